@@ -12,6 +12,8 @@
 
 import sympy as sp  # Import SymPy, a computer algebra system written entirely in Python
 import os           # Standard Python module for multiplatform OS-level functions
+import NRPy_param_funcs as par # NRPy+: Parameter interface
+import grid as gri   # NRPy+: Functions having to do with numerical grids (registers grid::GridFuncMemAlign)
 from MoLtimestepping.RK_Butcher_Table_Dictionary import Butcher_dict
 
 # Step 2: Checking if Butcher Table is Diagonal
@@ -55,6 +57,13 @@ def MoL_C_Code_Generation(RK_method = "RK4", RHS_string = "", post_RHS_string =
 
 ####### Step 3.b.i: Allocating Memory
     malloc_str = "// Code snippet allocating gridfunction memory for \"" + RK_method + "\" method:\n"
+    if par.parval_from_str("grid::GridFuncMemAlign") > 0:
+        # Aligned & padded gridfunctions are allocated, indexed & looped over as #define'd in
+        #   gridfunction_layout.h (see grid.py), which must be #include'd in place of the usual IDX4() macros.
+        malloc_str += """#ifndef GF_ALIGNMENT
+#error "grid::GridFuncMemAlign > 0 requires the gridfunction_layout.h output by grid.output__gridfunction_layout_h()"
+#endif
+"""
 
     # Loop over grids
     malloced_gridfunctions = []
@@ -64,6 +73,9 @@ def MoL_C_Code_Generation(RK_method = "RK4", RHS_string = "", post_RHS_string =
     def malloc_gfs_str(varname):
         malloced_gridfunctions.append(varname)
         memory_alloc_str = " = (REAL *)malloc(sizeof(REAL) * NUM_EVOL_GFS * Nxx_plus_2NGHOSTS_tot"+")"
+        if par.parval_from_str("grid::GridFuncMemAlign") > 0:
+            # Aligned & padded allocation, as #define'd in gridfunction_layout.h (see grid.py)
+            memory_alloc_str = " = GF_ALLOC(NUM_EVOL_GFS)"
         return type_str + varname + memory_alloc_str + ";\n"
     def diagnostic_output_gfs_equal_to(gfs):
         return type_str + "diagnostic_output_gfs"+" = "+gfs + ";\n"
@@ -145,7 +157,11 @@ def MoL_C_Code_Generation(RK_method = "RK4", RHS_string = "", post_RHS_string =
                               replace("RK_OUTPUT_GFS",RHS_output_str)+"\n"
 
         # Part 2: RK update
-        return_str += "LOOP_ALL_GFS_GPS"+"(i) {\n"
+        if par.parval_from_str("grid::GridFuncMemAlign") > 0:
+            # Padded rows are not contiguous, so loop over all allocated memory (see grid.py)
+            return_str += "#pragma omp parallel for\nfor(int i=0;i<GF_ALLOC_NUM_REALS(NUM_EVOL_GFS);i++) {\n"
+        else:
+            return_str += "LOOP_ALL_GFS_GPS"+"(i) {\n"
         for lhs,rhs in zip(RK_lhss_list,RK_rhss_list):
             return_str += indent + lhs + "[i] = " + rhs.replace("_gfs","_gfs") + ";\n"
         return_str += "}\n"
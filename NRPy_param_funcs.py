@@ -20,6 +20,33 @@ glb_Cparam = namedtuple('glb_Cparam','type module parname defaultval')
 
 veryverbose = False
 
+# Dict-backed indexes into the lists above (and into grid.glb_gridfcs_list), so that
+#    parameters and gridfunctions can be found by name in O(1) time.
+#    Each maps a key to the list of indices in its list having that key.
+#    Registrations only ever append to these lists, so an index is extended
+#    as its list grows, and is rebuilt if the list is replaced or shrinks.
+glb_indexes = {}
+
+def list_index(indexname, lst, keyfunc):
+    """ Return the dict index named indexname into the list lst, under the key keyfunc(element).
+
+        >>> lst = ["ab", "cd", "ae"]
+        >>> list_index("doctest", lst, lambda v: v[0])
+        {'a': [0, 2], 'c': [1]}
+        >>> lst.append("cf")
+        >>> list_index("doctest", lst, lambda v: v[0])
+        {'a': [0, 2], 'c': [1, 3]}
+        >>> list_index("doctest", ["xy"], lambda v: v[0])
+        {'x': [0]}
+    """
+    index, indexed_list, nindexed = glb_indexes.get(indexname, (None, None, 0))
+    if indexed_list is not lst or nindexed > len(lst):
+        index, nindexed = {}, 0
+    for i in range(nindexed, len(lst)):
+        index.setdefault(keyfunc(lst[i]), []).append(i)
+    glb_indexes[indexname] = (index, lst, len(lst))
+    return index
+
 def initialize_param(input):
     if get_params_idx(input) == -1:
         glb_params_list.append(input)
@@ -41,18 +68,22 @@ def initialize_Cparam(input):
 #    return the list index of `params` that matches `input`.
 # On error returns -1
 def get_params_idx(input,Cparam=False):
-    # inspired by: https://stackoverflow.com/questions/2917372/how-to-search-a-list-of-tuples-in-python:
     if Cparam==False:
-        list = [i for i, v in enumerate(glb_params_list)
-                if (input.type=="ignoretype" or input.type==v[0]) and input.module == v[1] and input.parname == v[2]]
+        list = [i for i in list_index("params_by_module_parname", glb_params_list,
+                                      lambda v: (v.module, v.parname)).get((input.module, input.parname), [])
+                if input.type=="ignoretype" or input.type==glb_params_list[i].type]
     else:
-        list = [i for i, v in enumerate(glb_Cparams_list) if input.parname == v[2]]
+        list = Cparam_indices(input.parname)
     if list == []:
         return -1 # No match found => error out!
     if len(list) > 1:
         print("Error: Found multiple parameters matching "+str(input))
         sys.exit(1)
-    return list.pop() # pop() returns the index
+    return list[-1]
+
+# Return the list of indices in glb_Cparams_list of C parameters named parname.
+def Cparam_indices(parname):
+    return list_index("Cparams_by_parname", glb_Cparams_list, lambda v: v.parname).get(parname, [])
 
 def get_params_value(input):
     idx = get_params_idx(input)
@@ -70,18 +101,18 @@ def idx_from_str(varname,modname=""):
         modname=splitstring[0]
         varname=splitstring[1]
 
-    # inspired by: https://stackoverflow.com/questions/2917372/how-to-search-a-list-of-tuples-in-python:
     if modname == "":
-        list = [i for i, v in enumerate(glb_params_list) if v[2] == varname]
+        list = list_index("params_by_parname", glb_params_list, lambda v: v.parname).get(varname, [])
     else:
-        list = [i for i, v in enumerate(glb_params_list) if (v[1] == modname and v[2] == varname)]
+        list = list_index("params_by_module_parname", glb_params_list,
+                          lambda v: (v.module, v.parname)).get((modname, varname), [])
     if list == []:
         print("Error: Could not find a parameter matching \""+varname+"\" in ",glb_params_list)
         sys.exit(1)
     if len(list) > 1:
         print("Error: Found more than one parameter named \""+varname+"\". Use get_params_value() instead.")
         sys.exit(1)
-    return list.pop()
+    return list[0]
 
 def parval_from_str(string):
     return glb_paramsvals_list[idx_from_str(string)]
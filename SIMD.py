@@ -5,9 +5,10 @@
 
 from sympy import (Integer, Rational, Float, Function, Symbol,
     Add, Mul, Pow, Abs, S, sign, srepr, simplify,
-    var, sin, cos, exp, log, preorder_traversal)
+    sin, cos, exp, log)
 from expr_tree import ExprTree
-from cse_helpers import cse_preprocess
+from cse_helpers import cse_preprocess, addition_chain, split_power
+import heapq
 
 # Basic Arithmetic Operations (Debugging)
 def ConstSIMD_check(a):
@@ -51,13 +52,318 @@ def SinSIMD_check(a):
 def CosSIMD_check(a):
     return cos(a)
 
-def expr_convert_to_SIMD_intrins(expr, map_sym_to_rat=None, prefix="", SIMD_find_more_FMAsFMSs="True", debug="False"):
+def rewrite_memoized(expr, rule):
+    """ Apply a rewrite rule to every subexpression in a single top-down pass.
+
+        The rule is applied to an expression before its arguments, and the
+        arguments of the replacement (if any) are then rewritten in turn.
+        The traversal uses an explicit stack rather than recursion, and
+        memoizes each distinct subexpression, so that repeated subexpressions
+        (common in large CSE trees) are rewritten only once. Subexpressions
+        are rebuilt (without evaluation) only if an argument has changed.
+
+        :arg:    SymPy expression
+        :arg:    rule, returning the replacement of a subexpression, or None
+        :return: rewritten expression
+
+        >>> from sympy.abc import a, b, c
+        >>> rule = lambda expr: Function('f')(*expr.args) if expr.func == Mul else None
+        >>> rewrite_memoized(a*b + c*sin(a*b), rule)
+        f(a, b) + f(c, sin(f(a, b)))
+    """
+    memo, pending = {}, {}
+    stack = [expr]
+    while stack:
+        subexpr = stack[-1]
+        if subexpr in memo:
+            stack.pop()
+            continue
+        replacement = pending.get(subexpr)
+        if replacement is None:
+            replacement = rule(subexpr)
+            if replacement is None:
+                replacement = subexpr
+            pending[subexpr] = replacement
+            children = [arg for arg in replacement.args if arg not in memo]
+            if children:
+                stack.extend(reversed(children))
+                continue
+        stack.pop()
+        args = [memo[arg] for arg in replacement.args]
+        if any(new is not old for new, old in zip(args, replacement.args)):
+            replacement = replacement.func(*args, evaluate=False)
+        memo[subexpr] = replacement
+        del pending[subexpr]
+    return memo[expr]
+
+# Latency, in clock cycles, of each SIMD operation; roughly that of recent x86-64 CPUs,
+#   e.g., Intel Skylake-X, where additions, multiplications, and FMAs all take 4 cycles
+#   (PowSIMD() etc. are approximate costs of the polynomial approximations in
+#   SIMD/SIMD_intrinsics.h). Operations not listed take 4 cycles.
+SIMD_latency = {"AddSIMD": 4, "SubSIMD": 4, "MulSIMD": 4, "FusedMulAddSIMD": 4, "FusedMulSubSIMD": 4,
+                "NegFusedMulAddSIMD": 4, "NegFusedMulSubSIMD": 4, "DivSIMD": 14, "SqrtSIMD": 18,
+                "CbrtSIMD": 40, "PowSIMD": 80, "ExpSIMD": 30, "LogSIMD": 30, "SinSIMD": 40, "CosSIMD": 40,
+                "AbsSIMD": 1, "SignSIMD": 3}
+# The FMA cost model (see contract_FMAs_by_cost()) minimizes the estimated time to evaluate
+#   each sum, in clock cycles: (number of operations)/FMA_issue_width, i.e., throughput on
+#   FMA_issue_width floating-point units, plus FMA_depth_weight*(critical path latency), i.e.,
+#   the fraction of the dependency chain the CPU cannot overlap with independent work.
+FMA_issue_width  = 2
+FMA_depth_weight = 0.125
+
+def SIMD_expr_cost(expr):
+    """ Count the SIMD operations in an expression (each distinct subexpression
+        once, as the C compiler would), and the latency of its critical path,
+        in clock cycles (see SIMD_latency).
+
+        :arg:    expression containing SIMD compiler intrinsics
+        :return: number of operations, critical path latency
+
+        >>> from sympy.abc import a, b, c
+        >>> AddSIMD, MulSIMD = Function('AddSIMD'), Function('MulSIMD')
+        >>> FusedMulAddSIMD = Function('FusedMulAddSIMD')
+        >>> SIMD_expr_cost(AddSIMD(MulSIMD(a, b), MulSIMD(a, b)))
+        (2, 8)
+        >>> SIMD_expr_cost(FusedMulAddSIMD(a, b, c))
+        (1, 4)
+    """
+    depth = {}
+    stack = [expr]
+    while stack:
+        subexpr = stack[-1]
+        if subexpr in depth:
+            stack.pop()
+            continue
+        children = [arg for arg in subexpr.args if arg not in depth]
+        if children:
+            stack.extend(children)
+            continue
+        stack.pop()
+        depth[subexpr] = 0 if subexpr.is_Atom else \
+            max([depth[arg] for arg in subexpr.args] + [0]) + SIMD_latency.get(subexpr.func.__name__, 4)
+    return sum(1 for subexpr in depth if not subexpr.is_Atom), depth[expr]
+
+def contract_FMAs_by_cost(expr, map_sym_to_rat=None, stats=None):
+    """ Contract the sums of products in an expression containing SIMD compiler
+        intrinsics (built from AddSIMD(), SubSIMD(), and MulSIMD()) into fused
+        multiply-adds, choosing for each sum the evaluation order with the lowest
+        estimated cost (see FMA_issue_width and FMA_depth_weight).
+
+        Each sum (with its subtractions, and negations of the form MulSIMD(-1, x),
+        flattened) of P products and Q other terms is evaluated as some number
+        of chains of FMAs, whose results, and the terms that start no chain, are
+        added pairwise in order of availability. With one chain, every product
+        is fused, and the number of operations is smallest, but the products are
+        added one after another; more chains cost more additions, but shorten
+        the critical path. Every number of chains (including none, i.e., no
+        FMAs at all) is tried, from the latency of each term (see SIMD_latency).
+        Sums are reassociated, which may change roundoff error.
+
+        :arg:    expression containing SIMD compiler intrinsics
+        :arg:    symbol to rational dictionary (to identify -1)
+        :arg:    dictionary in which to accumulate statistics (or None):
+                    sums: number of sums, products: number of products in them,
+                    FMAs: number of FMAs generated, chains: number of chains of FMAs,
+                    ops_unfused & ops: number of operations in the sums without & with FMAs,
+                    depth_unfused & depth: critical path latency without & with FMAs
+        :return: expression with fused multiply-adds
+
+        >>> from sympy.abc import a, b, c, d, e, f, g, h, i
+        >>> AddSIMD, SubSIMD, MulSIMD = Function('AddSIMD'), Function('SubSIMD'), Function('MulSIMD')
+        >>> contract_FMAs_by_cost(AddSIMD(MulSIMD(a, b), c))
+        FusedMulAddSIMD(a, b, c)
+        >>> contract_FMAs_by_cost(SubSIMD(c, MulSIMD(a, b)))
+        NegFusedMulAddSIMD(a, b, c)
+        >>> contract_FMAs_by_cost(MulSIMD(-1, AddSIMD(MulSIMD(a, b), c)))
+        NegFusedMulSubSIMD(a, b, c)
+
+        Four products and one other term are contracted into a single chain of FMAs:
+        >>> contract_FMAs_by_cost(AddSIMD(AddSIMD(MulSIMD(a, b), MulSIMD(c, d)), AddSIMD(AddSIMD(MulSIMD(e, f), MulSIMD(g, h)), i)))
+        FusedMulAddSIMD(g, h, FusedMulAddSIMD(e, f, FusedMulAddSIMD(c, d, FusedMulAddSIMD(a, b, i))))
+
+        With six products, a single chain of six FMAs would take 24 cycles. Splitting it into two chains keeps
+        the critical path at the unfused 16 cycles, for one more operation than a single chain (7, vs. 12 unfused):
+        >>> j, k, l, m = Symbol('j'), Symbol('k'), Symbol('l'), Symbol('m')
+        >>> stats = {}
+        >>> contract_FMAs_by_cost(AddSIMD(AddSIMD(AddSIMD(MulSIMD(a, b), MulSIMD(c, d)), AddSIMD(MulSIMD(e, f), MulSIMD(g, h))),
+        ...                               AddSIMD(AddSIMD(MulSIMD(i, j), MulSIMD(k, l)), m)), stats=stats)
+        AddSIMD(FusedMulAddSIMD(i, j, FusedMulAddSIMD(e, f, FusedMulAddSIMD(c, d, m))), FusedMulAddSIMD(k, l, FusedMulAddSIMD(g, h, MulSIMD(a, b))))
+        >>> print(sorted(stats.items()))
+        [('FMAs', 5), ('chains', 2), ('depth', 16), ('depth_unfused', 16), ('ops', 7), ('ops_unfused', 12), ('products', 6), ('sums', 1)]
+    """
+    if map_sym_to_rat is None: map_sym_to_rat = {}
+    AddSIMD, SubSIMD, MulSIMD = Function("AddSIMD"), Function("SubSIMD"), Function("MulSIMD")
+    FMA = {(1, 1): Function("FusedMulAddSIMD"), (1, -1): Function("NegFusedMulAddSIMD"),
+           (-1, 1): Function("FusedMulSubSIMD"), (-1, -1): Function("NegFusedMulSubSIMD")}
+    L_add, L_mul, L_FMA = SIMD_latency["AddSIMD"], SIMD_latency["MulSIMD"], SIMD_latency["FusedMulAddSIMD"]
+
+    def is_negative_one(arg):
+        return map_sym_to_rat.get(arg, arg) == -1
+
+    def negated(subexpr):
+        # Return x if subexpr = MulSIMD(-1, x) or MulSIMD(x, -1), and None otherwise
+        if subexpr.func == MulSIMD:
+            if is_negative_one(subexpr.args[0]): return subexpr.args[1]
+            if is_negative_one(subexpr.args[1]): return subexpr.args[0]
+        return None
+
+    def is_sum(subexpr):
+        return subexpr.func in (AddSIMD, SubSIMD) or \
+            (negated(subexpr) is not None and negated(subexpr).func in (AddSIMD, SubSIMD))
+
+    def strip_sign(subexpr):
+        # Factor the -1's out of a product: return sign, product
+        sign = 1
+        while negated(subexpr) is not None:
+            sign, subexpr = -sign, negated(subexpr)
+        if subexpr.func == MulSIMD:
+            (sign0, arg0), (sign1, arg1) = strip_sign(subexpr.args[0]), strip_sign(subexpr.args[1])
+            if arg0 is not subexpr.args[0] or arg1 is not subexpr.args[1]:
+                subexpr = MulSIMD(arg0, arg1)
+            sign *= sign0*sign1
+        return sign, subexpr
+
+    def terms_of_sum(subexpr):
+        # Flatten a sum into lists of (sign, product) and (sign, other term), and the -1 used (if any)
+        products, others, negative_one = [], [], None
+        stack = [(subexpr, 1)]
+        while stack:
+            term, sign = stack.pop()
+            if term.func == AddSIMD:
+                stack.extend([(term.args[1], sign), (term.args[0], sign)])
+            elif term.func == SubSIMD:
+                stack.extend([(term.args[1], -sign), (term.args[0], sign)])
+            elif negated(term) is not None and negated(term).func in (AddSIMD, SubSIMD):
+                negative_one = term.args[0] if is_negative_one(term.args[0]) else term.args[1]
+                stack.append((negated(term), -sign))
+            else:
+                if negated(term) is not None:
+                    negative_one = term.args[0] if is_negative_one(term.args[0]) else term.args[1]
+                term_sign, term = strip_sign(term)
+                (products if term.func == MulSIMD else others).append((sign*term_sign, term))
+        return products, others, negative_one
+
+    def children(subexpr):
+        if is_sum(subexpr):
+            products, others, _negative_one = terms_of_sum(subexpr)
+            return [arg for _sign, product in products for arg in product.args] + [term for _sign, term in others]
+        return subexpr.args
+
+    # Each sum is evaluated as a list of values, each (time ready, sign, expression, chain length);
+    #   combine() adds them pairwise in order of availability, e.g., a + (-b) = SubSIMD(a, b).
+    def combine(values, build):
+        heap = [(time, k, sign, value) for k, (time, sign, value) in enumerate(values)]
+        heapq.heapify(heap)
+        count = len(heap)
+        while len(heap) > 1:
+            time0, _k0, sign0, value0 = heapq.heappop(heap)
+            time1, _k1, sign1, value1 = heapq.heappop(heap)
+            if build:
+                if sign0 == sign1:   value, sign = AddSIMD(value0, value1), sign0
+                elif sign0 > sign1:  value, sign = SubSIMD(value0, value1), 1
+                else:                value, sign = SubSIMD(value1, value0), 1
+            else: value, sign = None, (sign0 if sign0 == sign1 else 1)
+            heapq.heappush(heap, (max(time0, time1) + L_add, count, sign, value))
+            count += 1
+        return heap[0]
+
+    def evaluate_sum(products, others, num_chains, build):
+        # Evaluate a sum of products [(sign, factor, factor, time ready)] and other terms
+        #   [(sign, term, time ready)] with num_chains chains of FMAs; return the cost, the number
+        #   of operations, the time the result is ready, the expression (if build), and the number of FMAs.
+        products = sorted(products, key=lambda product: product[3])
+        others = sorted(others, key=lambda term: term[2])
+        num_product_chains = max(num_chains - len(others), 0)
+        ops, values, chains = 0, [], []
+        # Start the chains from the first other terms to be ready, then from products.
+        for sign, term, ready in others[:num_chains]:
+            chains.append([ready, len(chains), sign, term])
+        for sign, factor0, factor1, ready in products[:num_product_chains]:
+            chains.append([ready + L_mul, len(chains), sign, MulSIMD(factor0, factor1) if build else None])
+            ops += 1
+        fused = products[num_product_chains:] if num_chains > 0 else []
+        heapq.heapify(chains)
+        for sign, factor0, factor1, ready in fused:
+            chain = heapq.heappop(chains)
+            chain[0] = max(chain[0], ready) + L_FMA
+            if build:
+                chain[3] = FMA[(chain[2], sign)](factor0, factor1, chain[3])
+            chain[2] = 1
+            heapq.heappush(chains, chain)
+            ops += 1
+        if num_chains == 0:
+            for sign, factor0, factor1, ready in products:
+                values.append((ready + L_mul, sign, MulSIMD(factor0, factor1) if build else None))
+                ops += 1
+        values += [(chain[0], chain[2], chain[3]) for chain in sorted(chains, key=lambda chain: chain[1])]
+        values += [(ready, sign, term) for sign, term, ready in others[num_chains:]]
+        ops += len(values) - 1
+        ready, _k, sign, result = combine(values, build)
+        if sign < 0:
+            ops += 1
+            ready += L_mul
+            if build: result = MulSIMD(negative_one, result)
+        return float(ops)/FMA_issue_width + FMA_depth_weight*ready, ops, ready, result, len(fused)
+
+    # Process each subexpression after its children (with an explicit stack), recording
+    #   the contracted expression, and the time it is ready with and without FMAs.
+    new_expr, time, time_unfused = {}, {}, {}
+    stack = [expr]
+    while stack:
+        subexpr = stack[-1]
+        if subexpr in new_expr:
+            stack.pop()
+            continue
+        pending = [arg for arg in children(subexpr) if arg not in new_expr]
+        if pending:
+            stack.extend(pending)
+            continue
+        stack.pop()
+        if not is_sum(subexpr):
+            args = [new_expr[arg] for arg in subexpr.args]
+            if any(new is not old for new, old in zip(args, subexpr.args)):
+                new_expr[subexpr] = subexpr.func(*args, evaluate=False)
+            else:
+                new_expr[subexpr] = subexpr
+            latency = 0 if subexpr.is_Atom else SIMD_latency.get(subexpr.func.__name__, 4)
+            time[subexpr] = max([time[arg] for arg in subexpr.args] + [0]) + latency
+            time_unfused[subexpr] = max([time_unfused[arg] for arg in subexpr.args] + [0]) + latency
+            continue
+        products, others, negative_one = terms_of_sum(subexpr)
+        if negative_one is None: negative_one = S.NegativeOne
+        def terms(times, new):
+            # The terms of the sum, with the times they are ready (and contracted, if new)
+            get = (lambda arg: new_expr[arg]) if new else (lambda arg: arg)
+            return ([(sign, get(product.args[0]), get(product.args[1]), max(times[arg] for arg in product.args))
+                     for sign, product in products],
+                    [(sign, get(term), times[term]) for sign, term in others])
+        _cost, ops_unfused, ready_unfused, _result, _num_fused = evaluate_sum(*(terms(time_unfused, False) + (0, False)))
+        best = min(range(len(products) + 1),
+                   key=lambda num_chains: evaluate_sum(*(terms(time, False) + (num_chains, False)))[0])
+        _cost, ops, ready, result, num_fused = evaluate_sum(*(terms(time, True) + (best, True)))
+        new_expr[subexpr], time[subexpr], time_unfused[subexpr] = result, ready, ready_unfused
+        if stats is not None:
+            for key, value in [("sums", 1), ("products", len(products)), ("FMAs", num_fused),
+                               ("chains", best if num_fused > 0 else 0), ("ops_unfused", ops_unfused), ("ops", ops)]:
+                stats[key] = stats.get(key, 0) + value
+    if stats is not None:
+        stats["depth_unfused"] = stats.get("depth_unfused", 0) + time_unfused[expr]
+        stats["depth"] = stats.get("depth", 0) + time[expr]
+    return new_expr[expr]
+
+def expr_convert_to_SIMD_intrins(expr, map_sym_to_rat=None, prefix="", SIMD_find_more_FMAsFMSs="True", debug="False",
+                                 FMA_stats=None, lower_powers="False"):
     """ Convert expression to SIMD compiler intrinsics
 
         :arg:    SymPy expression
         :arg:    symbol to rational dictionary
-        :arg:    option to find more FMA/FMS patterns
+        :arg:    option to find more FMA/FMS patterns: "True", "False", or "CostModel"
+                    (see contract_FMAs_by_cost())
         :arg:    back-substitute and check difference
+        :arg:    dictionary in which to accumulate the statistics of contract_FMAs_by_cost() (or None)
+        :arg:    compute integer powers in addition chains, and rational powers with denominator
+                    2, 3, 4, or 6 by multiplication, SqrtSIMD(), and CbrtSIMD(), rather than PowSIMD()
+                    (the outCparam lower_powers)
         :return: expression containing SIMD compiler intrinsics
 
         >>> from sympy.abc import a, b, c, d
@@ -70,16 +376,34 @@ def expr_convert_to_SIMD_intrins(expr, map_sym_to_rat=None, prefix="", SIMD_find
         >>> convert(a**(-2))
         DivSIMD(_Integer_1, MulSIMD(a, a))
 
-        >>> convert(a**(1/2))
+        >>> convert(a**0.5)
         SqrtSIMD(a)
 
-        >>> convert(a**(-1/2))
+        >>> convert(a**(-0.5))
         DivSIMD(1, SqrtSIMD(a))
 
         >>> from sympy import Rational
+        >>> convert(a**Rational(1, 2))
+        SqrtSIMD(a)
+
         >>> convert(a**Rational(1, 3))
         CbrtSIMD(a)
 
+        >>> convert(a**4)
+        MulSIMD(MulSIMD(MulSIMD(a, a), a), a)
+
+        >>> convert(a**4, lower_powers="True")
+        MulSIMD(MulSIMD(a, a), MulSIMD(a, a))
+
+        >>> convert(a**Rational(-3, 2))
+        DivSIMD(_Integer_1, PowSIMD(a, _Rational_3_2))
+
+        >>> convert(a**Rational(-3, 2), lower_powers="True")
+        DivSIMD(_Integer_1, MulSIMD(a, SqrtSIMD(a)))
+
+        >>> convert(a**Rational(3, 10))
+        PowSIMD(a, _Rational_3_10)
+
         >>> convert(a**b)
         PowSIMD(a, b)
 
@@ -115,12 +439,10 @@ def expr_convert_to_SIMD_intrins(expr, map_sym_to_rat=None, prefix="", SIMD_find
 
         >>> convert(-a*b - c)
         NegFusedMulSubSIMD(a, b, c)
-    """
-    for item in preorder_traversal(expr):
-        for arg in item.args:
-            if isinstance(arg, Symbol):
-                var(str(arg))
 
+        >>> convert(a*b - c*d + a, SIMD_find_more_FMAsFMSs="CostModel")
+        NegFusedMulAddSIMD(c, d, FusedMulAddSIMD(a, b, a))
+    """
     def lookup_rational(arg):
         if arg.func == Symbol:
             try: arg = map_sym_to_rat[arg]
@@ -132,7 +454,7 @@ def expr_convert_to_SIMD_intrins(expr, map_sym_to_rat=None, prefix="", SIMD_find
 
     map_rat_to_sym = {map_sym_to_rat[v]:v for v in map_sym_to_rat}
 
-    expr_orig, tree = expr, ExprTree(expr)
+    expr_orig = expr
 
     AbsSIMD  = Function("AbsSIMD")
     AddSIMD  = Function("AddSIMD")
@@ -153,76 +475,104 @@ def expr_convert_to_SIMD_intrins(expr, map_sym_to_rat=None, prefix="", SIMD_find
     SinSIMD  = Function("SinSIMD")
     CosSIMD  = Function("CosSIMD")
 
+    # Each of the following rewrite rules is applied to every node of the expression
+    #   tree in a top-down (preorder) pass: a rule receives a (sub)expression, and
+    #   returns its replacement, or None if the (sub)expression is left unchanged.
+    #   The passes are applied in order; the result of each pass is the input to the next.
+
     # Step 1: Replace transcendental functions, power functions, and division expressions.
     #   Note: SymPy does not represent fractional integers as rationals since
     #         those are explicitly declared using the rational class, and hence
     #         the following algorithm does not affect fractional integers.
     #         SymPy: srepr(a**(-2)) = Pow(a, -2)
     #         NRPy:  srepr(a**(-2)) = DivSIMD(1, MulSIMD(a, a))
-    for subtree in tree.preorder():
-        func = subtree.expr.func
-        args = subtree.expr.args
+    def replace_transcendentals(subexpr):
+        func = subexpr.func
+        args = subexpr.args
         if   func == Abs:
-            subtree.expr = AbsSIMD(args[0])
+            return AbsSIMD(args[0])
         elif func == exp:
-            subtree.expr = ExpSIMD(args[0])
+            return ExpSIMD(args[0])
         elif func == log:
-            subtree.expr = LogSIMD(args[0])
+            return LogSIMD(args[0])
         elif func == sin:
-            subtree.expr = SinSIMD(args[0])
+            return SinSIMD(args[0])
         elif func == cos:
-            subtree.expr = CosSIMD(args[0])
+            return CosSIMD(args[0])
         elif func == sign:
-            subtree.expr = SignSIMD(args[0])
-    tree.reconstruct()
+            return SignSIMD(args[0])
+        return None
+
+    def ConstRationalSIMD(r):
+        # Helper Function: Declare Positive Rational as SIMD Constant (named as in cse_preprocess)
+        try: return map_rat_to_sym[r]
+        except KeyError:
+            var_name = prefix + ('_Rational_' + str(r.p) + '_' + str(r.q) if r.q != 1 else '_Integer_' + str(r.p))
+            map_sym_to_rat[Symbol(var_name)], map_rat_to_sym[r] = r, Symbol(var_name)
+            return Symbol(var_name)
+
+    def ReciprocalSIMD(a):
+        # Helper Function: Construct Reciprocal
+        return DivSIMD(ConstRationalSIMD(S.One), a)
 
     def IntegerPowSIMD(a, n):
-        # Recursive Helper Function: Construct Integer Powers
-        if   n == 2:
-            return MulSIMD(a, a)
-        if n > 2:
-            return MulSIMD(IntegerPowSIMD(a, n - 1), a)
-        if n <= -2:
-            one = Symbol(prefix + '_Integer_1')
-            try: map_rat_to_sym[1]
-            except KeyError:
-                map_sym_to_rat[one], map_rat_to_sym[1] = S.One, one
-            return DivSIMD(one, IntegerPowSIMD(a, -n))
-        if n == -1:
-            one = Symbol(prefix + '_Integer_1')
-            try: map_rat_to_sym[1]
-            except KeyError:
-                map_sym_to_rat[one], map_rat_to_sym[1] = S.One, one
-            return DivSIMD(one, a)
-
-    for subtree in tree.preorder():
-        func = subtree.expr.func
-        args = subtree.expr.args
-        if func == Pow:
+        # Helper Function: Construct Integer Powers by Repeated Multiplication, e.g.,
+        #   a**4 = MulSIMD(MulSIMD(MulSIMD(a, a), a), a), or with lower_powers by an Addition
+        #   Chain, e.g., a**4 = MulSIMD(MulSIMD(a, a), MulSIMD(a, a)); see addition_chain()
+        if n < 0:
+            return ReciprocalSIMD(IntegerPowSIMD(a, -n) if n < -1 else a)
+        if n < 2:
+            return None
+        if lower_powers != "True":
+            return MulSIMD(IntegerPowSIMD(a, n - 1), a) if n > 2 else MulSIMD(a, a)
+        powers = {1: a}
+        for k, (i, j) in addition_chain([n]).items():
+            powers[k] = MulSIMD(powers[i], powers[j])
+        return powers[n]
+
+    def RationalPowSIMD(a, exponent):
+        # Helper Function: Construct Rational Powers with Denominator 2, 3, 4, or 6
+        #   from Integer Powers, Square Roots, and Cube Roots; see split_power()
+        #   e.g., a**(-3/2) = DivSIMD(1, MulSIMD(a, SqrtSIMD(a)))
+        n, roots, negative = split_power(exponent)
+        root = {Rational(1, 2): SqrtSIMD(a), Rational(1, 3): CbrtSIMD(a)}
+        root[Rational(1, 4)] = SqrtSIMD(root[Rational(1, 2)])
+        root[Rational(1, 6)] = SqrtSIMD(root[Rational(1, 3)])
+        factors = ([IntegerPowSIMD(a, n)] if n > 1 else [a] if n == 1 else []) + [root[r] for r in roots]
+        power = factors[0]
+        for factor in factors[1:]:
+            power = MulSIMD(power, factor)
+        return ReciprocalSIMD(power) if negative else power
+
+    def replace_powers(subexpr):
+        args = subexpr.args
+        if subexpr.func == Pow:
             exponent = lookup_rational(args[1])
-            if   exponent == 0.5:
-                subtree.expr = SqrtSIMD(args[0])
-                subtree.children.pop(1)
-            elif exponent == -0.5:
-                subtree.expr = DivSIMD(1, SqrtSIMD(args[0]))
-                tree.build(subtree)
+            if   exponent == Rational(1, 2) or exponent == 0.5:
+                return SqrtSIMD(args[0])
+            elif exponent == Rational(-1, 2) or exponent == -0.5:
+                return DivSIMD(1, SqrtSIMD(args[0]))
             elif exponent == Rational(1, 3):
-                subtree.expr = CbrtSIMD(args[0])
-                subtree.children.pop(1)
+                return CbrtSIMD(args[0])
             elif isinstance(exponent, Integer):
-                subtree.expr = IntegerPowSIMD(args[0], exponent)
-                tree.build(subtree)
+                return IntegerPowSIMD(args[0], exponent)
+            elif lower_powers == "True" and split_power(exponent) is not None:
+                return RationalPowSIMD(args[0], exponent)
+            elif isinstance(exponent, Rational):
+                # cse_preprocess() leaves exponents in place, so declare the exponent as a SIMD constant here
+                if exponent < 0:
+                    return ReciprocalSIMD(PowSIMD(args[0], ConstRationalSIMD(-exponent)))
+                return PowSIMD(args[0], ConstRationalSIMD(exponent))
             else:
-                subtree.expr = PowSIMD(*args)
-    tree.reconstruct()
+                return PowSIMD(*args)
+        return None
 
     # Step 2: Replace subtraction expressions.
     #   Note: SymPy: srepr(a - b) = Add(a, Mul(-1, b))
     #         NRPy:  srepr(a - b) = SubSIMD(a, b)
-    for subtree in tree.preorder():
-        func = subtree.expr.func
-        args = list(subtree.expr.args)
-        if func == Add:
+    def replace_subtractions(subexpr):
+        args = list(subexpr.args)
+        if subexpr.func == Add:
             try:
                 # Find the first occurrence of a negative product inside the addition
                 i = next(i for i, arg in enumerate(args) if arg.func == Mul and \
@@ -234,14 +584,13 @@ def expr_convert_to_SIMD_intrins(expr, map_sym_to_rat=None, prefix="", SIMD_find
                 # Remove the negative symbol from the product
                 subargs = list(args[i].args); subargs.pop(j)
                 # Build the subtraction expression for replacement
-                subexpr = SubSIMD(args[k], Mul(*subargs))
+                replacement = SubSIMD(args[k], Mul(*subargs))
                 args = [arg for arg in args if arg not in (args[i], args[k])]
                 if len(args) > 0:
-                    subexpr = Add(subexpr, *args)
-                subtree.expr = subexpr
-                tree.build(subtree)
+                    replacement = Add(replacement, *args)
+                return replacement
             except StopIteration: pass
-    tree.reconstruct()
+        return None
 
     # Step 3: Replace addition and multiplication expressions.
     #   Note: SIMD addition and multiplication compiler intrinsics can read
@@ -249,38 +598,35 @@ def expr_convert_to_SIMD_intrins(expr, map_sym_to_rat=None, prefix="", SIMD_find
     #         operators can read an arbitrary number of arguments.
     #         SymPy: srepr(a*b*c*d) = Mul(a, b, c, d)
     #         NRPy:  srepr(a*b*c*d) = MulSIMD(MulSIMD(a, b), MulSIMD(c, d))
-    for subtree in tree.preorder():
-        func = subtree.expr.func
-        args = subtree.expr.args
+    def replace_additions_multiplications(subexpr):
+        func = subexpr.func
+        args = subexpr.args
         if func in (Mul, Add):
             func = MulSIMD if func == Mul else AddSIMD
-            subexpr = func(*args[-2:])
+            replacement = func(*args[-2:])
             args, N = args[:-2], len(args) - 2
             for i in range(0, N, 2):
                 if N - i > 1:
                     tmpexpr = func(args[i], args[i + 1])
-                    subexpr = func(tmpexpr, subexpr, evaluate=False)
+                    replacement = func(tmpexpr, replacement, evaluate=False)
                 else:
-                    subexpr = func(args[i], subexpr, evaluate=False)
-            subtree.expr = subexpr
-            tree.build(subtree)
-    tree.reconstruct()
+                    replacement = func(args[i], replacement, evaluate=False)
+            return replacement
+        return None
 
     # Step 4: Replace the pattern Mul(Div(1, b), a) or Mul(a, Div(1, b)) with Div(a, b).
-    for subtree in tree.preorder():
-        func = subtree.expr.func
-        args = subtree.expr.args
+    def replace_reciprocal_products(subexpr):
+        func = subexpr.func
+        args = subexpr.args
         # MulSIMD(DivSIMD(1, b), a) >> DivSIMD(a, b)
         if   func == MulSIMD and args[0].func == DivSIMD and \
                 lookup_rational(args[0].args[0]) == 1:
-            subtree.expr = DivSIMD(args[1], args[0].args[1])
-            tree.build(subtree)
+            return DivSIMD(args[1], args[0].args[1])
         # MulSIMD(a, DivSIMD(1, b)) >> DivSIMD(a, b)
         elif func == MulSIMD and args[1].func == DivSIMD and \
                 lookup_rational(args[1].args[0]) == 1:
-            subtree.expr = DivSIMD(args[0], args[1].args[1])
-            tree.build(subtree)
-    tree.reconstruct()
+            return DivSIMD(args[0], args[1].args[1])
+        return None
 
     # Step 5: Now that all multiplication and addition functions only take two
     #         arguments, we can define fused-multiply-add functions,
@@ -292,205 +638,198 @@ def expr_convert_to_SIMD_intrins(expr, map_sym_to_rat=None, prefix="", SIMD_find
 
     # Step 5.a: Find double FMA patterns first [e.g. FMA(a, b, FMA(c, d, e))].
     #   Note: Double FMA simplifications do not guarantee a significant performance impact when solving BSSN equations
-    if SIMD_find_more_FMAsFMSs == "True":
-        for subtree in tree.preorder():
-            func = subtree.expr.func
-            args = subtree.expr.args
-            # a + b*c + d*e -> FMA(b,c,FMA(d,e,a))
-            # AddSIMD(a, AddSIMD(MulSIMD(b,c), MulSIMD(d,e))) >> FusedMulAddSIMD(b, c, FusedMulAddSIMD(d,e,a))
-            # Validate:
-            # x = a + b*c + d*e
-            # outputC(x,"x", params="SIMD_enable=True,SIMD_debug=True")
-            if  (func == AddSIMD and args[1].func == AddSIMD and args[1].args[0].func == MulSIMD and args[1].args[1].func == MulSIMD):
-                subtree.expr = FusedMulAddSIMD(                args[1].args[0].args[0], args[1].args[0].args[1],
-                                               FusedMulAddSIMD(args[1].args[1].args[0], args[1].args[1].args[1],
-                                                               args[0]))
-                tree.build(subtree)
-            # b*c + d*e + a -> FMA(b,c,FMA(d,e,a))
-            # Validate:
-            # x = b*c + d*e + a
-            # outputC(x,"x", params="SIMD_enable=True,SIMD_debug=True")
-            # AddSIMD(AddSIMD(MulSIMD(b,c), MulSIMD(d,e)),a) >> FusedMulAddSIMD(b, c, FusedMulAddSIMD(d,e,a))
-            elif func == AddSIMD and args[0].func == AddSIMD and args[0].args[0].func == MulSIMD and args[0].args[1].func == MulSIMD:
-                subtree.expr = FusedMulAddSIMD(                args[0].args[0].args[0], args[0].args[0].args[1],
-                                               FusedMulAddSIMD(args[0].args[1].args[0], args[0].args[1].args[1],
-                                                               args[1]))
-                tree.build(subtree)
-        tree.reconstruct()
+    def replace_double_FMAs(subexpr):
+        func = subexpr.func
+        args = subexpr.args
+        # a + b*c + d*e -> FMA(b,c,FMA(d,e,a))
+        # AddSIMD(a, AddSIMD(MulSIMD(b,c), MulSIMD(d,e))) >> FusedMulAddSIMD(b, c, FusedMulAddSIMD(d,e,a))
+        # Validate:
+        # x = a + b*c + d*e
+        # outputC(x,"x", params="SIMD_enable=True,SIMD_debug=True")
+        if  (func == AddSIMD and args[1].func == AddSIMD and args[1].args[0].func == MulSIMD and args[1].args[1].func == MulSIMD):
+            return FusedMulAddSIMD(                args[1].args[0].args[0], args[1].args[0].args[1],
+                                   FusedMulAddSIMD(args[1].args[1].args[0], args[1].args[1].args[1],
+                                                   args[0]))
+        # b*c + d*e + a -> FMA(b,c,FMA(d,e,a))
+        # Validate:
+        # x = b*c + d*e + a
+        # outputC(x,"x", params="SIMD_enable=True,SIMD_debug=True")
+        # AddSIMD(AddSIMD(MulSIMD(b,c), MulSIMD(d,e)),a) >> FusedMulAddSIMD(b, c, FusedMulAddSIMD(d,e,a))
+        elif func == AddSIMD and args[0].func == AddSIMD and args[0].args[0].func == MulSIMD and args[0].args[1].func == MulSIMD:
+            return FusedMulAddSIMD(                args[0].args[0].args[0], args[0].args[0].args[1],
+                                   FusedMulAddSIMD(args[0].args[1].args[0], args[0].args[1].args[1],
+                                                   args[1]))
+        return None
 
     # Step 5.b: Find single FMA patterns.
-    for subtree in tree.preorder():
-        func = subtree.expr.func
-        args = subtree.expr.args
+    def replace_single_FMAs(subexpr):
+        func = subexpr.func
+        args = subexpr.args
+        replacement = None
         # AddSIMD(MulSIMD(b, c), a) >> FusedMulAddSIMD(b, c, a)
         if   func == AddSIMD and args[0].func == MulSIMD:
-            subtree.expr = FusedMulAddSIMD(args[0].args[0], args[0].args[1], args[1])
-            tree.build(subtree)
+            replacement = FusedMulAddSIMD(args[0].args[0], args[0].args[1], args[1])
         # AddSIMD(a, MulSIMD(b, c)) >> FusedMulAddSIMD(b, c, a)
         elif func == AddSIMD and args[1].func == MulSIMD:
-            subtree.expr = FusedMulAddSIMD(args[1].args[0], args[1].args[1], args[0])
-            tree.build(subtree)
+            replacement = FusedMulAddSIMD(args[1].args[0], args[1].args[1], args[0])
         # SubSIMD(MulSIMD(b, c), a) >> FusedMulSubSIMD(b, c, a)
         elif func == SubSIMD and args[0].func == MulSIMD:
-            subtree.expr = FusedMulSubSIMD(args[0].args[0], args[0].args[1], args[1])
-            tree.build(subtree)
+            replacement = FusedMulSubSIMD(args[0].args[0], args[0].args[1], args[1])
         # SubSIMD(a, MulSIMD(b, c)) >> NegativeFusedMulAddSIMD(b, c, a)
         elif func == SubSIMD and args[1].func == MulSIMD:
-            subtree.expr = NegFusedMulAddSIMD(args[1].args[0], args[1].args[1], args[0])
-            tree.build(subtree)
+            replacement = NegFusedMulAddSIMD(args[1].args[0], args[1].args[1], args[0])
         # FMS(-1, MulSIMD(a, b), c) >> NegativeFusedMulSubSIMD(b, c, a)
-        func = subtree.expr.func
-        args = subtree.expr.args
+        if replacement is not None:
+            func = replacement.func
+            args = replacement.args
         if func == FusedMulSubSIMD and args[1].func == MulSIMD and lookup_rational(args[0]) == -1:
-            subtree.expr = NegFusedMulSubSIMD(args[1].args[0], args[1].args[1], args[2])
-            tree.build(subtree)
-    tree.reconstruct()
+            replacement = NegFusedMulSubSIMD(args[1].args[0], args[1].args[1], args[2])
+        return replacement
 
     # Step 5.c: Remaining double FMA patterns that previously in Step 5.a were difficult to find.
     #   Note: Double FMA simplifications do not guarantee a significant performance impact when solving BSSN equations
-    if SIMD_find_more_FMAsFMSs == "True":
-        for subtree in tree.preorder():
-            func = subtree.expr.func
-            args = subtree.expr.args
-            # (b*c - d*e) + a -> AddSIMD(a, FusedMulSubSIMD(b, c, MulSIMD(d, e))) >> FusedMulSubSIMD(b, c, FusedMulSubSIMD(d,e,a))
-            # Validate:
-            # x = (b*c - d*e) + a
-            # outputC(x,"x", params="SIMD_enable=True,SIMD_debug=True")
-            if func == AddSIMD and args[1].func == FusedMulSubSIMD and args[1].args[2].func == MulSIMD:
-                subtree.expr = FusedMulSubSIMD(                args[1].args[0]        ,args[1].args[1],
-                                               FusedMulSubSIMD(args[1].args[2].args[0],args[1].args[2].args[1],
-                                                               args[0]))
-                tree.build(subtree)
-            # b*c - (a - d*e) -> SubSIMD(FusedMulAddSIMD(b, c, MulSIMD(d, e)), a) >> FMA(b,c,FMS(d,e,a))
-            # Validate:
-            # x = b * c - (a - d * e)
-            # outputC(x, "x", params="SIMD_enable=True,SIMD_debug=True")
-            elif func == SubSIMD and args[0].func == FusedMulAddSIMD and args[0].args[2].func == MulSIMD:
-                subtree.expr = FusedMulAddSIMD(args[0].args[0], args[0].args[1],
-                                               FusedMulSubSIMD(args[0].args[2].args[0], args[0].args[2].args[1],
-                                                               args[1]))
-                tree.build(subtree)
-            # (b*c - d*e) - a -> SubSIMD(FusedMulSubSIMD(b, c, MulSIMD(d, e)), a) >> FMS(b,c,FMA(d,e,a))
-            # Validate:
-            # x = (b*c - d*e) - a
-            # outputC(x,"x", params="SIMD_enable=True,SIMD_debug=True")
-            elif func == SubSIMD and args[0].func == FusedMulSubSIMD and args[0].args[2].func == MulSIMD:
-                subtree.expr = FusedMulSubSIMD(args[0].args[0], args[0].args[1],
-                                               FusedMulAddSIMD(args[0].args[2].args[0], args[0].args[2].args[1],
-                                                               args[1]))
-                tree.build(subtree)
-        tree.reconstruct()
+    def replace_remaining_double_FMAs(subexpr):
+        func = subexpr.func
+        args = subexpr.args
+        # (b*c - d*e) + a -> AddSIMD(a, FusedMulSubSIMD(b, c, MulSIMD(d, e))) >> FusedMulSubSIMD(b, c, FusedMulSubSIMD(d,e,a))
+        # Validate:
+        # x = (b*c - d*e) + a
+        # outputC(x,"x", params="SIMD_enable=True,SIMD_debug=True")
+        if func == AddSIMD and args[1].func == FusedMulSubSIMD and args[1].args[2].func == MulSIMD:
+            return FusedMulSubSIMD(                args[1].args[0]        ,args[1].args[1],
+                                   FusedMulSubSIMD(args[1].args[2].args[0],args[1].args[2].args[1],
+                                                   args[0]))
+        # b*c - (a - d*e) -> SubSIMD(FusedMulAddSIMD(b, c, MulSIMD(d, e)), a) >> FMA(b,c,FMS(d,e,a))
+        # Validate:
+        # x = b * c - (a - d * e)
+        # outputC(x, "x", params="SIMD_enable=True,SIMD_debug=True")
+        elif func == SubSIMD and args[0].func == FusedMulAddSIMD and args[0].args[2].func == MulSIMD:
+            return FusedMulAddSIMD(args[0].args[0], args[0].args[1],
+                                   FusedMulSubSIMD(args[0].args[2].args[0], args[0].args[2].args[1],
+                                                   args[1]))
+        # (b*c - d*e) - a -> SubSIMD(FusedMulSubSIMD(b, c, MulSIMD(d, e)), a) >> FMS(b,c,FMA(d,e,a))
+        # Validate:
+        # x = (b*c - d*e) - a
+        # outputC(x,"x", params="SIMD_enable=True,SIMD_debug=True")
+        elif func == SubSIMD and args[0].func == FusedMulSubSIMD and args[0].args[2].func == MulSIMD:
+            return FusedMulSubSIMD(args[0].args[0], args[0].args[1],
+                                   FusedMulAddSIMD(args[0].args[2].args[0], args[0].args[2].args[1],
+                                                   args[1]))
+        return None
 
     # Step 5.d: NegFusedMulAddSIMD(a,b,c) = -a*b + c:
-    for subtree in tree.preorder():
-        func = subtree.expr.func
-        args = subtree.expr.args
+    def replace_NegFMAs(subexpr):
+        func = subexpr.func
+        args = subexpr.args
         # FMA(a,Mul(-1,b),c) >> NFMA(a,b,c)
         if   func == FusedMulAddSIMD and args[1].func == MulSIMD and \
              lookup_rational(args[1].args[0]) == -1:
-            subtree.expr = NegFusedMulAddSIMD(args[0],args[1].args[1],args[2])
-            tree.build(subtree)
+            return NegFusedMulAddSIMD(args[0],args[1].args[1],args[2])
         # FMA(a,Mul(b,-1),c) >> NFMA(a,b,c)
         elif func == FusedMulAddSIMD and args[1].func == MulSIMD and \
              lookup_rational(args[1].args[1]) == -1:
-            subtree.expr = NegFusedMulAddSIMD(args[0],args[1].args[0],args[2])
-            tree.build(subtree)
+            return NegFusedMulAddSIMD(args[0],args[1].args[0],args[2])
         # FMA(Mul(-1,a), b,c) >> NFMA(a,b,c)
         elif func == FusedMulAddSIMD and args[0].func == MulSIMD and \
              lookup_rational(args[0].args[0]) == -1:
-            subtree.expr = NegFusedMulAddSIMD(args[0].args[1],args[1],args[2])
-            tree.build(subtree)
+            return NegFusedMulAddSIMD(args[0].args[1],args[1],args[2])
         # FMA(Mul(a,-1), b,c) >> NFMA(a,b,c)
         elif func == FusedMulAddSIMD and args[0].func == MulSIMD and \
              lookup_rational(args[0].args[1]) == -1:
-            subtree.expr = NegFusedMulAddSIMD(args[0].args[0],args[1],args[2])
-            tree.build(subtree)
-    tree.reconstruct()
+            return NegFusedMulAddSIMD(args[0].args[0],args[1],args[2])
+        return None
 
     # Step 5.e: Replace e.g., FMA(-1,b,c) with SubSIMD(c,b) and similar patterns
-    for subtree in tree.preorder():
-        func = subtree.expr.func
-        args = subtree.expr.args
+    def replace_FMAs_of_negative_one(subexpr):
+        func = subexpr.func
+        args = subexpr.args
         # FMA(-1,b,c) >> SubSIMD(c,b)
         if   func == FusedMulAddSIMD and lookup_rational(args[0]) == -1:
-            subtree.expr = SubSIMD(args[2], args[1])
-            tree.build(subtree)
+            return SubSIMD(args[2], args[1])
         # FMA(a,-1,c) >> SubSIMD(c,a)
         elif func == FusedMulAddSIMD and lookup_rational(args[1]) == -1:
-            subtree.expr = SubSIMD(args[2], args[0])
-            tree.build(subtree)
+            return SubSIMD(args[2], args[0])
         # FMS(a,-1,c) >> MulSIMD(-1,AddSIMD(a,c))
         elif func == FusedMulSubSIMD and lookup_rational(args[1]) == -1:
-            subtree.expr = MulSIMD(args[1], AddSIMD(args[0], args[2]))
-            tree.build(subtree)
+            return MulSIMD(args[1], AddSIMD(args[0], args[2]))
         # FMS(-1,b,c) >> MulSIMD(-1,AddSIMD(b,c))
         elif func == FusedMulSubSIMD and lookup_rational(args[0]) == -1:
-            subtree.expr = MulSIMD(args[0], AddSIMD(args[1], args[2]))
-            tree.build(subtree)
-    tree.reconstruct()
+            return MulSIMD(args[0], AddSIMD(args[1], args[2]))
+        return None
 
     # Step 5.f: NegFusedMulSubSIMD(a,b,c) = -a*b - c:
-    for subtree in tree.preorder():
-        func = subtree.expr.func
-        args = subtree.expr.args
+    def replace_NegFMSs(subexpr):
+        func = subexpr.func
+        args = subexpr.args
         # NFMA(a,b,Mul(-1,c)) >> NFMS(a,b,c)
         if   func == NegFusedMulAddSIMD and args[2].func == MulSIMD and \
              lookup_rational(args[2].args[0]) == -1:
-            subtree.expr = NegFusedMulSubSIMD(args[0],args[1],args[2].args[1])
-            tree.build(subtree)
+            return NegFusedMulSubSIMD(args[0],args[1],args[2].args[1])
         # NFMA(a,b,Mul(c,-1)) >> NFMS(a,b,c)
         elif func == NegFusedMulAddSIMD and args[2].func == MulSIMD and \
              lookup_rational(args[2].args[1]) == -1:
-            subtree.expr = NegFusedMulSubSIMD(args[0],args[1],args[2].args[0])
-            tree.build(subtree)
+            return NegFusedMulSubSIMD(args[0],args[1],args[2].args[0])
         # FMS(a,Mul(-1,b),c) >> NFMS(a,b,c)
         elif func == FusedMulSubSIMD and args[1].func == MulSIMD and \
              lookup_rational(args[1].args[0]) == -1:
-            subtree.expr = NegFusedMulSubSIMD(args[0],args[1].args[1],args[2])
-            tree.build(subtree)
+            return NegFusedMulSubSIMD(args[0],args[1].args[1],args[2])
         # FMS(a,Mul(b,-1),c) >> NFMS(a,b,c)
         elif func == FusedMulSubSIMD and args[1].func == MulSIMD and \
              lookup_rational(args[1].args[1]) == -1:
-            subtree.expr = NegFusedMulSubSIMD(args[0],args[1].args[0],args[2])
-            tree.build(subtree)
+            return NegFusedMulSubSIMD(args[0],args[1].args[0],args[2])
         # FMS(a,Mul([something],Mul(-1,b)),c) >> NFMS(a,Mul([something],b),c)
         elif func == FusedMulSubSIMD and args[1].func == MulSIMD and \
              args[1].args[1].func == MulSIMD and lookup_rational(args[1].args[1].args[0]) == -1:
-            subtree.expr = NegFusedMulSubSIMD(args[0], MulSIMD(args[1].args[0],args[1].args[1].args[1]), args[2])
-            tree.build(subtree)
+            return NegFusedMulSubSIMD(args[0], MulSIMD(args[1].args[0],args[1].args[1].args[1]), args[2])
         # FMS(a,Mul([something],Mul(b,-1)),c) >> NFMS(a,Mul([something],b),c)
         elif func == FusedMulSubSIMD and args[1].func == MulSIMD and \
              args[1].args[1].func == MulSIMD and lookup_rational(args[1].args[1].args[1]) == -1:
-            subtree.expr = NegFusedMulSubSIMD(args[0], MulSIMD(args[1].args[0],args[1].args[1].args[0]), args[2])
-            tree.build(subtree)
-    tree.reconstruct()
+            return NegFusedMulSubSIMD(args[0], MulSIMD(args[1].args[0],args[1].args[1].args[0]), args[2])
+        return None
 
     # Step 5.g: Find single FMA patterns again, as some new ones might be found.
-    for subtree in tree.preorder():
-        func = subtree.expr.func
-        args = subtree.expr.args
+    def replace_single_FMAs_again(subexpr):
+        func = subexpr.func
+        args = subexpr.args
         # AddSIMD(MulSIMD(b, c), a) >> FusedMulAddSIMD(b, c, a)
         if   func == AddSIMD and args[0].func == MulSIMD:
-            subtree.expr = FusedMulAddSIMD(args[0].args[0], args[0].args[1], args[1])
-            tree.build(subtree)
+            return FusedMulAddSIMD(args[0].args[0], args[0].args[1], args[1])
         # AddSIMD(a, MulSIMD(b, c)) >> FusedMulAddSIMD(b, c, a)
         elif func == AddSIMD and args[1].func == MulSIMD:
-            subtree.expr = FusedMulAddSIMD(args[1].args[0], args[1].args[1], args[0])
-            tree.build(subtree)
+            return FusedMulAddSIMD(args[1].args[0], args[1].args[1], args[0])
         # SubSIMD(MulSIMD(b, c), a) >> FusedMulSubSIMD(b, c, a)
         elif func == SubSIMD and args[0].func == MulSIMD:
-            subtree.expr = FusedMulSubSIMD(args[0].args[0], args[0].args[1], args[1])
-            tree.build(subtree)
-    expr = tree.reconstruct()
+            return FusedMulSubSIMD(args[0].args[0], args[0].args[1], args[1])
+        return None
+
+    rules = [replace_transcendentals, replace_powers, replace_subtractions,
+             replace_additions_multiplications, replace_reciprocal_products]
+    # With SIMD_find_more_FMAsFMSs == "CostModel", Step 5 is replaced by contract_FMAs_by_cost().
+    if SIMD_find_more_FMAsFMSs != "CostModel":
+        if SIMD_find_more_FMAsFMSs == "True":
+            rules.append(replace_double_FMAs)
+        rules.append(replace_single_FMAs)
+        if SIMD_find_more_FMAsFMSs == "True":
+            rules.append(replace_remaining_double_FMAs)
+        rules.extend([replace_NegFMAs, replace_FMAs_of_negative_one, replace_NegFMSs, replace_single_FMAs_again])
+
+    for rule in rules:
+        expr = rewrite_memoized(expr, rule)
+    if SIMD_find_more_FMAsFMSs == "CostModel":
+        expr = contract_FMAs_by_cost(expr, map_sym_to_rat, FMA_stats)
 
     if debug == "True":
-        expr_check = eval(str(expr).replace("SIMD", "SIMD_check"))
+        # Evaluate the debugging expression in a local namespace, rather than
+        #   declaring each symbol in the module's global namespace with var().
+        namespace = dict(globals())
+        namespace.update((str(symbol), symbol) for symbol in expr.free_symbols)
+        expr_check = eval(str(expr).replace("SIMD", "SIMD_check"), namespace)
         expr_check = expr_check.subs(-1, Symbol('_NegativeOne_'))
 
         expr_diff = expr_check - expr_orig
         # The eval(str(srepr())) below normalizes the expression,
         # fixing a cancellation issue in SymPy ~0.7.4.
-        expr_diff = eval(str(srepr(expr_diff)))
+        expr_diff = eval(str(srepr(expr_diff)), namespace)
         tree_diff = ExprTree(expr_diff)
         for subtree in tree_diff.preorder():
             subexpr = subtree.expr
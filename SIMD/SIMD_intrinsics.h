@@ -1,19 +1,99 @@
+// Both double- and single-precision SIMD are supported. By default, REAL_SIMD_ARRAY
+//   holds doubles; #define SIMD_FLOAT before including this file if REAL is float,
+//   so that REAL_SIMD_ARRAY holds floats (twice as many per SIMD register). A mismatch
+//   is a compile-time error if REAL is #define'd first (see below).
+// ReadSIMD_aligned() and WriteSIMD_aligned() require addresses aligned to the SIMD register width,
+//   as are gridfunctions allocated & indexed with grid::GridFuncMemAlign > 0 (see grid.py);
+//   WriteSIMD_stream() additionally bypasses the cache (a non-temporal store; see StreamFenceSIMD() below).
 
 // If compiled with AVX512F SIMD instructions enabled:
 #ifdef __AVX512F__
 #include <immintrin.h>
+#ifdef SIMD_FLOAT
+#define REAL_SIMD_ARRAY __m512
+#define SIMD_width 16 // 16 floats per loop iteration
+#define ReadSIMD(a) _mm512_loadu_ps(a)
+#define WriteSIMD(a,b) _mm512_storeu_ps(a,(b))
+#define ReadSIMD_aligned(a) _mm512_load_ps(a)
+#define WriteSIMD_aligned(a,b) _mm512_store_ps(a,(b))
+#define WriteSIMD_stream(a,b) _mm512_stream_ps(a,(b))
+#define ConstSIMD(a) _mm512_set1_ps(a)
+#define AddSIMD(a,b) _mm512_add_ps((a),(b))
+#define SubSIMD(a,b) _mm512_sub_ps((a),(b))
+#define MulSIMD(a,b) _mm512_mul_ps((a),(b))
+#define DivSIMD(a,b) _mm512_div_ps((a),(b))
+#define SqrtSIMD(a) _mm512_sqrt_ps((a))
+#define MinSIMD(a,b) _mm512_min_ps((a),(b))
+#define MaxSIMD(a,b) _mm512_max_ps((a),(b))
+#define RoundSIMD(a) _mm512_roundscale_ps((a), _MM_FROUND_TO_NEAREST_INT|_MM_FROUND_NO_EXC)
+// Integer and bitwise operations on 32-bit lanes, used by the transcendental functions below:
+#define SIMD_INT_ARRAY __m512i
+#define ConstIntSIMD(a) _mm512_set1_epi32(a)
+#define CastToIntSIMD(a) _mm512_castps_si512(a)
+#define CastToRealSIMD(a) _mm512_castsi512_ps(a)
+#define RoundToIntSIMD(a) _mm512_cvtps_epi32(a)
+#define AddIntSIMD(a,b) _mm512_add_epi32((a),(b))
+#define SubIntSIMD(a,b) _mm512_sub_epi32((a),(b))
+#define AndIntSIMD(a,b) _mm512_and_si512((a),(b))
+#define OrIntSIMD(a,b) _mm512_or_si512((a),(b))
+#define XorIntSIMD(a,b) _mm512_xor_si512((a),(b))
+#define ShiftLeftIntSIMD(a,n) _mm512_slli_epi32((a),(n))
+#define ShiftRightIntSIMD(a,n) _mm512_srli_epi32((a),(n))
+#define LessThanSIMD(a,b) _mm512_maskz_mov_epi32(_mm512_cmp_ps_mask((a),(b),_CMP_LT_OQ), _mm512_set1_epi32(-1))
+#ifdef SIMD_TRANSCENDENTALS_SVML // Intel's Short Vector Math Library (requires the Intel compiler)
+#define ExpSIMD(a) _mm512_exp_ps((a))
+#define LogSIMD(a) _mm512_log_ps((a))
+#define SinSIMD(a) _mm512_sin_ps((a))
+#define CosSIMD(a) _mm512_cos_ps((a))
+#define PowSIMD(a,b) _mm512_pow_ps((a),(b))
+#define CbrtSIMD(a) _mm512_cbrt_ps((a))
+#endif
+// All AVX512 chips have FMA enabled
+#define FusedMulAddSIMD(a,b,c) _mm512_fmadd_ps((a),(b),(c))
+#define FusedMulSubSIMD(a,b,c) _mm512_fmsub_ps((a),(b),(c))
+#define NegFusedMulAddSIMD(a,b,c) _mm512_fnmadd_ps((a),(b),(c))
+#define NegFusedMulSubSIMD(a,b,c) _mm512_fnmsub_ps((a),(b),(c))
+// See description below UPWIND_ALG for double precision:
+#define UPWIND_ALG(a) _mm512_mask_add_ps(upwind_Integer_0,  _mm512_cmp_ps_mask( (a) , upwind_Integer_0, _CMP_GT_OQ), upwind_Integer_0 ,upwind_Integer_1)
+#else
 #define REAL_SIMD_ARRAY __m512d
 #define SIMD_width 8 // 8 doubles per loop iteration
 #define ReadSIMD(a) _mm512_loadu_pd(a)
 #define WriteSIMD(a,b) _mm512_storeu_pd(a,(b))
+#define ReadSIMD_aligned(a) _mm512_load_pd(a)
+#define WriteSIMD_aligned(a,b) _mm512_store_pd(a,(b))
+#define WriteSIMD_stream(a,b) _mm512_stream_pd(a,(b))
 #define ConstSIMD(a) _mm512_set1_pd(a)
 #define AddSIMD(a,b) _mm512_add_pd((a),(b))
 #define SubSIMD(a,b) _mm512_sub_pd((a),(b))
 #define MulSIMD(a,b) _mm512_mul_pd((a),(b))
 #define DivSIMD(a,b) _mm512_div_pd((a),(b))
+#define SqrtSIMD(a) _mm512_sqrt_pd((a))
+#define MinSIMD(a,b) _mm512_min_pd((a),(b))
+#define MaxSIMD(a,b) _mm512_max_pd((a),(b))
+#define RoundSIMD(a) _mm512_roundscale_pd((a), _MM_FROUND_TO_NEAREST_INT|_MM_FROUND_NO_EXC)
+// Integer and bitwise operations on 64-bit lanes, used by the transcendental functions below:
+#define SIMD_INT_ARRAY __m512i
+#define ConstIntSIMD(a) _mm512_set1_epi64(a)
+#define CastToIntSIMD(a) _mm512_castpd_si512(a)
+#define CastToRealSIMD(a) _mm512_castsi512_pd(a)
+#define RoundToIntSIMD(a) _mm512_cvtepi32_epi64(_mm512_cvtpd_epi32(a))
+#define AddIntSIMD(a,b) _mm512_add_epi64((a),(b))
+#define SubIntSIMD(a,b) _mm512_sub_epi64((a),(b))
+#define AndIntSIMD(a,b) _mm512_and_si512((a),(b))
+#define OrIntSIMD(a,b) _mm512_or_si512((a),(b))
+#define XorIntSIMD(a,b) _mm512_xor_si512((a),(b))
+#define ShiftLeftIntSIMD(a,n) _mm512_slli_epi64((a),(n))
+#define ShiftRightIntSIMD(a,n) _mm512_srli_epi64((a),(n))
+#define LessThanSIMD(a,b) _mm512_maskz_mov_epi64(_mm512_cmp_pd_mask((a),(b),_CMP_LT_OQ), _mm512_set1_epi64(-1))
+#ifdef SIMD_TRANSCENDENTALS_SVML // Intel's Short Vector Math Library (requires the Intel compiler)
 #define ExpSIMD(a) _mm512_exp_pd((a))
+#define LogSIMD(a) _mm512_log_pd((a))
 #define SinSIMD(a) _mm512_sin_pd((a))
 #define CosSIMD(a) _mm512_cos_pd((a))
+#define PowSIMD(a,b) _mm512_pow_pd((a),(b))
+#define CbrtSIMD(a) _mm512_cbrt_pd((a))
+#endif
 // All AVX512 chips have FMA enabled
 #define FusedMulAddSIMD(a,b,c) _mm512_fmadd_pd((a),(b),(c))
 #define FusedMulSubSIMD(a,b,c) _mm512_fmsub_pd((a),(b),(c))
@@ -23,12 +103,11 @@
 //    The result from this comparison is: result[i] = (a OP b) ? 1 : 0, stored in an 8-bit mask array.
 //    Then if result==1 we set upwind = 0+1, and if result==0 we set upwind = 0
 #define UPWIND_ALG(a) _mm512_mask_add_pd(upwind_Integer_0,  _mm512_cmp_pd_mask( (a) , upwind_Integer_0, _CMP_GT_OQ), upwind_Integer_0 ,upwind_Integer_1)
+#endif
 
 // If compiled with AVX SIMD instructions enabled:
 #elif __AVX__
 #include <immintrin.h>
-#define REAL_SIMD_ARRAY __m256d
-#define SIMD_width 4 // 4 doubles per loop iteration
 // Upwind algorithm notes, in the case of 256-bit SIMD:
 // Sources: https://software.intel.com/sites/landingpage/IntrinsicsGuide/#text=_mm256_cmp_pd&expand=736
 //  ...and: https://stackoverflow.com/questions/37099874/is-avx-intrinsic-mm256-cmp-ps-supposed-to-return-nan-when-true
@@ -36,18 +115,103 @@
 //     Thus if OP is >, then: if a > b then the result is NaN, and if a <= b then the result is 0.
 //     We want the result to be 1 if a>b and 0 otherwise, so we simply perform a logical AND operation
 //     on the result, against the number 1, because AND(NaN,1)=1, and AND(0,1)=0,
-//     where NaN=0xffffff... in double precision.
+//     where NaN=0xffffff... in double precision (0xffff... in single precision).
+#ifdef SIMD_FLOAT
+#define REAL_SIMD_ARRAY __m256
+#define SIMD_width 8 // 8 floats per loop iteration
+#define UPWIND_ALG(a) _mm256_and_ps(_mm256_cmp_ps( (a), upwind_Integer_0, _CMP_GT_OQ ), upwind_Integer_1)
+#define ReadSIMD(a) _mm256_loadu_ps(a)
+#define WriteSIMD(a,b) _mm256_storeu_ps(a,(b))
+#define ReadSIMD_aligned(a) _mm256_load_ps(a)
+#define WriteSIMD_aligned(a,b) _mm256_store_ps(a,(b))
+#define WriteSIMD_stream(a,b) _mm256_stream_ps(a,(b))
+#define ConstSIMD(a) _mm256_set1_ps(a)
+#define AddSIMD(a,b) _mm256_add_ps((a),(b))
+#define SubSIMD(a,b) _mm256_sub_ps((a),(b))
+#define MulSIMD(a,b) _mm256_mul_ps((a),(b))
+#define DivSIMD(a,b) _mm256_div_ps((a),(b))
+#define SqrtSIMD(a) _mm256_sqrt_ps((a))
+#define MinSIMD(a,b) _mm256_min_ps((a),(b))
+#define MaxSIMD(a,b) _mm256_max_ps((a),(b))
+#define RoundSIMD(a) _mm256_round_ps((a), _MM_FROUND_TO_NEAREST_INT|_MM_FROUND_NO_EXC)
+#ifdef __AVX2__ // 256-bit integer instructions were introduced with AVX2
+// Integer and bitwise operations on 32-bit lanes, used by the transcendental functions below:
+#define SIMD_INT_ARRAY __m256i
+#define ConstIntSIMD(a) _mm256_set1_epi32(a)
+#define CastToIntSIMD(a) _mm256_castps_si256(a)
+#define CastToRealSIMD(a) _mm256_castsi256_ps(a)
+#define RoundToIntSIMD(a) _mm256_cvtps_epi32(a)
+#define AddIntSIMD(a,b) _mm256_add_epi32((a),(b))
+#define SubIntSIMD(a,b) _mm256_sub_epi32((a),(b))
+#define AndIntSIMD(a,b) _mm256_and_si256((a),(b))
+#define OrIntSIMD(a,b) _mm256_or_si256((a),(b))
+#define XorIntSIMD(a,b) _mm256_xor_si256((a),(b))
+#define ShiftLeftIntSIMD(a,n) _mm256_slli_epi32((a),(n))
+#define ShiftRightIntSIMD(a,n) _mm256_srli_epi32((a),(n))
+#define LessThanSIMD(a,b) _mm256_castps_si256(_mm256_cmp_ps((a),(b),_CMP_LT_OQ))
+#endif
+#ifdef SIMD_TRANSCENDENTALS_SVML // Intel's Short Vector Math Library (requires the Intel compiler)
+#define ExpSIMD(a) _mm256_exp_ps((a))
+#define LogSIMD(a) _mm256_log_ps((a))
+#define SinSIMD(a) _mm256_sin_ps((a))
+#define CosSIMD(a) _mm256_cos_ps((a))
+#define PowSIMD(a,b) _mm256_pow_ps((a),(b))
+#define CbrtSIMD(a) _mm256_cbrt_ps((a))
+#endif
+#ifdef __FMA__
+#define FusedMulAddSIMD(a,b,c) _mm256_fmadd_ps((a),(b),(c))
+#define FusedMulSubSIMD(a,b,c) _mm256_fmsub_ps((a),(b),(c))
+#define NegFusedMulAddSIMD(a,b,c) _mm256_fnmadd_ps((a),(b),(c))
+#define NegFusedMulSubSIMD(a,b,c) _mm256_fnmsub_ps((a),(b),(c))
+#else
+#define FusedMulAddSIMD(a,b,c) _mm256_add_ps(_mm256_mul_ps((a),(b)), (c)) // a*b+c
+#define FusedMulSubSIMD(a,b,c) _mm256_sub_ps(_mm256_mul_ps((a),(b)), (c)) // a*b-c
+#define NegFusedMulAddSIMD(a,b,c) _mm256_sub_ps( (c), _mm256_mul_ps((a),(b)) ) // c-a*b
+// See description of NegFusedMulSubSIMD for double precision:
+#define NegFusedMulSubSIMD(a,b,c) _mm256_sub_ps( (c), _mm256_add_ps( (c), _mm256_add_ps( _mm256_mul_ps((a),(b)), (c) )))
+#endif
+#else
+#define REAL_SIMD_ARRAY __m256d
+#define SIMD_width 4 // 4 doubles per loop iteration
 #define UPWIND_ALG(a) _mm256_and_pd(_mm256_cmp_pd( (a), upwind_Integer_0, _CMP_GT_OQ ), upwind_Integer_1)
 #define ReadSIMD(a) _mm256_loadu_pd(a)
 #define WriteSIMD(a,b) _mm256_storeu_pd(a,(b))
+#define ReadSIMD_aligned(a) _mm256_load_pd(a)
+#define WriteSIMD_aligned(a,b) _mm256_store_pd(a,(b))
+#define WriteSIMD_stream(a,b) _mm256_stream_pd(a,(b))
 #define ConstSIMD(a) _mm256_set1_pd(a)
 #define AddSIMD(a,b) _mm256_add_pd((a),(b))
 #define SubSIMD(a,b) _mm256_sub_pd((a),(b))
 #define MulSIMD(a,b) _mm256_mul_pd((a),(b))
 #define DivSIMD(a,b) _mm256_div_pd((a),(b))
+#define SqrtSIMD(a) _mm256_sqrt_pd((a))
+#define MinSIMD(a,b) _mm256_min_pd((a),(b))
+#define MaxSIMD(a,b) _mm256_max_pd((a),(b))
+#define RoundSIMD(a) _mm256_round_pd((a), _MM_FROUND_TO_NEAREST_INT|_MM_FROUND_NO_EXC)
+#ifdef __AVX2__ // 256-bit integer instructions were introduced with AVX2
+// Integer and bitwise operations on 64-bit lanes, used by the transcendental functions below:
+#define SIMD_INT_ARRAY __m256i
+#define ConstIntSIMD(a) _mm256_set1_epi64x(a)
+#define CastToIntSIMD(a) _mm256_castpd_si256(a)
+#define CastToRealSIMD(a) _mm256_castsi256_pd(a)
+#define RoundToIntSIMD(a) _mm256_cvtepi32_epi64(_mm256_cvtpd_epi32(a))
+#define AddIntSIMD(a,b) _mm256_add_epi64((a),(b))
+#define SubIntSIMD(a,b) _mm256_sub_epi64((a),(b))
+#define AndIntSIMD(a,b) _mm256_and_si256((a),(b))
+#define OrIntSIMD(a,b) _mm256_or_si256((a),(b))
+#define XorIntSIMD(a,b) _mm256_xor_si256((a),(b))
+#define ShiftLeftIntSIMD(a,n) _mm256_slli_epi64((a),(n))
+#define ShiftRightIntSIMD(a,n) _mm256_srli_epi64((a),(n))
+#define LessThanSIMD(a,b) _mm256_castpd_si256(_mm256_cmp_pd((a),(b),_CMP_LT_OQ))
+#endif
+#ifdef SIMD_TRANSCENDENTALS_SVML // Intel's Short Vector Math Library (requires the Intel compiler)
 #define ExpSIMD(a) _mm256_exp_pd((a))
+#define LogSIMD(a) _mm256_log_pd((a))
 #define SinSIMD(a) _mm256_sin_pd((a))
 #define CosSIMD(a) _mm256_cos_pd((a))
+#define PowSIMD(a,b) _mm256_pow_pd((a),(b))
+#define CbrtSIMD(a) _mm256_cbrt_pd((a))
+#endif
 #ifdef __FMA__
 #define FusedMulAddSIMD(a,b,c) _mm256_fmadd_pd((a),(b),(c))
 #define FusedMulSubSIMD(a,b,c) _mm256_fmsub_pd((a),(b),(c))
@@ -62,23 +226,107 @@
 //                           = SubSIMD(c, AddSIMD(c, AddSIMD(MulSIMD(a,b), c)))
 #define NegFusedMulSubSIMD(a,b,c) _mm256_sub_pd( (c), _mm256_add_pd( (c), _mm256_add_pd( _mm256_mul_pd((a),(b)), (c) )))
 #endif
+#endif
 
 
 // If compiled with SSE2 SIMD instructions enabled:
 #elif __SSE2__
 #include <emmintrin.h>
+#ifdef SIMD_FLOAT
+#define REAL_SIMD_ARRAY __m128
+#define SIMD_width 4 // 4 floats per loop iteration
+#define ReadSIMD(a) _mm_loadu_ps(a)
+#define WriteSIMD(a,b) _mm_storeu_ps(a,(b))
+#define ReadSIMD_aligned(a) _mm_load_ps(a)
+#define WriteSIMD_aligned(a,b) _mm_store_ps(a,(b))
+#define WriteSIMD_stream(a,b) _mm_stream_ps(a,(b))
+#define ConstSIMD(a) _mm_set1_ps(a)
+#define AddSIMD(a,b) _mm_add_ps((a),(b))
+#define SubSIMD(a,b) _mm_sub_ps((a),(b))
+#define MulSIMD(a,b) _mm_mul_ps((a),(b))
+#define DivSIMD(a,b) _mm_div_ps((a),(b))
+#define SqrtSIMD(a) _mm_sqrt_ps((a))
+#define MinSIMD(a,b) _mm_min_ps((a),(b))
+#define MaxSIMD(a,b) _mm_max_ps((a),(b))
+// SSE2 has no rounding instruction, so round by conversion to 32-bit integers (valid for |a| < 2^31):
+#define RoundSIMD(a) _mm_cvtepi32_ps(_mm_cvtps_epi32(a))
+// Integer and bitwise operations on 32-bit lanes, used by the transcendental functions below:
+#define SIMD_INT_ARRAY __m128i
+#define ConstIntSIMD(a) _mm_set1_epi32(a)
+#define CastToIntSIMD(a) _mm_castps_si128(a)
+#define CastToRealSIMD(a) _mm_castsi128_ps(a)
+#define RoundToIntSIMD(a) _mm_cvtps_epi32(a)
+#define AddIntSIMD(a,b) _mm_add_epi32((a),(b))
+#define SubIntSIMD(a,b) _mm_sub_epi32((a),(b))
+#define AndIntSIMD(a,b) _mm_and_si128((a),(b))
+#define OrIntSIMD(a,b) _mm_or_si128((a),(b))
+#define XorIntSIMD(a,b) _mm_xor_si128((a),(b))
+#define ShiftLeftIntSIMD(a,n) _mm_slli_epi32((a),(n))
+#define ShiftRightIntSIMD(a,n) _mm_srli_epi32((a),(n))
+#define LessThanSIMD(a,b) _mm_castps_si128(_mm_cmplt_ps((a),(b)))
+#ifdef SIMD_TRANSCENDENTALS_SVML // Intel's Short Vector Math Library (requires the Intel compiler)
+#define ExpSIMD(a) _mm_exp_ps((a))
+#define LogSIMD(a) _mm_log_ps((a))
+#define SinSIMD(a) _mm_sin_ps((a))
+#define CosSIMD(a) _mm_cos_ps((a))
+#define PowSIMD(a,b) _mm_pow_ps((a),(b))
+#define CbrtSIMD(a) _mm_cbrt_ps((a))
+#endif
+// See description above UPWIND_ALG for __AVX__:
+#define UPWIND_ALG(a) _mm_and_ps(_mm_cmpgt_ps( (a), upwind_Integer_0 ), upwind_Integer_1)
+
+#ifdef __FMA__ // There are no mainstream non-AVX+ chips that have FMA, but we include the following for completeness.
+#define FusedMulAddSIMD(a,b,c) _mm_fmadd_ps((a),(b),(c))
+#define FusedMulSubSIMD(a,b,c) _mm_fmsub_ps((a),(b),(c))
+#define NegFusedMulAddSIMD(a,b,c) _mm_sub_ps( (c), _mm_mul_ps((a),(b)) ) // c-a*b
+#define NegFusedMulSubSIMD(a,b,c) _mm_sub_ps( (c), _mm_sub_ps( (c), _mm_sub_ps( _mm_mul_ps((a),(b)), (c) ))) // -a*b-c = c-c-a*b-c = SubSIMD(c,SubSIMD(c,SubSIMD(MulSIMD(a,b),c)
+#else
+#define FusedMulAddSIMD(a,b,c) _mm_add_ps(_mm_mul_ps((a),(b)), (c)) // a*b+c
+#define FusedMulSubSIMD(a,b,c) _mm_sub_ps(_mm_mul_ps((a),(b)), (c)) // a*b-c
+#define NegFusedMulAddSIMD(a,b,c) _mm_sub_ps( (c), _mm_mul_ps((a),(b)) ) // c-a*b
+// See description of NegFusedMulSubSIMD for double precision:
+#define NegFusedMulSubSIMD(a,b,c) _mm_sub_ps( (c), _mm_add_ps( (c), _mm_add_ps( _mm_mul_ps((a),(b)), (c) )))
+#endif
+#else
 #define REAL_SIMD_ARRAY __m128d
 #define SIMD_width 2 // 2 doubles per loop iteration
 #define ReadSIMD(a) _mm_loadu_pd(a)
 #define WriteSIMD(a,b) _mm_storeu_pd(a,(b))
+#define ReadSIMD_aligned(a) _mm_load_pd(a)
+#define WriteSIMD_aligned(a,b) _mm_store_pd(a,(b))
+#define WriteSIMD_stream(a,b) _mm_stream_pd(a,(b))
 #define ConstSIMD(a) _mm_set1_pd(a)
 #define AddSIMD(a,b) _mm_add_pd((a),(b))
 #define SubSIMD(a,b) _mm_sub_pd((a),(b))
 #define MulSIMD(a,b) _mm_mul_pd((a),(b))
 #define DivSIMD(a,b) _mm_div_pd((a),(b))
+#define SqrtSIMD(a) _mm_sqrt_pd((a))
+#define MinSIMD(a,b) _mm_min_pd((a),(b))
+#define MaxSIMD(a,b) _mm_max_pd((a),(b))
+// SSE2 has no rounding instruction, so round by conversion to 32-bit integers (valid for |a| < 2^31):
+#define RoundSIMD(a) _mm_cvtepi32_pd(_mm_cvtpd_epi32(a))
+// Integer and bitwise operations on 64-bit lanes, used by the transcendental functions below:
+#define SIMD_INT_ARRAY __m128i
+#define ConstIntSIMD(a) _mm_set1_epi64x(a)
+#define CastToIntSIMD(a) _mm_castpd_si128(a)
+#define CastToRealSIMD(a) _mm_castsi128_pd(a)
+#define RoundToIntSIMD(a) _mm_unpacklo_epi32(_mm_cvtpd_epi32(a), _mm_srai_epi32(_mm_cvtpd_epi32(a), 31)) // Sign-extended to 64 bits
+#define AddIntSIMD(a,b) _mm_add_epi64((a),(b))
+#define SubIntSIMD(a,b) _mm_sub_epi64((a),(b))
+#define AndIntSIMD(a,b) _mm_and_si128((a),(b))
+#define OrIntSIMD(a,b) _mm_or_si128((a),(b))
+#define XorIntSIMD(a,b) _mm_xor_si128((a),(b))
+#define ShiftLeftIntSIMD(a,n) _mm_slli_epi64((a),(n))
+#define ShiftRightIntSIMD(a,n) _mm_srli_epi64((a),(n))
+#define LessThanSIMD(a,b) _mm_castpd_si128(_mm_cmplt_pd((a),(b)))
+#ifdef SIMD_TRANSCENDENTALS_SVML // Intel's Short Vector Math Library (requires the Intel compiler)
 #define ExpSIMD(a) _mm_exp_pd((a))
+#define LogSIMD(a) _mm_log_pd((a))
 #define SinSIMD(a) _mm_sin_pd((a))
 #define CosSIMD(a) _mm_cos_pd((a))
+#define PowSIMD(a,b) _mm_pow_pd((a),(b))
+#define CbrtSIMD(a) _mm_cbrt_pd((a))
+#endif
 // See description above UPWIND_ALG for __AVX__:
 #define UPWIND_ALG(a) _mm_and_pd(_mm_cmpgt_pd( (a), upwind_Integer_0 ), upwind_Integer_1)
 
@@ -96,11 +344,95 @@
 //                           = SubSIMD(c, AddSIMD(c, AddSIMD(MulSIMD(a,b), c)))
 #define NegFusedMulSubSIMD(a,b,c) _mm_sub_pd( (c), _mm_add_pd( (c), _mm_add_pd( _mm_mul_pd((a),(b)), (c) )))
 #endif
+#endif
+
+// If compiled for 64-bit ARM (AArch64), which always has NEON (128-bit) SIMD instructions, with FMA:
+#elif defined(__ARM_NEON) && defined(__aarch64__)
+#include <arm_neon.h>
+#ifdef SIMD_FLOAT
+#define REAL_SIMD_ARRAY float32x4_t
+#define SIMD_width 4 // 4 floats per loop iteration
+#define ReadSIMD(a) vld1q_f32(a)
+#define WriteSIMD(a,b) vst1q_f32(a,(b))
+// NEON loads & stores have no alignment requirement, and no non-temporal variant for full registers:
+#define ReadSIMD_aligned(a) vld1q_f32(a)
+#define WriteSIMD_aligned(a,b) vst1q_f32(a,(b))
+#define WriteSIMD_stream(a,b) vst1q_f32(a,(b))
+#define ConstSIMD(a) vdupq_n_f32(a)
+#define AddSIMD(a,b) vaddq_f32((a),(b))
+#define SubSIMD(a,b) vsubq_f32((a),(b))
+#define MulSIMD(a,b) vmulq_f32((a),(b))
+#define DivSIMD(a,b) vdivq_f32((a),(b))
+#define SqrtSIMD(a) vsqrtq_f32((a))
+#define MinSIMD(a,b) vminq_f32((a),(b))
+#define MaxSIMD(a,b) vmaxq_f32((a),(b))
+#define RoundSIMD(a) vrndnq_f32(a)
+// Integer and bitwise operations on 32-bit lanes, used by the transcendental functions below:
+#define SIMD_INT_ARRAY uint32x4_t
+#define ConstIntSIMD(a) vdupq_n_u32((uint32_t)(a))
+#define CastToIntSIMD(a) vreinterpretq_u32_f32(a)
+#define CastToRealSIMD(a) vreinterpretq_f32_u32(a)
+#define RoundToIntSIMD(a) vreinterpretq_u32_s32(vcvtnq_s32_f32(a))
+#define AddIntSIMD(a,b) vaddq_u32((a),(b))
+#define SubIntSIMD(a,b) vsubq_u32((a),(b))
+#define AndIntSIMD(a,b) vandq_u32((a),(b))
+#define OrIntSIMD(a,b) vorrq_u32((a),(b))
+#define XorIntSIMD(a,b) veorq_u32((a),(b))
+#define ShiftLeftIntSIMD(a,n) vshlq_n_u32((a),(n))
+#define ShiftRightIntSIMD(a,n) vshrq_n_u32((a),(n))
+#define LessThanSIMD(a,b) vcltq_f32((a),(b))
+// Note that vfmaq_f32(c,a,b) = c+a*b and vfmsq_f32(c,a,b) = c-a*b
+#define FusedMulAddSIMD(a,b,c) vfmaq_f32((c),(a),(b))
+#define FusedMulSubSIMD(a,b,c) vnegq_f32(vfmsq_f32((c),(a),(b))) // a*b-c = -(c-a*b)
+#define NegFusedMulAddSIMD(a,b,c) vfmsq_f32((c),(a),(b))
+#define NegFusedMulSubSIMD(a,b,c) vnegq_f32(vfmaq_f32((c),(a),(b))) // -a*b-c = -(c+a*b)
+// vcgtq_f32() sets all bits of each lane in which a > b, so (as for AVX) AND-ing against 1 yields 1 or 0:
+#define UPWIND_ALG(a) vreinterpretq_f32_u32(vandq_u32(vcgtq_f32( (a), upwind_Integer_0 ), vreinterpretq_u32_f32(upwind_Integer_1)))
+#else
+#define REAL_SIMD_ARRAY float64x2_t
+#define SIMD_width 2 // 2 doubles per loop iteration
+#define ReadSIMD(a) vld1q_f64(a)
+#define WriteSIMD(a,b) vst1q_f64(a,(b))
+// NEON loads & stores have no alignment requirement, and no non-temporal variant for full registers:
+#define ReadSIMD_aligned(a) vld1q_f64(a)
+#define WriteSIMD_aligned(a,b) vst1q_f64(a,(b))
+#define WriteSIMD_stream(a,b) vst1q_f64(a,(b))
+#define ConstSIMD(a) vdupq_n_f64(a)
+#define AddSIMD(a,b) vaddq_f64((a),(b))
+#define SubSIMD(a,b) vsubq_f64((a),(b))
+#define MulSIMD(a,b) vmulq_f64((a),(b))
+#define DivSIMD(a,b) vdivq_f64((a),(b))
+#define SqrtSIMD(a) vsqrtq_f64((a))
+#define MinSIMD(a,b) vminq_f64((a),(b))
+#define MaxSIMD(a,b) vmaxq_f64((a),(b))
+#define RoundSIMD(a) vrndnq_f64(a)
+// Integer and bitwise operations on 64-bit lanes, used by the transcendental functions below:
+#define SIMD_INT_ARRAY uint64x2_t
+#define ConstIntSIMD(a) vdupq_n_u64((uint64_t)(a))
+#define CastToIntSIMD(a) vreinterpretq_u64_f64(a)
+#define CastToRealSIMD(a) vreinterpretq_f64_u64(a)
+#define RoundToIntSIMD(a) vreinterpretq_u64_s64(vcvtnq_s64_f64(a))
+#define AddIntSIMD(a,b) vaddq_u64((a),(b))
+#define SubIntSIMD(a,b) vsubq_u64((a),(b))
+#define AndIntSIMD(a,b) vandq_u64((a),(b))
+#define OrIntSIMD(a,b) vorrq_u64((a),(b))
+#define XorIntSIMD(a,b) veorq_u64((a),(b))
+#define ShiftLeftIntSIMD(a,n) vshlq_n_u64((a),(n))
+#define ShiftRightIntSIMD(a,n) vshrq_n_u64((a),(n))
+#define LessThanSIMD(a,b) vcltq_f64((a),(b))
+// Note that vfmaq_f64(c,a,b) = c+a*b and vfmsq_f64(c,a,b) = c-a*b
+#define FusedMulAddSIMD(a,b,c) vfmaq_f64((c),(a),(b))
+#define FusedMulSubSIMD(a,b,c) vnegq_f64(vfmsq_f64((c),(a),(b))) // a*b-c = -(c-a*b)
+#define NegFusedMulAddSIMD(a,b,c) vfmsq_f64((c),(a),(b))
+#define NegFusedMulSubSIMD(a,b,c) vnegq_f64(vfmaq_f64((c),(a),(b))) // -a*b-c = -(c+a*b)
+// vcgtq_f64() sets all bits of each lane in which a > b, so (as for AVX) AND-ing against 1 yields 1 or 0:
+#define UPWIND_ALG(a) vreinterpretq_f64_u64(vandq_u64(vcgtq_f64( (a), upwind_Integer_0 ), vreinterpretq_u64_f64(upwind_Integer_1)))
+#endif
 
 #else
 // If SIMD instructions unavailable:
 #define REAL_SIMD_ARRAY REAL
-#define SIMD_width 1 // 1 double per loop iteration
+#define SIMD_width 1 // 1 REAL per loop iteration
 #define ConstSIMD(a) (a)
 #define AddSIMD(a,b) ((a)+(b))
 #define SubSIMD(a,b) ((a)-(b))
@@ -112,10 +444,16 @@
 #define NegFusedMulSubSIMD(a,b,c) (-((a)*(b) + (c))) // -a*b-c = -(a*b+c)
 #define SqrtSIMD(a) (sqrt(a))
 #define ExpSIMD(a) (exp(a))
+#define LogSIMD(a) (log(a))
 #define SinSIMD(a) (sin(a))
 #define CosSIMD(a) (cos(a))
+#define PowSIMD(a,b) (pow(a,b))
+#define CbrtSIMD(a) (cbrt(a))
 #define WriteSIMD(a,b) *(a)=(b)
 #define ReadSIMD(a) *(a)
+#define WriteSIMD_aligned(a,b) *(a)=(b)
+#define ReadSIMD_aligned(a) *(a)
+#define WriteSIMD_stream(a,b) *(a)=(b)
 // Algorithm for upwinding, SIMD-disabled version.
 // *NOTE*: This upwinding is backwards from
 //  usual upwinding algorithms, because the
@@ -123,3 +461,305 @@
 //  acts like a *negative* velocity.
 #define UPWIND_ALG(UpwindVecU) UpwindVecU > 0.0 ? 1.0 : 0.0
 #endif
+
+// Each REAL_SIMD_ARRAY must hold SIMD_width REALs, i.e., SIMD_FLOAT must be #define'd if and only if
+//   REAL is float (e.g., when outputC::PRECISION is "float"). If REAL is #define'd before including
+//   this file, check this at compile time (declaring an array of negative size otherwise).
+#ifdef REAL
+extern char SIMD_FLOAT_must_be_defined_if_and_only_if_REAL_is_float[(sizeof(REAL_SIMD_ARRAY) == SIMD_width*sizeof(REAL)) ? 1 : -1];
+#endif
+// Likewise, if gridfunction_layout.h (see grid.py) was #include'd first, check that aligned gridfunctions
+//   are aligned to at least the SIMD register width, as ReadSIMD_aligned() etc. require.
+#ifdef GF_ALIGNMENT
+extern char GF_ALIGNMENT_must_be_at_least_the_SIMD_register_width[(GF_ALIGNMENT >= sizeof(REAL_SIMD_ARRAY)) ? 1 : -1];
+#endif
+
+// Non-temporal stores (WriteSIMD_stream()) are weakly ordered: each thread must execute
+//   StreamFenceSIMD() after its last such store, before any other thread reads the data.
+#if defined(__AVX512F__) || defined(__AVX__) || defined(__SSE2__)
+#define StreamFenceSIMD() _mm_sfence()
+#else
+#define StreamFenceSIMD()
+#endif
+
+// Transcendental functions ExpSIMD(), LogSIMD(), SinSIMD(), CosSIMD(), PowSIMD(), and CbrtSIMD():
+//   By default these are evaluated with the portable polynomial approximations below, built from the
+//   integer & bitwise operations #define'd above for each instruction set. Alternatively,
+//   #define SIMD_TRANSCENDENTALS_SVML to call Intel's SVML (x86 only; requires the Intel compiler), or
+//   #define SIMD_TRANSCENDENTALS_LIBM to call libm once per SIMD lane (slow, but as accurate as libm).
+//   AVX without AVX2 lacks 256-bit integer instructions, and always falls back to libm.
+//
+//   Accuracy of the polynomial approximations: maximum error in units in the last place (ULP), relative to
+//   the exact result, as measured by tests/test_SIMD_transcendentals.py (gcc -O2, SSE2, AVX2+FMA and AVX512F):
+//                          double   float   Domain & special values
+//     ExpSIMD(x)            1.2      1.2    all x; overflows to +inf, underflows (gradually) to 0
+//     LogSIMD(x)            0.9      0.9    x > 0 incl. subnormals; log(+/-0) = -inf, log(x<0) = NaN, log(+inf) = +inf
+//     SinSIMD(x),CosSIMD(x) 1.6      1.6    |x| <= 100. Beyond, double: <= 2.3 ULP up to |x| = 1e6;
+//                                           float: <= 3 ULP up to |x| = 1e3, degrading quickly past that
+//     PowSIMD(a,b)         (1 + 2|b log(a)|) x 0.9    a > 0, computed as exp(b log(a)). PowSIMD() is only
+//                                           generated for non-integer b, for which a < 0 -> NaN is correct.
+//     CbrtSIMD(x)           0.8      0.8    all x; cbrt(+/-0) = +/-0, cbrt(+/-inf) = +/-inf
+//   With -Ofast (as in cmdline_helper's "optimized" compile mode), LogSIMD() and CbrtSIMD() errors grow to
+//   about 1.7 ULP, subnormals are flushed to zero, and infinite/NaN inputs are no longer handled.
+#ifndef ExpSIMD
+#include <math.h>
+#if defined(SIMD_INT_ARRAY) && !defined(SIMD_TRANSCENDENTALS_LIBM)
+#ifdef SIMD_FLOAT
+#define SIMD_MANTISSA_BITS 23
+#define SIMD_EXPONENT_BIAS 127
+#define SIMD_SIGN_BIT 31
+#define SIMD_EXPONENT_BITS_PLUS_SIGN 9
+#else
+#define SIMD_MANTISSA_BITS 52
+#define SIMD_EXPONENT_BIAS 1023
+#define SIMD_SIGN_BIT 63
+#define SIMD_EXPONENT_BITS_PLUS_SIGN 12
+#endif
+
+// Under -ffast-math (implied by -Ofast), compilers may reassociate floating-point arithmetic, undoing the
+//   extra-precise argument reductions below (e.g., x - n C1 - n C2 -> x - n (C1+C2)). SIMD_OPAQUE(a) hides
+//   the value of a from the optimizer, at no run-time cost.
+#if defined(__GNUC__) && defined(__aarch64__)
+#define SIMD_OPAQUE(a) __asm__("" : "+w"(a))
+#elif defined(__GNUC__)
+#define SIMD_OPAQUE(a) __asm__("" : "+x"(a))
+#else
+#define SIMD_OPAQUE(a)
+#endif
+
+// mask ? a : b, lane by lane, where each lane of mask has either all bits or no bits set (as from LessThanSIMD()).
+static inline REAL_SIMD_ARRAY SelectSIMD(const SIMD_INT_ARRAY mask, const REAL_SIMD_ARRAY a, const REAL_SIMD_ARRAY b) {
+  const SIMD_INT_ARRAY bits_b = CastToIntSIMD(b);
+  return CastToRealSIMD(XorIntSIMD(bits_b, AndIntSIMD(mask, XorIntSIMD(CastToIntSIMD(a), bits_b))));
+}
+
+// p * 2^n, for integer-valued n. 2^n is applied in two factors, so that each factor is a normal number
+//   even when p*2^n overflows or is subnormal.
+static inline REAL_SIMD_ARRAY SIMD_ldexp(const REAL_SIMD_ARRAY p, const REAL_SIMD_ARRAY n) {
+  const REAL_SIMD_ARRAY n1 = RoundSIMD(MulSIMD(n, ConstSIMD(0.5)));
+  const REAL_SIMD_ARRAY n2 = SubSIMD(n, n1);
+  const SIMD_INT_ARRAY bias = ConstIntSIMD(SIMD_EXPONENT_BIAS);
+  const REAL_SIMD_ARRAY two_to_n1 = CastToRealSIMD(ShiftLeftIntSIMD(AddIntSIMD(RoundToIntSIMD(n1), bias), SIMD_MANTISSA_BITS));
+  const REAL_SIMD_ARRAY two_to_n2 = CastToRealSIMD(ShiftLeftIntSIMD(AddIntSIMD(RoundToIntSIMD(n2), bias), SIMD_MANTISSA_BITS));
+  return MulSIMD(MulSIMD(p, two_to_n1), two_to_n2);
+}
+
+// exp(x) = 2^n exp(r), where n = round(x/ln2) and r = x - n ln2 (in two parts, Cody & Waite), |r| <= ln2/2.
+//   exp(r) is evaluated by its Taylor series, truncated where the remainder falls below 1/2 ULP.
+static inline REAL_SIMD_ARRAY SIMD_exp_poly(const REAL_SIMD_ARRAY x_in) {
+#ifdef SIMD_FLOAT
+  // exp(x) overflows for x > 88.73, and underflows to zero for x < -103.98:
+  const REAL_SIMD_ARRAY x = MinSIMD(ConstSIMD(89.0f), MaxSIMD(ConstSIMD(-104.0f), x_in));
+  const REAL_SIMD_ARRAY n = RoundSIMD(MulSIMD(x, ConstSIMD(1.44269504088896341f)));
+  REAL_SIMD_ARRAY r = NegFusedMulAddSIMD(n, ConstSIMD(0.693359375f), x);
+  SIMD_OPAQUE(r);
+  r = NegFusedMulAddSIMD(n, ConstSIMD(-2.12194440e-4f), r);
+  REAL_SIMD_ARRAY p = ConstSIMD(1.0f/5040.0f);
+  p = FusedMulAddSIMD(p, r, ConstSIMD(1.0f/720.0f));
+  p = FusedMulAddSIMD(p, r, ConstSIMD(1.0f/120.0f));
+  p = FusedMulAddSIMD(p, r, ConstSIMD(1.0f/24.0f));
+  p = FusedMulAddSIMD(p, r, ConstSIMD(1.0f/6.0f));
+  p = FusedMulAddSIMD(p, r, ConstSIMD(0.5f));
+  p = FusedMulAddSIMD(p, r, ConstSIMD(1.0f));
+  p = FusedMulAddSIMD(p, r, ConstSIMD(1.0f));
+#else
+  // exp(x) overflows for x > 709.78, and underflows to zero for x < -745.13:
+  const REAL_SIMD_ARRAY x = MinSIMD(ConstSIMD(710.0), MaxSIMD(ConstSIMD(-746.0), x_in));
+  const REAL_SIMD_ARRAY n = RoundSIMD(MulSIMD(x, ConstSIMD(1.4426950408889634)));
+  REAL_SIMD_ARRAY r = NegFusedMulAddSIMD(n, ConstSIMD(6.93147180369123816490e-01), x);
+  SIMD_OPAQUE(r);
+  r = NegFusedMulAddSIMD(n, ConstSIMD(1.90821492927058770002e-10), r);
+  REAL_SIMD_ARRAY p = ConstSIMD(1.0/6227020800.0);
+  p = FusedMulAddSIMD(p, r, ConstSIMD(1.0/479001600.0));
+  p = FusedMulAddSIMD(p, r, ConstSIMD(1.0/39916800.0));
+  p = FusedMulAddSIMD(p, r, ConstSIMD(1.0/3628800.0));
+  p = FusedMulAddSIMD(p, r, ConstSIMD(1.0/362880.0));
+  p = FusedMulAddSIMD(p, r, ConstSIMD(1.0/40320.0));
+  p = FusedMulAddSIMD(p, r, ConstSIMD(1.0/5040.0));
+  p = FusedMulAddSIMD(p, r, ConstSIMD(1.0/720.0));
+  p = FusedMulAddSIMD(p, r, ConstSIMD(1.0/120.0));
+  p = FusedMulAddSIMD(p, r, ConstSIMD(1.0/24.0));
+  p = FusedMulAddSIMD(p, r, ConstSIMD(1.0/6.0));
+  p = FusedMulAddSIMD(p, r, ConstSIMD(0.5));
+  p = FusedMulAddSIMD(p, r, ConstSIMD(1.0));
+  p = FusedMulAddSIMD(p, r, ConstSIMD(1.0));
+#endif
+  return SIMD_ldexp(p, n);
+}
+
+// log(x) = e ln2 + log(m), where x = 2^e m with sqrt(1/2) <= m < sqrt(2). With f = m-1 and s = f/(2+f),
+//   log(m) = f - f^2/2 + s (f^2/2 + R(s^2)), where R is the minimax polynomial of FreeBSD's msun library.
+static inline REAL_SIMD_ARRAY SIMD_log_poly(const REAL_SIMD_ARRAY x_in) {
+#ifdef SIMD_FLOAT
+  const REAL_SIMD_ARRAY smallest_normal = ConstSIMD(1.17549435e-38f), two_to_mantissa_bits = ConstSIMD(8388608.0f);
+  const REAL_SIMD_ARRAY subnormal_scale = ConstSIMD(33554432.0f), subnormal_shift = ConstSIMD(25.0f);
+  const REAL_SIMD_ARRAY ln2_hi = ConstSIMD(6.9313812256e-01f), ln2_lo = ConstSIMD(9.0580006145e-06f);
+  const REAL_SIMD_ARRAY sqrt2 = ConstSIMD(1.41421356f), huge = ConstSIMD(3.40282347e+38f), tiny = ConstSIMD(1.40129846e-45f);
+#else
+  const REAL_SIMD_ARRAY smallest_normal = ConstSIMD(2.2250738585072014e-308), two_to_mantissa_bits = ConstSIMD(4503599627370496.0);
+  const REAL_SIMD_ARRAY subnormal_scale = ConstSIMD(18014398509481984.0), subnormal_shift = ConstSIMD(54.0);
+  const REAL_SIMD_ARRAY ln2_hi = ConstSIMD(6.93147180369123816490e-01), ln2_lo = ConstSIMD(1.90821492927058770002e-10);
+  const REAL_SIMD_ARRAY sqrt2 = ConstSIMD(1.4142135623730951), huge = ConstSIMD(1.7976931348623157e+308), tiny = ConstSIMD(4.9406564584124654e-324);
+#endif
+  const REAL_SIMD_ARRAY one = ConstSIMD(1.0), half = ConstSIMD(0.5);
+  // Scale subnormal x into the normal range, so that its exponent and significand can be read off its bits:
+  const SIMD_INT_ARRAY subnormal = LessThanSIMD(x_in, smallest_normal);
+  const REAL_SIMD_ARRAY x = SelectSIMD(subnormal, MulSIMD(x_in, subnormal_scale), x_in);
+  const SIMD_INT_ARRAY bits = CastToIntSIMD(x);
+  // Convert the biased exponent to REAL by placing it in the significand of 2^SIMD_MANTISSA_BITS:
+  const REAL_SIMD_ARRAY biased_e = SubSIMD(CastToRealSIMD(OrIntSIMD(ShiftRightIntSIMD(bits, SIMD_MANTISSA_BITS),
+                                                                    CastToIntSIMD(two_to_mantissa_bits))), two_to_mantissa_bits);
+  REAL_SIMD_ARRAY e = SubSIMD(biased_e, ConstSIMD(SIMD_EXPONENT_BIAS));
+  e = SubSIMD(e, CastToRealSIMD(AndIntSIMD(subnormal, CastToIntSIMD(subnormal_shift))));
+  REAL_SIMD_ARRAY m = CastToRealSIMD(OrIntSIMD(AndIntSIMD(bits, ShiftRightIntSIMD(ConstIntSIMD(-1), SIMD_EXPONENT_BITS_PLUS_SIGN)),
+                                               CastToIntSIMD(one)));
+  const SIMD_INT_ARRAY m_above_sqrt2 = LessThanSIMD(sqrt2, m);
+  m = SelectSIMD(m_above_sqrt2, MulSIMD(m, half), m);
+  e = AddSIMD(e, CastToRealSIMD(AndIntSIMD(m_above_sqrt2, CastToIntSIMD(one))));
+
+  const REAL_SIMD_ARRAY f = SubSIMD(m, one);
+  const REAL_SIMD_ARRAY s = DivSIMD(f, AddSIMD(ConstSIMD(2.0), f));
+  const REAL_SIMD_ARRAY z = MulSIMD(s, s);
+  const REAL_SIMD_ARRAY w = MulSIMD(z, z);
+#ifdef SIMD_FLOAT
+  const REAL_SIMD_ARRAY t1 = MulSIMD(w, FusedMulAddSIMD(w, ConstSIMD(0.24279078841f), ConstSIMD(0.40000972152f)));
+  const REAL_SIMD_ARRAY t2 = MulSIMD(z, FusedMulAddSIMD(w, ConstSIMD(0.28498786688f), ConstSIMD(0.66666662693f)));
+#else
+  const REAL_SIMD_ARRAY t1 = MulSIMD(w, FusedMulAddSIMD(w, FusedMulAddSIMD(w, ConstSIMD(1.531383769920937332e-01),
+                                                                           ConstSIMD(2.222219843214978396e-01)),
+                                                        ConstSIMD(3.999999999940941908e-01)));
+  const REAL_SIMD_ARRAY t2 = MulSIMD(z, FusedMulAddSIMD(w, FusedMulAddSIMD(w, FusedMulAddSIMD(w, ConstSIMD(1.479819860511658591e-01),
+                                                                                             ConstSIMD(1.818357216161805012e-01)),
+                                                                           ConstSIMD(2.857142874366239149e-01)),
+                                                        ConstSIMD(6.666666666666735130e-01)));
+#endif
+  const REAL_SIMD_ARRAY R = AddSIMD(t1, t2);
+  const REAL_SIMD_ARRAY hfsq = MulSIMD(half, MulSIMD(f, f));
+  // e ln2_hi - ((hfsq - (s (hfsq + R) + e ln2_lo)) - f):
+  REAL_SIMD_ARRAY inner = FusedMulAddSIMD(e, ln2_lo, MulSIMD(s, AddSIMD(hfsq, R)));
+  SIMD_OPAQUE(inner);
+  REAL_SIMD_ARRAY log_m = SubSIMD(SubSIMD(hfsq, inner), f);
+  SIMD_OPAQUE(log_m);
+  REAL_SIMD_ARRAY result = FusedMulSubSIMD(e, ln2_hi, log_m);
+  // Special cases: log(NaN) = NaN (via x-x), log(+inf) = +inf, log(+/-0) = -inf, log(x < 0) = NaN:
+  result = AddSIMD(result, SubSIMD(x_in, x_in));
+  result = SelectSIMD(LessThanSIMD(huge, x_in), x_in, result);
+  result = SelectSIMD(LessThanSIMD(x_in, tiny), ConstSIMD(-INFINITY), result);
+  result = SelectSIMD(LessThanSIMD(x_in, ConstSIMD(0.0)), ConstSIMD(NAN), result);
+  return result;
+}
+
+// sin(x) (quadrant_shift=0) or cos(x) = sin(x + pi/2) (quadrant_shift=1). With n = round(x/(pi/2)) and
+//   r = x - n pi/2 (in three parts, Cody & Waite), |r| <= pi/4, and sin(x) = +/-sin(r) or +/-cos(r),
+//   according to the quadrant n. sin(r) and cos(r) are evaluated by their Taylor series.
+static inline REAL_SIMD_ARRAY SIMD_sincos_poly(const REAL_SIMD_ARRAY x, const int quadrant_shift) {
+#ifdef SIMD_FLOAT
+  const REAL_SIMD_ARRAY n = RoundSIMD(MulSIMD(x, ConstSIMD(0.636619772367581343f)));
+  REAL_SIMD_ARRAY r = NegFusedMulAddSIMD(n, ConstSIMD(1.5703125f), x);
+  SIMD_OPAQUE(r);
+  r = NegFusedMulAddSIMD(n, ConstSIMD(4.837512969970703125e-4f), r);
+  SIMD_OPAQUE(r);
+  r = NegFusedMulAddSIMD(n, ConstSIMD(7.54978995489188216e-8f), r);
+  const REAL_SIMD_ARRAY z = MulSIMD(r, r);
+  REAL_SIMD_ARRAY ps = ConstSIMD(1.0f/362880.0f);
+  ps = FusedMulAddSIMD(ps, z, ConstSIMD(-1.0f/5040.0f));
+  ps = FusedMulAddSIMD(ps, z, ConstSIMD(1.0f/120.0f));
+  ps = FusedMulAddSIMD(ps, z, ConstSIMD(-1.0f/6.0f));
+  REAL_SIMD_ARRAY pc = ConstSIMD(-1.0f/3628800.0f);
+  pc = FusedMulAddSIMD(pc, z, ConstSIMD(1.0f/40320.0f));
+  pc = FusedMulAddSIMD(pc, z, ConstSIMD(-1.0f/720.0f));
+  pc = FusedMulAddSIMD(pc, z, ConstSIMD(1.0f/24.0f));
+#else
+  const REAL_SIMD_ARRAY n = RoundSIMD(MulSIMD(x, ConstSIMD(0.63661977236758134308)));
+  REAL_SIMD_ARRAY r = NegFusedMulAddSIMD(n, ConstSIMD(1.57079632673412561417e+00), x);
+  SIMD_OPAQUE(r);
+  r = NegFusedMulAddSIMD(n, ConstSIMD(6.07710050630396597660e-11), r);
+  SIMD_OPAQUE(r);
+  r = NegFusedMulAddSIMD(n, ConstSIMD(2.02226624879595063154e-21), r);
+  const REAL_SIMD_ARRAY z = MulSIMD(r, r);
+  REAL_SIMD_ARRAY ps = ConstSIMD(1.0/355687428096000.0);
+  ps = FusedMulAddSIMD(ps, z, ConstSIMD(-1.0/1307674368000.0));
+  ps = FusedMulAddSIMD(ps, z, ConstSIMD(1.0/6227020800.0));
+  ps = FusedMulAddSIMD(ps, z, ConstSIMD(-1.0/39916800.0));
+  ps = FusedMulAddSIMD(ps, z, ConstSIMD(1.0/362880.0));
+  ps = FusedMulAddSIMD(ps, z, ConstSIMD(-1.0/5040.0));
+  ps = FusedMulAddSIMD(ps, z, ConstSIMD(1.0/120.0));
+  ps = FusedMulAddSIMD(ps, z, ConstSIMD(-1.0/6.0));
+  REAL_SIMD_ARRAY pc = ConstSIMD(-1.0/6402373705728000.0);
+  pc = FusedMulAddSIMD(pc, z, ConstSIMD(1.0/20922789888000.0));
+  pc = FusedMulAddSIMD(pc, z, ConstSIMD(-1.0/87178291200.0));
+  pc = FusedMulAddSIMD(pc, z, ConstSIMD(1.0/479001600.0));
+  pc = FusedMulAddSIMD(pc, z, ConstSIMD(-1.0/3628800.0));
+  pc = FusedMulAddSIMD(pc, z, ConstSIMD(1.0/40320.0));
+  pc = FusedMulAddSIMD(pc, z, ConstSIMD(-1.0/720.0));
+  pc = FusedMulAddSIMD(pc, z, ConstSIMD(1.0/24.0));
+#endif
+  const REAL_SIMD_ARRAY sin_r = FusedMulAddSIMD(MulSIMD(r, z), ps, r);                                      // r - r^3/6 + ...
+  const REAL_SIMD_ARRAY cos_r = FusedMulAddSIMD(MulSIMD(z, z), pc, NegFusedMulAddSIMD(z, ConstSIMD(0.5), ConstSIMD(1.0))); // 1 - r^2/2 + ...
+  // Odd quadrants swap sin(r) for cos(r); quadrants 2 and 3 (mod 4) flip the sign:
+  const SIMD_INT_ARRAY quadrant = AddIntSIMD(RoundToIntSIMD(n), ConstIntSIMD(quadrant_shift));
+  const SIMD_INT_ARRAY swap = SubIntSIMD(ConstIntSIMD(0), AndIntSIMD(quadrant, ConstIntSIMD(1)));
+  const SIMD_INT_ARRAY sign = ShiftLeftIntSIMD(AndIntSIMD(quadrant, ConstIntSIMD(2)), SIMD_SIGN_BIT - 1);
+  return CastToRealSIMD(XorIntSIMD(CastToIntSIMD(SelectSIMD(swap, cos_r, sin_r)), sign));
+}
+
+// pow(a,b) = exp(b log(a)), for a > 0. The relative error of b log(a) is amplified by |b log(a)| in exp().
+static inline REAL_SIMD_ARRAY SIMD_pow_poly(const REAL_SIMD_ARRAY a, const REAL_SIMD_ARRAY b) {
+  return SIMD_exp_poly(MulSIMD(b, SIMD_log_poly(a)));
+}
+
+// cbrt(x) = sign(x) exp(log(|x|)/3), refined by one Newton-Raphson step y -> y - (y - |x|/y^2)/3.
+static inline REAL_SIMD_ARRAY SIMD_cbrt_poly(const REAL_SIMD_ARRAY x) {
+#ifdef SIMD_FLOAT
+  const REAL_SIMD_ARRAY huge = ConstSIMD(3.40282347e+38f), tiny = ConstSIMD(1.40129846e-45f);
+#else
+  const REAL_SIMD_ARRAY huge = ConstSIMD(1.7976931348623157e+308), tiny = ConstSIMD(4.9406564584124654e-324);
+#endif
+  const REAL_SIMD_ARRAY one_third = ConstSIMD(1.0/3.0);
+  const SIMD_INT_ARRAY sign_bit = ShiftLeftIntSIMD(ConstIntSIMD(1), SIMD_SIGN_BIT);
+  const REAL_SIMD_ARRAY abs_x = CastToRealSIMD(AndIntSIMD(CastToIntSIMD(x), ShiftRightIntSIMD(ConstIntSIMD(-1), 1)));
+  REAL_SIMD_ARRAY y = SIMD_exp_poly(MulSIMD(SIMD_log_poly(abs_x), one_third));
+  y = NegFusedMulAddSIMD(SubSIMD(y, DivSIMD(abs_x, MulSIMD(y, y))), one_third, y);
+  y = CastToRealSIMD(OrIntSIMD(CastToIntSIMD(y), AndIntSIMD(CastToIntSIMD(x), sign_bit)));
+  // cbrt(+/-0) = +/-0 and cbrt(+/-inf) = +/-inf, for which the Newton-Raphson step would give NaN:
+  return SelectSIMD(OrIntSIMD(LessThanSIMD(abs_x, tiny), LessThanSIMD(huge, abs_x)), x, y);
+}
+
+#define ExpSIMD(a) SIMD_exp_poly(a)
+#define LogSIMD(a) SIMD_log_poly(a)
+#define SinSIMD(a) SIMD_sincos_poly((a), 0)
+#define CosSIMD(a) SIMD_sincos_poly((a), 1)
+#define PowSIMD(a,b) SIMD_pow_poly((a),(b))
+#define CbrtSIMD(a) SIMD_cbrt_poly(a)
+
+#else
+// Call libm once per SIMD lane:
+#ifdef SIMD_FLOAT
+#define SIMD_LIBM(func) func ## f
+typedef float SIMD_LANE_REAL;
+#else
+#define SIMD_LIBM(func) func
+typedef double SIMD_LANE_REAL;
+#endif
+static inline REAL_SIMD_ARRAY SIMD_libm_lanewise1(SIMD_LANE_REAL (*f)(SIMD_LANE_REAL), const REAL_SIMD_ARRAY a) {
+  SIMD_LANE_REAL lanes[SIMD_width];
+  WriteSIMD(lanes, a);
+  for(int i=0;i<SIMD_width;i++) lanes[i] = f(lanes[i]);
+  return ReadSIMD(lanes);
+}
+static inline REAL_SIMD_ARRAY SIMD_libm_lanewise2(SIMD_LANE_REAL (*f)(SIMD_LANE_REAL, SIMD_LANE_REAL),
+                                                  const REAL_SIMD_ARRAY a, const REAL_SIMD_ARRAY b) {
+  SIMD_LANE_REAL lanes_a[SIMD_width], lanes_b[SIMD_width];
+  WriteSIMD(lanes_a, a);
+  WriteSIMD(lanes_b, b);
+  for(int i=0;i<SIMD_width;i++) lanes_a[i] = f(lanes_a[i], lanes_b[i]);
+  return ReadSIMD(lanes_a);
+}
+#define ExpSIMD(a) SIMD_libm_lanewise1(SIMD_LIBM(exp), (a))
+#define LogSIMD(a) SIMD_libm_lanewise1(SIMD_LIBM(log), (a))
+#define SinSIMD(a) SIMD_libm_lanewise1(SIMD_LIBM(sin), (a))
+#define CosSIMD(a) SIMD_libm_lanewise1(SIMD_LIBM(cos), (a))
+#define PowSIMD(a,b) SIMD_libm_lanewise2(SIMD_LIBM(pow), (a), (b))
+#define CbrtSIMD(a) SIMD_libm_lanewise1(SIMD_LIBM(cbrt), (a))
+#endif
+#endif
@@ -56,7 +56,7 @@ add_test WeylScal4NRPy/tests/test_WeylScal4NRPy.py
 # TODO: add your tests here
 echo "Starting doctest unit tests!"
 failed_unittest=0
-for file in expr_tree.py indexedexp.py loop.py functional.py finite_difference_helpers.py assert_equal.py; do
+for file in expr_tree.py indexedexp.py loop.py functional.py finite_difference_helpers.py finite_difference.py NRPy_param_funcs.py outputC_cache.py codegen_profiler.py kernel_cost_model.py outputC.py autotune.py assert_equal.py; do
     echo Running doctest on file: $file
     $PYTHONEXEC -m doctest $file
     if [ $? == 1 ]
@@ -68,15 +68,17 @@ done
 $PYTHONEXEC -c "import sys, sympy; major, minor = int(sympy.__version__.split('.')[0]), int(sympy.__version__.split('.')[1]); sys.exit(major == 1 and minor <= 3)"
 if [ $? == 0 ]
 then
-    echo Running doctest on file: cse_helpers.py
-    $PYTHONEXEC -m doctest cse_helpers.py
-    if [ $? == 1 ]
-    then
-        failed_unittest=1
-    fi
-    echo Doctest of cse_helpers.py finished.
+    for file in cse_helpers.py SIMD.py; do
+        echo Running doctest on file: $file
+        $PYTHONEXEC -m doctest $file
+        if [ $? == 1 ]
+        then
+            failed_unittest=1
+        fi
+        echo Doctest of $file finished.
+    done
 fi
-for file in tests/test_parse_BSSN.py; do
+for file in tests/test_parse_BSSN.py tests/test_SIMD_transcendentals.py; do
     echo Running unittest on file: $file
     $PYTHONEXEC $file
     if [ $? == 1 ]
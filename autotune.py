@@ -0,0 +1,349 @@
+""" Empirical Autotuning of Generated C Kernels
+
+    The following module chooses, by measurement, the fastest of a set of
+    code generation options for a C function registered to
+    outputC.outC_function_dict[] (e.g., via add_to_Cfunction_dict()).
+    For each configuration in a parameter space, autotune()
+      1) sets any NRPy+ parameters in the configuration (keys of the
+         form "module::parname", e.g., "finite_difference::FD_functions_enable"),
+      2) calls the user-supplied generate_kernel(config), which must
+         (re)register the C function, using the remaining keys of config
+         (e.g., outputC parameters like SIMD_enable, or loop options like
+         tile sizes and OpenMP schedules) as it sees fit,
+      3) compiles the C function into a timing harness with
+         cmdline_helper.C_compile(), runs it on a synthetic grid,
+         and records its throughput in gridpoints per second.
+    The best configuration is stored on disk, in a file specific to this
+    machine, so that later builds may simply call best_config().
+
+    The timing harness supplies the C function's arguments by name:
+    "params" (the C parameter struct), "rfmstruct" (precomputed reference
+    metric quantities; requires reference_metric::enable_rfm_precompute),
+    "xx" (the coordinate arrays), and gridfunction arrays ending in "_gfs"
+    (with names containing "auxevol" and "aux" holding the AUXEVOL and AUX
+    gridfunctions, respectively, and all others the EVOL gridfunctions).
+"""
+
+import NRPy_param_funcs as par   # NRPy+: parameter interface
+import outputC as outC           # NRPy+: Core C code output module
+import grid as gri               # NRPy+: Functions having to do with numerical grids
+import finite_difference as fin  # NRPy+: Finite difference C code generation module
+import reference_metric as rfm   # NRPy+: Reference metric support
+import cmdline_helper as cmd     # NRPy+: Multi-platform Python command-line interface
+import sympy as sp               # SymPy: The Python computer algebra package upon which NRPy+ depends
+from outputC_cache import makedirs, replace_file # NRPy+: Python 2 & 3 compatible file operations
+import contextlib, hashlib, itertools, json, os, platform, re, shutil, subprocess, sys, tempfile  # Standard Python modules
+
+thismodule = __name__
+par.initialize_param(par.glb_param("char", thismodule, "cache_dir",
+                                   os.path.join(os.path.expanduser("~"), ".cache", "nrpy", "autotune")))
+
+def configurations(param_space):
+    """ Return the list of all configurations (dicts) in param_space, a dict mapping
+        each option to the list of values to try.
+
+        >>> for config in configurations({"SIMD_enable": ["False", "True"], "grid::MemAllocStyle": ["210"]}): print(config)
+        {'SIMD_enable': 'False', 'grid::MemAllocStyle': '210'}
+        {'SIMD_enable': 'True', 'grid::MemAllocStyle': '210'}
+    """
+    keys = sorted(param_space)
+    return [dict(zip(keys, values)) for values in itertools.product(*[param_space[key] for key in keys])]
+
+def machine_id():
+    """ Return a string identifying this machine: its host name, CPU model, and architecture. """
+    cpu = platform.processor()
+    if os.path.exists("/proc/cpuinfo"):
+        with open("/proc/cpuinfo") as file:
+            model = re.search(r"^model name\s*:\s*(.*)$", file.read(), re.MULTILINE)
+        if model:
+            cpu = model.group(1)
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", "-".join([platform.node(), cpu, platform.machine()]))
+
+@contextlib.contextmanager
+def configured(config):
+    """ Set the NRPy+ parameters in config (keys of the form "module::parname"),
+        and restore them on exit.
+
+        >>> with configured({"finite_difference::FD_CENTDERIVS_ORDER": 8, "SIMD_enable": "True"}):
+        ...     print(par.parval_from_str("finite_difference::FD_CENTDERIVS_ORDER"))
+        8
+        >>> print(par.parval_from_str("finite_difference::FD_CENTDERIVS_ORDER"))
+        4
+    """
+    NRPy_params = [option for option in config if "::" in option]
+    saved_parvals = [par.parval_from_str(option) for option in NRPy_params]
+    try:
+        for option in NRPy_params:
+            par.set_parval_from_str(option, config[option])
+        yield
+    finally:
+        for option, parval in zip(NRPy_params, saved_parvals):
+            par.set_parval_from_str(option, parval)
+
+def tuning_key(name, param_space, Nxx, Ccode, compile_mode, custom_compile_string):
+    """ Return the key under which the autotuning results for C function name,
+        over param_space on a grid of Nxx points, are stored. Results are also
+        specific to the C code of the function, the way it is compiled, the
+        finite difference order, and the precision.
+
+        >>> tuning_key("rhs_eval", {"SIMD_enable": ["False", "True"]}, (32, 32, 32), "", "optimized", "")[:9]
+        'rhs_eval-'
+        >>> tuning_key("rhs_eval", {"SIMD_enable": ["True"]}, (32, 32, 32), "", "optimized", "") == tuning_key("rhs_eval", {"SIMD_enable": ["False", "True"]}, (32, 32, 32), "", "optimized", "")
+        False
+        >>> tuning_key("rhs_eval", {"SIMD_enable": ["True"]}, (32, 32, 32), "", "optimized", "") == tuning_key("rhs_eval", {"SIMD_enable": ["True"]}, (32, 32, 32), "", "safe", "")
+        False
+    """
+    space = json.dumps([param_space, list(Nxx), hashlib.sha256(Ccode.encode("utf-8")).hexdigest(),
+                        compile_mode, custom_compile_string,
+                        par.parval_from_str("finite_difference::FD_CENTDERIVS_ORDER"),
+                        par.parval_from_str("outputC::PRECISION")], sort_keys=True)
+    return name + "-" + hashlib.sha256(space.encode("utf-8")).hexdigest()[:16]
+
+def autotune_key(name, generate_kernel, param_space, Nxx, compile_mode, custom_compile_string):
+    """ Return the tuning_key() for these autotune() arguments. The C code hashed is that
+        of the first configuration in param_space, so that changes to the C code
+        generated (e.g., to the equations) invalidate the stored results. """
+    config = configurations(param_space)[0]
+    with configured(config):
+        generate_kernel(config)
+        Ccode = outC.outC_function_dict[name]
+        return tuning_key(name, param_space, Nxx, Ccode, compile_mode, custom_compile_string)
+
+def results_file():
+    return os.path.join(par.parval_from_str(thismodule + "::cache_dir"), machine_id() + ".json")
+
+def load_results():
+    if not os.path.exists(results_file()):
+        return {}
+    with open(results_file()) as file:
+        return json.load(file)
+
+def store_results(key, entry):
+    results = load_results()
+    results[key] = entry
+    makedirs(os.path.dirname(results_file()))
+    tmpfile = results_file() + ".tmp" + str(os.getpid())
+    with open(tmpfile, "w") as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+    replace_file(tmpfile, results_file())
+
+def best_config(name, generate_kernel, param_space, Nxx=(32, 32, 32),
+                compile_mode="optimized", custom_compile_string=""):
+    """ Return the best configuration found by autotune() on this machine for these
+        arguments, or None if they have not been autotuned. """
+    entry = load_results().get(autotune_key(name, generate_kernel, param_space, Nxx,
+                                            compile_mode, custom_compile_string))
+    return None if entry is None else entry["best_config"]
+
+def kernel_arguments(name):
+    """ Return the list of (argument name, is_const) of the C function name, from its prototype.
+
+        >>> outC.outC_function_prototype_dict["autotune_doctest"] = "void autotune_doctest(const paramstruct *restrict params, REAL *restrict xx[3], const REAL *restrict in_gfs, REAL *restrict rhs_gfs);"
+        >>> kernel_arguments("autotune_doctest")
+        [('params', True), ('xx', False), ('in_gfs', True), ('rhs_gfs', False)]
+    """
+    prototype = outC.outC_function_prototype_dict[name]
+    arglist = prototype[prototype.index("(")+1:prototype.rindex(")")]
+    arguments = []
+    for arg in arglist.split(","):
+        argname = re.search(r"(\w+)\s*(\[[^\]]*\]\s*)*$", arg.strip()).group(1)
+        arguments.append((argname, arg.strip().startswith("const")))
+    return arguments
+
+def timing_harness_C(name, Nxx, REPEATS):
+    """ Return a C program that calls the C function name REPEATS times, on a grid of
+        Nxx[0] x Nxx[1] x Nxx[2] interior points, and prints the best throughput,
+        in gridpoints per second, and a checksum of its output gridfunctions. """
+    FDORDER = par.parval_from_str("finite_difference::FD_CENTDERIVS_ORDER")
+    Ccode = "#include <stdio.h>\n#include <stdlib.h>\n#include <math.h>\n#include <time.h>\n"
+    Ccode += "#define REAL " + par.parval_from_str("outputC::PRECISION") + "\n"
+    if par.parval_from_str("outputC::PRECISION") == "float":
+        Ccode += "#define SIMD_FLOAT\n" # Single-precision SIMD intrinsics; see SIMD/SIMD_intrinsics.h
+    # Ghost zones: half the centered stencil width, plus one for upwinded derivatives
+    Ccode += "#define NGHOSTS " + str(FDORDER//2 + 1) + "\n"
+    Ccode += "#define MIN(A, B) ( ((A) < (B)) ? (A) : (B) )\n"
+    if "REAL_SIMD_ARRAY" in outC.outC_function_dict[name]:
+        Ccode += "#include \"SIMD_intrinsics.h\"\n"
+    else:
+        Ccode += "#define UPWIND_ALG(UpwindVecU) UpwindVecU > 0.0 ? 1.0 : 0.0\n"
+    Ccode += "#include \"gridfunction_layout.h\"\n#include \"gridfunction_defines.h\"\n"
+    Ccode += "#include \"declare_Cparameters_struct.h\"\n#include \"finite_difference_functions.h\"\n"
+    arguments = kernel_arguments(name)
+    use_rfmstruct = "rfmstruct" in [argname for argname, _is_const in arguments]
+    if use_rfmstruct:
+        Ccode += "#include \"rfm_files/rfm_struct__declare.h\"\n"
+    Ccode += "#include \"" + name + ".c\"\n"
+    Ccode += r"""
+static double wall_time() {
+  struct timespec t;
+  clock_gettime(CLOCK_MONOTONIC, &t);
+  return t.tv_sec + 1e-9*t.tv_nsec;
+}
+
+int main() {
+  paramstruct params;
+#include "set_Cparameters_default.h"
+"""
+    # Uniform, cell-centered grid covering the reference metric's coordinate range (if set up):
+    xxmin = getattr(rfm, "xxmin", [sp.sympify(0)]*3)
+    xxmax = getattr(rfm, "xxmax", [sp.sympify(1)]*3)
+    for i in range(3):
+        params_subs = {sym: sp.Symbol("params." + str(sym)) for sym in (xxmin[i].free_symbols | xxmax[i].free_symbols)
+                       if [idx for idx in par.Cparam_indices(str(sym)) if par.glb_Cparams_list[idx].type != "#define"]}
+        Ccode += "  params.Nxx{0} = {1}; params.Nxx_plus_2NGHOSTS{0} = {1} + 2*NGHOSTS;\n".format(i, Nxx[i])
+        Ccode += "  const REAL xxmin{0} = {1};\n".format(i, sp.ccode(xxmin[i].subs(params_subs)))
+        Ccode += "  params.dxx{0} = ({1} - xxmin{0}) / {2}; params.invdx{0} = 1.0/params.dxx{0};\n".format(
+            i, sp.ccode(xxmax[i].subs(params_subs)), Nxx[i])
+    Ccode += r"""#include "set_Cparameters-nopointer.h"
+  REAL *xx[3];
+  const REAL xxmin[3] = { xxmin0, xxmin1, xxmin2 };
+  const int Nxx_plus_2NGHOSTS[3] = { Nxx_plus_2NGHOSTS0, Nxx_plus_2NGHOSTS1, Nxx_plus_2NGHOSTS2 };
+  const REAL dxx[3] = { dxx0, dxx1, dxx2 };
+  for(int d=0;d<3;d++) {
+    xx[d] = (REAL *)malloc(sizeof(REAL)*Nxx_plus_2NGHOSTS[d]);
+    for(int i=0;i<Nxx_plus_2NGHOSTS[d];i++) xx[d][i] = xxmin[d] + (i - NGHOSTS + 0.5)*dxx[d];
+  }
+"""
+    if use_rfmstruct:
+        Ccode += "#include \"rfm_files/rfm_struct__malloc.h\"\n#include \"rfm_files/rfm_struct__define.h\"\n"
+    # A smooth, small perturbation of flat space (for BSSN gridfunctions, if present):
+    Ccode += "  const int Npts = Nxx_plus_2NGHOSTS0*Nxx_plus_2NGHOSTS1*Nxx_plus_2NGHOSTS2;\n"
+    call_args, output_gfs = [], []
+    for argname, is_const in arguments:
+        if argname in ("params", "rfmstruct"):
+            call_args.append("&" + argname)
+        elif argname == "xx":
+            call_args.append("xx")
+        elif argname.endswith("_gfs"):
+            NUM_GFS = "NUM_EVOL_GFS"
+            if "auxevol" in argname:
+                NUM_GFS = "NUM_AUXEVOL_GFS"
+            elif "aux" in argname:
+                NUM_GFS = "NUM_AUX_GFS"
+            Ccode += """  REAL *{0} = GF_ALLOC({1});
+  for(int i=0;i<GF_ALLOC_NUM_REALS({1});i++) {0}[i] = 0.0;
+  for(int gf=0;gf<{1};gf++) for(int i2=0;i2<Nxx_plus_2NGHOSTS2;i2++) for(int i1=0;i1<Nxx_plus_2NGHOSTS1;i1++) for(int i0=0;i0<Nxx_plus_2NGHOSTS0;i0++) {{
+    const int n = i0 + Nxx_plus_2NGHOSTS0*(i1 + Nxx_plus_2NGHOSTS1*i2);
+    {0}[IDX4(gf,i0,i1,i2)] = 1e-2*sin(1e-3*(n + Npts*gf));
+""".format(argname, NUM_GFS)
+            if NUM_GFS == "NUM_EVOL_GFS":
+                for gf in ["ALPHAGF", "CFGF"]:
+                    Ccode += "#ifdef {1}\n    if(gf == {1}) {0}[IDX4(gf,i0,i1,i2)] += 1.0;\n#endif\n".format(argname, gf)
+            Ccode += "  }\n"
+            call_args.append(argname)
+            if not is_const:
+                output_gfs.append((argname, NUM_GFS))
+        else:
+            print("autotune error: cannot supply argument \"" + argname + "\" of C function " + name + "().")
+            sys.exit(1)
+    Ccode += """
+  double best = 1e100;
+  for(int r=0;r<{0};r++) {{
+    const double start = wall_time();
+    {1}({2});
+    const double elapsed = wall_time() - start;
+    if(elapsed < best) best = elapsed;
+  }}
+  double sum = 0;
+""".format(REPEATS, name, ", ".join(call_args))
+    for argname, NUM_GFS in output_gfs:
+        Ccode += """  for(int gf=0;gf<{1};gf++) for(int i2=NGHOSTS;i2<NGHOSTS+Nxx2;i2++) for(int i1=NGHOSTS;i1<NGHOSTS+Nxx1;i1++) for(int i0=NGHOSTS;i0<NGHOSTS+Nxx0;i0++)
+    sum += fabs({0}[IDX4(gf,i0,i1,i2)]);
+""".format(argname, NUM_GFS)
+    Ccode += """  printf("%.6e %.16e\\n", (double)Nxx0*Nxx1*Nxx2/best, (double)sum);
+  return 0;
+}
+"""
+    return Ccode
+
+def time_kernel(name, Nxx, REPEATS, compile_mode, custom_compile_string):
+    """ Compile the C function name into the timing harness and run it; return its
+        throughput in gridpoints per second and the checksum, or None if it fails to compile. """
+    workdir = tempfile.mkdtemp()
+    try:
+        par.generate_Cparameters_Ccodes(workdir)
+        gri.output__gridfunction_defines_h__return_gf_lists(workdir)
+        gri.output__gridfunction_layout_h(workdir)
+        fin.output_finite_difference_functions_h(workdir)
+        shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), "SIMD", "SIMD_intrinsics.h"), workdir)
+        if par.parval_from_str("reference_metric::enable_rfm_precompute") == "True":
+            shutil.copytree(par.parval_from_str("reference_metric::rfm_precompute_Ccode_outdir"),
+                            os.path.join(workdir, "rfm_files"))
+        with open(os.path.join(workdir, name + ".c"), "w") as file:
+            file.write(outC.outC_function_dict[name])
+        source = os.path.join(workdir, "autotune_" + name + ".c")
+        exe = os.path.join(workdir, "autotune_" + name)
+        with open(source, "w") as file:
+            file.write(timing_harness_C(name, Nxx, REPEATS))
+        # C_compile() exits on failure; a configuration that does not compile is skipped,
+        #   after printing the compiler output (which is otherwise suppressed).
+        compile_log, stdout = outC.StringBuffer(), sys.stdout
+        try:
+            sys.stdout = compile_log
+            cmd.C_compile(source, exe, compile_mode=compile_mode,
+                          custom_compile_string=custom_compile_string.replace("SOURCE", source).replace("EXE", exe))
+        except SystemExit:
+            sys.stdout = stdout
+            print(compile_log.getvalue())
+            return None
+        finally:
+            sys.stdout = stdout
+        output = subprocess.check_output([exe]).decode().split()
+    finally:
+        shutil.rmtree(workdir)
+    return float(output[0]), float(output[1])
+
+def autotune(name, generate_kernel, param_space, Nxx=(32, 32, 32), REPEATS=5,
+             compile_mode="optimized", custom_compile_string="", retune=False, verbose=True):
+    """ Find the fastest configuration in param_space of the C function name on this machine.
+
+        :arg:    name of the C function, as registered to outputC.outC_function_dict[]
+        :arg:    generate_kernel(config): (re)registers the C function name for configuration config
+        :arg:    dict mapping each option to the list of values to try. Options of the form
+                 "module::parname" are NRPy+ parameters, set before calling generate_kernel()
+                 and restored afterward.
+        :arg:    number of interior grid points in each direction of the synthetic grid
+        :arg:    number of calls to the C function timed (the fastest is recorded)
+        :arg:    cmdline_helper.C_compile() compile_mode
+        :arg:    cmdline_helper.C_compile() custom_compile_string (compile_mode="custom"), in which
+                 SOURCE and EXE are replaced by the paths of the C source and executable
+        :arg:    if False, return previously stored results for these arguments, if any
+        :arg:    print the throughput of each configuration
+        :return: (best configuration, list of (configuration, gridpoints per second, checksum))
+    """
+    key = autotune_key(name, generate_kernel, param_space, Nxx, compile_mode, custom_compile_string)
+    if not retune:
+        entry = load_results().get(key)
+        if entry is not None:
+            return entry["best_config"], [tuple(result) for result in entry["results"]]
+
+    results = []
+    for config in configurations(param_space):
+        with configured(config):
+            generate_kernel(config)
+            timing = time_kernel(name, Nxx, REPEATS, compile_mode, custom_compile_string)
+        if timing is None:
+            if verbose:
+                print("autotune: " + name + "() failed to compile with " + str(config) + "; skipping.")
+            continue
+        results.append((config, timing[0], timing[1]))
+        if verbose:
+            print("autotune: %s() %.4e gridpoints/s with %s" % (name, timing[0], str(config)))
+    if results == []:
+        print("autotune error: " + name + "() failed to compile in every configuration.")
+        sys.exit(1)
+
+    # Different configurations should compute the same results, up to roundoff error
+    #   (amplified by cancellations in finite differences, so much larger in single precision):
+    tolerance = 1e-3 if par.parval_from_str("outputC::PRECISION") == "float" else 1e-8
+    for config, _throughput, checksum in results:
+        if abs(checksum - results[0][2]) > tolerance*abs(results[0][2]):
+            print("autotune warning: checksum " + str(checksum) + " with " + str(config)
+                  + " differs from " + str(results[0][2]) + " with " + str(results[0][0]))
+
+    best = max(results, key=lambda result: result[1])
+    store_results(key, {"name": name, "param_space": param_space, "Nxx": list(Nxx),
+                        "compile_mode": compile_mode, "custom_compile_string": custom_compile_string,
+                        "best_config": best[0], "gridpoints_per_second": best[1],
+                        "results": [list(result) for result in results]})
+    return best[0], results
@@ -0,0 +1,80 @@
+""" Benchmark: Finite Difference Coefficient Tables
+
+    Times compute_fdcoeffs_fdstencl() on the finite difference operators
+    appearing in the BSSN RHSs (first, second, mixed second, up/downwinded,
+    and Kreiss-Oliger derivatives in all three directions), for FD orders
+    2 through 12:
+    * by inverting the matrix A symbolically, as NRPy+ used to (reproduced
+      below as a reference, and used to check the coefficients);
+    * with an empty coefficient table, computed by Fornberg's recursion;
+    * with the coefficient table loaded from an on-disk table file,
+      as in a new process (finite_difference::FD_coeffs_table_file);
+    * with the coefficient table already in memory.
+
+    Usage (from the root NRPy+ directory):
+    python -m benchmarks.bench_FD_coeffs
+"""
+
+import NRPy_param_funcs as par   # NRPy+: Parameter interface
+import finite_difference as fin  # NRPy+: Finite difference C code generation module
+import sympy as sp               # SymPy: The Python computer algebra package upon which NRPy+ depends
+import os, shutil, tempfile, time  # Standard Python modules for multiplatform OS-level functions and timing
+
+derivstrings = ["dD" + str(i) for i in range(3)] + \
+               ["dDD" + str(i) + str(j) for i in range(3) for j in range(i, 3)] + \
+               [op + str(i) for op in ("dupD", "ddnD", "dKOD") for i in range(3)]
+
+def matrix_inverse_fdcoeffs(FDORDER, derivorder, UPDOWNWIND_stencil_shift):
+    """ Finite difference coefficients from the symbolic inverse of the matrix A (see finite_difference.py). """
+    STENCILSIZE = FDORDER+1
+    M = sp.zeros(STENCILSIZE, STENCILSIZE)
+    for i in range(STENCILSIZE):
+        for j in range(STENCILSIZE):
+            M[(i, j)] = (j - sp.Rational(STENCILSIZE - 1, 2) + UPDOWNWIND_stencil_shift)**i if i > 0 else 1
+    Minv = M**(-1)
+    return [sp.factorial(derivorder)*Minv[(i, derivorder)] for i in range(STENCILSIZE)]
+
+def time_all_derivstrings(FDORDER):
+    start = time.time()
+    for derivstring in derivstrings:
+        fin.compute_fdcoeffs_fdstencl(derivstring, FDORDER)
+    return 1e3*(time.time() - start)
+
+def main():
+    tabledir = tempfile.mkdtemp()
+    try:
+        print("FD order: ms for %d operators (matrix inverse | Fornberg | from disk | in memory), coefficients agree?"
+              % len(derivstrings))
+        for FDORDER in range(2, 13, 2):
+            KO_ORDER = FDORDER + par.parval_from_str("finite_difference::FD_KO_ORDER__CENTDERIVS_PLUS")
+            stencils = []
+            for derivstring in derivstrings:
+                order = KO_ORDER if "dKOD" in derivstring else FDORDER
+                derivorder = order if "dKOD" in derivstring else derivstring.count("D")
+                if "DD" in derivstring and derivstring[-1] != derivstring[-2]:
+                    derivorder = 1  # Mixed second derivatives are products of first derivatives
+                stencils.append((order, derivorder, {"dupD": 1, "ddnD": -1}.get(derivstring[:4], 0)))
+            start = time.time()
+            matrix_inverse_coeffs = [matrix_inverse_fdcoeffs(*stencil) for stencil in stencils]
+            matrix_inverse_ms = 1e3*(time.time() - start)
+            agree = all(coeffs == [sp.Rational(c.numerator, c.denominator) for c in fin.FD_coeffs_1D(*stencil)]
+                        for stencil, coeffs in zip(stencils, matrix_inverse_coeffs))
+
+            tablefile = os.path.join(tabledir, "FD_coeffs_%d.json" % FDORDER)
+            fin.FD_coeffs_table.clear()
+            par.set_parval_from_str("finite_difference::FD_coeffs_table_file", "")
+            Fornberg_ms = time_all_derivstrings(FDORDER)
+            fin.output_FD_coeffs_table(tablefile)
+
+            fin.FD_coeffs_table.clear()
+            par.set_parval_from_str("finite_difference::FD_coeffs_table_file", tablefile)
+            from_disk_ms = time_all_derivstrings(FDORDER)
+            in_memory_ms = time_all_derivstrings(FDORDER)
+            par.set_parval_from_str("finite_difference::FD_coeffs_table_file", "")
+            print("  %2d: %8.2f | %6.2f | %6.2f | %6.2f  %s (%d distinct 1D stencils)"
+                  % (FDORDER, matrix_inverse_ms, Fornberg_ms, from_disk_ms, in_memory_ms, agree, len(set(stencils))))
+    finally:
+        shutil.rmtree(tabledir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+""" Benchmark: FMA Contraction by Cost Model versus Fixed Heuristics
+
+    Converts every CSE temporary and output of several kernels (prepared as
+    outputC() does with SIMD_enable=True) to SIMD intrinsics with each value
+    of SIMD_find_more_FMAsFMSs: "False" (single FMA patterns only), "True"
+    (the default heuristics, tuned for BSSN), and "CostModel" (see
+    SIMD.contract_FMAs_by_cost()). For each, SIMD.SIMD_expr_cost() estimates
+    the total number of SIMD operations and the sum over expressions of the
+    critical path latency, in clock cycles.
+
+    With "compile", the BSSN RHS C function (see bench_helpers) is also
+    generated with "True" and "CostModel", compiled with gcc -Ofast, and timed.
+
+    Usage (from the root NRPy+ directory):
+    python -m benchmarks.bench_FMA_cost_model [BSSN_RHS] [Ricci] [Psi4] [GRMHD] [ScalarField] [compile]
+    (default: all kernels, each benchmarked in a separate process, without "compile")
+"""
+
+from benchmarks import bench_helpers as bh
+from cse_helpers import cse_preprocess, cse_postprocess         # NRPy+: CSE helper functions
+from SIMD import expr_convert_to_SIMD_intrins, SIMD_expr_cost   # NRPy+: SymPy expression => SIMD intrinsics interface
+import sympy as sp                                              # SymPy: The Python computer algebra package upon which NRPy+ depends
+import io, contextlib, subprocess, sys                          # Standard Python modules for in-memory streams, subprocesses, and OS-level functions
+
+kernels = {"BSSN_RHS":    lambda: [lhrh.rhs for lhrh in bh.BSSN_RHS_lhrh_list()[0]],
+           "Ricci":       bh.BSSN_Ricci_exprs,
+           "Psi4":        bh.Psi4_exprs,
+           "GRMHD":       bh.GRMHD_exprs,
+           "ScalarField": bh.ScalarField_exprs}
+modes = ("False", "True", "CostModel")
+
+def benchmark_kernel(name):
+    exprs, map_sym_to_rat = cse_preprocess(kernels[name](), declare=True, factor=False)
+    replaced, reduced = cse_postprocess(sp.cse(exprs, order='canonical'))
+    exprs = [expr for _, expr in replaced] + reduced
+    print("%s: %d expressions; SIMD operations | summed critical paths (cycles)" % (name, len(exprs)))
+    for mode in modes:
+        stats = {}
+        ops = depth = 0
+        for expr in exprs:
+            expr_ops, expr_depth = SIMD_expr_cost(expr_convert_to_SIMD_intrins(expr, map_sym_to_rat, "", mode,
+                                                                                 FMA_stats=stats))
+            ops += expr_ops
+            depth += expr_depth
+        print("  %-9s %7d | %7d" % (mode, ops, depth)
+              + ("   (%d of %d products in %d sums fused, in %d chains)"
+                 % (stats["FMAs"], stats["products"], stats["sums"], stats["chains"]) if stats else ""))
+
+def benchmark_compiled_BSSN_RHS():
+    print("BSSN RHS C function, gcc -Ofast: ns/point | RHS checksum")
+    for mode in ("True", "CostModel"):
+        Cfunc = bh.BSSN_RHS_Cfunction(FD_params="outCverbose=False,SIMD_enable=True,SIMD_find_more_FMAsFMSs=" + mode)
+        with contextlib.redirect_stdout(io.StringIO()):
+            _compile_time, ns_per_point, checksum = bh.time_BSSN_RHS_Cfunction(Cfunc, REPEATS=20)
+        print("  %-9s %7.1f | %.15e" % (mode, ns_per_point, checksum))
+
+def main():
+    names = [name for name in sys.argv[1:] if name in kernels]
+    if len(names) == 1:
+        benchmark_kernel(names[0])
+    else:
+        # Kernels register gridfunctions and parameters, so benchmark each in a fresh process.
+        for name in names if names else kernels:
+            subprocess.check_call([sys.executable, "-m", "benchmarks.bench_FMA_cost_model", name])
+    if "compile" in sys.argv[1:]:
+        benchmark_compiled_BSSN_RHS()
+
+if __name__ == "__main__":
+    main()
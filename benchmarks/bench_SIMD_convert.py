@@ -0,0 +1,69 @@
+""" Benchmark: Conversion of CSE'd Expressions to SIMD Compiler Intrinsics
+
+    Times SIMD.expr_convert_to_SIMD_intrins() on every CSE temporary and
+    output of a kernel, prepared as outputC does with SIMD_enable=True,
+    using the memoized single-walk-per-rule engine (SIMD.rewrite_memoized())
+    and, for comparison, the original ExprTree walk (reproduced below), and
+    checks that both engines produce identical expressions.
+
+    Usage (from the root NRPy+ directory):
+    python -m benchmarks.bench_SIMD_convert [BSSN_RHS] [Ricci]
+    (default: all kernels, each benchmarked in a separate process)
+"""
+
+from benchmarks import bench_helpers as bh
+from benchmarks.bench_helpers import time_call
+from cse_helpers import cse_preprocess, cse_postprocess  # NRPy+: CSE helper functions
+from SIMD import expr_convert_to_SIMD_intrins            # NRPy+: SymPy expression => SIMD intrinsics interface
+from expr_tree import ExprTree                           # NRPy+: Expression trees
+import SIMD                                              # NRPy+: SIMD module (whose rewrite engine is swapped below)
+import sympy as sp                                       # SymPy: The Python computer algebra package upon which NRPy+ depends
+import subprocess, sys                                   # Standard Python modules for subprocesses and OS-level functions
+
+kernels = {"BSSN_RHS": lambda: [lhrh.rhs for lhrh in bh.BSSN_RHS_lhrh_list()[0]],
+           "Ricci":    bh.BSSN_Ricci_exprs}
+
+def rewrite_ExprTree(expr, rule):
+    """ Apply a rewrite rule to every subexpression, as SIMD.py originally did: rebuilding
+        the subtree of each replacement, and reconstructing the whole tree after each rule. """
+    tree = ExprTree(expr, shared=True)
+    for subtree in tree.preorder():
+        replacement = rule(subtree.expr)
+        if replacement is not None:
+            subtree.expr = replacement
+            tree.build(subtree)
+    return tree.reconstruct()
+
+engines = {"ExprTree": rewrite_ExprTree, "memoized": SIMD.rewrite_memoized}
+
+def convert_all(exprs, map_sym_to_rat, engine):
+    # expr_convert_to_SIMD_intrins() applies each rule with SIMD.rewrite_memoized(); swap in the engine to time
+    SIMD.rewrite_memoized = engines[engine]
+    try:
+        return [expr_convert_to_SIMD_intrins(expr, map_sym_to_rat, "", "True") for expr in exprs]
+    finally:
+        SIMD.rewrite_memoized = engines["memoized"]
+
+def benchmark_kernel(name):
+    exprs, map_sym_to_rat = cse_preprocess(kernels[name](), declare=True, factor=False)
+    replaced, reduced = cse_postprocess(sp.cse(exprs, order='canonical'))
+    exprs = [expr for _, expr in replaced] + reduced
+    print(name + ": " + str(len(exprs)) + " expressions (CSE temporaries and outputs), "
+          + str(sum(sp.count_ops(expr) for expr in exprs)) + " operations")
+    results = {}
+    for engine in ("ExprTree", "memoized"):
+        results[engine], elapsed = time_call(convert_all, exprs, map_sym_to_rat, engine)
+        print("  %-8s: %6.2f s" % (engine, elapsed))
+    print("  identical output: " + str(results["ExprTree"] == results["memoized"]))
+
+def main():
+    names = [name for name in sys.argv[1:] if name in kernels]
+    if len(names) == 1:
+        benchmark_kernel(names[0])
+        return
+    # Each kernel sets up its own NRPy+ parameters, so run each in a fresh process.
+    for name in names if names else list(kernels):
+        subprocess.call([sys.executable, "-m", "benchmarks.bench_SIMD_convert", name])
+
+if __name__ == "__main__":
+    main()
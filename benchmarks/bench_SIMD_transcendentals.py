@@ -0,0 +1,112 @@
+""" Benchmark: Transcendental Functions in SIMD/SIMD_intrinsics.h
+
+    Times ExpSIMD(), LogSIMD(), SinSIMD(), CosSIMD(), PowSIMD(), and
+    CbrtSIMD() on arrays of 2^16 points (which fit in L2 cache), using the
+    header's portable polynomial approximations (the default) and libm
+    called once per SIMD lane (-DSIMD_TRANSCENDENTALS_LIBM), for each
+    instruction set this machine supports, in double and single precision.
+    Kernels are compiled with gcc -O2, and with -Ofast as in
+    cmdline_helper's "optimized" compile mode (with which gcc may also
+    vectorize the libm calls using glibc's libmvec).
+
+    Accuracy is checked separately, by tests/test_SIMD_transcendentals.py.
+
+    Usage (from the root NRPy+ directory):
+    python -m benchmarks.bench_SIMD_transcendentals [SSE2] [AVX2] [AVX512F]
+    (default: all instruction sets supported by this machine)
+"""
+
+from tests.test_SIMD_transcendentals import ISAs, CPU_supports, SIMD_dir
+import cmdline_helper as cmd  # NRPy+: Multi-platform Python command-line interface
+import os, shutil, subprocess, sys, tempfile  # Standard Python modules for multiplatform OS-level functions
+
+timing_C = r"""
+#include <stdio.h>
+#include <stdlib.h>
+#include <math.h>
+#include <time.h>
+#include "SIMD_intrinsics.h"
+#define N (1<<16)
+// Hide each input from the optimizer, so that -Ofast cannot hoist pure computations out of the REPEATS loop:
+#define OPAQUE(a) __asm__ volatile("" : "+x"(a))
+#define REPEATS 200
+
+static double wall_time() {
+  struct timespec t;
+  clock_gettime(CLOCK_MONOTONIC, &t);
+  return t.tv_sec + 1e-9*t.tv_nsec;
+}
+
+// Report the best of 5 trials, in nanoseconds per point:
+#define TIME(name, expr, lo, hi)                                        \
+  {                                                                     \
+    for(int i=0;i<N;i++) { x[i] = lo + (hi - lo)*(REAL)rand()/RAND_MAX; y[i] = 0.5 + 2*(REAL)rand()/RAND_MAX; } \
+    double best = 1e100;                                                \
+    for(int trial=0;trial<5;trial++) {                                  \
+      const double start = wall_time();                                 \
+      for(int r=0;r<REPEATS;r++)                                        \
+        for(int i=0;i<N;i+=SIMD_width) {                                \
+          REAL_SIMD_ARRAY a = ReadSIMD(&x[i]), b = ReadSIMD(&y[i]);     \
+          OPAQUE(a); OPAQUE(b);                                         \
+          WriteSIMD(&out[i], expr);                                     \
+        }                                                               \
+      const double elapsed = wall_time() - start;                       \
+      if(elapsed < best) best = elapsed;                                \
+    }                                                                   \
+    printf("%s %.4f\n", name, 1e9*best/((double)N*REPEATS));            \
+  }
+
+int main() {
+  REAL *x = (REAL *)malloc(sizeof(REAL)*N), *y = (REAL *)malloc(sizeof(REAL)*N), *out = (REAL *)malloc(sizeof(REAL)*N);
+  srand(1);
+  TIME("exp", ExpSIMD(a), -50, 50);
+  TIME("log", LogSIMD(a), 1e-3, 1e3);
+  TIME("sin", SinSIMD(a), -10, 10);
+  TIME("cos", CosSIMD(a), -10, 10);
+  TIME("pow", PowSIMD(a, b), 1e-3, 1e3);
+  TIME("cbrt", CbrtSIMD(a), -1e3, 1e3);
+  // Keep the results live:
+  REAL sum = 0;
+  for(int i=0;i<N;i++) sum += out[i];
+  fprintf(stderr, "%g\n", (double)sum);
+  free(x); free(y); free(out);
+  return 0;
+}
+"""
+
+def time_functions(ISA, precision, optimization, transcendentals):
+    """ Compile and run the timing program; return a dict of nanoseconds per point for each function. """
+    workdir = tempfile.mkdtemp()
+    try:
+        source = os.path.join(workdir, "timing.c")
+        exe = os.path.join(workdir, "timing")
+        with open(source, "w") as file:
+            file.write(("#define SIMD_FLOAT\n" if precision == "float" else "")
+                       + "#define REAL " + precision + "\n" + timing_C)
+        flags = ISAs[ISA][0] + " " + optimization + (" -DSIMD_TRANSCENDENTALS_LIBM" if transcendentals == "libm" else "")
+        cmd.C_compile(source, exe, compile_mode="custom",
+                      custom_compile_string="gcc -std=gnu99 " + flags + " -I" + SIMD_dir + " " + source + " -o " + exe + " -lm")
+        output = subprocess.check_output([exe], stderr=subprocess.DEVNULL).decode()
+    finally:
+        shutil.rmtree(workdir)
+    return {line.split()[0]: float(line.split()[1]) for line in output.splitlines()}
+
+def main():
+    if shutil.which("gcc") is None:
+        print("gcc not found; nothing to benchmark.")
+        return
+    names = [name for name in sys.argv[1:] if name in ISAs and name != "noSIMD"]
+    for ISA in names if names else [ISA for ISA in ISAs if ISA != "noSIMD"]:
+        if not CPU_supports(ISAs[ISA][1]):
+            print(ISA + ": not supported by this CPU; skipping.")
+            continue
+        for precision in ("double", "float"):
+            for optimization in ("-O2", "-Ofast"):
+                poly = time_functions(ISA, precision, optimization, "polynomial")
+                libm = time_functions(ISA, precision, optimization, "libm")
+                print("%s, %s, gcc %s: ns/point (polynomial | libm per lane | speedup)" % (ISA, precision, optimization))
+                for func in poly:
+                    print("  %-5s %7.3f | %7.3f | %5.1fx" % (func, poly[func], libm[func], libm[func]/poly[func]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+""" Benchmark: Aligned and Non-temporal Gridfunction Access in the BSSN RHS C Function
+
+    Generates the BSSN RHS C function with SIMD enabled, in Cartesian
+    coordinates, with gridfunction memory laid out and accessed three ways:
+    "unaligned": the default, unpadded layout, with ReadSIMD() & WriteSIMD();
+    "aligned":   grid::GridFuncMemAlign = 64 (see grid.output__gridfunction_layout_h()),
+                 with SIMD_aligned_gfs=True (aligned loads & stores at offset 0 in i0);
+    "streaming": as "aligned", plus SIMD_streaming_stores=True and the "StreamingStores"
+                 loop option (non-temporal stores of the write-only RHS gridfunctions).
+    Each is compiled with gcc -Ofast and timed on one thread, on a grid that
+    fits in the last-level cache and on one that does not.
+
+    Usage (from the root NRPy+ directory):
+    python -m benchmarks.bench_aligned_stores [Nxx0,Nxx1,Nxx2 ...]
+    (default grids: 32,32,32 and 64,64,64 interior points)
+"""
+
+from benchmarks.bench_helpers import BSSN_RHS_Cfunction, time_BSSN_RHS_Cfunction
+import NRPy_param_funcs as par  # NRPy+: Parameter interface
+import io, contextlib, sys      # Standard Python modules for in-memory streams and multiplatform OS-level functions
+
+variants = {"unaligned": (0,  "", ""),
+            "aligned":   (64, ",SIMD_aligned_gfs=True", ""),
+            "streaming": (64, ",SIMD_aligned_gfs=True,SIMD_streaming_stores=True", ",StreamingStores")}
+
+def main():
+    grids = [tuple(int(n) for n in arg.split(",")) for arg in sys.argv[1:]] or [(32, 32, 32), (64, 64, 64)]
+    Cfuncs = {}
+    for label, (align, FD_params, loopopts) in variants.items():
+        par.set_parval_from_str("grid::GridFuncMemAlign", align)
+        Cfuncs[label] = BSSN_RHS_Cfunction(FD_params="outCverbose=False,SIMD_enable=True" + FD_params,
+                                           loopopts="InteriorPoints,EnableSIMD,Enable_rfm_precompute" + loopopts,
+                                           CoordSystem="Cartesian")
+    for Nxx in grids:
+        print("%dx%dx%d Cartesian grid, gcc -Ofast: ns/point | RHS checksum" % Nxx)
+        for label, (align, _FD_params, _loopopts) in variants.items():
+            # The memory layout (gridfunction_layout.h) is written when compiling:
+            par.set_parval_from_str("grid::GridFuncMemAlign", align)
+            with contextlib.redirect_stdout(io.StringIO()):
+                _compile_time, ns_per_point, checksum = time_BSSN_RHS_Cfunction(Cfuncs[label], Nxx=Nxx, REPEATS=10)
+            print("  %-9s %7.1f | %.15e" % (label, ns_per_point, checksum))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+""" Benchmark: Autotuning the BSSN RHS C Function
+
+    Autotunes rhs_eval(), the BSSN RHS C function (in Spherical coordinates,
+    with reference metric precomputation), over SIMD_enable, finite difference
+    functions (finite_difference::FD_functions_enable), and cache blocking in
+    i1, on a 32^3 grid. Results are stored in a temporary directory, rather
+    than the autotune::cache_dir used by later builds, and are then read back
+    with autotune.best_config().
+
+    Usage (from the root NRPy+ directory):
+    python -m benchmarks.bench_autotune
+"""
+
+from benchmarks.bench_helpers import BSSN_RHS_lhrh_list
+import NRPy_param_funcs as par   # NRPy+: Parameter interface
+import outputC as outC           # NRPy+: Core C code output module
+import finite_difference as fin  # NRPy+: Finite difference C code generation module
+import autotune                  # NRPy+: Empirical autotuning of generated C kernels
+import shutil, tempfile  # Standard Python modules for multiplatform OS-level functions
+
+param_space = {"SIMD_enable": ["False", "True"],
+               "finite_difference::FD_functions_enable": [False, True],
+               "tile_i1": ["", "8"]}
+
+def main():
+    lhrh_list, betaU = BSSN_RHS_lhrh_list()
+    bodies = {}
+    def generate_rhs_eval(config):
+        # The loop body depends only on the FD_outputC() options; the tile size only on the loop options.
+        key = (config["SIMD_enable"], config["finite_difference::FD_functions_enable"])
+        if key not in bodies:
+            bodies[key] = fin.FD_outputC("returnstring", lhrh_list, upwindcontrolvec=betaU,
+                                         params="outCverbose=False,SIMD_enable=" + config["SIMD_enable"])
+        loopopts = "InteriorPoints,Enable_rfm_precompute"
+        if config["SIMD_enable"] == "True":
+            loopopts += ",EnableSIMD"
+        if config["tile_i1"]:
+            loopopts += ",tile_i1=" + config["tile_i1"]
+        outC.add_to_Cfunction_dict(desc="Evaluate the BSSN RHSs", name="rhs_eval",
+                                   params="""const paramstruct *restrict params, const rfm_struct *restrict rfmstruct,
+              const REAL *restrict auxevol_gfs, const REAL *restrict in_gfs, REAL *restrict rhs_gfs""",
+                                   body=bodies[key], loopopts=loopopts)
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        par.set_parval_from_str("autotune::cache_dir", cache_dir)
+        best, results = autotune.autotune("rhs_eval", generate_rhs_eval, param_space, verbose=False)
+        print("rhs_eval(), gcc (cmdline_helper \"optimized\"), 32^3 grid: gridpoints/s | RHS checksum | configuration")
+        for config, throughput, checksum in results:
+            print("  %.4e | %.15e | %s" % (throughput, checksum, config))
+        print("Best: " + str(best))
+        print("Stored for this machine (" + autotune.machine_id() + "): "
+              + str(autotune.best_config("rhs_eval", generate_rhs_eval, param_space) == best))
+    finally:
+        shutil.rmtree(cache_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+""" Benchmark: SymPy CSE vs. DAG-Based CSE (outputC's CSE_engine option)
+
+    For each kernel, reports the time for CSE alone (SymPy's cse() vs.
+    cse_helpers.cse_dag()), the time for complete C code generation with
+    outputC() (CSE_engine=sympy vs. CSE_engine=DAG), and the number of
+    arithmetic operations and CSE temporaries in the generated code
+    (after cse_postprocess()).
+
+    Usage (from the root NRPy+ directory):
+    python -m benchmarks.bench_cse_engines [BSSN_RHS] [Ricci] [Psi4] [GRMHD]
+    (default: all kernels, each benchmarked in a separate process)
+"""
+
+from benchmarks import bench_helpers as bh
+from benchmarks.bench_helpers import time_call
+from cse_helpers import cse_dag, cse_postprocess  # NRPy+: CSE helper functions
+from outputC import outputC                       # NRPy+: Core C code output module
+import sympy as sp                                # SymPy: The Python computer algebra package upon which NRPy+ depends
+import subprocess, sys                            # Standard Python modules for subprocesses and OS-level functions
+
+kernels = {"BSSN_RHS": lambda: [lhrh.rhs for lhrh in bh.BSSN_RHS_lhrh_list()[0]],
+           "Ricci":    bh.BSSN_Ricci_exprs,
+           "Psi4":     bh.Psi4_exprs,
+           "GRMHD":    bh.GRMHD_exprs}
+
+def count_ops(cse_output):
+    replaced, reduced = cse_output
+    return sum(sp.count_ops(expr) for _sym, expr in replaced) + sum(sp.count_ops(expr) for expr in reduced)
+
+def benchmark_kernel(name):
+    exprs = kernels[name]()
+    print(name + ": " + str(len(exprs)) + " expressions")
+    for engine, cse_func in [("sympy", lambda: sp.cse(exprs, order='canonical')),
+                             ("DAG",   lambda: cse_dag(exprs, order='canonical'))]:
+        cse_output, cse_time = time_call(cse_func)
+        cse_output = cse_postprocess(cse_output)
+        _Ccode, outputC_time = time_call(outputC, exprs, ["out" + str(i) for i in range(len(exprs))],
+                                         "returnstring", params="outCverbose=False,CSE_engine=" + engine)
+        print("  %-6s: CSE %7.2f s, outputC %7.2f s, %6d operations, %5d temporaries"
+              % (engine, cse_time, outputC_time, count_ops(cse_output), len(cse_output[0])))
+
+def main():
+    names = [name for name in sys.argv[1:] if name in kernels]
+    if len(names) == 1:
+        benchmark_kernel(names[0])
+        return
+    # Each kernel sets up its own NRPy+ parameters, so run each in a fresh process.
+    for name in names if names else list(kernels):
+        subprocess.call([sys.executable, "-m", "benchmarks.bench_cse_engines", name])
+
+if __name__ == "__main__":
+    main()
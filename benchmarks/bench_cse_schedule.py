@@ -0,0 +1,50 @@
+""" Benchmark: Register-Pressure-Aware Scheduling of CSE Temporaries
+
+    For each kernel, reports the estimated maximum number of simultaneously
+    live CSE temporaries with the default statement order (all temporaries,
+    then all outputs) and after cse_helpers.cse_schedule() (outputC's
+    CSE_schedule option), as well as the time taken by the scheduler.
+    Fewer live temporaries means fewer register spills in the compiled
+    kernel, particularly in SIMD kernels with only 16 (AVX) or 32 (AVX-512)
+    vector registers.
+
+    Usage (from the root NRPy+ directory):
+    python -m benchmarks.bench_cse_schedule [BSSN_RHS] [Ricci] [Psi4] [GRMHD]
+    (default: all kernels, each benchmarked in a separate process)
+"""
+
+from benchmarks import bench_helpers as bh
+from benchmarks.bench_helpers import time_call
+from cse_helpers import cse_preprocess, cse_postprocess, cse_schedule, max_live_temporaries  # NRPy+: CSE helper functions
+import sympy as sp                                # SymPy: The Python computer algebra package upon which NRPy+ depends
+import subprocess, sys                            # Standard Python modules for subprocesses and OS-level functions
+
+kernels = {"BSSN_RHS": lambda: [lhrh.rhs for lhrh in bh.BSSN_RHS_lhrh_list()[0]],
+           "Ricci":    bh.BSSN_Ricci_exprs,
+           "Psi4":     bh.Psi4_exprs,
+           "GRMHD":    bh.GRMHD_exprs}
+
+def benchmark_kernel(name):
+    exprs = kernels[name]()
+    print(name + ": " + str(len(exprs)) + " expressions")
+    # CSE as performed by outputC with default parameters, with SIMD_enable=False
+    #   and with SIMD_enable=True (where rationals are replaced by symbols).
+    for label, preprocessed in [("scalar", exprs),
+                                ("SIMD", cse_preprocess(exprs, declare=True, factor=False)[0])]:
+        replaced, reduced = cse_postprocess(sp.cse(preprocessed, order='canonical'))
+        order, schedule_time = time_call(cse_schedule, replaced, reduced)
+        print("  %-6s: %5d temporaries; max live temporaries %5d -> %5d (scheduling: %.2f s)"
+              % (label, len(replaced), max_live_temporaries(replaced, reduced),
+                 max_live_temporaries(replaced, reduced, order), schedule_time))
+
+def main():
+    names = [name for name in sys.argv[1:] if name in kernels]
+    if len(names) == 1:
+        benchmark_kernel(names[0])
+        return
+    # Each kernel sets up its own NRPy+ parameters, so run each in a fresh process.
+    for name in names if names else list(kernels):
+        subprocess.call([sys.executable, "-m", "benchmarks.bench_cse_schedule", name])
+
+if __name__ == "__main__":
+    main()
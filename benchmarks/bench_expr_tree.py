@@ -0,0 +1,51 @@
+""" Benchmark: Expression Tree Construction, Traversal, and Memory Footprint
+
+    Builds an expr_tree.ExprTree for every right-hand side of the BSSN RHS
+    expression list, both as a plain tree (one node per occurrence of each
+    subexpression) and with shared=True (one node per distinct subexpression
+    and parent), and reports the number of nodes, the memory allocated by
+    the trees (measured with tracemalloc), and the time taken to build,
+    traverse (preorder and postorder), and reconstruct them.
+
+    Usage (from the root NRPy+ directory):
+    python -m benchmarks.bench_expr_tree [module]
+    (module: an alternative expression tree module to benchmark, default: expr_tree)
+"""
+
+from benchmarks.bench_helpers import BSSN_RHS_lhrh_list, time_call
+import importlib, sys, tracemalloc  # Standard Python modules for module importing, OS-level functions, and memory tracing
+
+def build_trees(ExprTree, exprs, **kwargs):
+    return [ExprTree(expr, **kwargs) for expr in exprs]
+
+def count_preorder(trees):
+    return sum(1 for tree in trees for _ in tree.preorder())
+
+def count_postorder(trees):
+    return sum(1 for tree in trees for _ in tree.postorder())
+
+def reconstruct_all(trees):
+    return [tree.reconstruct() for tree in trees]
+
+def main():
+    ExprTree = importlib.import_module(sys.argv[1] if len(sys.argv) > 1 else "expr_tree").ExprTree
+    exprs = [lhrh.rhs for lhrh in BSSN_RHS_lhrh_list()[0]]
+    print("BSSN RHS: " + str(len(exprs)) + " expressions")
+    for label, kwargs in [("tree", {}), ("shared", {"shared": True})]:
+        try:
+            ExprTree(exprs[0], **kwargs)
+        except TypeError:
+            continue
+        tracemalloc.start()
+        trees, build_time = time_call(build_trees, ExprTree, exprs, **kwargs)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        nodes, preorder_time = time_call(count_preorder, trees)
+        _, postorder_time = time_call(count_postorder, trees)
+        results, reconstruct_time = time_call(reconstruct_all, trees)
+        assert results == exprs
+        print("  %-6s: %8d nodes, %7.1f MB; build %.2f s, preorder %.2f s, postorder %.2f s, reconstruct %.2f s"
+              % (label, nodes, memory / 1.0e6, build_time, preorder_time, postorder_time, reconstruct_time))
+
+if __name__ == "__main__":
+    main()
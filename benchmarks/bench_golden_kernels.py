@@ -0,0 +1,30 @@
+""" Benchmark: BSSN RHS Code Generation Time with and without GoldenKernels
+
+    Times FD_outputC() on the BSSN RHS expressions with SIMD enabled, with
+    GoldenKernelsEnable=False and GoldenKernelsEnable=True (i.e., with CSE
+    preprocessing, where rationals are replaced by symbols and partially
+    factored out by cse_helpers.collect_symbols()), and tabulates the cost
+    of each generated kernel as estimated by kernel_cost_model.
+
+    Usage (from the root NRPy+ directory):
+    python -m benchmarks.bench_golden_kernels
+"""
+
+from benchmarks.bench_helpers import BSSN_RHS_lhrh_list, time_call
+import kernel_cost_model as kcm        # NRPy+: Operation-count and arithmetic-intensity cost model
+import finite_difference as fin        # NRPy+: Finite difference C code generation module
+
+settings = [("SIMD",         "outCverbose=False,SIMD_enable=True"),
+            ("SIMD, Golden", "outCverbose=False,SIMD_enable=True,GoldenKernelsEnable=True")]
+
+def main():
+    lhrh_list, betaU = BSSN_RHS_lhrh_list()
+    costs = {}
+    for label, params in settings:
+        Ccode, elapsed = time_call(fin.FD_outputC, "returnstring", lhrh_list, params=params, upwindcontrolvec=betaU)
+        print("%-12s: FD_outputC() %7.1f s" % (label, elapsed))
+        costs[label] = kcm.Ccode_cost(Ccode)
+    print(kcm.cost_table(costs))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+""" Shared Setup for the NRPy+ Code Generation Benchmarks
+
+    The benchmarks in this directory time NRPy+ code generation on the
+    BSSN right-hand sides in Spherical coordinates (with reference metric
+    precomputation), which exercise every stage of FD_outputC(): finite
+    difference stencils, upwinding, CSE, and (optionally) SIMD output.
+    BSSN_RHS_Cfunction() and time_BSSN_RHS_Cfunction() also compile and
+    time the generated BSSN RHS C function itself.
+
+    Run any benchmark from the root NRPy+ directory, e.g.,
+    python -m benchmarks.bench_streaming
+"""
+
+import NRPy_param_funcs as par   # NRPy+: Parameter interface
+import grid as gri               # NRPy+: Functions having to do with numerical grids
+import reference_metric as rfm   # NRPy+: Reference metric support
+import outputC as outC           # NRPy+: Core C code output module
+from outputC import lhrh         # NRPy+: Core C code output module
+import finite_difference as fin  # NRPy+: Finite difference C code generation module
+import cmdline_helper as cmd     # NRPy+: Multi-platform Python command-line interface
+import os, shutil, subprocess, tempfile, time  # Standard Python modules for multiplatform OS-level functions and timing
+
+def set_up_reference_metric(CoordSystem, enable_rfm_precompute=False):
+    par.set_parval_from_str("grid::DIM", 3)
+    par.set_parval_from_str("reference_metric::CoordSystem", CoordSystem)
+    if enable_rfm_precompute:
+        par.set_parval_from_str("reference_metric::enable_rfm_precompute", "True")
+        par.set_parval_from_str("reference_metric::rfm_precompute_Ccode_outdir",
+                                os.path.join(tempfile.gettempdir(), "nrpy_benchmarks_rfm"))
+        if not os.path.isdir(par.parval_from_str("reference_metric::rfm_precompute_Ccode_outdir")):
+            os.makedirs(par.parval_from_str("reference_metric::rfm_precompute_Ccode_outdir"))
+    rfm.reference_metric()
+
+def BSSN_RHS_lhrh_list(CoordSystem="Spherical"):
+    """ Construct the BSSN RHS expressions, returning the list of lhrh's passed to
+        FD_outputC(), and the upwinding control vector betaU. """
+    set_up_reference_metric(CoordSystem, enable_rfm_precompute=True)
+
+    import BSSN.BSSN_RHSs as rhs
+    import BSSN.BSSN_gauge_RHSs as gaugerhs
+    import BSSN.BSSN_quantities as Bq
+    par.set_parval_from_str("BSSN.BSSN_gauge_RHSs::ShiftEvolutionOption", "GammaDriving2ndOrder_Covariant")
+    par.set_parval_from_str("BSSN.BSSN_quantities::LeaveRicciSymbolic", "True")
+    rhs.BSSN_RHSs()
+    gaugerhs.BSSN_gauge_RHSs()
+    Bq.BSSN_basic_tensors()
+
+    lhs_names = ["alpha", "cf", "trK"]
+    rhs_exprs = [gaugerhs.alpha_rhs, rhs.cf_rhs, rhs.trK_rhs]
+    for i in range(3):
+        lhs_names.append("betU"+str(i))
+        rhs_exprs.append(gaugerhs.bet_rhsU[i])
+        lhs_names.append("lambdaU"+str(i))
+        rhs_exprs.append(rhs.lambda_rhsU[i])
+        lhs_names.append("vetU"+str(i))
+        rhs_exprs.append(gaugerhs.vet_rhsU[i])
+        for j in range(i, 3):
+            lhs_names.append("aDD"+str(i)+str(j))
+            rhs_exprs.append(rhs.a_rhsDD[i][j])
+            lhs_names.append("hDD"+str(i)+str(j))
+            rhs_exprs.append(rhs.h_rhsDD[i][j])
+    # Sort the list of lhrh's by gridfunction name, for consistent output
+    lhs_names, rhs_exprs = [list(x) for x in zip(*sorted(zip(lhs_names, rhs_exprs), key=lambda p: p[0]))]
+    lhrh_list = [lhrh(lhs=gri.gfaccess("rhs_gfs", name), rhs=expr) for name, expr in zip(lhs_names, rhs_exprs)]
+    return lhrh_list, Bq.betaU
+
+def BSSN_Ricci_exprs():
+    """ Return the list of expressions for the (symmetric) BSSN Ricci tensor RbarDD. """
+    set_up_reference_metric("Spherical")
+    import BSSN.BSSN_quantities as Bq
+    par.set_parval_from_str("BSSN.BSSN_quantities::LeaveRicciSymbolic", "False")
+    Bq.RicciBar__gammabarDD_dHatD__DGammaUDD__DGammaU()
+    return [Bq.RbarDD[i][j] for i in range(3) for j in range(i, 3)]
+
+def Psi4_exprs():
+    """ Return the list of expressions for the real and imaginary parts of psi_4. """
+    set_up_reference_metric("Spherical")
+    import BSSN.Psi4 as BP4
+    BP4.Psi4()
+    return BP4.psi4_re_pt + BP4.psi4_im_pt
+
+def ScalarField_exprs():
+    """ Return the list of scalar field right-hand sides, in Spherical coordinates. """
+    set_up_reference_metric("Spherical")
+    import ScalarField.ScalarField_RHSs as sfrhs
+    sfrhs.ScalarField_RHSs()
+    return [sfrhs.sf_rhs, sfrhs.sfM_rhs]
+
+def GRMHD_exprs():
+    """ Return the list of GRMHD conservative variables, fluxes, and source terms. """
+    import GRMHD.equations as GRMHD
+    GRMHD.generate_everything_for_UnitTesting()
+    exprs = [GRMHD.rho_star, GRMHD.tau_tilde, GRMHD.s_source_term]
+    for i in range(3):
+        exprs += [GRMHD.S_tildeD[i], GRMHD.rho_star_fluxU[i], GRMHD.tau_tilde_fluxU[i],
+                  GRMHD.S_tilde_source_termD[i]]
+        exprs += [GRMHD.S_tilde_fluxUD[i][j] for j in range(3)]
+    return exprs
+
+def time_call(func, *args, **kwargs):
+    """ Call func(*args, **kwargs), returning its result and the wall-clock time elapsed, in seconds. """
+    start = time.time()
+    result = func(*args, **kwargs)
+    return result, time.time() - start
+
+# Standalone C program that calls the BSSN RHS C function rhs_eval() (with SIMD, and reference
+#   metric precomputation, in Spherical or Cartesian coordinates) on a grid of NXX0 x NXX1 x NXX2
+#   interior points, and prints the best time of REPEATS calls, in nanoseconds per grid point, and
+#   a checksum of the RHSs. Gridfunctions are allocated & indexed as in gridfunction_layout.h (see
+#   grid.output__gridfunction_layout_h()), and the initial data do not depend on the layout.
+BSSN_RHS_timing_C = r"""
+#include <stdio.h>
+#include <stdlib.h>
+#include <math.h>
+#include <time.h>
+#ifdef NO_SIMD
+// SIMD-disabled rhs_eval(), which needs only the (scalar) upwinding algorithm:
+#define UPWIND_ALG(UpwindVecU) UpwindVecU > 0.0 ? 1.0 : 0.0
+#else
+#include "SIMD_intrinsics.h"
+#endif
+#include "gridfunction_layout.h"
+#include "gridfunction_defines.h"
+#define MIN(A, B) ( ((A) < (B)) ? (A) : (B) )
+#include "declare_Cparameters_struct.h"
+#include "rfm_files/rfm_struct__declare.h"
+#include "rhs_eval.c"
+
+static double wall_time() {
+  struct timespec t;
+  clock_gettime(CLOCK_MONOTONIC, &t);
+  return t.tv_sec + 1e-9*t.tv_nsec;
+}
+
+int main() {
+  paramstruct params;
+#include "set_Cparameters_default.h"
+  params.Nxx0 = NXX0; params.Nxx1 = NXX1; params.Nxx2 = NXX2;
+  params.Nxx_plus_2NGHOSTS0 = NXX0 + 2*NGHOSTS; params.Nxx_plus_2NGHOSTS1 = NXX1 + 2*NGHOSTS; params.Nxx_plus_2NGHOSTS2 = NXX2 + 2*NGHOSTS;
+#ifdef COORD_CARTESIAN
+  params.dxx0 = (params.xmax - params.xmin) / NXX0; params.dxx1 = (params.ymax - params.ymin) / NXX1; params.dxx2 = (params.zmax - params.zmin) / NXX2;
+#else
+  params.dxx0 = params.RMAX / NXX0; params.dxx1 = M_PI / NXX1; params.dxx2 = 2.0*M_PI / NXX2;
+#endif
+  params.invdx0 = 1.0/params.dxx0; params.invdx1 = 1.0/params.dxx1; params.invdx2 = 1.0/params.dxx2;
+#include "set_Cparameters-nopointer.h"
+  // Cell-centered coordinates:
+  REAL *xx[3];
+  const int Nxx_plus_2NGHOSTS[3] = { Nxx_plus_2NGHOSTS0, Nxx_plus_2NGHOSTS1, Nxx_plus_2NGHOSTS2 };
+#ifdef COORD_CARTESIAN
+  const REAL xxmin[3] = { xmin, ymin, zmin }, dxx[3] = { dxx0, dxx1, dxx2 };
+#else
+  const REAL xxmin[3] = { 0.0, 0.0, -M_PI }, dxx[3] = { dxx0, dxx1, dxx2 };
+#endif
+  for(int d=0;d<3;d++) {
+    xx[d] = (REAL *)malloc(sizeof(REAL)*Nxx_plus_2NGHOSTS[d]);
+    for(int i=0;i<Nxx_plus_2NGHOSTS[d];i++) xx[d][i] = xxmin[d] + (i - NGHOSTS + 0.5)*dxx[d];
+  }
+#include "rfm_files/rfm_struct__malloc.h"
+#include "rfm_files/rfm_struct__define.h"
+  REAL *in_gfs      = GF_ALLOC(NUM_EVOL_GFS);
+  REAL *rhs_gfs     = GF_ALLOC(NUM_EVOL_GFS);
+  REAL *auxevol_gfs = GF_ALLOC(NUM_AUXEVOL_GFS);
+  for(int i=0;i<GF_ALLOC_NUM_REALS(NUM_EVOL_GFS);i++) { in_gfs[i] = 0.0; rhs_gfs[i] = 0.0; }
+  for(int i=0;i<GF_ALLOC_NUM_REALS(NUM_AUXEVOL_GFS);i++) auxevol_gfs[i] = 0.0;
+  // A smooth, small perturbation of flat space:
+  const int Npts = Nxx_plus_2NGHOSTS0*Nxx_plus_2NGHOSTS1*Nxx_plus_2NGHOSTS2;
+  for(int i2=0;i2<Nxx_plus_2NGHOSTS2;i2++) for(int i1=0;i1<Nxx_plus_2NGHOSTS1;i1++) for(int i0=0;i0<Nxx_plus_2NGHOSTS0;i0++) {
+    const int n = i0 + Nxx_plus_2NGHOSTS0*(i1 + Nxx_plus_2NGHOSTS1*i2); // Index of (i0,i1,i2) in the unpadded layout
+    for(int gf=0;gf<NUM_EVOL_GFS;gf++)    in_gfs[IDX4(gf,i0,i1,i2)]      = 1e-2*sin(1e-3*(n + Npts*gf));
+    for(int gf=0;gf<NUM_AUXEVOL_GFS;gf++) auxevol_gfs[IDX4(gf,i0,i1,i2)] = 1e-2*cos(1e-3*(n + Npts*gf));
+    in_gfs[IDX4(ALPHAGF,i0,i1,i2)] += 1.0; in_gfs[IDX4(CFGF,i0,i1,i2)] += 1.0;
+  }
+
+  double best = 1e100;
+  for(int r=0;r<REPEATS;r++) {
+    const double start = wall_time();
+    rhs_eval(&params, &rfmstruct, auxevol_gfs, in_gfs, rhs_gfs);
+    const double elapsed = wall_time() - start;
+    if(elapsed < best) best = elapsed;
+  }
+  REAL sum = 0;
+  for(int i2=NGHOSTS;i2<NGHOSTS+NXX2;i2++) for(int i1=NGHOSTS;i1<NGHOSTS+NXX1;i1++) for(int i0=NGHOSTS;i0<NGHOSTS+NXX0;i0++)
+    for(int gf=0;gf<NUM_EVOL_GFS;gf++) sum += fabs(rhs_gfs[IDX4(gf,i0,i1,i2)]);
+  printf("%.4f %.16e\n", 1e9*best/((double)NXX0*NXX1*NXX2), (double)sum);
+  return 0;
+}
+"""
+
+def BSSN_RHS_Cfunction(FD_params="outCverbose=False,SIMD_enable=True",
+                       loopopts="InteriorPoints,EnableSIMD,Enable_rfm_precompute", opts="", CoordSystem="Spherical"):
+    """ Generate the BSSN RHS C function rhs_eval(), for BSSN_RHS_timing_C. """
+    lhrh_list, betaU = BSSN_RHS_lhrh_list(CoordSystem)
+    body = fin.FD_outputC("returnstring", lhrh_list, params=FD_params, upwindcontrolvec=betaU)
+    return rhs_eval_Cfunction(body, loopopts, opts)
+
+def rhs_eval_Cfunction(body, loopopts="InteriorPoints,EnableSIMD,Enable_rfm_precompute", opts=""):
+    """ Wrap the loop body (e.g., from FD_outputC()) in the C function rhs_eval(), for BSSN_RHS_timing_C. """
+    return outC.Cfunction(desc="Evaluate the BSSN RHSs", name="rhs_eval",
+                          params="""const paramstruct *restrict params, const rfm_struct *restrict rfmstruct,
+              const REAL *restrict auxevol_gfs, const REAL *restrict in_gfs, REAL *restrict rhs_gfs""",
+                          body=body, loopopts=loopopts, opts=opts)[1]
+
+def time_BSSN_RHS_Cfunction(Cfunction, CC="gcc", CFLAGS="-Ofast -march=native -funroll-loops",
+                            Nxx=(32, 32, 16), REPEATS=10):
+    """ Compile Cfunction (from BSSN_RHS_Cfunction()) into BSSN_RHS_timing_C with the C compiler CC,
+        and run it; return the compile time in seconds, the best time per grid point in nanoseconds,
+        and the sum of the absolute values of the RHSs at all interior points.
+        BSSN_RHS_lhrh_list() must have been called first, to register the parameters and gridfunctions. """
+    workdir = tempfile.mkdtemp()
+    try:
+        par.generate_Cparameters_Ccodes(workdir)
+        gri.output__gridfunction_defines_h__return_gf_lists(workdir)
+        gri.output__gridfunction_layout_h(workdir)
+        shutil.copytree(par.parval_from_str("reference_metric::rfm_precompute_Ccode_outdir"),
+                        os.path.join(workdir, "rfm_files"))
+        with open(os.path.join(workdir, "rhs_eval.c"), "w") as file:
+            file.write(Cfunction)
+        source = os.path.join(workdir, "timing.c")
+        exe = os.path.join(workdir, "timing")
+        with open(source, "w") as file:
+            file.write("#define REAL double\n#define NXX0 %d\n#define NXX1 %d\n#define NXX2 %d\n#define REPEATS %d\n"
+                       % (Nxx + (REPEATS,))
+                       + ("#define COORD_CARTESIAN\n" if par.parval_from_str("reference_metric::CoordSystem") == "Cartesian" else "")
+                       # Ghost zones: half the centered stencil width, plus one for upwinded derivatives
+                       + "#define NGHOSTS %d\n" % (int(par.parval_from_str("finite_difference::FD_CENTDERIVS_ORDER"))//2 + 1)
+                       + ("#define NO_SIMD\n" if "REAL_SIMD_ARRAY" not in Cfunction else "")
+                       + BSSN_RHS_timing_C)
+        SIMD_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "SIMD")
+        start = time.time()
+        cmd.C_compile(source, exe, compile_mode="custom",
+                      custom_compile_string=CC + " -std=gnu99 " + CFLAGS + " -I" + SIMD_dir + " -I" + workdir
+                      + " " + source + " -o " + exe + " -lm")
+        compile_time = time.time() - start
+        output = subprocess.check_output([exe]).decode().split()
+    finally:
+        shutil.rmtree(workdir)
+    return compile_time, float(output[0]), float(output[1])
@@ -0,0 +1,40 @@
+""" Benchmark: Operation Counts and Arithmetic Intensity of the BSSN RHS Kernel
+
+    Generates the BSSN RHS kernel with several combinations of code generation
+    options, and tabulates the cost of each as estimated by kernel_cost_model
+    (operation counts, gridfunction loads/stores per point, and flops per
+    byte), without compiling anything. Optionally, given the peak floating-point
+    performance (GFLOP/s) and memory bandwidth (GB/s) of a machine, also
+    predicts each kernel's roofline position.
+
+    Usage (from the root NRPy+ directory):
+    python -m benchmarks.bench_kernel_cost [peak_GFLOPs bandwidth_GBs]
+"""
+
+from benchmarks.bench_helpers import BSSN_RHS_lhrh_list
+import kernel_cost_model as kcm  # NRPy+: Operation-count and arithmetic-intensity cost model
+import sys                       # Standard Python module for OS-level functions
+
+settings = [("default",           "outCverbose=False"),
+            ("CSE_preprocess",    "outCverbose=False,CSE_preprocess=True"),
+            ("SIMD",              "outCverbose=False,SIMD_enable=True"),
+            ("SIMD, no FMA subs", "outCverbose=False,SIMD_enable=True,SIMD_find_more_FMAsFMSs=False"),
+            ("SIMD, Golden",      "outCverbose=False,SIMD_enable=True,GoldenKernelsEnable=True")]
+
+def main():
+    lhrh_list, betaU = BSSN_RHS_lhrh_list()
+    costs = {}
+    for label, params in settings:
+        costs[label] = kcm.FD_outputC_cost(lhrh_list, params=params, upwindcontrolvec=betaU)
+    print(kcm.cost_table(costs))
+    if len(sys.argv) == 3:
+        peak_GFLOPs, bandwidth_GBs = float(sys.argv[1]), float(sys.argv[2])
+        print("\nRoofline (peak %.1f GFLOP/s, bandwidth %.1f GB/s):" % (peak_GFLOPs, bandwidth_GBs))
+        for label, cost in costs.items():
+            attainable, bound = kcm.roofline(cost, peak_GFLOPs, bandwidth_GBs)
+            attainable_noreuse, bound_noreuse = kcm.roofline(cost, peak_GFLOPs, bandwidth_GBs, compulsory=False)
+            print("  %-18s: perfect cache reuse %8.1f GFLOP/s (%s); no reuse %8.1f GFLOP/s (%s)"
+                  % (label, attainable, bound, attainable_noreuse, bound_noreuse))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+""" Benchmark: OpenMP Loop Options for the BSSN RHS Loop
+
+    Generates the BSSN RHS loop body once (with SIMD, in Spherical
+    coordinates with reference metric precomputation), wraps it in loops
+    with the simple_loop() OpenMP options OMP_collapse=N and
+    OMP_schedule=KIND (with OMP_chunk_size=N). Then splits the RHSs into
+    two kernels (two loops), each either in its own parallel loop, or
+    sharing a single OpenMP parallel region (simple_loop() option
+    OMP_in_parallel_region, and omp_parallel_region()). Times each
+    (gcc -Ofast -fopenmp) on the threads the OpenMP runtime provides, with
+    OMP_PROC_BIND=close and OMP_PLACES=cores.
+
+    Usage (from the root NRPy+ directory):
+    python -m benchmarks.bench_omp_options [FD order] [N]
+    (defaults: 4th-order finite differences, on an N^3 = 64^3 grid)
+"""
+
+from benchmarks.bench_helpers import BSSN_RHS_lhrh_list, rhs_eval_Cfunction, time_BSSN_RHS_Cfunction
+import NRPy_param_funcs as par   # NRPy+: Parameter interface
+import finite_difference as fin  # NRPy+: Finite difference C code generation module
+import loop as lp                # NRPy+: Generate C code loops
+import io, contextlib, os, sys   # Standard Python modules for in-memory streams and OS-level functions
+
+loopopts = "InteriorPoints,EnableSIMD,Enable_rfm_precompute"
+
+def main():
+    order = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    N = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    par.set_parval_from_str("finite_difference::FD_CENTDERIVS_ORDER", order)
+    lhrh_list, betaU = BSSN_RHS_lhrh_list()
+    body = fin.FD_outputC("returnstring", lhrh_list, params="outCverbose=False,SIMD_enable=True", upwindcontrolvec=betaU)
+    os.environ["OMP_PROC_BIND"], os.environ["OMP_PLACES"] = "close", "cores"
+
+    print("FD order %d, gcc -Ofast -fopenmp, %dx%dx%d grid, %d CPU(s): ns/point | RHS checksum"
+          % (order, N, N, N, os.cpu_count()))
+    variants = [(ompopts, rhs_eval_Cfunction(body, loopopts=loopopts + ("," + ompopts if ompopts else "")))
+                for ompopts in ["", "OMP_collapse=2", "OMP_collapse=3", "OMP_schedule=static,OMP_chunk_size=1",
+                                "OMP_schedule=dynamic,OMP_chunk_size=4", "OMP_collapse=2,OMP_schedule=guided"]]
+    half = len(lhrh_list)//2
+    kernels = [fin.FD_outputC("returnstring", lhrhs, params="outCverbose=False,SIMD_enable=True", upwindcontrolvec=betaU)
+               for lhrhs in (lhrh_list[:half], lhrh_list[half:])]
+    SIMD_Cparams = '#include "./set_Cparameters-SIMD.h"\n'
+    variants.append(("2 kernels, 2 parallel regions",
+                     rhs_eval_Cfunction(SIMD_Cparams + "".join(lp.simple_loop(loopopts, kernel) for kernel in kernels),
+                                        loopopts="", opts="DisableCparameters")))
+    variants.append(("2 kernels, 1 parallel region",
+                     rhs_eval_Cfunction(SIMD_Cparams + lp.omp_parallel_region(
+                         "".join(lp.simple_loop(loopopts + ",OMP_in_parallel_region", kernel) for kernel in kernels)),
+                                        loopopts="", opts="DisableCparameters")))
+    for ompopts, Cfunc in variants:
+        with contextlib.redirect_stdout(io.StringIO()):
+            _compile_time, ns_per_point, checksum = time_BSSN_RHS_Cfunction(
+                Cfunc, CFLAGS="-Ofast -march=native -funroll-loops -fopenmp", Nxx=(N, N, N), REPEATS=5)
+        print("  %-38s %7.1f | %.15e" % (ompopts if ompopts else "parallel for (default)", ns_per_point, checksum))
+
+if __name__ == "__main__":
+    main()
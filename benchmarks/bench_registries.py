@@ -0,0 +1,52 @@
+""" Benchmark: Gridfunction and Parameter Registry Lookups
+
+    Times full BSSN RHS code generation in Spherical coordinates (with
+    reference metric precomputation): first constructing the SymPy
+    expressions, then FD_outputC(). Then reports, from a separate run
+    under cProfile, the number of calls to, and the total time spent in,
+    the registry lookups (NRPy_param_funcs.get_params_idx()/idx_from_str(),
+    and grid.variable_type()/gfaccess()/find_gftype()), as well as each
+    lookup's cost per call on the final BSSN registries.
+
+    Usage (from the root NRPy+ directory):
+    python -m benchmarks.bench_registries
+"""
+
+from benchmarks.bench_helpers import BSSN_RHS_lhrh_list, time_call
+import NRPy_param_funcs as par   # NRPy+: Parameter interface
+import grid as gri               # NRPy+: Functions having to do with numerical grids
+import finite_difference as fin  # NRPy+: Finite difference C code generation module
+import sympy as sp               # SymPy: The Python computer algebra package upon which NRPy+ depends
+import cProfile, pstats, timeit  # Standard Python modules for profiling and timing
+
+lookups = ["get_params_idx", "idx_from_str", "variable_type", "gfaccess", "find_gftype"]
+
+def FD_outputC_BSSN(lhrh_list, betaU):
+    return fin.FD_outputC("returnstring", lhrh_list, params="outCverbose=False,SIMD_enable=True",
+                          upwindcontrolvec=betaU)
+
+def main():
+    (lhrh_list, betaU), expr_time = time_call(BSSN_RHS_lhrh_list)
+    _Ccode, FD_time = time_call(FD_outputC_BSSN, lhrh_list, betaU)
+    print("BSSN RHSs: %.2f s constructing expressions, %.2f s in FD_outputC(); %d parameters, %d Cparameters, %d gridfunctions"
+          % (expr_time, FD_time, len(par.glb_params_list), len(par.glb_Cparams_list), len(gri.glb_gridfcs_list)))
+
+    profiler = cProfile.Profile()
+    profiler.runcall(FD_outputC_BSSN, lhrh_list, betaU)
+    stats = pstats.Stats(profiler).stats
+    print("Registry lookups in FD_outputC() (under cProfile): calls | total s | us/call on BSSN registries")
+    per_call = {"get_params_idx": lambda: par.get_params_idx(par.glb_param("ignoretype", "finite_difference", "FD_CENTDERIVS_ORDER", "")),
+                "idx_from_str":   lambda: par.idx_from_str("finite_difference::FD_CENTDERIVS_ORDER"),
+                "variable_type":  lambda: gri.variable_type(sp.Symbol("trK")),
+                "gfaccess":       lambda: gri.gfaccess("in_gfs", "trK"),
+                "find_gftype":    lambda: gri.find_gftype("trK")}
+    for lookup in lookups:
+        calls, cumtime = 0, 0.0
+        for (filename, _line, funcname), (_cc, ncalls, _tottime, cum, _callers) in stats.items():
+            if funcname == lookup and filename.endswith(("NRPy_param_funcs.py", "grid.py")):
+                calls += ncalls
+                cumtime += cum
+        print("  %-15s %7d | %6.2f | %6.2f" % (lookup, calls, cumtime, 1e6*min(timeit.repeat(per_call[lookup], number=1000, repeat=5))/1000))
+
+if __name__ == "__main__":
+    main()
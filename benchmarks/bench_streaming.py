@@ -0,0 +1,53 @@
+""" Benchmark: Streaming C Code Emission in FD_outputC()
+
+    Generates the BSSN RHS kernel twice: once returned as a string
+    (filename="returnstring"), and once streamed directly into a file
+    (filename=file handle). For each, reports the wall-clock time and
+    checks that both produce byte-identical C code. With the "memory"
+    option, the peak Python memory usage is also reported (tracemalloc
+    slows down code generation several-fold, so the times reported with
+    this option are not representative).
+
+    Usage (from the root NRPy+ directory):
+    python -m benchmarks.bench_streaming [SIMD] [memory]
+"""
+
+from benchmarks.bench_helpers import BSSN_RHS_lhrh_list, time_call
+import finite_difference as fin  # NRPy+: Finite difference C code generation module
+import sys, tempfile, tracemalloc  # Standard Python modules
+
+def main():
+    params = "outCverbose=False"
+    if "SIMD" in sys.argv[1:]:
+        params += ",SIMD_enable=True"
+    trace_memory = "memory" in sys.argv[1:]
+    lhrh_list, betaU = BSSN_RHS_lhrh_list()
+
+    results = {}
+    for mode in ["returnstring", "stream_to_file"]:
+        if trace_memory:
+            tracemalloc.start()
+        if mode == "returnstring":
+            Ccode, elapsed = time_call(fin.FD_outputC, "returnstring", lhrh_list,
+                                       params=params, upwindcontrolvec=betaU)
+        else:
+            with tempfile.TemporaryFile(mode="w+") as file:
+                _ignore, elapsed = time_call(fin.FD_outputC, file, lhrh_list,
+                                             params=params, upwindcontrolvec=betaU)
+                file.seek(0)
+                Ccode = file.read()
+        results[mode] = Ccode
+        memory_str = ""
+        if trace_memory:
+            _current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            memory_str = ", peak memory %8.2f MB" % (peak / 1024.0**2)
+        print("%-15s: %8.2f s%s, %d bytes of C code" % (mode, elapsed, memory_str, len(Ccode)))
+
+    if results["returnstring"] != results["stream_to_file"]:
+        print("Error: streamed C code differs from returned string!")
+        sys.exit(1)
+    print("Streamed and returned C code are identical.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+""" Benchmark: Cache Blocking (Loop Tiling) of the BSSN RHS Loop
+
+    Generates the BSSN RHS loop body once (with SIMD, in Spherical
+    coordinates with reference metric precomputation), wraps it in
+    loops tiled in i1 and/or i2 with the simple_loop() options
+    tile_i1=T1 and tile_i2=T2, and times each (gcc -Ofast) on one thread,
+    on a grid large enough that the stencils' i0-i1 planes of all
+    gridfunctions do not fit in L2 cache. One variant sets the tile size at
+    runtime, via an int Cparameter.
+
+    Usage (from the root NRPy+ directory):
+    python -m benchmarks.bench_tiling [FD order] [N]
+    (defaults: 8th-order finite differences, on an N^3 = 64^3 grid)
+"""
+
+from benchmarks.bench_helpers import BSSN_RHS_lhrh_list, rhs_eval_Cfunction, time_BSSN_RHS_Cfunction
+import NRPy_param_funcs as par   # NRPy+: Parameter interface
+import finite_difference as fin  # NRPy+: Finite difference C code generation module
+import io, contextlib, sys       # Standard Python modules for in-memory streams and OS-level functions
+
+def main():
+    order = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    N = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    par.set_parval_from_str("finite_difference::FD_CENTDERIVS_ORDER", order)
+    par.Cparameters("int", __name__, "tile_size_i1", 8)
+    lhrh_list, betaU = BSSN_RHS_lhrh_list()
+    body = fin.FD_outputC("returnstring", lhrh_list, params="outCverbose=False,SIMD_enable=True", upwindcontrolvec=betaU)
+
+    print("FD order %d, gcc -Ofast, %dx%dx%d grid: ns/point | RHS checksum" % (order, N, N, N))
+    for tiling in ["", "tile_i1=4", "tile_i1=8", "tile_i1=16", "tile_i2=8,tile_i1=8", "tile_i2=16",
+                   "tile_i1=tile_size_i1"]:
+        Cfunc = rhs_eval_Cfunction(body, loopopts="InteriorPoints,EnableSIMD,Enable_rfm_precompute"
+                                   + ("," + tiling if tiling else ""))
+        with contextlib.redirect_stdout(io.StringIO()):
+            _compile_time, ns_per_point, checksum = time_BSSN_RHS_Cfunction(Cfunc, Nxx=(N, N, N), REPEATS=5)
+        print("  %-20s %7.1f | %.15e" % (tiling if tiling else "untiled", ns_per_point, checksum))
+
+if __name__ == "__main__":
+    main()
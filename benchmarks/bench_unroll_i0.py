@@ -0,0 +1,34 @@
+""" Benchmark: Sharing Stencil Reads Across Consecutive Points in i0 (FD_unroll_i0)
+
+    Generates the (scalar, i.e., SIMD-disabled) BSSN RHS C function in
+    Spherical coordinates, with reference metric precomputation, computing
+    1, 2, and 4 consecutive points in i0 per loop iteration (outputC
+    parameter FD_unroll_i0, with the "unroll_i0" loop option), for 4th and
+    8th-order finite differences. For each, it counts the gridfunction
+    values read from memory per grid point, and times the compiled function
+    (gcc -Ofast) on one thread.
+
+    Usage (from the root NRPy+ directory):
+    python -m benchmarks.bench_unroll_i0 [4] [8]
+    (default: both finite-difference orders)
+"""
+
+from benchmarks.bench_helpers import BSSN_RHS_Cfunction, time_BSSN_RHS_Cfunction
+import NRPy_param_funcs as par  # NRPy+: Parameter interface
+import io, contextlib, re, sys  # Standard Python modules for in-memory streams, regular expressions, and OS-level functions
+
+def main():
+    orders = [int(arg) for arg in sys.argv[1:]] or [4, 8]
+    for order in orders:
+        par.set_parval_from_str("finite_difference::FD_CENTDERIVS_ORDER", order)
+        print("FD order %d, gcc -Ofast, 32x32x16 grid: reads/point | ns/point | RHS checksum" % order)
+        for unroll in (1, 2, 4):
+            Cfunc = BSSN_RHS_Cfunction(FD_params="outCverbose=False,FD_unroll_i0=" + str(unroll),
+                                       loopopts="InteriorPoints,Enable_rfm_precompute,unroll_i0=" + str(unroll))
+            reads = len(re.findall(r"= \w+_gfs\[IDX4\(", Cfunc))
+            with contextlib.redirect_stdout(io.StringIO()):
+                _compile_time, ns_per_point, checksum = time_BSSN_RHS_Cfunction(Cfunc, REPEATS=10)
+            print("  unroll %d: %6.1f | %7.1f | %.15e" % (unroll, reads / unroll, ns_per_point, checksum))
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,8 @@
 #                            return True if executable exists in PATH.
 # C_compile(): Compile C code using gcc.
 # Execute(): Execute generated executable file, using taskset
-#            if available. Calls Execute_input_string() to
+#            if available (or, if OMP_PROC_BIND or OMP_PLACES is set,
+#            OpenMP thread affinity instead). Calls Execute_input_string() to
 #            redirect output from stdout & stderr to desired
 #            destinations.
 # Execute_input_string(): Executes an input string and redirects
@@ -106,10 +107,12 @@ def C_compile(main_C_output_path, main_C_output_file, compile_mode="optimized",
     print("Finished compilation.")
 
 # Execute(): Execute generated executable file, using taskset
-#            if available. Calls Execute_input_string() to
+#            if available (or, if OMP_PROC_BIND or OMP_PLACES is set,
+#            OpenMP thread affinity instead). Calls Execute_input_string() to
 #            redirect output from stdout & stderr to desired
 #            destinations.
-def Execute(executable, executable_output_arguments="", file_to_redirect_stdout=os.devnull,verbose=True):
+def Execute(executable, executable_output_arguments="", file_to_redirect_stdout=os.devnull,verbose=True,
+            OMP_PROC_BIND="", OMP_PLACES=""):
     # Step 1: Delete old version of executable file
     if file_to_redirect_stdout != os.devnull:
         delete_existing_files(file_to_redirect_stdout)
@@ -124,7 +127,18 @@ def Execute(executable, executable_output_arguments="", file_to_redirect_stdout=
         execute_prefix = "cmd /c " # Run with cmd /c executable [options] on Windows
     else:
         execute_prefix = "./"      # Run with ./executable [options] on Linux & Mac
-    taskset_exists = check_executable_exists("taskset", error_if_not_found=False)
+    # If OMP_PROC_BIND and/or OMP_PLACES (e.g., "close" and "cores") are set, leave thread placement
+    #    to the OpenMP runtime via these environment variables, instead of pinning the process with taskset.
+    env = None
+    if OMP_PROC_BIND != "" or OMP_PLACES != "":
+        env = os.environ.copy()
+        if OMP_PROC_BIND != "":
+            env["OMP_PROC_BIND"] = OMP_PROC_BIND
+        if OMP_PLACES != "":
+            env["OMP_PLACES"] = OMP_PLACES
+        taskset_exists = False
+    else:
+        taskset_exists = check_executable_exists("taskset", error_if_not_found=False)
     if taskset_exists:
         execute_string += "taskset -c 0"
         if getpass.getuser() != "jovyan": # on mybinder, username is jovyan, and taskset -c 0 is the fastest option.
@@ -145,11 +159,12 @@ def Execute(executable, executable_output_arguments="", file_to_redirect_stdout=
     execute_string += execute_prefix+executable+" "+executable_output_arguments
 
     # Step 3: Execute the desired executable
-    Execute_input_string(execute_string, file_to_redirect_stdout,verbose)
+    Execute_input_string(execute_string, file_to_redirect_stdout,verbose,env)
 
 # Execute_input_string(): Executes an input string and redirects
 #            output from stdout & stderr to desired destinations.
-def Execute_input_string(input_string, file_to_redirect_stdout=os.devnull, verbose=True):
+#            If env is set, it replaces the environment of the executed process.
+def Execute_input_string(input_string, file_to_redirect_stdout=os.devnull, verbose=True, env=None):
 
     if verbose:
         print("(EXEC): Executing `"+input_string+"`...")
@@ -163,7 +178,7 @@ def Execute_input_string(input_string, file_to_redirect_stdout=os.devnull, verbo
     # https://stackoverflow.com/questions/18421757/live-output-from-subprocess-command
     filename = "tmp.txt"
     with io.open(filename, 'w') as writer, io.open(filename, 'rb', buffering=-1) as reader, io.open(file_to_redirect_stdout, 'wb') as rdirect:
-        process = subprocess.Popen(args, stdout=rdirect, stderr=writer)
+        process = subprocess.Popen(args, stdout=rdirect, stderr=writer, env=env)
         while process.poll() is None:
             # https://stackoverflow.com/questions/21689365/python-3-typeerror-must-be-str-not-bytes-with-sys-stdout-write/21689447
             sys.stdout.write(reader.read().decode('utf-8'))
@@ -0,0 +1,209 @@
+""" Code Generation Stage Profiler for outputC() and FD_outputC()
+
+    The following module times each stage of NRPy+ C code generation
+    (e.g., CSE preprocessing, SymPy's CSE, C code printing, SIMD
+    conversion, finite difference stencil construction), and records for
+    each stage the number of calls, the wall-clock time, the number of
+    nodes in the input expression trees, and the peak resident set size
+    (RSS) of the process.
+
+    Stage statistics accumulate until add_to_Cfunction_dict() is called,
+    at which point they are attributed to that C function. This matches the
+    usual workflow, in which the body of a C function is generated (e.g.,
+    by FD_outputC()) right before being registered in outC_function_dict.
+    Profiled stages do not overlap, so their times may be summed; the
+    remainder of the code generation time is spent in unprofiled bookkeeping
+    (and in the construction of the SymPy expressions themselves).
+
+    Profiling is disabled by default; enable it with e.g.,
+    par.set_parval_from_str("codegen_profiler::enable", True)
+    and then output the report with report_table() or report_json().
+"""
+
+import NRPy_param_funcs as par  # NRPy+: parameter interface
+import sympy as sp              # SymPy: The Python computer algebra package upon which NRPy+ depends
+import json, sys, time          # Standard Python modules for serialization, OS-level functions, and timing
+from collections import OrderedDict  # Standard Python: dictionary that remembers insertion order
+try:
+    import resource             # Standard Python (Unix only): process resource usage, for peak RSS
+except ImportError:
+    resource = None
+
+thismodule = __name__
+par.initialize_param(par.glb_param("bool", thismodule, "enable", False))
+
+# Stage statistics not yet attributed to a C function, and the
+#   report: a dictionary mapping C function names to their stage statistics.
+unassigned_name = "(not in outC_function_dict)"
+pending_stats = OrderedDict()
+report_dict = OrderedDict()
+
+def profiling_enabled():
+    return par.parval_from_str(thismodule + "::enable")
+
+def peak_RSS_MB():
+    """ Return the peak resident set size of this process in MB, or -1 if unavailable. """
+    if resource is None:
+        return -1.0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    if sys.platform == "darwin":
+        return maxrss / 1024.0**2
+    return maxrss / 1024.0
+
+def expr_node_count(exprs):
+    """ Count the nodes in a list of SymPy expression trees, where
+        shared subexpressions are counted each time they appear.
+
+        >>> from sympy.abc import x, y
+        >>> expr_node_count([x*y + sp.sin(x*y), x])
+        9
+    """
+    if not isinstance(exprs, (list, tuple)):
+        exprs = [exprs]
+    memo = {}
+    total = 0
+    for expr in exprs:
+        # Iterative postorder traversal, memoized on id(): each unique
+        #   subexpression is visited only once.
+        stack = [(expr, False)]
+        while stack:
+            subexpr, children_done = stack.pop()
+            if id(subexpr) in memo:
+                continue
+            args = subexpr.args if isinstance(subexpr, sp.Basic) else ()
+            if not args:
+                memo[id(subexpr)] = 1
+            elif children_done:
+                memo[id(subexpr)] = 1 + sum(memo[id(arg)] for arg in args)
+            else:
+                stack.append((subexpr, True))
+                for arg in args:
+                    stack.append((arg, False))
+        total += memo[id(expr)]
+    return total
+
+class ProfiledStage:
+    """ Context manager that profiles one code generation stage. """
+    def __init__(self, name, exprs=None):
+        self.name = name
+        self.nodes = expr_node_count(exprs) if exprs is not None else 0
+        self.start_time = None
+        self.start_RSS = None
+
+    def __enter__(self):
+        self.start_RSS = peak_RSS_MB()
+        self.start_time = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.time() - self.start_time
+        end_RSS = peak_RSS_MB()
+        if self.name not in pending_stats:
+            pending_stats[self.name] = OrderedDict([("calls", 0), ("time_s", 0.0), ("nodes", 0),
+                                                    ("peak_RSS_MB", 0.0), ("RSS_growth_MB", 0.0)])
+        stats = pending_stats[self.name]
+        stats["calls"] += 1
+        stats["time_s"] += elapsed
+        stats["nodes"] += self.nodes
+        stats["peak_RSS_MB"] = max(stats["peak_RSS_MB"], end_RSS)
+        stats["RSS_growth_MB"] += end_RSS - self.start_RSS
+        return False
+
+class NullStage:
+    """ No-op context manager, used when profiling is disabled. """
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+null_stage = NullStage()
+
+def stage(name, exprs=None):
+    """ Return a context manager that profiles the enclosed code as stage "name".
+        If exprs (a SymPy expression or list thereof) is given, its node count
+        is recorded as well. When profiling is disabled, this is a no-op.
+
+        >>> par.set_parval_from_str(thismodule + "::enable", True)
+        >>> reset()
+        >>> from sympy.abc import x, y
+        >>> with stage("sympy_cse", [x*y + x]):
+        ...     _ = sp.cse([x*y + x])
+        >>> assign_to_Cfunction("myfunc")
+        >>> stats = report()["myfunc"]["sympy_cse"]
+        >>> stats["calls"], stats["nodes"]
+        (1, 5)
+        >>> par.set_parval_from_str(thismodule + "::enable", False)
+    """
+    if not profiling_enabled():
+        return null_stage
+    return ProfiledStage(name, exprs)
+
+def assign_to_Cfunction(name):
+    """ Attribute all stage statistics recorded since the last call to the C function name. """
+    if not pending_stats:
+        return
+    merge_stats(report_dict.setdefault(name, OrderedDict()), pending_stats)
+    pending_stats.clear()
+
+def merge_stats(dest, src):
+    for stagename, stats in src.items():
+        if stagename not in dest:
+            dest[stagename] = OrderedDict(stats)
+            continue
+        for key, value in stats.items():
+            if key == "peak_RSS_MB":
+                dest[stagename][key] = max(dest[stagename][key], value)
+            else:
+                dest[stagename][key] += value
+
+def report():
+    """ Return the report: a dictionary mapping each C function name to a dictionary
+        of its stage statistics. Statistics not (yet) attributed to a C function
+        appear under the name "(not in outC_function_dict)". """
+    full_report = OrderedDict((name, OrderedDict((k, OrderedDict(v)) for k, v in stages.items()))
+                              for name, stages in report_dict.items())
+    if pending_stats:
+        merge_stats(full_report.setdefault(unassigned_name, OrderedDict()), pending_stats)
+    return full_report
+
+def report_json(filename=None):
+    """ Return the report as a JSON string; if filename is given, also write it to that file. """
+    json_str = json.dumps(report(), indent=2)
+    if filename is not None:
+        with open(filename, "w") as file:
+            file.write(json_str + "\n")
+    return json_str
+
+def report_table():
+    """ Return the report as a human-readable table, listing for each C function
+        its stages in order of decreasing time.
+
+        >>> reset()
+        >>> pending_stats["ccode"] = OrderedDict([("calls", 2), ("time_s", 0.5), ("nodes", 10),
+        ...                                       ("peak_RSS_MB", 100.0), ("RSS_growth_MB", 0.0)])
+        >>> assign_to_Cfunction("rhs_eval")
+        >>> print(report_table())
+        C function / stage                 calls   time [s]      nodes  peak RSS [MB]  RSS growth [MB]
+        rhs_eval
+          ccode                                2      0.500         10          100.0              0.0
+    """
+    header = "%-32s %7s %10s %10s %14s %16s" % ("C function / stage", "calls", "time [s]", "nodes",
+                                                "peak RSS [MB]", "RSS growth [MB]")
+    lines = [header]
+    for name, stages in report().items():
+        lines.append(name)
+        for stagename, stats in sorted(stages.items(), key=lambda item: -item[1]["time_s"]):
+            lines.append("  %-30s %7d %10.3f %10d %14.1f %16.1f"
+                         % (stagename, stats["calls"], stats["time_s"], stats["nodes"],
+                            stats["peak_RSS_MB"], stats["RSS_growth_MB"]))
+    return "\n".join(lines)
+
+def reset():
+    """ Discard all profiling statistics. """
+    pending_stats.clear()
+    report_dict.clear()
+
+if __name__ == "__main__":
+    import doctest
+    sys.exit(doctest.testmod()[0])
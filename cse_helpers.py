@@ -11,7 +11,9 @@
 from expr_tree import ExprTree  # NRPy+: Contains expression tree data structure class definitions and manipulation functions
 import sympy as sp              # SymPy: The Python computer algebra package upon which NRPy+ depends
 import sys                      # Standard Python module for multiplatform OS-level functions
+import multiprocessing, heapq   # Standard Python modules for process-based parallelism and priority queues
 from collections import OrderedDict
+from itertools import chain
 
 def cse_preprocess(expr_list, prefix='', declare=False, factor=True, negative=False, debug=False):
     """ Perform CSE Preprocessing
@@ -59,7 +61,7 @@ def cse_preprocess(expr_list, prefix='', declare=False, factor=True, negative=Fa
     _NegativeOne_ = sp.Symbol(prefix + '_NegativeOne_')
     map_sym_to_rat, map_rat_to_sym = OrderedDict(), OrderedDict()
     for i, expr in enumerate(expr_list):
-        tree = ExprTree(expr)
+        tree = ExprTree(expr, shared=True)
         # Search through expression tree for rational(s)
         for subtree in tree.preorder():
             subexpr = subtree.expr
@@ -88,19 +90,16 @@ def cse_preprocess(expr_list, prefix='', declare=False, factor=True, negative=Fa
         expr = tree.reconstruct()
         # If factor == True, then perform partial factoring (excluding _NegativeOne_)
         if factor == True:
+            var_list = [var for var in map_sym_to_rat if var != _NegativeOne_]
             # Handle the separate case of function argument(s)
             for subtree in tree.preorder():
                 if isinstance(subtree.expr, sp.Function):
                     arg = subtree.children[0]
-                    for var in map_sym_to_rat:
-                        if var != _NegativeOne_:
-                            arg.expr = sp.collect(arg.expr, var)
+                    arg.expr = collect_symbols(arg.expr, var_list)
                     tree.build(arg)
             expr = tree.reconstruct()
             # Perform partial factoring on expression(s)
-            for var in map_sym_to_rat:
-                if var != _NegativeOne_:
-                    expr = sp.collect(expr, var)
+            expr = collect_symbols(expr, var_list)
             tree.root.expr = expr
             tree.build(tree.root)
         # If negative == True, then perform partial factoring on _NegativeOne_
@@ -108,9 +107,9 @@ def cse_preprocess(expr_list, prefix='', declare=False, factor=True, negative=Fa
             for subtree in tree.preorder():
                 if isinstance(subtree.expr, sp.Function):
                     arg = subtree.children[0]
-                    arg.expr = sp.collect(arg.expr, _NegativeOne_)
+                    arg.expr = collect_symbols(arg.expr, [_NegativeOne_])
                     tree.build(arg)
-            expr = sp.collect(tree.reconstruct(), _NegativeOne_)
+            expr = collect_symbols(tree.reconstruct(), [_NegativeOne_])
             tree.root.expr = expr
             tree.build(tree.root)
         # If declare == True, then simplify (-1)^n
@@ -158,6 +157,90 @@ def cse_preprocess(expr_list, prefix='', declare=False, factor=True, negative=Fa
         expr_list = expr_list[0]
     return expr_list, map_sym_to_rat
 
+def collect_symbols(expr, symbols):
+    """ Collect Symbols (Batched Partial Factorization)
+
+        Equivalent to applying sp.collect(expr, symbol) to expr for each symbol
+        in the given order, except that every sum in the expression is visited
+        only once: the terms of a sum are grouped by the first symbol (in order)
+        that is a common factor of two or more terms, and the sum of each group's
+        cofactors is then grouped by the remaining symbols. As with sp.collect,
+        sums inside function arguments are not factored.
+
+        :arg:    SymPy expression
+        :arg:    ordered list of symbols to collect
+        :return: partially factored SymPy expression
+
+        >>> from sympy.abc import a, b, c, x, y, z
+        >>> from sympy import collect, cos
+        >>> expr = a*b*x + a*b*y + a*z + b*z + c*cos(a*x + a*y)
+        >>> collect_symbols(expr, [a, b])
+        a*(b*(x + y) + z) + b*z + c*cos(a*x + a*y)
+        >>> collect(collect(expr, a), b)
+        a*(b*(x + y) + z) + b*z + c*cos(a*x + a*y)
+
+        >>> collect_symbols(a**2*x + a**2*y - a*z - a, [a])
+        a**2*(x + y) + a*(-z - 1)
+    """
+    rank = {symbol: i for i, symbol in enumerate(symbols)}
+
+    def factors(term):
+        # Return {symbol: exponent} for each symbol that is a (numeric) power factor of term
+        found = {}
+        for factor in sp.Mul.make_args(term):
+            base, exponent = factor.as_base_exp() if factor.is_Pow else (factor, sp.S.One)
+            if base in rank and exponent.is_Number:
+                found[base] = exponent
+        return found
+
+    def group(terms, start):
+        # Group the terms of a sum by the symbols of rank >= start, in order of rank
+        terms = [sp.expand_power_base(term, deep=False) for term in terms]
+        index, queue = {}, []
+        def add_term(i, start):
+            for symbol, exponent in factors(terms[i]).items():
+                if rank[symbol] >= start:
+                    if symbol not in index:
+                        index[symbol] = []
+                        heapq.heappush(queue, rank[symbol])
+                    index[symbol].append((i, exponent))
+        for i in range(len(terms)):
+            add_term(i, start)
+        free = [True]*len(terms)
+        while queue:
+            symbol = symbols[heapq.heappop(queue)]
+            groups = OrderedDict()
+            for i, exponent in index.pop(symbol):
+                if free[i]:
+                    groups.setdefault(exponent, []).append(i)
+            for exponent, members in groups.items():
+                # Terms with a factor that appears only once remain unchanged
+                if len(members) < 2: continue
+                key = symbol**exponent
+                cofactors = [sp.expand_power_base(terms[i]/key, deep=False) for i in members]
+                for i in members: free[i] = False
+                # The sum of cofactors is then grouped by the remaining symbols
+                grouped = sp.Add(*cofactors)
+                grouped = sp.expand_power_base(key, deep=False)*group(sp.Add.make_args(grouped), rank[symbol] + 1)
+                terms.append(grouped); free.append(True)
+                add_term(len(terms) - 1, rank[symbol] + 1)
+        return sp.Add(*[term for i, term in enumerate(terms) if free[i]])
+
+    cache = {}
+    def collect(expr):
+        try: return cache[expr]
+        except KeyError: pass
+        if expr.is_Add:
+            result = group(sp.Add.make_args(sp.Add(*[collect(arg) for arg in expr.args])), 0)
+        elif expr.is_Mul:
+            result = sp.Mul(*[collect(arg) for arg in expr.args])
+        elif expr.is_Pow:
+            result = sp.Pow(collect(expr.base), expr.exp)
+        else: result = expr
+        cache[expr] = result
+        return result
+    return collect(expr)
+
 def cse_postprocess(cse_output):
     """ Perform CSE Postprocessing
 
@@ -205,52 +288,912 @@ def cse_postprocess(cse_output):
         ([], [_NegativeOne_*x + exp(_NegativeOne_*x) + log(_NegativeOne_*x)])
     """
     replaced, reduced = cse_output
-    replaced, reduced = replaced[:], reduced[:]
-    i = 0
-    while i < len(replaced):
-        sym, expr = replaced[i]; args = expr.args
+    # Expression k is replaced[k][1] for k < len(replaced), and reduced[k - len(replaced)] otherwise.
+    #   For each expression, count the occurrences of each symbol (by name, in a preorder traversal),
+    #   and index the expressions in which each symbol occurs, so that the occurrences of a symbol
+    #   can be looked up, and the symbol back-substituted, without rescanning all expressions.
+    syms = [sym for sym, _ in replaced]
+    exprs = [expr for _, expr in replaced] + list(reduced)
+    occurrences = [symbol_occurrences(expr) for expr in exprs]
+    total_occurrences, users = {}, {}
+    for k, counts in enumerate(occurrences):
+        for name, count in counts.items():
+            total_occurrences[name] = total_occurrences.get(name, 0) + count
+            users.setdefault(name, set()).add(k)
+
+    def update_occurrences(k, counts):
+        for name, count in occurrences[k].items():
+            total_occurrences[name] -= count
+            users[name].discard(k)
+        for name, count in counts.items():
+            total_occurrences[name] = total_occurrences.get(name, 0) + count
+            users.setdefault(name, set()).add(k)
+        occurrences[k] = counts
+
+    def back_substitute(i):
+        # Substitute replaced[i] into every later expression in which it occurs, then remove it
+        sym, expr = syms[i], exprs[i]
+        for k in sorted(users.get(str(sym), ())):
+            if k > i:
+                new_expr = exprs[k].xreplace({sym: expr})
+                if new_expr is not exprs[k]:
+                    exprs[k] = new_expr
+                    update_occurrences(k, symbol_occurrences(new_expr))
+        update_occurrences(i, {})
+        removed[i] = True
+
+    removed = [False]*len(replaced)
+    skip_next, kept = False, 0
+    for i in range(len(replaced)):
+        if skip_next:
+            # (Preserves the behavior of the original implementation, which skipped the entry
+            #  following a negative symbol that was removed from the front of the list.)
+            skip_next = False
+            kept += 1
+            continue
+        sym, expr = syms[i], exprs[i]; args = expr.args
         # Search through replaced expressions for negative symbols
         if (expr.func == sp.Mul and len(expr.args) == 2 and any(a1.func == sp.Symbol and \
                (a2 == sp.S.NegativeOne or '_NegativeOne_' in str(a2)) for a1, a2 in [args, reversed(args)])):
-            for k in range(i + 1, len(replaced)):
-                if sym in replaced[k][1].free_symbols:
-                    replaced[k] = (replaced[k][0], replaced[k][1].subs(sym, expr))
-            for k in range(len(reduced)):
-                if sym in reduced[k].free_symbols:
-                    reduced[k] = reduced[k].subs(sym, expr)
-            # Remove the replaced expression from the list
-            replaced.pop(i)
-            if i != 0: i -= 1
+            skip_next = kept == 0
+            back_substitute(i)
+            continue
         # Search through replaced expressions for addition/product of 2 or less symbols
         if ((expr.func == sp.Add or expr.func == sp.Mul) and 0 < len(expr.args) < 3 and \
                 all((arg.func == sp.Symbol or arg.is_integer or arg.is_rational) for arg in expr.args)) or \
                 (expr.func == sp.Pow and expr.args[0].func == sp.Symbol and expr.args[1] == 2):
-            sym_count = 0 # Count the number of occurrences of the substituted symbol
-            for k in range(len(replaced) - i):
-                # Check if the substituted symbol appears in the replaced expressions
-                if sym in replaced[i + k][1].free_symbols:
-                    for arg in sp.preorder_traversal(replaced[i + k][1]):
-                        if arg.func == sp.Symbol and str(arg) == str(sym):
-                            sym_count += 1
-            for k in range(len(reduced)):
-                # Check if the substituted symbol appears in the reduced expression
-                if sym in reduced[k].free_symbols:
-                    for arg in sp.preorder_traversal(reduced[k]):
-                        if arg.func == sp.Symbol and str(arg) == str(sym):
-                            sym_count += 1
             # If the number of occurrences of the substituted symbol is 2 or less, back-substitute
-            if 0 < sym_count < 3:
-                for k in range(i + 1, len(replaced)):
-                    if sym in replaced[k][1].free_symbols:
-                        replaced[k] = (replaced[k][0], replaced[k][1].subs(sym, expr))
-                for k in range(len(reduced)):
-                    if sym in reduced[k].free_symbols:
-                        reduced[k] = reduced[k].subs(sym, expr)
-                # Remove the replaced expression from the list
-                replaced.pop(i); i -= 1
-        i += 1
+            if 0 < total_occurrences.get(str(sym), 0) < 3:
+                back_substitute(i)
+                continue
+        kept += 1
+    return [(syms[k], exprs[k]) for k in range(len(syms)) if not removed[k]], exprs[len(syms):]
+
+def symbol_occurrences(expr):
+    """ Count the occurrences of each symbol (by name) in a preorder traversal of expr
+
+        >>> from sympy.abc import x, y
+        >>> sorted(symbol_occurrences(x*y + (x + 1)**2).items())
+        [('x', 2), ('y', 1)]
+    """
+    counts = {}
+    stack = [expr]
+    while stack:
+        subexpr = stack.pop()
+        if subexpr.func == sp.Symbol:
+            counts[str(subexpr)] = counts.get(str(subexpr), 0) + 1
+        else:
+            stack.extend(subexpr.args)
+    return counts
+
+def subexpression_dict(expr):
+    """ Collect the Unique Non-Atomic Subexpressions of an Expression
+
+        :arg:    SymPy expression
+        :return: dictionary with the unique non-atomic subexpressions as keys (values unused),
+                    in postorder, i.e. each subexpression appears after its own subexpressions
+
+        Each shared subtree is visited only once, and the (insertion) order is
+        independent of hash randomization, since SymPy stores args canonically.
+
+        >>> from sympy.abc import x, y
+        >>> from sympy import cos
+        >>> list(subexpression_dict(cos(x + y)**2 + cos(x + y)))
+        [x + y, cos(x + y), cos(x + y)**2, cos(x + y)**2 + cos(x + y)]
+    """
+    subexpr_dict = OrderedDict()
+    stack = [(expr, False)]
+    while stack:
+        subexpr, children_done = stack.pop()
+        if subexpr.is_Atom or subexpr in subexpr_dict:
+            continue
+        if children_done:
+            subexpr_dict[subexpr] = None
+        else:
+            stack.append((subexpr, True))
+            stack.extend((arg, False) for arg in reversed(subexpr.args))
+    return subexpr_dict
+
+def cse_partition(expr_list, nclusters, features=None):
+    """ Partition a List of Expressions into Clusters for CSE
+
+        :arg:    list of SymPy expressions
+        :arg:    (maximum) number of clusters
+        :arg:    list of subexpression_dict() for each expression (computed if not provided)
+        :return: list of clusters, each a sorted list of indices into expr_list,
+                    such that expressions sharing many subexpressions share a cluster
+
+        Expressions are assigned greedily, largest first, to the cluster with
+        which they share the most (non-atomic) subexpressions, subject to a
+        load-balancing bound on the total size of each cluster.
+
+        >>> from sympy.abc import x, y, z
+        >>> from sympy import cos, sin
+        >>> expr_list = [cos(x + y) + x, sin(z**3) + z, cos(x + y)*y, sin(z**3)*z]
+        >>> cse_partition(expr_list, 2)
+        [[0, 2], [1, 3]]
+    """
+    if features is None:
+        features = [subexpression_dict(expr) for expr in expr_list]
+    sizes = [len(feature) + 1 for feature in features]
+    nclusters = max(1, min(nclusters, len(expr_list)))
+    capacity = 1.1 * sum(sizes) / nclusters
+    cluster_features = [set() for _ in range(nclusters)]
+    cluster_loads = [0]*nclusters
+    clusters = [[] for _ in range(nclusters)]
+    # Sort by decreasing size; ties are broken by index, keeping the partition deterministic
+    for i in sorted(range(len(expr_list)), key=lambda i: (-sizes[i], i)):
+        candidates = [k for k in range(nclusters) if cluster_loads[k] + sizes[i] <= capacity or not clusters[k]]
+        if not candidates:
+            candidates = [min(range(nclusters), key=lambda k: cluster_loads[k])]
+        k = max(candidates, key=lambda k: (len(cluster_features[k].intersection(features[i])), -cluster_loads[k], -k))
+        clusters[k].append(i)
+        cluster_features[k].update(features[i])
+        cluster_loads[k] += sizes[i]
+    return [sorted(cluster) for cluster in clusters if cluster]
+
+def cse_cluster_worker(args):
+    """ Perform SymPy CSE on a single cluster (executed within a worker process) """
+    label, expr_list, order = args
+    symbols = sp.numbered_symbols('_cse_' + label + '_')
+    return label, sp.cse(expr_list, symbols, order=order)
+
+def cse_parallel(expr_list, symbols=None, order='canonical', workers=None, ordering='deterministic'):
+    """ Perform CSE in Parallel over Clusters of Expressions
+
+        :arg:    list of SymPy expressions
+        :arg:    iterator of symbols for the CSE temporaries (default: x0, x1, ...)
+        :arg:    SymPy CSE ordering ('canonical' or 'none')
+        :arg:    number of worker processes (default: number of CPUs)
+        :arg:    'deterministic' to merge cluster results in cluster order, or
+                    'fastest' to merge them as soon as each worker finishes
+                    (numbering of the CSE temporaries may then vary between runs)
+        :return: output in the same (replaced, reduced) format as SymPy CSE
+
+        The expressions are partitioned using cse_partition(). Subexpressions
+        that appear in more than one cluster are replaced by placeholder symbols
+        and form a separate "shared" cluster. CSE is applied to every cluster
+        in a process pool, and the results are merged: temporaries from different
+        clusters with identical expressions are deduplicated, and all temporaries
+        are renumbered (in dependency order) using symbols.
+
+        >>> from sympy.abc import x, y, z
+        >>> from sympy import cos, sin
+        >>> expr_list = [cos(x + y) + x, sin(z**3) + z, cos(x + y)*y, sin(z**3)*z]
+        >>> cse_parallel(expr_list, workers=1)
+        ([(x0, cos(x + y)), (x1, sin(z**3))], [x + x0, x1 + z, x0*y, x1*z])
+        >>> cse_parallel(expr_list, workers=2)
+        ([(x0, cos(x + y)), (x1, sin(z**3))], [x + x0, x1 + z, x0*y, x1*z])
+
+        >>> expr_list = [cos(x + y) + x, sin(z**3) + z, cos(x + y)*y, sin(z**3)*cos(x + y)]
+        >>> cse_parallel(expr_list, workers=2)
+        ([(x0, cos(x + y)), (x1, sin(z**3))], [x + x0, x1 + z, x0*y, x0*x1])
+
+        Note: a subexpression that is not an exact subtree of expressions in several
+        clusters (e.g., a + b within a + b + c and a + b + d) is not eliminated across
+        clusters, so the result may contain more operations than serial CSE.
+    """
+    if symbols is None:
+        symbols = sp.numbered_symbols()
+    if workers is None or workers < 1:
+        workers = multiprocessing.cpu_count()
+    if workers == 1 or len(expr_list) < 2:
+        return sp.cse(expr_list, symbols, order=order)
+    features = [subexpression_dict(expr) for expr in expr_list]
+    clusters = cse_partition(expr_list, workers, features)
+    # Find subexpressions that appear in more than one cluster (in postorder), and
+    #   replace each with a placeholder symbol (xreplace replaces outermost matches first)
+    owner = OrderedDict()
+    for k, cluster in enumerate(clusters):
+        for i in cluster:
+            for subexpr in features[i]:
+                if owner.setdefault(subexpr, k) != k:
+                    owner[subexpr] = -1
+    shared = [subexpr for subexpr in owner if owner[subexpr] == -1]
+    map_shared_to_sym = OrderedDict((subexpr, sp.Symbol('_cse_placeholder_' + str(j))) for j, subexpr in enumerate(shared))
+    cluster_exprs = [[expr_list[i].xreplace(map_shared_to_sym) for i in cluster] for cluster in clusters]
+    shared_defs = OrderedDict((map_shared_to_sym[subexpr], subexpr.func(*[arg.xreplace(map_shared_to_sym) for arg in subexpr.args]))
+                              for subexpr in shared)
+    # A shared subexpression may appear in several clusters only as part of a larger shared
+    #   subexpression; if so, substitute it back into its single user (outermost first).
+    use_count = dict.fromkeys(shared_defs, 0)
+    for expr in chain(chain(*cluster_exprs), shared_defs.values()):
+        for sym in expr.free_symbols:
+            if sym in use_count:
+                use_count[sym] += 1
+    for sym in reversed(list(shared_defs)):
+        if use_count[sym] == 1:
+            user = next(user for user in reversed(list(shared_defs)) if user != sym and sym in shared_defs[user].free_symbols)
+            shared_defs[user] = shared_defs[user].xreplace({sym: shared_defs[sym]})
+            del shared_defs[sym]
+    tasks = [('cluster' + str(k), exprs, order) for k, exprs in enumerate(cluster_exprs)]
+    if shared_defs:
+        tasks.insert(0, ('shared', list(shared_defs.values()), order))
+    pool = multiprocessing.Pool(min(workers, len(tasks)))
+    try:
+        if ordering == 'fastest':
+            results = dict(pool.imap_unordered(cse_cluster_worker, tasks))
+            labels = [label for label in results]
+        else:
+            results = dict(pool.map(cse_cluster_worker, tasks))
+            labels = [task[0] for task in tasks]
+    finally:
+        pool.terminate()
+        pool.join()
+    # Collect all definitions: the shared cluster's temporaries and placeholders first,
+    #   sorted topologically, then each cluster's temporaries (which are already ordered)
+    definitions = []
+    if shared_defs:
+        shared_replaced, shared_reduced = results['shared']
+        definitions = topological_sort(list(shared_replaced) + list(zip(shared_defs, shared_reduced)))
+    for label in labels:
+        if label != 'shared':
+            definitions.extend(results[label][0])
+    # Merge, deduplicating and renumbering the temporaries
+    replaced, rename, map_expr_to_sym = [], {}, {}
+    for sym, expr in definitions:
+        expr = expr.xreplace(rename)
+        try: rename[sym] = map_expr_to_sym[expr]
+        except KeyError:
+            rename[sym] = map_expr_to_sym[expr] = next(symbols)
+            replaced.append((rename[sym], expr))
+    reduced = [None]*len(expr_list)
+    for k, cluster in enumerate(clusters):
+        for i, expr in zip(cluster, results['cluster' + str(k)][1]):
+            reduced[i] = expr.xreplace(rename)
+    return replaced, reduced
+
+def cse_dag(expr_list, symbols=None, order='canonical'):
+    """ Perform CSE by Global Value Numbering over a Hash-Consed Expression DAG
+
+        :arg:    list of SymPy expressions
+        :arg:    iterator of symbols for the CSE temporaries (default: x0, x1, ...)
+        :arg:    SymPy CSE ordering (accepted for compatibility with SymPy CSE; the
+                    canonical order of SymPy's args is always used)
+        :return: output in the same (replaced, reduced) format as SymPy CSE
+
+        Every unique subexpression is assigned a value number, hashed on its
+        type and the value numbers of its arguments (sorted, for the commutative
+        Add and Mul), so structurally identical subexpressions share a single
+        DAG node no matter how many times they appear. Next, pairs of arguments
+        common to two or more Adds (or Muls) are repeatedly factored out into
+        new nodes, most frequent pair first (e.g., x*y*z and 2*x*y share x*y).
+        Finally, a temporary is introduced for each non-atomic node used more
+        than once. Time and memory scale (nearly) linearly with the size of the
+        DAG, whereas SymPy CSE becomes super-linear on large inputs.
+
+        >>> from sympy.abc import x, y, z
+        >>> from sympy import cos, sin
+        >>> cse_dag([x*y + cos(x*y), sin(x*y)*(x + 1)**2, y*(x + 1)**2])
+        ([(x0, x*y), (x1, (x + 1)**2)], [x0 + cos(x0), x1*sin(x0), x1*y])
+        >>> cse_dag([x*y*z + 1, 2*x*y + cos(z)])
+        ([(x0, x*y)], [x0*z + 1, 2*x0 + cos(z)])
+    """
+    if not isinstance(expr_list, (list, tuple)):
+        expr_list = [expr_list]
+
+    # Step 1: Hash-cons the expressions into a DAG, assigning each unique subexpression
+    #         a value number. Node n is either an atom (node_args[n] is None) or
+    #         node_func[n] applied to the nodes node_args[n].
+    value_number = {}       # id(expr) -> value number
+    value_table = {}        # (func, argument value numbers) or atom -> value number
+    node_func, node_args, node_expr = [], [], []
+    def add_node(key, func, args, expr):
+        """ Return the value number of the node with the given key, adding the node if new """
+        try:
+            return value_table[key]
+        except KeyError:
+            value_table[key] = len(node_expr)
+            node_func.append(func)
+            node_args.append(args)
+            node_expr.append(expr)
+            return value_table[key]
+    def hash_cons(expr):
+        """ Return the value number of expr, adding the nodes of its DAG as needed """
+        stack = [(expr, False)]
+        while stack:
+            subexpr, children_done = stack.pop()
+            if id(subexpr) in value_number:
+                continue
+            args = subexpr.args if isinstance(subexpr, sp.Basic) else ()
+            if args and not children_done:
+                stack.append((subexpr, True))
+                stack.extend((arg, False) for arg in args)
+                continue
+            if not args:
+                value_number[id(subexpr)] = add_node(subexpr, None, None, subexpr)
+            elif subexpr.func == sp.Pow and subexpr.exp.is_Number and subexpr.exp.is_negative \
+                    and subexpr.exp != -1:
+                # As in SymPy CSE, x**(-n) is treated as 1/x**n, so that it may share x**n
+                exp = -subexpr.exp
+                exp_number = add_node(exp, None, None, exp)
+                inverse_number = add_node(sp.S.NegativeOne, None, None, sp.S.NegativeOne)
+                base_number = value_number[id(subexpr.base)]
+                power_number = add_node((sp.Pow, (base_number, exp_number)), sp.Pow,
+                                        [base_number, exp_number], None)
+                value_number[id(subexpr)] = add_node((sp.Pow, (power_number, inverse_number)), sp.Pow,
+                                                     [power_number, inverse_number], subexpr)
+            elif subexpr.func == sp.Add and subexpr.could_extract_minus_sign():
+                # As in SymPy CSE, an Add such as -x + y is treated as -(x - y), so that it may share x - y
+                negative_number = hash_cons(-subexpr)
+                inverse_number = add_node(sp.S.NegativeOne, None, None, sp.S.NegativeOne)
+                value_number[id(subexpr)] = add_node((sp.Mul, tuple(sorted((inverse_number, negative_number)))),
+                                                     sp.Mul, sorted([inverse_number, negative_number]), subexpr)
+            else:
+                arg_numbers = tuple(value_number[id(arg)] for arg in args)
+                if subexpr.func in (sp.Add, sp.Mul) and subexpr.is_commutative:
+                    arg_numbers = tuple(sorted(arg_numbers))
+                value_number[id(subexpr)] = add_node((subexpr.func, arg_numbers), subexpr.func,
+                                                     list(arg_numbers), subexpr)
+        return value_number[id(expr)]
+    roots = [hash_cons(expr) for expr in expr_list]
+
+    # Step 2: Factor out pairs of arguments common to two or more commutative
+    #         Add (or Mul) nodes, most frequent pair first. Pairs are keyed by
+    #         (0 for Add or 1 for Mul, arg, arg), and their counts are kept in a heap,
+    #         updated lazily: stale entries are skipped when popped.
+    commutative_funcs = [sp.Add, sp.Mul]
+    modified, alias = set(), {}
+    argsets, containing = {}, {}  # node -> set of args; (0 or 1, arg) -> set of nodes
+    pair_count = {}
+    for n, func in enumerate(node_func):
+        if func in commutative_funcs and node_expr[n].is_commutative:
+            f = commutative_funcs.index(func)
+            argsets[n] = set(node_args[n])
+            for arg in node_args[n]:
+                containing.setdefault((f, arg), set()).add(n)
+            for i, a in enumerate(node_args[n]):
+                for b in node_args[n][i + 1:]:
+                    pair_count[(f, a, b)] = pair_count.get((f, a, b), 0) + 1
+    def update_pair(f, a, b, change):
+        key = (f, a, b) if a < b else (f, b, a)
+        pair_count[key] = pair_count.get(key, 0) + change
+        if change > 0 and pair_count[key] > 1:
+            heapq.heappush(heap, (-pair_count[key], key))
+    heap = [(-count, key) for key, count in pair_count.items() if count > 1]
+    heapq.heapify(heap)
+    while heap:
+        neg_count, key = heapq.heappop(heap)
+        if pair_count.get(key, 0) != -neg_count:
+            continue  # stale entry
+        f, a, b = key
+        nodes = sorted(containing[(f, a)] & containing[(f, b)])
+        # The node func(a, b): an existing node if possible, otherwise a new one
+        pair_key = (commutative_funcs[f], (a, b))
+        if pair_key not in value_table:
+            exact = [n for n in nodes if len(argsets[n]) == 2]
+            if exact:
+                value_table[pair_key] = exact[0]
+            else:
+                value_table[pair_key] = len(node_expr)
+                node_func.append(commutative_funcs[f])
+                node_args.append([a, b])
+                node_expr.append(None)
+                argsets[value_table[pair_key]] = set([a, b])
+        new = value_table[pair_key]
+        for n in nodes:
+            if len(argsets[n]) == 2:
+                # n is func(a, b) itself; if it duplicates node new, redirect its uses there
+                if n != new:
+                    alias[n] = new
+                continue
+            argsets[n] -= set([a, b])
+            for c in argsets[n]:
+                update_pair(f, a, c, -1)
+                update_pair(f, b, c, -1)
+                update_pair(f, new, c, +1)
+            update_pair(f, a, b, -1)
+            argsets[n].add(new)
+            containing[(f, a)].discard(n)
+            containing[(f, b)].discard(n)
+            containing.setdefault((f, new), set()).add(n)
+            modified.add(n)
+    for n in modified:
+        node_args[n] = sorted(argsets[n])
+    if alias:
+        for n, args in enumerate(node_args):
+            if args is not None and any(arg in alias for arg in args):
+                node_args[n] = [alias.get(arg, arg) for arg in args]
+                modified.add(n)
+        roots = [alias.get(root, root) for root in roots]
+
+    # Step 3: Count the uses of each node reachable from the roots
+    #         (once per parent node, and once per appearance as a root).
+    uses = [0]*len(node_expr)
+    visited = set()
+    for root in roots:
+        uses[root] += 1
+        stack = [root]
+        while stack:
+            n = stack.pop()
+            if n in visited or node_args[n] is None:
+                continue
+            visited.add(n)
+            for arg in node_args[n]:
+                uses[arg] += 1
+                stack.append(arg)
+
+    # Step 4: Rebuild the expressions bottom-up, replacing each non-atomic node
+    #         used more than once with a temporary symbol. Do not reuse the names
+    #         of any symbols already in the expressions.
+    excluded = set(str(expr) for n, expr in enumerate(node_expr)
+                   if node_args[n] is None and getattr(expr, "is_Symbol", False))
+    symbols = (sym for sym in (sp.numbered_symbols('x') if symbols is None else symbols)
+               if str(sym) not in excluded)
+    replaced, rebuilt, reduced = [], {}, []
+    for root in roots:
+        stack = [(root, False)]
+        while stack:
+            n, children_done = stack.pop()
+            if n in rebuilt:
+                continue
+            if node_args[n] is None:
+                rebuilt[n] = node_expr[n]
+                continue
+            if not children_done:
+                stack.append((n, True))
+                stack.extend((arg, False) for arg in reversed(node_args[n]))
+                continue
+            new_args = [rebuilt[arg] for arg in node_args[n]]
+            if node_expr[n] is not None and n not in modified and \
+                    all(rebuilt[arg] is node_expr[arg] for arg in node_args[n]):
+                new_expr = node_expr[n]
+            else:
+                new_expr = node_func[n](*new_args)
+            if uses[n] > 1:
+                sym = next(symbols)
+                replaced.append((sym, new_expr))
+                new_expr = sym
+            rebuilt[n] = new_expr
+        reduced.append(rebuilt[root])
     return replaced, reduced
 
+def topological_sort(definitions):
+    """ Sort a List of (symbol, expression) Definitions so that Each Follows its Dependencies
+
+        :arg:    list of (symbol, expression) pairs
+        :return: sorted list; ties are broken by the original position in the list
+
+        >>> from sympy.abc import a, b, c, x, y
+        >>> topological_sort([(a, b + x), (b, c*y), (c, x**2)])
+        [(c, x**2), (b, c*y), (a, b + x)]
+    """
+    index = {sym: i for i, (sym, _) in enumerate(definitions)}
+    dependencies = [set(index[sym] for sym in expr.free_symbols if sym in index) for _, expr in definitions]
+    dependents = [[] for _ in definitions]
+    for i, deps in enumerate(dependencies):
+        for j in deps:
+            dependents[j].append(i)
+    remaining = [len(deps) for deps in dependencies]
+    ready = [i for i, count in enumerate(remaining) if count == 0]
+    heapq.heapify(ready)
+    sorted_definitions = []
+    while ready:
+        i = heapq.heappop(ready)
+        sorted_definitions.append(definitions[i])
+        for j in dependents[i]:
+            remaining[j] -= 1
+            if remaining[j] == 0:
+                heapq.heappush(ready, j)
+    if len(sorted_definitions) != len(definitions):
+        raise ValueError('cyclic dependency between CSE definitions')
+    return sorted_definitions
+
+def cse_hoist_reciprocals(replaced, reduced, prefix='tmp', map_sym_to_rat=None):
+    """ Hoist Repeated Divisions Out of CSE Output
+
+        Finds each denominator (the base b of a power b**(-n), for positive integer n)
+        appearing more than once in the CSE output, computes its reciprocal once in a
+        new temporary (e.g., tmp_inv0 = 1/b), and rewrites each b**(-n) as tmp_inv0**n,
+        thereby replacing divisions (which cost 10-20x a multiplication) by multiplications.
+        Each temporary is defined just before the first temporary using it.
+
+        Accuracy: x/b is correctly rounded, whereas x*(1/b) is rounded twice, so the
+        result may differ from that without hoisting by about one unit in the last place
+        (ulp) per rewritten division; b**(-n) = (1/b)**n may differ by up to about n ulps.
+        This matches the reciprocal transformation done by compilers with -ffast-math.
+
+        :arg:    CSE replaced list of (symbol, expression) pairs
+        :arg:    CSE reduced list of expressions
+        :arg:    prefix for the names of reciprocal temporaries
+        :arg:    map from rational symbols to rationals, as returned by cse_preprocess()
+                    (e.g., when SIMD is enabled, exponents of -1 are the symbol _NegativeOne_)
+        :return: (replaced, reduced) with repeated divisions hoisted
+
+        >>> from sympy.abc import a, b, c, x, y
+        >>> x0 = sp.Symbol('x0')
+        >>> cse_hoist_reciprocals([(x0, a/b + c)], [x0/b**2, y/b, x/c])
+        ([(tmp_inv0, 1/b), (x0, a*tmp_inv0 + c)], [tmp_inv0**2*x0, tmp_inv0*y, x/c])
+
+        >>> cse_hoist_reciprocals([], [x/(a + 1/b), y/(a + 1/b), x/b])
+        ([(tmp_inv1, 1/b), (tmp_inv0, 1/(a + tmp_inv1))], [tmp_inv0*x, tmp_inv0*y, tmp_inv1*x])
+
+        >>> expr_list, map_sym_to_rat = cse_preprocess([x/(a + b), y/(a + b)**2], declare=True)
+        >>> expr_list
+        [x*(a + b)**_NegativeOne_, y/(a + b)**2]
+        >>> cse_hoist_reciprocals([], expr_list, map_sym_to_rat=map_sym_to_rat)
+        ([(tmp_inv0, 1/(a + b))], [tmp_inv0*x, tmp_inv0**2*y])
+
+        >>> cse_hoist_reciprocals([(x0, 1/b), (sp.Symbol('x1'), a*x0 + c/b)], [x0*c, y/b])
+        ([(tmp_inv0, 1/b), (x1, a*tmp_inv0 + c*tmp_inv0)], [c*tmp_inv0, tmp_inv0*y])
+    """
+    if map_sym_to_rat is None:
+        map_sym_to_rat = {}
+    def negative_integer_exponent(expr):
+        # Return n if expr is b**(-n) for positive integer n and non-numerical b, else None
+        if isinstance(expr, sp.Pow) and not expr.base.is_Number:
+            exponent = map_sym_to_rat.get(expr.exp, expr.exp)
+            if exponent.is_Integer and exponent < 0:
+                return -exponent
+        return None
+    exprs = [expr for _, expr in replaced] + list(reduced)
+    # Step 1: Count the divisions by each denominator, and record
+    #         the first statement in which each appears
+    divisions, first_use, used_names = OrderedDict(), {}, set()
+    for k, expr in enumerate(exprs):
+        for subexpr in sp.preorder_traversal(expr):
+            if isinstance(subexpr, sp.Symbol):
+                used_names.add(str(subexpr))
+            elif negative_integer_exponent(subexpr) is not None:
+                divisions[subexpr.base] = divisions.get(subexpr.base, 0) + 1
+                first_use.setdefault(subexpr.base, k)
+    # Step 2: Introduce a temporary for the reciprocal of each repeated denominator
+    recip_defs, recip_subs, counter = {}, {}, 0
+    for base, count in divisions.items():
+        if count < 2:
+            continue
+        while prefix + '_inv' + str(counter) in used_names:
+            counter += 1
+        recip = sp.Symbol(prefix + '_inv' + str(counter))
+        counter += 1
+        recip_defs.setdefault(min(first_use[base], len(replaced)), []).append((recip, base))
+        recip_subs[base] = recip
+    if not recip_subs:
+        return replaced, reduced
+    # Step 3: Rewrite b**(-n) >> recip**n, top-down (so that a denominator containing
+    #         another repeated denominator is matched before its subexpressions are rewritten)
+    rewritten = {}
+    def rewrite(expr):
+        if expr not in rewritten:
+            power = negative_integer_exponent(expr)
+            if power is not None and expr.base in recip_subs:
+                rewritten[expr] = recip_subs[expr.base]**power
+            elif expr.args:
+                rewritten[expr] = expr.func(*[rewrite(arg) for arg in expr.args])
+            else:
+                rewritten[expr] = expr
+        return rewritten[expr]
+    new_replaced = []
+    for k in range(len(replaced) + 1):
+        # Reciprocals of denominators containing other hoisted reciprocals must follow them
+        new_replaced.extend(topological_sort([(recip, 1/rewrite(base)) for recip, base in recip_defs.get(k, [])]))
+        if k < len(replaced):
+            new_replaced.append((replaced[k][0], rewrite(replaced[k][1])))
+    new_reduced = [rewrite(expr) for expr in reduced]
+    # Step 4: A temporary whose whole expression was a hoisted reciprocal is now an alias
+    #         of the reciprocal temporary (e.g., tmp_1 = tmp_inv0); substitute it away
+    recips = set(recip_subs.values())
+    aliases = dict((sym, expr) for sym, expr in new_replaced if expr in recips)
+    if aliases:
+        new_replaced = [(sym, expr.xreplace(aliases)) for sym, expr in new_replaced if sym not in aliases]
+        new_reduced = [expr.xreplace(aliases) for expr in new_reduced]
+    return new_replaced, new_reduced
+
+def addition_chain(targets):
+    """ Addition Chain for Computing Integer Powers by Multiplication
+
+        Finds an addition chain containing every target, i.e., a sequence of integers
+        (starting from 1) each of which is the sum of two earlier ones, so that x**n may
+        be computed for every target n with one multiplication per chain element
+        (x**n = x**i * x**j), sharing elements between targets. Each target is added as
+        the sum of two elements already in the chain if possible, else by the binary
+        method (x**n = (x**(n/2))**2 for even n, and x**(n-1) * x for odd n).
+
+        :arg:    iterable of positive integers
+        :return: dict mapping each chain element n > 1 to the pair (i, j), with i + j = n,
+                 of earlier elements from which it is computed (in order of computation)
+
+        >>> addition_chain([6])
+        {2: (1, 1), 3: (2, 1), 6: (3, 3)}
+        >>> addition_chain([2, 3, 7])
+        {2: (1, 1), 3: (2, 1), 6: (3, 3), 7: (6, 1)}
+    """
+    chain, elements = {}, {1}
+    def reach(n):
+        if n in elements:
+            return
+        i = next((i for i in sorted(elements, reverse=True) if i <= n - i and n - i in elements), None)
+        if i is not None:
+            chain[n] = (n - i, i)
+        elif n % 2 == 0:
+            reach(n // 2)
+            chain[n] = (n // 2, n // 2)
+        else:
+            reach(n - 1)
+            chain[n] = (n - 1, 1)
+        elements.add(n)
+    for n in sorted(set(targets)):
+        reach(n)
+    return chain
+
+# Decomposition of the fractional part of a rational exponent into the exponents of
+#   the roots sqrt(x) (1/2), cbrt(x) (1/3), sqrt(sqrt(x)) (1/4), and sqrt(cbrt(x)) (1/6)
+root_exponents = {sp.Rational(1, 2): (sp.Rational(1, 2),),
+                  sp.Rational(1, 3): (sp.Rational(1, 3),),
+                  sp.Rational(2, 3): (sp.Rational(1, 3), sp.Rational(1, 3)),
+                  sp.Rational(1, 4): (sp.Rational(1, 4),),
+                  sp.Rational(3, 4): (sp.Rational(1, 2), sp.Rational(1, 4)),
+                  sp.Rational(1, 6): (sp.Rational(1, 6),),
+                  sp.Rational(5, 6): (sp.Rational(1, 2), sp.Rational(1, 3))}
+
+def split_power(exponent):
+    """ Split an Exponent into an Integer Power and Roots
+
+        Writes |exponent| = n + (sum of root exponents), each root exponent being 1/2 (sqrt),
+        1/3 (cbrt), 1/4 (sqrt of sqrt) or 1/6 (sqrt of cbrt), so that x**exponent can be
+        computed by multiplications, sqrt(), cbrt(), and at most one division, instead of pow().
+
+        :arg:    exponent
+        :return: (n, tuple of root exponents, whether exponent is negative), or None if exponent
+                 is neither an integer nor a rational with denominator 2, 3, 4, or 6
+
+        >>> split_power(sp.Rational(-3, 2))
+        (1, (1/2,), True)
+        >>> split_power(sp.Rational(5, 6))
+        (0, (1/2, 1/3), False)
+        >>> print(split_power(sp.Rational(2, 5)))
+        None
+    """
+    if not isinstance(exponent, sp.Rational):
+        return None
+    n, fraction = abs(exponent.p) // exponent.q, sp.Rational(abs(exponent.p) % exponent.q, exponent.q)
+    roots = root_exponents.get(fraction) if fraction else ()
+    if roots is None:
+        return None
+    return n, roots, bool(exponent < 0)
+
+def cse_lower_powers(replaced, reduced, prefix='tmp', map_sym_to_rat=None):
+    """ Share the Intermediate Powers of Each Base Across CSE Output
+
+        For each base raised to integer or rational powers (see split_power()) in the CSE
+        output, e.g., b**2, b**5, and b**(-5/2), finds the integer powers and roots of the
+        base from which all of them are computed: the elements of an addition chain (see
+        addition_chain()) of the integer parts of the exponents, together with sqrt(b),
+        cbrt(b), sqrt(sqrt(b)), and sqrt(cbrt(b)) as needed. Each of these used more than
+        once is computed once, in a new temporary (e.g., tmp_pow0 = b**2), and each power of
+        the base is rewritten as the product of its integer power and roots (or the reciprocal
+        thereof, for a negative exponent), e.g., b**5 = tmp_pow0**2*b. Each temporary is defined
+        just before the first statement using its base.
+
+        Accuracy: sqrt(), cbrt(), and multiplication are each correctly rounded (or nearly so),
+        so a power computed this way may differ from pow() by a few units in the last place.
+
+        :arg:    CSE replaced list of (symbol, expression) pairs
+        :arg:    CSE reduced list of expressions
+        :arg:    prefix for the names of power temporaries
+        :arg:    map from rational symbols to rationals, as returned by cse_preprocess()
+        :return: (replaced, reduced) with the powers of each base sharing intermediate powers
+
+        >>> from sympy.abc import a, b, x, y
+        >>> x0 = sp.Symbol('x0')
+        >>> cse_lower_powers([(x0, a + b**2)], [x0*b**5, y*b**sp.Rational(-5, 2)])
+        ([(tmp_pow0, b**2), (x0, a + tmp_pow0)], [b*tmp_pow0**2*x0, y/(sqrt(b)*tmp_pow0)])
+
+        >>> cse_lower_powers([], [x*a**sp.Rational(3, 2), y/sp.sqrt(a), a**sp.Rational(1, 4)])
+        ([(tmp_pow0, sqrt(a))], [a*tmp_pow0*x, y/tmp_pow0, sqrt(tmp_pow0)])
+    """
+    if map_sym_to_rat is None:
+        map_sym_to_rat = {}
+    def lowered_exponent(expr):
+        # Return e if expr is b**e for non-numerical b and e != +/-1 to be split by split_power(), else None
+        if isinstance(expr, sp.Pow) and not expr.base.is_Number:
+            exponent = map_sym_to_rat.get(expr.exp, expr.exp)
+            if split_power(exponent) is not None and abs(exponent) != 1:
+                return exponent
+        return None
+    exprs = [expr for _, expr in replaced] + list(reduced)
+    # Step 1: Count the occurrences of each power of each base, and record
+    #         the first statement in which each base is raised to a power
+    powers, first_use, used_names = OrderedDict(), {}, set()
+    for k, expr in enumerate(exprs):
+        for subexpr in sp.preorder_traversal(expr):
+            if isinstance(subexpr, sp.Symbol):
+                used_names.add(str(subexpr))
+                continue
+            exponent = lowered_exponent(subexpr)
+            if exponent is not None:
+                counts = powers.setdefault(subexpr.base, OrderedDict())
+                counts[exponent] = counts.get(exponent, 0) + 1
+                first_use.setdefault(subexpr.base, k)
+    # Step 2: For each base, find the integer powers (addition chain elements) and roots
+    #         needed by its powers, and introduce a temporary for each used more than once
+    plans, counter = OrderedDict(), 0
+    for base, counts in powers.items():
+        splits = OrderedDict((exponent, split_power(exponent)) for exponent in counts)
+        chain = addition_chain(n for n, _, _ in splits.values() if n > 1)
+        uses = {}
+        for i, j in chain.values():
+            uses[i] = uses.get(i, 0) + 1
+            uses[j] = uses.get(j, 0) + 1
+        for exponent, (n, roots, _) in splits.items():
+            for element in ((n,) if n > 1 else ()) + roots:
+                uses[element] = uses.get(element, 0) + counts[exponent]
+        # sqrt(sqrt(b)) and sqrt(cbrt(b)) are computed from sqrt(b) and cbrt(b)
+        for root in (sp.Rational(1, 4), sp.Rational(1, 6)):
+            if root in uses:
+                uses[2*root] = uses.get(2*root, 0) + 1
+        elements = list(chain) + [root for root in (sp.Rational(1, 2), sp.Rational(1, 3), sp.Rational(1, 4),
+                                                    sp.Rational(1, 6)) if root in uses]
+        temps = OrderedDict()
+        for element in elements:
+            if uses[element] > 1:
+                while prefix + '_pow' + str(counter) in used_names:
+                    counter += 1
+                temps[element] = sp.Symbol(prefix + '_pow' + str(counter))
+                counter += 1
+        if temps:
+            plans[base] = (splits, chain, elements, temps)
+    if not plans:
+        return replaced, reduced
+    # Step 3: Rewrite each power of a base with temporaries as a product of its integer
+    #         power and roots, top-down (as a base may contain powers of another base)
+    values, power_defs, rewritten = {}, {}, {}
+    def element_values(base):
+        # Value of each chain element and root of base: its temporary if it has one, else its definition
+        if base not in values:
+            _, chain, elements, temps = plans[base]
+            value = {1: rewrite(base)}
+            for element in elements:
+                if element in chain:
+                    i, j = chain[element]
+                    definition = value[i]*value[j]
+                elif element in (sp.Rational(1, 2), sp.Rational(1, 3)):
+                    definition = value[1]**element
+                else:
+                    definition = sp.sqrt(value[2*element])
+                if element in temps:
+                    power_defs.setdefault(min(first_use[base], len(replaced)), []).append((temps[element], definition))
+                value[element] = temps.get(element, definition)
+            values[base] = value
+        return values[base]
+    def rewrite(expr):
+        if expr not in rewritten:
+            exponent = lowered_exponent(expr)
+            if exponent is not None and expr.base in plans:
+                value = element_values(expr.base)
+                n, roots, negative = plans[expr.base][0][exponent]
+                power = sp.Mul(*([value[n]] if n > 0 else []) + [value[root] for root in roots])
+                rewritten[expr] = 1/power if negative else power
+            elif expr.args:
+                rewritten[expr] = expr.func(*[rewrite(arg) for arg in expr.args])
+            else:
+                rewritten[expr] = expr
+        return rewritten[expr]
+    new_exprs = [rewrite(expr) for expr in exprs]
+    for base in plans:
+        element_values(base)
+    new_replaced = []
+    for k in range(len(replaced) + 1):
+        # Each temporary must follow those (of the same or another base) it is computed from
+        new_replaced.extend(topological_sort(power_defs.get(k, [])))
+        if k < len(replaced):
+            new_replaced.append((replaced[k][0], new_exprs[k]))
+    return new_replaced, new_exprs[len(replaced):]
+
+def cse_dependencies(replaced, reduced):
+    """ Find the CSE Temporaries Read by Each Statement
+
+        Statement k is the definition of temporary k for k < len(replaced),
+        and the assignment of output k - len(replaced) otherwise.
+
+        :arg:    CSE replaced list of (symbol, expression) pairs
+        :arg:    CSE reduced list of expressions
+        :return: list, for each statement, of the (distinct) indices of the temporaries it reads
+
+        >>> from sympy.abc import x, y
+        >>> x0, x1 = sp.symbols('x0 x1')
+        >>> replaced, reduced = [(x0, x*y), (x1, sp.cos(x0))], [x1 + x0, 2*x1]
+        >>> cse_dependencies(replaced, reduced)
+        [[], [0], [0, 1], [1]]
+    """
+    index = {str(sym): j for j, (sym, _) in enumerate(replaced)}
+    return [sorted(index[name] for name in symbol_occurrences(expr) if name in index)
+            for expr in chain((expr for _, expr in replaced), reduced)]
+
+def max_live_temporaries(replaced, reduced, order=None):
+    """ Estimate the Maximum Number of Simultaneously Live CSE Temporaries
+
+        A temporary is live from the statement defining it through the last
+        statement reading it; the maximum number of live temporaries estimates
+        the register pressure of the generated C code.
+
+        :arg:    CSE replaced list of (symbol, expression) pairs
+        :arg:    CSE reduced list of expressions
+        :arg:    statement order, as returned by cse_schedule() (default: temporaries, then outputs)
+        :return: maximum number of simultaneously live temporaries
+
+        >>> from sympy.abc import a, b, c, d
+        >>> x0, x1 = sp.symbols('x0 x1')
+        >>> replaced, reduced = [(x0, a + b), (x1, c + d)], [x0**2 + x0, x1**2 + x1]
+        >>> max_live_temporaries(replaced, reduced)
+        2
+        >>> max_live_temporaries(replaced, reduced, [0, 2, 1, 3])
+        1
+    """
+    deps = cse_dependencies(replaced, reduced)
+    if order is None:
+        order = list(range(len(deps)))
+    last_use = {}
+    for position, k in enumerate(order):
+        for j in deps[k]:
+            last_use[j] = position
+    live = max_live = 0
+    for position, k in enumerate(order):
+        if k < len(replaced) and k in last_use:
+            live += 1
+            max_live = max(max_live, live)
+        for j in deps[k]:
+            if last_use[j] == position:
+                live -= 1
+    return max_live
+
+def cse_schedule(replaced, reduced, fixed_outputs=False):
+    """ Schedule CSE Temporaries and Outputs to Reduce Register Pressure
+
+        Greedy list scheduling on the dependency DAG: among the statements
+        whose dependencies have all been emitted, repeatedly emit the one that
+        increases the number of live temporaries the least (i.e., an output,
+        or a statement that is the last reader of many temporaries), breaking
+        ties in favor of temporaries whose readers are closest to being ready,
+        and then by original position. Temporaries are thus defined close to
+        their uses and die early, shortening live ranges.
+
+        :arg:    CSE replaced list of (symbol, expression) pairs
+        :arg:    CSE reduced list of expressions
+        :arg:    keep all outputs at the end, in their original order (required when
+                    an output variable is also read by an expression)
+        :return: statement order: a permutation of range(len(replaced) + len(reduced)),
+                    where k < len(replaced) denotes temporary k, and otherwise output k - len(replaced)
+
+        >>> from sympy.abc import a, b, c, d
+        >>> x0, x1 = sp.symbols('x0 x1')
+        >>> replaced, reduced = [(x0, a + b), (x1, c + d)], [x0**2 + x0, x1**2 + x1]
+        >>> cse_schedule(replaced, reduced)
+        [0, 2, 1, 3]
+        >>> cse_schedule(replaced, reduced, fixed_outputs=True)
+        [0, 1, 2, 3]
+    """
+    ntemps, nstmts = len(replaced), len(replaced) + len(reduced)
+    deps = cse_dependencies(replaced, reduced)
+    readers = [[] for _ in range(ntemps)]
+    for k, dep in enumerate(deps):
+        for j in dep:
+            readers[j].append(k)
+    unread = [len(reader) for reader in readers]
+    unready = [len(dep) for dep in deps]
+    schedulable = ntemps if fixed_outputs else nstmts
+    ready = [k for k in range(schedulable) if unready[k] == 0]
+    order = []
+    while ready:
+        def priority(k):
+            kills = sum(1 for j in deps[k] if unread[j] == 1)
+            if k >= ntemps:
+                return (-kills, -kills, 0, k)
+            return (1 - kills, -kills, min([unready[i] for i in readers[k]] or [0]), k)
+        k = min(ready, key=priority)
+        ready.remove(k)
+        order.append(k)
+        for j in deps[k]:
+            unread[j] -= 1
+        if k < ntemps:
+            for i in readers[k]:
+                unready[i] -= 1
+                if unready[i] == 0 and i < schedulable:
+                    ready.append(i)
+    if fixed_outputs:
+        order.extend(range(ntemps, nstmts))
+    return order
+
 if __name__ == "__main__":
     import doctest
     sys.exit(doctest.testmod()[0])
@@ -16,6 +16,12 @@
     while the __str__ representation will return a string of the class name
     and root expression. The Node subclass has a field for an expression and
     a field for subexpression children (implemented as a mutable list).
+    The build method and traversal generators are iterative (using an explicit
+    stack), so that deeply nested expressions do not exceed the recursion limit.
+    Optionally (shared=True), the expression tree is hash-consed into a directed
+    acyclic graph, where every occurrence of the same subexpression (with the same
+    parent function) shares a single node, which is visited only once during
+    traversal; any modification of a shared node then applies to every occurrence.
 """
 # Author: Ken Sible
 # Email:  ksible *at* outlook *dot* com
@@ -34,7 +40,8 @@ class ExprTree:
         [cos(a + b)**2, cos(a + b), a + b, a, b, 2]
     """
 
-    def __init__(self, expr):
+    def __init__(self, expr, shared=False):
+        self.shared = shared
         self.root = self.Node(expr, None)
         self.build(self.root)
 
@@ -53,10 +60,26 @@ class ExprTree:
             [sin(a*b)**2, sin(a*b), a*b, a, b, 2]
         """
         if clear: del node.children[:]
-        for arg in node.expr.args:
-            subtree = self.Node(arg, node.expr.func)
-            node.append(subtree)
-            self.build(subtree)
+        Node, shared = self.Node, self.shared
+        # Hash-consing table for the (sub)tree being built: (expression, id of parent function) -> node
+        nodes = {}
+        stack = [node]
+        while stack:
+            parent = stack.pop()
+            func = parent.expr.func
+            funcid = id(func)
+            for arg in parent.expr.args:
+                if shared:
+                    try:
+                        parent.children.append(nodes[(arg, funcid)])
+                        continue
+                    except KeyError:
+                        subtree = nodes[(arg, funcid)] = Node(arg, func)
+                else:
+                    subtree = Node(arg, func)
+                parent.children.append(subtree)
+                if arg.args:
+                    stack.append(subtree)
 
     def preorder(self, node=None):
         """ Generate iterator for preorder traversal.
@@ -71,13 +94,27 @@ class ExprTree:
             ...     if subtree.expr.func == Mul:
             ...         print((i, subtree.expr))
             (2, a*b)
+
+            >>> from sympy.abc import x, y
+            >>> tree = ExprTree(x*cos(a + b) + y*cos(a + b), shared=True)
+            >>> [node.expr for node in tree.preorder()]
+            [x*cos(a + b) + y*cos(a + b), x*cos(a + b), x, cos(a + b), a + b, a, b, y*cos(a + b), y]
+            >>> tree.root.children[0].children[1] is tree.root.children[1].children[1]
+            True
         """
         if node is None:
             node = self.root
-        yield node
-        for child in node.children:
-            for subtree in self.preorder(child):
-                yield subtree
+        visited = set() if self.shared else None
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if visited is not None:
+                if id(node) in visited: continue
+                visited.add(id(node))
+            yield node
+            # The children are read after the node was yielded, since the client
+            # may have modified (and rebuilt) the node during the traversal.
+            stack.extend(reversed(node.children))
 
     def postorder(self, node=None):
         """ Generate iterator for postorder traversal.
@@ -95,10 +132,18 @@ class ExprTree:
         """
         if node is None:
             node = self.root
-        for child in node.children:
-            for subtree in self.postorder(child):
-                yield subtree
-        yield node
+        visited = set() if self.shared else None
+        stack = [(node, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                yield node
+                continue
+            if visited is not None:
+                if id(node) in visited: continue
+                visited.add(id(node))
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.children))
 
     def reconstruct(self, evaluate=False):
         """
@@ -122,6 +167,8 @@ class ExprTree:
 
     class Node:
         """ Expression Tree Node """
+        __slots__ = ('expr', 'func', 'children')
+
         def __init__(self, expr, func):
             self.expr = expr
             self.func = func
@@ -10,13 +10,17 @@
 #         zachetie **at** gmail **dot* com
 
 from outputC import parse_outCparams_string, outC_function_dict # NRPy+: Core C code output module
+from outputC import CcodeWriter, is_Ccode_stream                 # NRPy+: Streaming C code output
 import NRPy_param_funcs as par   # NRPy+: parameter interface
+import codegen_profiler as prof  # NRPy+: Code generation stage profiler
 import sympy as sp               # SymPy: The Python computer algebra package upon which NRPy+ depends
 import grid as gri               # NRPy+: Functions having to do with numerical grids
-import os, sys                     # Standard Python module for multiplatform OS-level functions
+import json, os, sys               # Standard Python modules for serialization and multiplatform OS-level functions
+from outputC_cache import makedirs, replace_file # NRPy+: Python 2 & 3 compatible file operations
+from fractions import Fraction     # Standard Python: exact rational arithmetic
 from finite_difference_helpers import extract_from_list_of_deriv_vars__base_gfs_and_deriv_ops_lists
 from finite_difference_helpers import generate_list_of_deriv_vars_from_lhrh_sympyexpr_list
-from finite_difference_helpers import read_gfs_from_memory, FDparams, construct_Ccode
+from finite_difference_helpers import read_gfs_from_memory, FDparams, construct_Ccode, unroll_i0
 
 # Step 1: Initialize free parameters for this module:
 modulename = __name__
@@ -24,6 +28,8 @@ modulename = __name__
 par.initialize_param(par.glb_param("int",  modulename, "FD_CENTDERIVS_ORDER",          4))
 par.initialize_param(par.glb_param("bool", modulename, "FD_functions_enable",      False))
 par.initialize_param(par.glb_param("int",  modulename, "FD_KO_ORDER__CENTDERIVS_PLUS", 2))
+# On-disk table of finite difference coefficients, shared across processes (disabled if empty)
+par.initialize_param(par.glb_param("char", modulename, "FD_coeffs_table_file",        ""))
 
 def FD_outputC(filename,sympyexpr_list, params="", upwindcontrolvec=""):
     outCparams = parse_outCparams_string(params)
@@ -57,6 +63,13 @@ def FD_outputC(filename,sympyexpr_list, params="", upwindcontrolvec=""):
 
     # Step 0.c: FDparams named tuple stores parameters used in the finite-difference codegen
     FDparams.SIMD_enable         = outCparams.SIMD_enable
+    FDparams.SIMD_aligned_gfs      = outCparams.SIMD_aligned_gfs
+    FDparams.SIMD_streaming_stores = outCparams.SIMD_streaming_stores
+    if "True" in (FDparams.SIMD_aligned_gfs, FDparams.SIMD_streaming_stores) and \
+            par.parval_from_str("grid::GridFuncMemAlign") == 0:
+        print("Error: outputC parameters SIMD_aligned_gfs and SIMD_streaming_stores require aligned gridfunction memory;")
+        print("       set grid::GridFuncMemAlign (e.g., to 64) and use grid.output__gridfunction_layout_h().")
+        sys.exit(1)
     FDparams.PRECISION           = par.parval_from_str("PRECISION")
     FDparams.FD_CD_order         = par.parval_from_str("FD_CENTDERIVS_ORDER")
     FDparams.FD_functions_enable = par.parval_from_str("FD_functions_enable")
@@ -65,6 +78,9 @@ def FD_outputC(filename,sympyexpr_list, params="", upwindcontrolvec=""):
     FDparams.upwindcontrolvec    = upwindcontrolvec
     FDparams.fullindent          = indent + outCparams.preindent
     FDparams.outCparams          = params
+    if int(outCparams.FD_unroll_i0) > 1 and FDparams.SIMD_enable == "True":
+        print("Error: outputC parameter FD_unroll_i0 > 1 is not supported with SIMD_enable=True.")
+        sys.exit(1)
 
     # Step 1: Generate from list of SymPy expressions in the form
     #     [lhrh(lhs=var, rhs=expr),lhrh(...),...]
@@ -86,11 +102,7 @@ def FD_outputC(filename,sympyexpr_list, params="", upwindcontrolvec=""):
     #     it is indeed registered as a gridfunction.
     #     If not, exit with error.
     for basegf in list_of_base_gridfunction_names_in_derivs:
-        is_gf = False
-        for gf in gri.glb_gridfcs_list:
-            if basegf == str(gf.name):
-                is_gf = True
-        if not is_gf:
+        if gri.gridfunction_indices(basegf) == []:
             print("Error: Attempting to take the derivative of "+basegf+", which is not a registered gridfunction.")
             print("       Make sure your gridfunction name does not have any underscores in it!")
             sys.exit(1)
@@ -123,32 +135,46 @@ def FD_outputC(filename,sympyexpr_list, params="", upwindcontrolvec=""):
     #     etc.
     fdcoeffs = [[] for i in range(len(list_of_deriv_operators))]
     fdstencl = [[[] for i in range(4)] for j in range(len(list_of_deriv_operators))]
-    for i in range(len(list_of_deriv_operators)):
-        fdcoeffs[i], fdstencl[i] = compute_fdcoeffs_fdstencl(list_of_deriv_operators[i])
+    with prof.stage("FD_stencils"):
+        for i in range(len(list_of_deriv_operators)):
+            fdcoeffs[i], fdstencl[i] = compute_fdcoeffs_fdstencl(list_of_deriv_operators[i])
 
     # Step 4: Create C code to read gridfunctions from memory
-    read_from_memory_Ccode = read_gfs_from_memory(list_of_base_gridfunction_names_in_derivs, fdstencl, sympyexpr_list,
-                                                  FDparams)
+    with prof.stage("FD_memory_reads"):
+        read_from_memory_Ccode = read_gfs_from_memory(list_of_base_gridfunction_names_in_derivs, fdstencl, sympyexpr_list,
+                                                      FDparams)
 
-    # Step 5: construct C code.
-    Coutput = ""
-    if outCparams.includebraces == "True":
-        Coutput = outCparams.preindent + "{\n"
-    Coutput = construct_Ccode(sympyexpr_list, list_of_deriv_vars,
-                           list_of_base_gridfunction_names_in_derivs, list_of_deriv_operators,
-                           fdcoeffs, fdstencl, read_from_memory_Ccode, FDparams, Coutput)
-    if outCparams.includebraces == "True":
-        Coutput += outCparams.preindent+"}"
+    # Step 5: construct C code, streaming it into a CcodeWriter.
+    def write_Ccode(writer):
+        if outCparams.includebraces == "True":
+            writer.write(outCparams.preindent + "{\n")
+        if int(outCparams.FD_unroll_i0) > 1:
+            # Compute FD_unroll_i0 consecutive points in the i0 direction, sharing the values read from memory.
+            Ccode = construct_Ccode(sympyexpr_list, list_of_deriv_vars,
+                                    list_of_base_gridfunction_names_in_derivs, list_of_deriv_operators,
+                                    fdcoeffs, fdstencl, read_from_memory_Ccode, FDparams, "")
+            writer.write(unroll_i0(Ccode, int(outCparams.FD_unroll_i0), FDparams))
+        else:
+            construct_Ccode(sympyexpr_list, list_of_deriv_vars,
+                            list_of_base_gridfunction_names_in_derivs, list_of_deriv_operators,
+                            fdcoeffs, fdstencl, read_from_memory_Ccode, FDparams, writer)
+        if outCparams.includebraces == "True":
+            writer.write(outCparams.preindent+"}")
 
-    # Step 6: Output the C code in desired format: stdout, string, or file.
-    if filename == "stdout":
-        print(Coutput)
+    # Step 6: Output the C code in desired format: stdout, string, CcodeWriter/file handle, or file.
+    if is_Ccode_stream(filename):
+        write_Ccode(filename if isinstance(filename, CcodeWriter) else CcodeWriter(filename))
+    elif filename == "stdout":
+        write_Ccode(CcodeWriter(sys.stdout))
+        sys.stdout.write("\n")
     elif filename == "returnstring":
-        return Coutput
+        writer = CcodeWriter()
+        write_Ccode(writer)
+        return writer.getvalue()
     else:
         # Output to the file specified by outCfilename
         with open(filename, outCparams.outCfileaccess) as file:
-            file.write(Coutput)
+            write_Ccode(CcodeWriter(file))
         successstr = ""
         if outCparams.outCfileaccess == "a":
             successstr = "Appended "
@@ -248,6 +274,101 @@ def output_finite_difference_functions_h(path=os.path.join(".")):
 #  .... row, but with each element e_j -> e_j^(L-1)
 #  A1 is used later to validate the inverted
 #  matrix.
+#
+#  Rather than inverting A symbolically, we compute the
+#  needed column of A^{-1} (times the factorial of the
+#  derivative order) exactly, using Fornberg's recursion
+#  [Fornberg, Math. Comp. 51, 699 (1988)], and store it in
+#  FD_coeffs_table, keyed by (FD order, derivative order,
+#  up/downwind stencil shift). If the parameter
+#  FD_coeffs_table_file is set, the table is also read from
+#  and written to that file, so it need be computed only once.
+
+FD_coeffs_table = {}
+FD_coeffs_table_file_loaded = None
+
+def Fornberg_weights(x0, xs, m):
+    """ Compute exact finite difference weights with Fornberg's algorithm.
+
+        :arg:    point at which derivatives are evaluated
+        :arg:    list of stencil points (Fractions or ints)
+        :arg:    maximum derivative order m
+        :return: c, where c[j][k] is the weight of xs[j] in the k'th derivative, for k = 0..m
+
+        >>> c = Fornberg_weights(0, [-2, -1, 0, 1, 2], 2)
+        >>> [str(c[j][1]) for j in range(5)]
+        ['1/12', '-2/3', '0', '2/3', '-1/12']
+        >>> [str(c[j][2]) for j in range(5)]
+        ['-1/12', '4/3', '-5/2', '4/3', '-1/12']
+    """
+    n = len(xs)
+    c = [[Fraction(0)]*(m+1) for _ in range(n)]
+    c[0][0] = Fraction(1)
+    c1 = Fraction(1)
+    c4 = xs[0] - x0
+    for i in range(1, n):
+        mn = min(i, m)
+        c2 = Fraction(1)
+        c5 = c4
+        c4 = xs[i] - x0
+        for j in range(i):
+            c3 = xs[i] - xs[j]
+            c2 *= c3
+            if j == i-1:
+                for k in range(mn, 0, -1):
+                    c[i][k] = c1*(k*c[i-1][k-1] - c5*c[i-1][k])/c2
+                c[i][0] = -c1*c5*c[i-1][0]/c2
+            for k in range(mn, 0, -1):
+                c[j][k] = (c4*c[j][k] - k*c[j][k-1])/c3
+            c[j][0] = c4*c[j][0]/c3
+        c1 = c2
+    return c
+
+def load_FD_coeffs_table(filename):
+    """ Merge the coefficients stored in filename (if it exists) into FD_coeffs_table. """
+    if not os.path.exists(filename):
+        return
+    with open(filename) as file:
+        table = json.load(file)
+    for key, coeffs in table.items():
+        FDORDER, derivorder, shift = [int(i) for i in key.split(",")]
+        FD_coeffs_table[(FDORDER, derivorder, shift)] = tuple(Fraction(coeff) for coeff in coeffs)
+
+def output_FD_coeffs_table(filename):
+    """ Write FD_coeffs_table to filename (atomically, as concurrent processes may share the file).
+        Coefficients another process wrote since this one last loaded the file are merged in first,
+        so that they are not lost; entries may still be lost if two processes write at once, but are
+        then just recomputed. """
+    makedirs(os.path.dirname(os.path.abspath(filename)))
+    load_FD_coeffs_table(filename)
+    table = {"%d,%d,%d" % key: [str(coeff) for coeff in coeffs] for key, coeffs in sorted(FD_coeffs_table.items())}
+    tmpfile = filename + ".tmp" + str(os.getpid())
+    with open(tmpfile, "w") as file:
+        json.dump(table, file, indent=0, sort_keys=True)
+    replace_file(tmpfile, filename)
+
+def FD_coeffs_1D(FDORDER, derivorder, UPDOWNWIND_stencil_shift):
+    """ Return the (FDORDER+1)-point finite difference coefficients for the derivorder'th
+        derivative, on the stencil shifted by UPDOWNWIND_stencil_shift points, as a tuple of Fractions.
+        Equivalent to the derivorder'th column of A^{-1} above, times derivorder!
+
+        >>> [str(coeff) for coeff in FD_coeffs_1D(4, 1, 1)]
+        ['-1/4', '-5/6', '3/2', '-1/2', '1/12']
+    """
+    global FD_coeffs_table_file_loaded
+    key = (FDORDER, derivorder, UPDOWNWIND_stencil_shift)
+    filename = par.parval_from_str(modulename + "::FD_coeffs_table_file")
+    if filename != "" and FD_coeffs_table_file_loaded != filename:
+        load_FD_coeffs_table(filename)
+        FD_coeffs_table_file_loaded = filename
+    if key not in FD_coeffs_table:
+        STENCILSIZE = FDORDER+1
+        xs = [j - Fraction(STENCILSIZE-1, 2) + UPDOWNWIND_stencil_shift for j in range(STENCILSIZE)]
+        c = Fornberg_weights(0, xs, derivorder)
+        FD_coeffs_table[key] = tuple(c[j][derivorder] for j in range(STENCILSIZE))
+        if filename != "":
+            output_FD_coeffs_table(filename)
+    return FD_coeffs_table[key]
 
 def compute_fdcoeffs_fdstencl(derivstring,FDORDER=-1):
     # Step 0: Set finite differencing order, stencil size, and up/downwinding
@@ -269,24 +390,7 @@ def compute_fdcoeffs_fdstencl(derivstring,FDORDER=-1):
     elif "dfulldnD" in derivstring:
         UPDOWNWIND_stencil_shift = -int(FDORDER/2)
 
-    # Step 1: Set up matrix based on the stencil size (FDORDER+1).
-    #         See documentation above for details on how this
-    #         matrix is set up.
-    M = sp.zeros(STENCILSIZE,STENCILSIZE)
-    for i in range(STENCILSIZE):
-        for j in range(STENCILSIZE):
-            if i == 0:
-                M[(i,j)] = 1 # Setting n^0 = 1 for all n, including n=0, because this matches the pattern
-            else:
-                dist_from_xeq0_col = j - sp.Rational((STENCILSIZE - 1),2) + UPDOWNWIND_stencil_shift
-                if dist_from_xeq0_col==0:
-                    M[(i,j)] = 0
-                else:
-                    M[(i, j)] = dist_from_xeq0_col**(i)
-    Minv = sp.zeros(STENCILSIZE,STENCILSIZE)
-    Minv = M**(-1)
-
-    # Step 2:
+    # Step 1:
     #     Based on the input derivative string,
     #     pick out the relevant row of the matrix
     #     inverse, as outlined in the detailed code
@@ -314,8 +418,10 @@ def compute_fdcoeffs_fdstencl(derivstring,FDORDER=-1):
     else:
         # Up/downwinded and first derivs are all of "FirstDeriv" type
         pass
+    coeffs = [sp.Rational(coeff.numerator, coeff.denominator)
+              for coeff in FD_coeffs_1D(FDORDER, matrixrow, UPDOWNWIND_stencil_shift)]
 
-    # Step 3:
+    # Step 2:
     #     Set finite difference coefficients
     #     and stencil points corresponding to
     #     each finite difference coefficient.
@@ -325,7 +431,7 @@ def compute_fdcoeffs_fdstencl(derivstring,FDORDER=-1):
         for i in range(STENCILSIZE):
             idx4 = [0, 0, 0, 0]
             # First compute finite difference coefficient.
-            fdcoeff = sp.factorial(matrixrow)*Minv[(i,matrixrow)]
+            fdcoeff = coeffs[i]
             # Do not store fdcoeff or fdstencil if
             # finite difference coefficient is zero.
             if fdcoeff != 0:
@@ -349,8 +455,7 @@ def compute_fdcoeffs_fdstencl(derivstring,FDORDER=-1):
                 idx4 = [0, 0, 0, 0]
 
                 # First compute finite difference coefficient.
-                fdcoeff = (sp.factorial(matrixrow)*Minv[(i,matrixrow)]) * \
-                          (sp.factorial(matrixrow)*Minv[(j,matrixrow)])
+                fdcoeff = coeffs[i]*coeffs[j]
 
                 # Do not store fdcoeff or fdstencil if
                 # finite difference coefficient is zero.
@@ -9,13 +9,15 @@
 # Author: Zachariah B. Etienne
 #         zachetie **at** gmail **dot* com
 from outputC import superfast_uniq, outputC, outC_function_dict, add_to_Cfunction_dict # NRPy+: Core C code output module
+from outputC import CcodeWriter, is_Ccode_stream                # NRPy+: Streaming C code output
 import NRPy_param_funcs as par   # NRPy+: parameter interface
+import codegen_profiler as prof  # NRPy+: Code generation stage profiler
 import sympy as sp                 # SymPy: The Python computer algebra package upon which NRPy+ depends
 import grid as gri                 # NRPy+: Functions having to do with numerical grids
-import sys                         # Standard Python module for multiplatform OS-level functions
+import re, sys                     # Standard Python modules for regular expressions and multiplatform OS-level functions
 from collections import namedtuple # Standard Python: Enable namedtuple data type
 
-FDparams = namedtuple('FDparams', 'PRECISION FD_CD_order FD_functions_enable SIMD_enable DIM MemAllocStyle upwindcontrolvec fullindent outCparams')
+FDparams = namedtuple('FDparams', 'PRECISION FD_CD_order FD_functions_enable SIMD_enable SIMD_aligned_gfs SIMD_streaming_stores DIM MemAllocStyle upwindcontrolvec fullindent outCparams')
 
 #########################################
 # STEP 1: EXTRACT DERIVATIVES TO COMPUTE
@@ -227,13 +229,22 @@ def read_from_memory_Ccode_onept(gfname,idx, FDparams):
     >>> vetU = ixp.register_gridfunctions_for_single_rank1("EVOL","vetU",FDparams.DIM)
     >>> read_from_memory_Ccode_onept("vetU0","0,1,-2,300",FDparams)
     \'const REAL_SIMD_ARRAY vetU0_i0_i1p1_i2m2 = ReadSIMD(&in_gfs[IDX4(VETU0GF, i0,i1+1,i2-2)]);\\n\'
+
+    With SIMD_aligned_gfs, points not offset in the i0 direction are read with aligned loads:
+    >>> FDparams.SIMD_aligned_gfs = "True"
+    >>> read_from_memory_Ccode_onept("vetU0","0,1,-2,300",FDparams)
+    \'const REAL_SIMD_ARRAY vetU0_i0_i1p1_i2m2 = ReadSIMD_aligned(&in_gfs[IDX4(VETU0GF, i0,i1+1,i2-2)]);\\n\'
+    >>> read_from_memory_Ccode_onept("vetU0","1,0,0,0",FDparams)
+    \'const REAL_SIMD_ARRAY vetU0_i0p1_i1_i2 = ReadSIMD(&in_gfs[IDX4(VETU0GF, i0+1,i1,i2)]);\\n\'
+    >>> FDparams.SIMD_aligned_gfs = "False"
     """
     idxsplit = idx.split(',')
     idx4 = [int(idxsplit[0]),int(idxsplit[1]),int(idxsplit[2]),int(idxsplit[3])]
     gf_array_name = "in_gfs" # Default array name.
     gfaccess_str = gri.gfaccess(gf_array_name,gfname,ijkl_string(idx4, FDparams))
     if FDparams.SIMD_enable == "True":
-        retstring = type__var(gfname,FDparams) + varsuffix(idx4, FDparams) +" = ReadSIMD(&" + gfaccess_str + ");"
+        ReadSIMD = "ReadSIMD_aligned" if FDparams.SIMD_aligned_gfs == "True" and idx4[0] == 0 else "ReadSIMD"
+        retstring = type__var(gfname,FDparams) + varsuffix(idx4, FDparams) +" = " + ReadSIMD + "(&" + gfaccess_str + ");"
     else:
         retstring = type__var(gfname,FDparams) + varsuffix(idx4, FDparams) +" = " + gfaccess_str + ";"
     return retstring+"\n"
@@ -347,17 +358,14 @@ def read_gfs_from_memory(list_of_base_gridfunction_names_in_derivs, fdstencl, sy
     list_of_points_read_from_memory_with_duplicates = [[] for i in range(len(gri.glb_gridfcs_list))]
     for j in range(len(list_of_base_gridfunction_names_in_derivs)):
         derivgfname = list_of_base_gridfunction_names_in_derivs[j]
-        # Next find the corresponding gridfunction index:
-        for i in range(len(gri.glb_gridfcs_list)):
-            gfname = gri.glb_gridfcs_list[i].name
-            # If the gridfunction for the derivative matches, then
-            #    add to the list of points read from memory:
-            if derivgfname == gfname:
-                for k in range(len(fdstencl[j])):
-                    list_of_points_read_from_memory_with_duplicates[i].append(str(fdstencl[j][k][0]) + "," +
-                                                                              str(fdstencl[j][k][1]) + "," +
-                                                                              str(fdstencl[j][k][2]) + "," +
-                                                                              str(fdstencl[j][k][3]))
+        # Next find the corresponding gridfunction index,
+        #    and add to its list of points read from memory:
+        for i in gri.gridfunction_indices(derivgfname):
+            for k in range(len(fdstencl[j])):
+                list_of_points_read_from_memory_with_duplicates[i].append(str(fdstencl[j][k][0]) + "," +
+                                                                          str(fdstencl[j][k][1]) + "," +
+                                                                          str(fdstencl[j][k][2]) + "," +
+                                                                          str(fdstencl[j][k][3]))
 
     # Step 4b: "Zeroth derivative" case:
     #     If gridfunction appears in expression not
@@ -367,10 +375,8 @@ def read_gfs_from_memory(list_of_base_gridfunction_names_in_derivs, fdstencl, sy
         for var in sympyexpr_list[expr].rhs.free_symbols:
             vartype = gri.variable_type(var)
             if vartype == "gridfunction":
-                for i in range(len(gri.glb_gridfcs_list)):
-                    gfname = gri.glb_gridfcs_list[i].name
-                    if gfname == str(var):
-                        list_of_points_read_from_memory_with_duplicates[i].append("0,0,0,0")
+                for i in gri.gridfunction_indices(str(var)):
+                    list_of_points_read_from_memory_with_duplicates[i].append("0,0,0,0")
 
 
     # Step 4c: Remove duplicates when reading from memory;
@@ -592,6 +598,138 @@ def add_FD_func_to_outC_function_dict(list_of_deriv_vars,
                                   params=outfunc_params, preloop="", body=outFDstr)
     return FDfunccall_list
 
+def SIMD_store(lhs, read_from_memory_Ccode, FDparams):
+    """ Choose the SIMD intrinsic for writing a gridfunction output lhs (e.g., "rhs_gfs[IDX4(UUGF, i0,i1,i2)]").
+
+        An output that is never read by the kernel (in read_from_memory_Ccode) is written with a
+        non-temporal store if SIMD_streaming_stores is enabled: it bypasses the cache, saving the
+        memory bandwidth otherwise spent reading the output's cache lines before overwriting them.
+        Otherwise it is written with an aligned store if SIMD_aligned_gfs is enabled.
+    :param lhs: C code for the gridfunction output, as returned by gri.gfaccess()
+    :param read_from_memory_Ccode: C code reading the kernel's inputs from memory
+    :param FDparams: Parameters used in the finite-difference codegen
+    :return: The name of the SIMD store intrinsic
+
+    >>> from finite_difference_helpers import SIMD_store, FDparams
+    >>> FDparams.SIMD_aligned_gfs, FDparams.SIMD_streaming_stores = "False", "False"
+    >>> reads = "const REAL_SIMD_ARRAY hh = ReadSIMD(&aux_gfs[IDX4(HHGF, i0,i1,i2)]);\\n"
+    >>> SIMD_store("rhs_gfs[IDX4(UUGF, i0,i1,i2)]", reads, FDparams)
+    'WriteSIMD'
+    >>> FDparams.SIMD_aligned_gfs, FDparams.SIMD_streaming_stores = "True", "True"
+    >>> SIMD_store("rhs_gfs[IDX4(UUGF, i0,i1,i2)]", reads, FDparams)
+    'WriteSIMD_stream'
+    >>> SIMD_store("aux_gfs[IDX4(HHGF, i0,i1,i2)]", reads, FDparams)
+    'WriteSIMD_aligned'
+    >>> FDparams.SIMD_aligned_gfs, FDparams.SIMD_streaming_stores = "False", "False"
+    """
+    if not re.match(r"\w+\[IDX\d\(\w+, i0,", lhs):
+        return "WriteSIMD" # Not a gridfunction access that the aligned layout of grid.py applies to.
+    if FDparams.SIMD_streaming_stores == "True" and lhs[:lhs.index(",")] not in read_from_memory_Ccode:
+        return "WriteSIMD_stream"
+    if FDparams.SIMD_aligned_gfs == "True":
+        return "WriteSIMD_aligned"
+    return "WriteSIMD"
+
+def unroll_i0(Ccode, unroll, FDparams):
+    """ Unroll the (scalar) finite-difference C code for the point (i0,i1,i2) over the points
+        (i0,i1,i2) ... (i0+unroll-1,i1,i2), reusing the gridfunction values read from memory:
+        all points read by the unrolled copies are read just once, at the top, and each copy
+        (in its own block) refers to the values it needs by name. Thus a stencil extending
+        r points in each i0 direction needs unroll+2r reads along i0, instead of unroll*(2r+1),
+        and the values shared by neighboring points stay in registers.
+
+        Quantities read outside the loop body that depend on i0 (xx0, read with the loop
+        option Read_xxs, and reference metric precomputed quantities like f0_of_xx0, read with
+        Enable_rfm_precompute) are read again at i0+u in the block for the copy at i0+u.
+        The loop must increment i0 by unroll (see the loop option "unroll_i0" in loop.py), and there
+        is no remainder loop: the loop option stops at runtime unless the extent of the i0 loop is a
+        multiple of unroll.
+
+    :param Ccode: C code for the point (i0,i1,i2), as output by construct_Ccode()
+    :param unroll: number of points computed per iteration of the i0 loop
+    :param FDparams: Parameters used in the finite-difference codegen
+    :return: C code for the points (i0,i1,i2) ... (i0+unroll-1,i1,i2)
+
+    >>> from finite_difference_helpers import unroll_i0, FDparams
+    >>> FDparams.DIM = 3
+    >>> Ccode  = "const double uu_i0m1_i1_i2 = in_gfs[IDX4(UUGF, i0-1,i1,i2)];\\n"
+    >>> Ccode += "const double uu = in_gfs[IDX4(UUGF, i0,i1,i2)];\\n"
+    >>> Ccode += "const double uu_i0p1_i1_i2 = in_gfs[IDX4(UUGF, i0+1,i1,i2)];\\n"
+    >>> Ccode += "const double uu_dDD00 = invdx0*invdx0*(uu_i0m1_i1_i2 - 2*uu + uu_i0p1_i1_i2);\\n"
+    >>> Ccode += "rhs_gfs[IDX4(VVGF, i0,i1,i2)] = f0_of_xx0*uu_dDD00;\\n"
+    >>> print(unroll_i0(Ccode, 2, FDparams))
+    // Unrolled over 2 points in the i0 direction: 4 reads from memory, vs. 6 without unrolling
+    const double uu_i0m1_i1_i2 = in_gfs[IDX4(UUGF, i0-1,i1,i2)];
+    const double uu = in_gfs[IDX4(UUGF, i0,i1,i2)];
+    const double uu_i0p1_i1_i2 = in_gfs[IDX4(UUGF, i0+1,i1,i2)];
+    const double uu_i0p2_i1_i2 = in_gfs[IDX4(UUGF, i0+2,i1,i2)];
+    {
+       const double uu_dDD00 = invdx0*invdx0*(uu_i0m1_i1_i2 - 2*uu + uu_i0p1_i1_i2);
+       rhs_gfs[IDX4(VVGF, i0,i1,i2)] = f0_of_xx0*uu_dDD00;
+    }
+    {
+       const REAL f0_of_xx0 = rfmstruct->f0_of_xx0[i0+1];
+       const double uu_dDD00 = invdx0*invdx0*(uu - 2*uu_i0p1_i1_i2 + uu_i0p2_i1_i2);
+       rhs_gfs[IDX4(VVGF, i0+1,i1,i2)] = f0_of_xx0*uu_dDD00;
+    }
+    <BLANKLINE>
+    """
+    read_regex = re.compile(r'^\s*const (\w+) (\w+) = (\w+)\[IDX\d\((\w+), (i0[^\]]*)\)\];\s*$')
+    reads, body = [], []
+    for line in Ccode.splitlines():
+        m = read_regex.match(line)
+        if m:
+            vartype, varname, gfarray, gfindex, ijkl = m.groups()
+            idx4 = [0, 0, 0, 0]
+            for dirn, offset in re.findall(r'i(\d)([+-]\d+)?', ijkl):
+                idx4[int(dirn)] = int(offset) if offset else 0
+            basename = varname[:len(varname) - len(varsuffix(idx4, FDparams))]
+            reads.append((vartype, basename, gfarray, gfindex, idx4))
+        else:
+            body.append(line)
+    body = "\n".join(body)
+    declared = set(re.findall(r'\bconst \w+ (\w+) =', body))
+    # Quantities that depend on i0, and are read from memory outside the loop body:
+    i0_dependent = sorted(set(var for var in re.findall(r'\b(xx0|\w+_of_xx0(?:_xx1)?(?:__\w+)?)\b', body)
+                              if var not in declared))
+    def read_Ccode(vartype, basename, gfarray, gfindex, idx4):
+        return "const " + vartype + " " + basename + varsuffix(idx4, FDparams) + " = " + \
+            gfarray + "[IDX" + str(FDparams.DIM + 1) + "(" + gfindex + ", " + ijkl_string(idx4, FDparams) + ")];\n"
+
+    # Read each point needed by any of the unrolled copies once, in the order in which they are stored in memory.
+    shared_reads = {}
+    for vartype, basename, gfarray, gfindex, idx4 in reads:
+        for u in range(unroll):
+            shifted = [idx4[0] + u] + idx4[1:]
+            shared_reads[(gfarray, gfindex, tuple(shifted[::-1]))] = (vartype, basename, gfarray, gfindex, shifted)
+    outstr = "// Unrolled over " + str(unroll) + " points in the i0 direction: " + str(len(shared_reads)) + \
+             " reads from memory, vs. " + str(unroll * len(reads)) + " without unrolling\n"
+    order = {}
+    for _vartype, _basename, gfarray, gfindex, _idx4 in reads:
+        order.setdefault((gfarray, gfindex), len(order))
+    for key in sorted(shared_reads, key=lambda key: (order[key[:2]], key[2])):
+        outstr += read_Ccode(*shared_reads[key])
+    for u in range(unroll):
+        # Refer to the values read at (i0+u+offset), and write to the point i0+u:
+        rename = {}
+        for _vartype, basename, _gfarray, _gfindex, idx4 in reads:
+            rename[basename + varsuffix(idx4, FDparams)] = basename + varsuffix([idx4[0] + u] + idx4[1:], FDparams)
+        i0_str = "i0+" + str(u) if u > 0 else "i0"
+        copy = re.sub(r'\b[A-Za-z_]\w*\b', lambda m: rename.get(m.group(0), m.group(0)), body)
+        copy = re.sub(r'(IDX\d\(\w+, )i0,', r'\g<1>' + i0_str + ',', copy)
+        outstr += "{\n"
+        if u > 0:
+            for var in i0_dependent:
+                if var == "xx0":
+                    outstr += "   const REAL xx0 = xx[0][" + i0_str + "];\n"
+                elif "_of_xx0_xx1" in var:
+                    outstr += "   const REAL " + var + " = rfmstruct->" + var + "[" + i0_str + " + Nxx_plus_2NGHOSTS0*i1];\n"
+                else:
+                    outstr += "   const REAL " + var + " = rfmstruct->" + var + "[" + i0_str + "];\n"
+        outstr += "".join("   " + line + "\n" if line.strip() else "\n" for line in copy.split("\n"))
+        outstr += "}\n"
+    return outstr
+
 def construct_Ccode(sympyexpr_list, list_of_deriv_vars,
                     list_of_base_gridfunction_names_in_derivs,list_of_deriv_operators,
                     fdcoeffs, fdstencl, read_from_memory_Ccode, FDparams, Coutput):
@@ -613,8 +751,9 @@ def construct_Ccode(sympyexpr_list, list_of_deriv_vars,
     # :param fdstencl:
     # :param read_from_memory_Ccode:
     # :param FDparams:
-    # :param Coutput: The start of the Coutput string; this function's output will be pasted to a copy of Coutput
-    # :return: Returns a C code string
+    # :param Coutput: The start of the Coutput string; this function's output will be pasted to a copy of Coutput.
+    #                 Alternatively a CcodeWriter or file handle, into which the C code will be streamed.
+    # :return: Returns a C code string (or None, if Coutput is a CcodeWriter or file handle)
     # >>> from outputC import lhrh
     # >>> import indexedexp as ixp
     # >>> import NRPy_param_funcs as par
@@ -680,12 +819,15 @@ def construct_Ccode(sympyexpr_list, list_of_deriv_vars,
     # a1 = c*hDD_dupD021*vU1;
     # <BLANKLINE>
 
-    def indent_Ccode(Ccode):
-        Ccodesplit = Ccode.splitlines()
-        outstring = ""
-        for i in range(len(Ccodesplit)):
-            outstring += FDparams.fullindent + Ccodesplit[i] + '\n'
-        return outstring
+    # Stream all C code through a CcodeWriter, which indents each line by
+    #   FDparams.fullindent. This avoids building (and re-indenting) large
+    #   intermediate strings, keeping memory usage linear in the output size.
+    if is_Ccode_stream(Coutput):
+        writer = Coutput if isinstance(Coutput, CcodeWriter) else CcodeWriter(Coutput)
+    else:
+        writer = CcodeWriter()
+        writer.write(Coutput)
+    Cwriter = writer.indented(FDparams.fullindent)
 
     # Step 5.a.i: Read gridfunctions from memory at needed pts.
     # *** No need to do anything here; already set in
@@ -704,10 +846,11 @@ def construct_Ccode(sympyexpr_list, list_of_deriv_vars,
     FDexprs = []
     FDlhsvarnames = []
     if not FDparams.FD_functions_enable:
-        FDexprs, FDlhsvarnames = \
-            construct_FD_exprs_as_SymPy_exprs(list_of_deriv_vars,
-                                              list_of_base_gridfunction_names_in_derivs, list_of_deriv_operators,
-                                              fdcoeffs, fdstencl)
+        with prof.stage("FD_stencils"):
+            FDexprs, FDlhsvarnames = \
+                construct_FD_exprs_as_SymPy_exprs(list_of_deriv_vars,
+                                                  list_of_base_gridfunction_names_in_derivs, list_of_deriv_operators,
+                                                  fdcoeffs, fdstencl)
 
     # Compute finite differences using function calls (instead of inlined calculations)?
     if FDparams.FD_functions_enable:
@@ -763,44 +906,44 @@ def construct_Ccode(sympyexpr_list, list_of_deriv_vars,
         NRPy_FD__Number_of_Steps += 1
 
     if len(read_from_memory_Ccode) > 0:
-        Coutput += indent_Ccode("/*\n * NRPy+ Finite Difference Code Generation, Step "
-                                + str(NRPy_FD_StepNumber) + " of " + str(NRPy_FD__Number_of_Steps) +
-                                ": Read from main memory and compute finite difference stencils:\n */\n")
+        Cwriter.write("/*\n * NRPy+ Finite Difference Code Generation, Step "
+                      + str(NRPy_FD_StepNumber) + " of " + str(NRPy_FD__Number_of_Steps) +
+                      ": Read from main memory and compute finite difference stencils:\n */\n")
         NRPy_FD_StepNumber = NRPy_FD_StepNumber + 1
         if FDparams.FD_functions_enable:
             # Compute finite differences using function calls (instead of inlined calculations)
-            Coutput += indent_Ccode(read_from_memory_Ccode)
+            Cwriter.write(read_from_memory_Ccode)
             for funccall in funccall_list:
-                Coutput += indent_Ccode(funccall)
+                Cwriter.write(funccall + "\n")
             if FDparams.upwindcontrolvec != "":
                 # Compute finite differences using inlined calculations
                 params = FDparams.outCparams
                 # We choose the CSE temporary variable prefix "FDpart1" for the finite difference coefficients:
                 params += ",CSE_varprefix=FDPart1,includebraces=False,CSE_preprocess=True,SIMD_find_more_subs=True"
-                Coutput += indent_Ccode(outputC(FDexprs, FDlhsvarnames, "returnstring", params=params))
+                outputC(FDexprs, FDlhsvarnames, Cwriter, params=params)
 
         else:
             # Compute finite differences using inlined calculations
             params = FDparams.outCparams.replace("preindent=1", "preindent=0")  # Remove an unnecessary indentation
             # We choose the CSE temporary variable prefix "FDpart1" for the finite difference coefficients:
             params += ",CSE_varprefix=FDPart1,includebraces=False,CSE_preprocess=True,SIMD_find_more_subs=True"
-            Coutput += indent_Ccode(outputC(FDexprs, FDlhsvarnames, "returnstring",params=params,
-                                            prestring=read_from_memory_Ccode))
+            outputC(FDexprs, FDlhsvarnames, Cwriter, params=params,
+                    prestring=read_from_memory_Ccode)
 
     # Step 5.b.ii: Implement control-vector upwinding algorithm.
     if FDparams.upwindcontrolvec != "":
         if len(upwind_directions) > 0:
-            Coutput += indent_Ccode("/*\n * NRPy+ Finite Difference Code Generation, Step "
-                                    + str(NRPy_FD_StepNumber) + " of " + str(NRPy_FD__Number_of_Steps) +
-                                    ": Implement upwinding algorithm:\n */\n")
+            Cwriter.write("/*\n * NRPy+ Finite Difference Code Generation, Step "
+                          + str(NRPy_FD_StepNumber) + " of " + str(NRPy_FD__Number_of_Steps) +
+                          ": Implement upwinding algorithm:\n */\n")
             NRPy_FD_StepNumber = NRPy_FD_StepNumber + 1
             if FDparams.SIMD_enable == "True":
                 for n in ["0", "1"]:
-                    Coutput += indent_Ccode("const double tmp_upwind_Integer_"+n+" = "+n+".000000000000000000000000000000000;\n")
-                    Coutput += indent_Ccode("const REAL_SIMD_ARRAY upwind_Integer_"+n+" = ConstSIMD(tmp_upwind_Integer_"+n+");\n")
+                    Cwriter.write("const "+FDparams.PRECISION+" tmp_upwind_Integer_"+n+" = "+n+".000000000000000000000000000000000;\n")
+                    Cwriter.write("const REAL_SIMD_ARRAY upwind_Integer_"+n+" = ConstSIMD(tmp_upwind_Integer_"+n+");\n")
             for dirn in upwind_directions:
-                Coutput += indent_Ccode(type__var("UpWind" + str(dirn), FDparams) +
-                                        " = UPWIND_ALG(UpwindControlVectorU" + str(dirn) + ");\n")
+                Cwriter.write(type__var("UpWind" + str(dirn), FDparams) +
+                              " = UPWIND_ALG(UpwindControlVectorU" + str(dirn) + ");\n")
         upwindU = [sp.sympify(0) for i in range(FDparams.DIM)]
         for dirn in upwind_directions:
             upwindU[dirn] = sp.sympify("UpWind" + str(dirn))
@@ -816,14 +959,14 @@ def construct_Ccode(sympyexpr_list, list_of_deriv_vars,
         # For convenience, we require type__var() above to
         # prefix up/downwinded variables with "UpwindAlgInput".
         # Here we do not wish to have this prefix.
-        Coutput += indent_Ccode(outputC(upwind_expr_list, var_list,
-                                        "returnstring", params=FDparams.outCparams + ",CSE_varprefix=FDPart2,includebraces=False"))
+        outputC(upwind_expr_list, var_list,
+                Cwriter, params=FDparams.outCparams + ",CSE_varprefix=FDPart2,includebraces=False")
 
     # Step 5.c.i: Add input RHS & LHS expressions from
     #             sympyexpr_list[]
-    Coutput += indent_Ccode("/*\n * NRPy+ Finite Difference Code Generation, Step "
-                            + str(NRPy_FD_StepNumber) + " of " + str(NRPy_FD__Number_of_Steps) +
-                            ": Evaluate SymPy expressions and write to main memory:\n */\n")
+    Cwriter.write("/*\n * NRPy+ Finite Difference Code Generation, Step "
+                  + str(NRPy_FD_StepNumber) + " of " + str(NRPy_FD__Number_of_Steps) +
+                  ": Evaluate SymPy expressions and write to main memory:\n */\n")
     exprs = []
     lhsvarnames = []
     for i in range(len(sympyexpr_list)):
@@ -838,7 +981,8 @@ def construct_Ccode(sympyexpr_list, list_of_deriv_vars,
     write_to_mem_string = ""
     if FDparams.SIMD_enable == "True":
         for i in range(len(sympyexpr_list)):
-            write_to_mem_string += "WriteSIMD(&" + sympyexpr_list[i].lhs + ", __RHS_exp_" + str(i) + ");\n"
+            write_to_mem_string += SIMD_store(sympyexpr_list[i].lhs, read_from_memory_Ccode, FDparams) + \
+                                   "(&" + sympyexpr_list[i].lhs + ", __RHS_exp_" + str(i) + ");\n"
 
     # outputC requires as its second argument a list of strings.
     #   Sometimes when the lhs's are simple constants, but the inputs
@@ -848,11 +992,13 @@ def construct_Ccode(sympyexpr_list, list_of_deriv_vars,
     for lhs in lhsvarnames:
         lhsvarnamestrings.append(str(lhs))
 
-    Coutput += indent_Ccode(outputC(exprs, lhsvarnamestrings, "returnstring",
-                                    params=FDparams.outCparams + ",CSE_varprefix=FDPart3,includebraces=False,preindent=0",
-                                    prestring="", poststring=write_to_mem_string))
+    outputC(exprs, lhsvarnamestrings, Cwriter,
+            params=FDparams.outCparams + ",CSE_varprefix=FDPart3,includebraces=False,preindent=0",
+            prestring="", poststring=write_to_mem_string)
 
-    return Coutput
+    if is_Ccode_stream(Coutput):
+        return None
+    return writer.getvalue()
 #################################
 
 if __name__ == "__main__":
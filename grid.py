@@ -7,7 +7,7 @@
 import NRPy_param_funcs as par     # NRPy+: Parameter interface
 import sympy as sp                 # Import SymPy, a computer algebra system written entirely in Python
 from collections import namedtuple # Standard Python `collections` module: defines named tuples data structure
-import os                          # Standard Python module for multiplatform OS-level functions
+import os, sys                     # Standard Python modules for multiplatform OS-level functions
 
 # Initialize globals related to the grid
 glb_gridfcs_list = []
@@ -17,6 +17,8 @@ thismodule = __name__
 par.initialize_param(par.glb_param("char", thismodule, "GridFuncMemAccess", "SENRlike"))
 par.initialize_param(par.glb_param("char", thismodule, "MemAllocStyle","210"))
 par.initialize_param(par.glb_param("int",  thismodule, "DIM", 3))
+# Alignment, in bytes, of gridfunction memory (0: natural, unpadded layout). See output__gridfunction_layout_h() below.
+par.initialize_param(par.glb_param("int",  thismodule, "GridFuncMemAlign", 0))
 
 Nxx = par.Cparameters("int", thismodule,["Nxx0","Nxx1","Nxx2"],[64,32,64]) # Default to 64x32x64 grid
 Nxx_plus_2NGHOSTS = par.Cparameters("int", thismodule,
@@ -28,20 +30,16 @@ xx  = par.Cparameters("REAL",thismodule,[ "xx0", "xx1", "xx2"],1e300) # These ar
 dxx   = par.Cparameters("REAL",thismodule,[   "dxx0",   "dxx1",   "dxx2"],0.1)
 invdx = par.Cparameters("REAL",thismodule,[ "invdx0", "invdx1", "invdx2"],1.0)
 
+# Return the list of indices in glb_gridfcs_list of gridfunctions named varname.
+def gridfunction_indices(varname):
+    return par.list_index("gridfcs_by_name", glb_gridfcs_list, lambda gf: gf.name).get(varname, [])
+
 def variable_type(var):
-    var_is_gf = False
-    for gf in range(len(glb_gridfcs_list)):
-        if str(var) == glb_gridfcs_list[gf].name:
-            var_is_gf = True
-    var_is_parameter = False
-#     for paramname in range(len(par.glb_params_list)):
-#         if str(var) == par.glb_params_list[paramname].parname:
-#             var_is_parameter = True
-    for paramname in range(len(par.glb_Cparams_list)):
-        if str(var) == par.glb_Cparams_list[paramname].parname:
-            var_is_parameter = True
+    varname = str(var)
+    var_is_gf = gridfunction_indices(varname) != []
+    var_is_parameter = par.Cparam_indices(varname) != []
     if var_is_parameter and var_is_gf:
-        print("Error: variable "+str(var)+" is registered both as a gridfunction and as a Cparameter.")
+        print("Error: variable "+varname+" is registered both as a gridfunction and as a Cparameter.")
         sys.exit(1)
     if not (var_is_parameter or var_is_gf):
         return "other"
@@ -53,22 +51,19 @@ def variable_type(var):
     sys.exit(1)
 
 def find_gftype(varname):
-    for gf in glb_gridfcs_list:
-        if gf.name == varname:
-            return gf.gftype
+    indices = gridfunction_indices(varname)
+    if indices != []:
+        return glb_gridfcs_list[indices[0]].gftype
     print("grid.py: Could not find gftype.")
     sys.exit(1)
 
 def gfaccess(gfarrayname = "", varname = "", ijklstring = ""):
-    found_registered_gf = False
-    for gf in glb_gridfcs_list:
-        if gf.name == varname:
-            if found_registered_gf:
-                print("Error: found duplicate gridfunction name: "+gf.name)
-                sys.exit(1)
-            found_registered_gf = True
-
-    if not found_registered_gf:
+    indices = gridfunction_indices(varname)
+    if len(indices) > 1:
+        print("Error: found duplicate gridfunction name: "+varname)
+        sys.exit(1)
+
+    if indices == []:
         print("Error: gridfunction \""+varname+"\" is not registered!")
         sys.exit(1)
 
@@ -174,10 +169,9 @@ def register_gridfunctions(gf_type,gf_names,rank=0,is_indexed=False,DIM=3):
     #         a) A duplicate is found, error out. Otherwise
     #         b) Append to list of gridfunctions, stored in glb_gridfcs_list[].
     for i in range(len(gf_names)):
-        for j in range(len(glb_gridfcs_list)):
-            if gf_names[i] == glb_gridfcs_list[j].name:
-                print("Error: Tried to register the gridfunction \""+gf_names[i]+"\" twice (ignored type)\n\n")
-                sys.exit(1)
+        if gridfunction_indices(gf_names[i]) != []:
+            print("Error: Tried to register the gridfunction \""+gf_names[i]+"\" twice (ignored type)\n\n")
+            sys.exit(1)
         # If no duplicate found, append to "gridfunctions" list:
         glb_gridfcs_list.append(glb_gridfc(gf_type,gf_names[i],rank,DIM))
 
@@ -266,3 +260,72 @@ def output__gridfunction_defines_h__return_gf_lists(outdir):
             file.write("#define "+auxevol_variables_list[i].upper()+"GF\t"+str(i)+"\n")
 
     return evolved_variables_list,auxiliary_variables_list,auxevol_variables_list
+
+# Given output directory "outdir" as input, the
+#   following function outputs a file called
+#   "outdir/gridfunction_layout.h", which #define's
+#   the IDX4() macro (MemAllocStyle "210") mapping
+#   gridfunction g at point (i,j,k) to its index in
+#   memory, along with GF_ALLOC(num_gfs), which
+#   allocates memory for num_gfs gridfunctions,
+#   and GF_ALLOC_NUM_REALS(num_gfs), the number of
+#   REALs so allocated.
+#
+# With grid::GridFuncMemAlign = 0 (default) this is
+#   the usual, unpadded layout, allocated with malloc().
+#   With grid::GridFuncMemAlign set to a power of 2
+#   (e.g., 64 bytes, the width of an AVX512 register
+#   and of a cache line), memory is allocated with
+#   posix_memalign(), and each row of consecutive i
+#   values is padded such that every point with
+#   i = NGHOSTS + (a multiple of the alignment in
+#   REALs) is aligned. Thus in SIMD loops over
+#   interior points, all accesses at offset 0 in the
+#   i direction are aligned, as required by the
+#   outputC parameters SIMD_aligned_gfs and
+#   SIMD_streaming_stores. The alignment must be at
+#   least the SIMD register width, which is checked at
+#   compile time (whichever of this file and
+#   SIMD_intrinsics.h is #include'd second). Code that
+#   loops over all gridfunction memory as a 1D array
+#   (e.g., MoL's RK updates; see MoLtimestepping/) must
+#   then loop over GF_ALLOC_NUM_REALS(num_gfs) REALs, as
+#   rows are no longer contiguous.
+def output__gridfunction_layout_h(outdir):
+    align = par.parval_from_str("grid::GridFuncMemAlign")
+    with open(os.path.join(outdir,"gridfunction_layout.h"), "w") as file:
+        file.write("/* This file is automatically generated by NRPy+. Do not edit. */\n\n")
+        if align == 0:
+            file.write("""#define IDX4(g,i,j,k) ( (i) + Nxx_plus_2NGHOSTS0 * ( (j) + Nxx_plus_2NGHOSTS1 * ( (k) + Nxx_plus_2NGHOSTS2 * (g) ) ) )
+#define GF_ALLOC_NUM_REALS(num_gfs) ( Nxx_plus_2NGHOSTS0*Nxx_plus_2NGHOSTS1*Nxx_plus_2NGHOSTS2 * (num_gfs) )
+#define GF_ALLOC(num_gfs) (REAL *)malloc(sizeof(REAL) * GF_ALLOC_NUM_REALS(num_gfs))
+""")
+            return
+        if align < 0 or align & (align - 1) != 0:
+            print("Error: grid::GridFuncMemAlign = "+str(align)+" must be 0 or a power of 2.")
+            sys.exit(1)
+        file.write("""#define GF_ALIGNMENT """+str(align)+""" // bytes
+#define GF_ALIGN_NUM_REALS ( (int)(GF_ALIGNMENT / sizeof(REAL)) )
+#define GF_ROUND_UP(n) ( ( ((n) + GF_ALIGN_NUM_REALS-1) / GF_ALIGN_NUM_REALS ) * GF_ALIGN_NUM_REALS )
+// Offset each row such that point i=NGHOSTS is aligned, and pad rows to a multiple of the alignment:
+#define GF_ROW_OFFSET ( (GF_ALIGN_NUM_REALS - NGHOSTS % GF_ALIGN_NUM_REALS) % GF_ALIGN_NUM_REALS )
+#define Nxx_plus_2NGHOSTS0_padded GF_ROUND_UP(GF_ROW_OFFSET + Nxx_plus_2NGHOSTS0)
+#define IDX4(g,i,j,k) ( GF_ROW_OFFSET + (i) + Nxx_plus_2NGHOSTS0_padded * ( (j) + Nxx_plus_2NGHOSTS1 * ( (k) + Nxx_plus_2NGHOSTS2 * (g) ) ) )
+#define GF_ALLOC_NUM_REALS(num_gfs) GF_ROUND_UP( GF_ROW_OFFSET + Nxx_plus_2NGHOSTS0_padded*Nxx_plus_2NGHOSTS1*Nxx_plus_2NGHOSTS2 * (num_gfs) )
+#define GF_ALLOC(num_gfs) GF_aligned_alloc(GF_ALLOC_NUM_REALS(num_gfs))
+// Aligned SIMD loads & stores fault unless GF_ALIGNMENT is at least the SIMD register width:
+extern char GF_ALIGNMENT_must_be_at_least_sizeof_REAL[(GF_ALIGNMENT >= sizeof(REAL)) ? 1 : -1];
+#ifdef SIMD_width
+extern char GF_ALIGNMENT_must_be_at_least_the_SIMD_register_width[(GF_ALIGNMENT >= SIMD_width*sizeof(REAL)) ? 1 : -1];
+#endif
+#include <stdlib.h>
+#include <string.h>
+// posix_memalign() (unlike C11's aligned_alloc()) is available with -std=gnu99; free() the result as usual.
+//   Memory is zeroed, so that row padding (which loops over all GF_ALLOC_NUM_REALS() REALs also update) holds finite values.
+static inline REAL *GF_aligned_alloc(const size_t num_reals) {
+  void *ptr;
+  if(posix_memalign(&ptr, GF_ALIGNMENT, sizeof(REAL) * num_reals) != 0) return NULL;
+  memset(ptr, 0, sizeof(REAL) * num_reals);
+  return (REAL *)ptr;
+}
+""")
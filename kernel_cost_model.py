@@ -0,0 +1,343 @@
+""" Operation-Count and Arithmetic-Intensity Cost Model for Generated C Kernels
+
+    The following module estimates the cost of a generated C kernel without
+    compiling it, by counting, per grid point, the floating-point operations
+    (additions/subtractions, multiplications, fused multiply-adds, divisions,
+    square/cube roots, pow() calls, and transcendental function calls) and
+    the memory accesses (gridfunction and other array loads and stores),
+    from which it computes arithmetic intensities (flops per byte).
+
+    Costs are computed from the C code itself, so any C code generated by
+    NRPy+ may be analyzed: the output of outputC() and FD_outputC() (see
+    outputC_cost() and FD_outputC_cost()), or an entry of outC_function_dict
+    (see Cfunction_cost()). This makes it easy to compare code generation
+    options (e.g., GoldenKernelsEnable, SIMD_find_more_FMAsFMSs, CSE_preprocess),
+    and with roofline() to predict whether a kernel is memory- or compute-bound.
+
+    Conventions:
+    * Only statements in the innermost loop (i.e., those executed once per
+      grid point) are counted, unless the code has no loops at all.
+    * For SIMD kernels, counts are per SIMD vector rather than per point;
+      arithmetic intensities are unaffected.
+    * A fused multiply-add counts as two flops; every other operation or
+      function call counts as one flop, even though e.g., a division costs
+      10-20x a multiplication and a transcendental function far more.
+    * Divisions of numerical literals (e.g., (1.0/3.0)) and statements with
+      purely numerical right-hand sides are folded by the compiler, and
+      are not counted. Unary minus signs are not counted.
+    * Memory traffic is bounded two ways: "bytes" assumes no cache reuse between
+      points (every distinct array element read or written per point goes to
+      main memory), while "compulsory_bytes" assumes perfect cache reuse of
+      stencil neighbors (each gridfunction is read and/or written once per point).
+"""
+
+import NRPy_param_funcs as par  # NRPy+: parameter interface
+import outputC as outC          # NRPy+: Core C code output module (also defines the PRECISION parameter)
+import re, sys                  # Standard Python modules for regular expressions and OS-level functions
+from collections import OrderedDict  # Standard Python: dictionary that remembers insertion order
+
+# Operation classes of C math functions, SIMD intrinsics (see SIMD/SIMD_intrinsics.h),
+#   and macros appearing in NRPy+-generated kernels. Function calls not listed here
+#   count as "other_calls"; those in "free" (memory accesses, broadcasts,
+#   index macros) are not counted at all.
+function_op_classes = {}
+for opclass, funcs in [("adds", ["AddSIMD", "SubSIMD"]),
+                       ("muls", ["MulSIMD"]),
+                       ("FMAs", ["FusedMulAddSIMD", "FusedMulSubSIMD", "NegFusedMulAddSIMD", "NegFusedMulSubSIMD",
+                                 "fma", "fmaf", "fmal"]),
+                       ("divs", ["DivSIMD"]),
+                       ("sqrts", ["sqrt", "sqrtf", "sqrtl", "cbrt", "cbrtf", "cbrtl", "SqrtSIMD", "CbrtSIMD"]),
+                       ("pows", ["pow", "powf", "powl", "PowSIMD"]),
+                       ("transcendentals", [func + suffix for func in ["exp", "exp2", "expm1", "log", "log2", "log10", "log1p",
+                                                                       "sin", "cos", "tan", "asin", "acos", "atan", "atan2",
+                                                                       "sinh", "cosh", "tanh", "asinh", "acosh", "atanh",
+                                                                       "erf", "erfc", "tgamma", "lgamma"]
+                                            for suffix in ["", "f", "l"]] +
+                                           ["ExpSIMD", "LogSIMD", "SinSIMD", "CosSIMD"]),
+                       ("free", ["ReadSIMD", "WriteSIMD", "ConstSIMD", "IDX2", "IDX3", "IDX3S", "IDX4", "IDX4S", "IDX4pt", "IDX4ptS",
+                                 "sizeof"])]:
+    for func in funcs:
+        function_op_classes[func] = opclass
+
+# Flops per operation; all other operation classes count one flop each
+flops_per_op = {"FMAs": 2, "other_calls": 0}
+
+NUMBER = r"(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?[fFlL]?"
+# A division of two numerical literals (folded by the compiler), either in parentheses or
+#   at the start of a term, e.g., (1.0/3.0)*x or -1.0/2.0*x
+literal_division_regex = re.compile(r"\(\s*" + NUMBER + r"\s*/\s*" + NUMBER + r"\s*\)|(?:(?<=^)|(?<=[-+(,=?:]))\s*"
+                                    + NUMBER + r"\s*/\s*" + NUMBER + r"(?![\w.])")
+token_regex = re.compile(r"(?P<func>[A-Za-z_]\w*)\s*\(|(?P<operand>[A-Za-z_]\w*|" + NUMBER + r")|(?P<close>[)\]])"
+                         r"|(?P<op>[-+*/])|(?P<other>[^\s])")
+array_access_regex = re.compile(r"[A-Za-z_]\w*(?:\s*(?:->|\.)\s*[A-Za-z_]\w*)*\s*\[")
+assignment_regex = re.compile(r"(?<![=!<>+\-*/%&|^])([-+*/]?=)(?!=)")
+integer_decl_regex = re.compile(r"\b(?:int|unsigned|size_t|char|bool|short)\b|\blong\b(?!\s+double)")
+
+def strip_comments_and_directives(Ccode):
+    """ Remove comments and preprocessor directives (including #pragma's) from C code. """
+    Ccode = re.sub(r"/\*.*?\*/", " ", Ccode, flags=re.S)
+    Ccode = re.sub(r"//[^\n]*", " ", Ccode)
+    return re.sub(r"^[ \t]*#(?:[^\n]*\\\n)*[^\n]*", " ", Ccode, flags=re.M)
+
+def matching_bracket(text, start):
+    """ Return the index just past the bracket matching the opening bracket text[start]. """
+    opening = text[start]
+    closing = {"(": ")", "[": "]", "{": "}"}[opening]
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == opening:
+            depth += 1
+        elif text[i] == closing:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return len(text)
+
+def statements_by_loop_depth(Ccode):
+    """ Split C code into statements, each paired with its loop nesting depth.
+
+        >>> statements_by_loop_depth("const double a = b*c; for(int i=0;i<N;i++) { x[i] = a*y[i]; }")
+        [(0, 'const double a = b*c'), (0, 'int i=0'), (1, 'x[i] = a*y[i]')]
+    """
+    statements = []
+    loops_in_frame = []   # For each open brace: the number of for loops it closes
+    pending_loops = 0     # for loops whose body has not yet started
+    start = 0
+    for match in re.finditer(r"\bfor\s*\(|[{};]", Ccode):
+        if match.start() < start:
+            continue
+        token = match.group(0)
+        if token.startswith("for"):
+            # The loop header is not part of the loop body; only its initialization is kept
+            header_end = matching_bracket(Ccode, match.end() - 1)
+            init = Ccode[match.end():header_end - 1].split(";")[0].strip()
+            if init:
+                statements.append((sum(loops_in_frame) + pending_loops, init))
+            pending_loops += 1
+            start = header_end
+        elif token == "{":
+            loops_in_frame.append(pending_loops)
+            pending_loops = 0
+            start = match.end()
+        elif token == "}":
+            if loops_in_frame:
+                loops_in_frame.pop()
+            start = match.end()
+        else:
+            statement = Ccode[start:match.start()].strip()
+            # Strip a leading control statement (e.g., "if (x > 0.0)" or "else")
+            control = re.match(r"(?:else\b\s*)?(?:(?:if|while)\s*\()?", statement)
+            if control.group(0).endswith("("):
+                statement = statement[matching_bracket(statement, control.end() - 1):].strip()
+            elif control.group(0):
+                statement = statement[control.end():].strip()
+            if statement:
+                statements.append((sum(loops_in_frame) + pending_loops, statement))
+            pending_loops = 0
+            start = match.end()
+    return statements
+
+def replace_array_accesses(expr):
+    """ Replace each array access in the C expression expr by a placeholder.
+
+        :arg:    C expression string
+        :return: (expression with accesses replaced, list of (access, is_store) pairs);
+                    the destination of WriteSIMD() is a store, all others are loads
+
+        >>> replace_array_accesses("ReadSIMD(&in_gfs[IDX4S(HDD00GF, i0+1,i1,i2)]) + xx[0][i0]")
+        ('ReadSIMD(&_array_) + _array_', [('in_gfs[IDX4S(HDD00GF,i0+1,i1,i2)]', False), ('xx[0][i0]', False)])
+    """
+    accesses = []
+    pieces = []
+    pos = 0
+    while True:
+        match = array_access_regex.search(expr, pos)
+        if match is None:
+            break
+        end = matching_bracket(expr, match.end() - 1)
+        while end < len(expr) and expr[end] == "[":
+            end = matching_bracket(expr, end)
+        access = re.sub(r"\s+", "", expr[match.start():end])
+        is_store = re.search(r"WriteSIMD\s*\(\s*&\s*$", expr[:match.start()]) is not None
+        accesses.append((access, is_store))
+        pieces.append(expr[pos:match.start()] + "_array_")
+        pos = end
+    pieces.append(expr[pos:])
+    return "".join(pieces), accesses
+
+def array_identity(access):
+    """ Return the array, or (for IDX4-indexed gridfunction arrays) the gridfunction, accessed.
+
+        >>> array_identity("in_gfs[IDX4S(HDD00GF,i0+1,i1,i2)]"), array_identity("xx[0][i0]")
+        ('in_gfs:HDD00GF', 'xx[0]')
+    """
+    base, _, index = access.partition("[")
+    gf = re.match(r"IDX\w*\(([A-Za-z_]\w*)", index)
+    if gf is not None:
+        return base + ":" + gf.group(1)
+    # For multidimensional arrays (e.g., xx[0][i0]), all but the last index select the array
+    return access[:access.rfind("[")] if access.count("[") > 1 else base
+
+def count_expression_ops(expr, counts):
+    """ Add the operations in the C expression expr (with array accesses replaced) to counts. """
+    expr = literal_division_regex.sub(" _literal_ ", expr)
+    previous_is_operand = False
+    for match in token_regex.finditer(expr):
+        kind = match.lastgroup
+        if kind == "func":
+            opclass = function_op_classes.get(match.group("func"), "other_calls")
+            if opclass != "free":
+                counts[opclass] += 1
+            previous_is_operand = False
+        elif kind in ("operand", "close"):
+            previous_is_operand = True
+        elif kind == "op":
+            # A + or - sign is a binary operator only if it follows an operand
+            if previous_is_operand:
+                counts[{"+": "adds", "-": "adds", "*": "muls", "/": "divs"}[match.group("op")]] += 1
+            previous_is_operand = False
+        else:
+            previous_is_operand = False
+
+def bytes_per_REAL_default():
+    return {"float": 4, "double": 8, "long double": 16}.get(par.parval_from_str("PRECISION"), 8)
+
+def Ccode_cost(Ccode, bytes_per_REAL=None):
+    """ Estimate the per-point cost of a C kernel
+
+        :arg:    C code string
+        :arg:    size of a REAL in bytes (default: set by the PRECISION parameter)
+        :return: OrderedDict of operation counts, flops, memory accesses, bytes moved,
+                    and arithmetic intensities, per grid point
+
+        >>> cost = Ccode_cost('''
+        ... for(int i0=0;i0<Nxx0;i0++) {
+        ...   const double uu = in_gfs[IDX4S(UUGF, i0,i1,i2)];
+        ...   const double uu_dD0 = invdx0*((1.0/2.0)*(in_gfs[IDX4S(UUGF, i0+1,i1,i2)] - in_gfs[IDX4S(UUGF, i0-1,i1,i2)]));
+        ...   rhs_gfs[IDX4S(VVGF, i0,i1,i2)] = -uu*uu_dD0 + exp(uu)/sqrt(uu);
+        ... }''', bytes_per_REAL=8)
+        >>> [(key, cost[key]) for key in ["adds", "muls", "divs", "sqrts", "transcendentals", "flops"]]
+        [('adds', 2), ('muls', 3), ('divs', 1), ('sqrts', 1), ('transcendentals', 1), ('flops', 8)]
+        >>> [(key, cost[key]) for key in ["GF_loads", "GF_stores", "bytes", "compulsory_bytes"]]
+        [('GF_loads', 3), ('GF_stores', 1), ('bytes', 32), ('compulsory_bytes', 16)]
+        >>> cost["flops_per_byte"], cost["compulsory_flops_per_byte"]
+        (0.25, 0.5)
+
+        SIMD intrinsics are counted as well:
+        >>> cost = Ccode_cost("const REAL_SIMD_ARRAY a = ReadSIMD(&in_gfs[IDX4S(AGF, i0,i1,i2)]);"
+        ...                   "WriteSIMD(&rhs_gfs[IDX4S(BGF, i0,i1,i2)], FusedMulAddSIMD(a, a, DivSIMD(_Integer_1, a)));")
+        >>> cost["FMAs"], cost["divs"], cost["flops"], cost["GF_loads"], cost["GF_stores"]
+        (1, 1, 3, 1, 1)
+    """
+    if bytes_per_REAL is None:
+        bytes_per_REAL = bytes_per_REAL_default()
+    counts = OrderedDict((key, 0) for key in ["adds", "muls", "FMAs", "divs", "sqrts", "pows",
+                                              "transcendentals", "other_calls"])
+    loads, stores = OrderedDict(), OrderedDict()
+    statements = statements_by_loop_depth(strip_comments_and_directives(Ccode))
+    innermost_depth = max([depth for depth, _statement in statements] + [0])
+    num_statements = 0
+    for depth, statement in statements:
+        if depth != innermost_depth:
+            continue
+        assignment = assignment_regex.search(statement)
+        if assignment is not None:
+            lhs, op, rhs = statement[:assignment.start()], assignment.group(1), statement[assignment.end():]
+        else:
+            lhs, op, rhs = "", "", statement
+        # Integer arithmetic (e.g., index computations) is not counted
+        if integer_decl_regex.search(lhs):
+            continue
+        rhs, accesses = replace_array_accesses(rhs)
+        lhs, lhs_accesses = replace_array_accesses(lhs)
+        if not accesses and not lhs_accesses and re.search(r"[A-Za-z_]", re.sub(NUMBER, "", rhs)) is None:
+            continue  # Purely numerical right-hand side: folded by the compiler
+        num_statements += 1
+        for access, _is_store in lhs_accesses:
+            stores[access] = True
+            if op != "=":
+                loads[access] = True  # Compound assignment: read-modify-write
+        for access, is_store in accesses:
+            (stores if is_store else loads)[access] = True
+        if len(op) == 2:
+            counts[{"+": "adds", "-": "adds", "*": "muls", "/": "divs"}[op[0]]] += 1
+        count_expression_ops(rhs, counts)
+
+    cost = OrderedDict(counts)
+    cost["flops"] = sum(flops_per_op.get(key, 1)*count for key, count in counts.items())
+    cost["statements"] = num_statements
+    cost["loads"] = len(loads)
+    cost["GF_loads"] = sum(1 for access in loads if "gfs" in access.partition("[")[0])
+    cost["stores"] = len(stores)
+    cost["GF_stores"] = sum(1 for access in stores if "gfs" in access.partition("[")[0])
+    cost["bytes"] = bytes_per_REAL*(len(loads) + len(stores))
+    cost["compulsory_bytes"] = bytes_per_REAL*(len(set(array_identity(access) for access in loads)) +
+                                               len(set(array_identity(access) for access in stores)))
+    cost["flops_per_byte"] = float(cost["flops"]) / cost["bytes"] if cost["bytes"] > 0 else float("inf")
+    cost["compulsory_flops_per_byte"] = \
+        float(cost["flops"]) / cost["compulsory_bytes"] if cost["compulsory_bytes"] > 0 else float("inf")
+    return cost
+
+def outputC_cost(sympyexpr, output_varname_str, params=""):
+    """ Estimate the cost of the C code generated by outputC(sympyexpr, output_varname_str, params=params).
+
+        >>> from sympy.abc import x, y
+        >>> cost = outputC_cost([x*y + x/y, x*y*y], ["a", "b"], params="outCverbose=False")
+        >>> cost["adds"], cost["muls"], cost["divs"], cost["flops"]
+        (1, 3, 1, 5)
+    """
+    return Ccode_cost(outC.outputC(sympyexpr, output_varname_str, "returnstring", params=params))
+
+def FD_outputC_cost(sympyexpr_list, params="", upwindcontrolvec=""):
+    """ Estimate the cost of the C code generated by
+        FD_outputC("returnstring", sympyexpr_list, params=params, upwindcontrolvec=upwindcontrolvec). """
+    import finite_difference as fin  # NRPy+: Finite difference C code generation module
+    return Ccode_cost(fin.FD_outputC("returnstring", sympyexpr_list, params=params, upwindcontrolvec=upwindcontrolvec))
+
+def Cfunction_cost(name):
+    """ Estimate the per-point cost of the innermost loop of outC_function_dict[name]. """
+    if name not in outC.outC_function_dict:
+        print("Error: C function \"" + name + "\" not found in outC_function_dict.")
+        sys.exit(1)
+    return Ccode_cost(outC.outC_function_dict[name])
+
+def roofline(cost, peak_GFLOPs, bandwidth_GBs, compulsory=True):
+    """ Predict a kernel's position on the roofline model
+
+        :arg:    cost, as returned by Ccode_cost()
+        :arg:    peak floating-point performance of the machine, in GFLOP/s
+        :arg:    main memory bandwidth of the machine, in GB/s
+        :arg:    use the compulsory (perfect cache reuse) memory traffic, rather than the no-reuse bound
+        :return: (attainable GFLOP/s, "memory-bound" or "compute-bound")
+
+        >>> roofline({"flops_per_byte": 0.5, "compulsory_flops_per_byte": 2.0}, 100.0, 20.0)
+        (40.0, 'memory-bound')
+        >>> roofline({"flops_per_byte": 0.5, "compulsory_flops_per_byte": 20.0}, 100.0, 20.0)
+        (100.0, 'compute-bound')
+    """
+    intensity = cost["compulsory_flops_per_byte" if compulsory else "flops_per_byte"]
+    if intensity*bandwidth_GBs < peak_GFLOPs:
+        return intensity*bandwidth_GBs, "memory-bound"
+    return peak_GFLOPs, "compute-bound"
+
+def cost_table(costs):
+    """ Return a table comparing costs, given a dictionary mapping labels (e.g., code
+        generation options or C function names) to costs returned by Ccode_cost().
+
+        >>> print(cost_table({"a": Ccode_cost("x = y*z + w;", 8)}))
+        kernel                 adds    muls    FMAs    divs   sqrts    pows  transc   flops GF ld/st   flops/B compul. f/B
+        a                         1       1       0       0       0       0       0       2      0/0       inf         inf
+    """
+    lines = ["%-18s %8s%8s%8s%8s%8s%8s%8s%8s %8s %9s %11s"
+             % ("kernel", "adds", "muls", "FMAs", "divs", "sqrts", "pows", "transc", "flops",
+                "GF ld/st", "flops/B", "compul. f/B")]
+    for label, cost in costs.items():
+        lines.append("%-18s %8d%8d%8d%8d%8d%8d%8d%8d %8s %9.3f %11.3f"
+                     % (label, cost["adds"], cost["muls"], cost["FMAs"], cost["divs"], cost["sqrts"], cost["pows"],
+                        cost["transcendentals"], cost["flops"], "%d/%d" % (cost["GF_loads"], cost["GF_stores"]),
+                        cost["flops_per_byte"], cost["compulsory_flops_per_byte"]))
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    import doctest
+    sys.exit(doctest.testmod()[0])
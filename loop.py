@@ -1,7 +1,8 @@
 """ NRPy+ Loop Generation
 
     The following script generate a single or nested loop of arbitrary
-    dimension in C, and has support for cache blocking (loop tiling).
+    dimension in C, and has support for cache blocking (loop tiling)
+    and OpenMP collapse, schedule, and parallel region options.
 """
 # Author: Zachariah B. Etienne
     # Email: zachetie **at** gmail **dot* com
@@ -82,6 +83,18 @@ def loop(idx_var, lower_bound, upper_bound, increment, pragma, padding='', inter
         } // END LOOP: for (int iB = 0; iB < N; iB += 16)
         <BLANKLINE>
 
+        An empty tile size leaves that dimension untiled:
+
+        >>> print(loop(['i', 'j'], ['0', '0'], ['Nx', 'Ny'], ['1', '1'], ['', ''], interior='// <INTERIOR>', tile_size=['', '8']))
+        for (int jB = 0; jB < Ny; jB += 8) {
+            for (int i = 0; i < Nx; i++) {
+                for (int j = jB; j < MIN(Ny, jB + 8); j++) {
+                    // <INTERIOR>
+                } // END LOOP: for (int j = jB; j < MIN(Ny, jB + 8); j++)
+            } // END LOOP: for (int i = 0; i < Nx; i++)
+        } // END LOOP: for (int jB = 0; jB < Ny; jB += 8)
+        <BLANKLINE>
+
         >>> print(loop(['i', 'j'], ['0', '0'], ['Nx', 'Ny'], ['1', '1'], ['', ''], interior='// <INTERIOR>'))
         for (int i = 0; i < Nx; i++) {
             for (int j = 0; j < Ny; j++) {
@@ -102,24 +115,27 @@ def loop(idx_var, lower_bound, upper_bound, increment, pragma, padding='', inter
         if isinstance(tile_size, str): tile_size = [tile_size]
         if len(tile_size) != length:
             raise ValueError('all list parameters must have the same length.')
+    # Loops over tiles (in the dimensions having a nonempty tile size) enclose all other loops
+    ntiled = len([size for size in tile_size if size])
     header_list, footer_list = [], []
     for i in range(length):
-        if len(tile_size) > 0:
+        if tile_size and tile_size[i]:
+            ntiled_outer = len([size for size in tile_size[:i] if size])
             # Generate header and footer for a single loop dimension over each tile
-            ext_header, ext_footer = loop1D(idx_var[i] + 'B', lower_bound[i], upper_bound[i], tile_size[i], '', padding + i*'    ')
+            ext_header, ext_footer = loop1D(idx_var[i] + 'B', lower_bound[i], upper_bound[i], tile_size[i], '', padding + ntiled_outer*'    ')
             # Generate header and footer for a nested loop over the iteration space inside of each tile
             header, footer = loop1D(idx_var[i], idx_var[i] + 'B', 'MIN(%s, %s + %s)' % (upper_bound[i], idx_var[i] + 'B', \
-                tile_size[i]), increment[i], pragma[i], padding + (length + i)*'    ')
-            header_list.insert(i, ext_header)
-            footer_list.insert(i, ext_footer)
+                tile_size[i]), increment[i], pragma[i], padding + (ntiled + i)*'    ')
+            header_list.insert(ntiled_outer, ext_header)
+            footer_list.insert(ntiled_outer, ext_footer)
         else:
             # Generate header and footer for a single loop dimension
-            header, footer = loop1D(idx_var[i], lower_bound[i], upper_bound[i], increment[i], pragma[i], padding + i*'    ')
+            header, footer = loop1D(idx_var[i], lower_bound[i], upper_bound[i], increment[i], pragma[i], padding + (ntiled + i)*'    ')
         header_list.append(header)
         footer_list.append(footer)
     # If loop interior was provided, generate the loop body with appropriate formatting
     if interior:
-        interior = [padding + (length + len(tile_size))*'    ' + line + '\n' for line in interior.split('\n')]
+        interior = [padding + (length + ntiled)*'    ' + line + '\n' for line in interior.split('\n')]
     # Build global looping structure from each generated header/footer
     header = ''.join(header_list)
     footer = ''.join(footer_list[::-1])
@@ -143,6 +159,126 @@ def simple_loop(options, interior):
                 } // END LOOP: for (int i1 = 0; i1 < Nxx_plus_2NGHOSTS1; i1++)
             } // END LOOP: for (int i2 = 0; i2 < Nxx_plus_2NGHOSTS2; i2++)
         <BLANKLINE>
+
+        With 'EnableSIMD', each iteration of the innermost loop processes SIMD_width points,
+        where SIMD_width is #define'd in SIMD/SIMD_intrinsics.h according to the vector width
+        and the precision (e.g., 4 doubles or 8 floats for AVX), so the extent of the i0 loop
+        must be a multiple of SIMD_width.
+
+        >>> print(simple_loop('AllPoints,EnableSIMD,DisableOpenMP', '// <INTERIOR>'))
+            for (int i2 = 0; i2 < Nxx_plus_2NGHOSTS2; i2++) {
+                for (int i1 = 0; i1 < Nxx_plus_2NGHOSTS1; i1++) {
+                    for (int i0 = 0; i0 < Nxx_plus_2NGHOSTS0; i0 += SIMD_width) {
+                        // <INTERIOR>
+                    } // END LOOP: for (int i0 = 0; i0 < Nxx_plus_2NGHOSTS0; i0 += SIMD_width)
+                } // END LOOP: for (int i1 = 0; i1 < Nxx_plus_2NGHOSTS1; i1++)
+            } // END LOOP: for (int i2 = 0; i2 < Nxx_plus_2NGHOSTS2; i2++)
+        <BLANKLINE>
+
+        With 'unroll_i0=N', each iteration of the innermost loop computes N consecutive points,
+        as output by FD_outputC() with FD_unroll_i0=N, so the extent of the i0 loop must be a
+        multiple of N, which is checked at runtime (there is no remainder loop):
+
+        >>> print(simple_loop('InteriorPoints,unroll_i0=4,DisableOpenMP', '// <INTERIOR>'))
+            if(Nxx0 % 4 != 0) {
+                printf("ERROR: loop over i0 unrolled by 4 points, so Nxx0 = %d must be a multiple of 4.\\n", Nxx0);
+                exit(1);
+            }
+            for (int i2 = NGHOSTS; i2 < NGHOSTS+Nxx2; i2++) {
+                for (int i1 = NGHOSTS; i1 < NGHOSTS+Nxx1; i1++) {
+                    for (int i0 = NGHOSTS; i0 < NGHOSTS+Nxx0; i0 += 4) {
+                        // <INTERIOR>
+                    } // END LOOP: for (int i0 = NGHOSTS; i0 < NGHOSTS+Nxx0; i0 += 4)
+                } // END LOOP: for (int i1 = NGHOSTS; i1 < NGHOSTS+Nxx1; i1++)
+            } // END LOOP: for (int i2 = NGHOSTS; i2 < NGHOSTS+Nxx2; i2++)
+        <BLANKLINE>
+
+        With 'StreamingStores', each row of points is followed by StreamFenceSIMD(), which orders
+        the non-temporal stores written by FD_outputC() with SIMD_streaming_stores enabled, before
+        other threads may read them. Such stores must be aligned, and gridfunction memory laid out
+        by grid.py with grid::GridFuncMemAlign > 0 is aligned at i0 = NGHOSTS, so the loop must be
+        over 'InteriorPoints':
+
+        >>> print(simple_loop('InteriorPoints,EnableSIMD,StreamingStores', '// <INTERIOR>'))
+            #pragma omp parallel for
+            for (int i2 = NGHOSTS; i2 < NGHOSTS+Nxx2; i2++) {
+                for (int i1 = NGHOSTS; i1 < NGHOSTS+Nxx1; i1++) {
+                    for (int i0 = NGHOSTS; i0 < NGHOSTS+Nxx0; i0 += SIMD_width) {
+                        // <INTERIOR>
+                    } // END LOOP: for (int i0 = NGHOSTS; i0 < NGHOSTS+Nxx0; i0 += SIMD_width)
+                    StreamFenceSIMD();
+                } // END LOOP: for (int i1 = NGHOSTS; i1 < NGHOSTS+Nxx1; i1++)
+            } // END LOOP: for (int i2 = NGHOSTS; i2 < NGHOSTS+Nxx2; i2++)
+        <BLANKLINE>
+
+        With 'tile_i2=T2' and/or 'tile_i1=T1', the loops over i2 and/or i1 are cache blocked (tiled),
+        with tile sizes given either as integers, or as the names of C variables (e.g., int
+        Cparameters, for tile sizes set at runtime). The loops over tiles are outermost, and
+        are parallelized with OpenMP (as MIN() appears in the loop bounds, it must be #define'd):
+
+        >>> print(simple_loop('InteriorPoints,EnableSIMD,Read_xxs,tile_i1=16,tile_i2=tile_size_i2', '// <INTERIOR>'))
+            #pragma omp parallel for collapse(2)
+            for (int i2B = NGHOSTS; i2B < NGHOSTS+Nxx2; i2B += tile_size_i2) {
+                for (int i1B = NGHOSTS; i1B < NGHOSTS+Nxx1; i1B += 16) {
+                    for (int i2 = i2B; i2 < MIN(NGHOSTS+Nxx2, i2B + tile_size_i2); i2++) {
+                        const REAL NOSIMDxx2 = xx[2][i2]; const REAL_SIMD_ARRAY xx2 = ConstSIMD(NOSIMDxx2);
+                        for (int i1 = i1B; i1 < MIN(NGHOSTS+Nxx1, i1B + 16); i1++) {
+                            const REAL NOSIMDxx1 = xx[1][i1]; const REAL_SIMD_ARRAY xx1 = ConstSIMD(NOSIMDxx1);
+                            for (int i0 = NGHOSTS; i0 < NGHOSTS+Nxx0; i0 += SIMD_width) {
+                                const REAL_SIMD_ARRAY xx0 = ReadSIMD(&xx[0][i0]);
+                                // <INTERIOR>
+                            } // END LOOP: for (int i0 = NGHOSTS; i0 < NGHOSTS+Nxx0; i0 += SIMD_width)
+                        } // END LOOP: for (int i1 = i1B; i1 < MIN(NGHOSTS+Nxx1, i1B + 16); i1++)
+                    } // END LOOP: for (int i2 = i2B; i2 < MIN(NGHOSTS+Nxx2, i2B + tile_size_i2); i2++)
+                } // END LOOP: for (int i1B = NGHOSTS; i1B < NGHOSTS+Nxx1; i1B += 16)
+            } // END LOOP: for (int i2B = NGHOSTS; i2B < NGHOSTS+Nxx2; i2B += tile_size_i2)
+        <BLANKLINE>
+
+        >>> print(simple_loop('AllPoints,Enable_rfm_precompute,tile_i1=8', '// <INTERIOR>'))
+            #pragma omp parallel for collapse(2)
+            for (int i1B = 0; i1B < Nxx_plus_2NGHOSTS1; i1B += 8) {
+                for (int i2 = 0; i2 < Nxx_plus_2NGHOSTS2; i2++) {
+                    #include "rfm_files/rfm_struct__read2.h"
+                    for (int i1 = i1B; i1 < MIN(Nxx_plus_2NGHOSTS1, i1B + 8); i1++) {
+                        #include "rfm_files/rfm_struct__read1.h"
+                        for (int i0 = 0; i0 < Nxx_plus_2NGHOSTS0; i0++) {
+                            #include "rfm_files/rfm_struct__read0.h"
+                            // <INTERIOR>
+                        } // END LOOP: for (int i0 = 0; i0 < Nxx_plus_2NGHOSTS0; i0++)
+                    } // END LOOP: for (int i1 = i1B; i1 < MIN(Nxx_plus_2NGHOSTS1, i1B + 8); i1++)
+                } // END LOOP: for (int i2 = 0; i2 < Nxx_plus_2NGHOSTS2; i2++)
+            } // END LOOP: for (int i1B = 0; i1B < Nxx_plus_2NGHOSTS1; i1B += 8)
+        <BLANKLINE>
+
+        >>> print(simple_loop('AllPoints,Read_xxs,OMP_collapse=2,OMP_schedule=static', '// <INTERIOR>'))
+            #pragma omp parallel for collapse(2) schedule(static)
+            for (int i2 = 0; i2 < Nxx_plus_2NGHOSTS2; i2++) {
+                for (int i1 = 0; i1 < Nxx_plus_2NGHOSTS1; i1++) {
+                    const REAL xx2 = xx[2][i2];
+                    const REAL xx1 = xx[1][i1];
+                    for (int i0 = 0; i0 < Nxx_plus_2NGHOSTS0; i0++) {
+                        const REAL xx0 = xx[0][i0];
+                        // <INTERIOR>
+                    } // END LOOP: for (int i0 = 0; i0 < Nxx_plus_2NGHOSTS0; i0++)
+                } // END LOOP: for (int i1 = 0; i1 < Nxx_plus_2NGHOSTS1; i1++)
+            } // END LOOP: for (int i2 = 0; i2 < Nxx_plus_2NGHOSTS2; i2++)
+        <BLANKLINE>
+
+        >>> print(simple_loop('InteriorPoints,OMP_in_parallel_region,OMP_collapse=3,OMP_schedule=dynamic,OMP_chunk_size=64', '// <INTERIOR>'))
+            #pragma omp for collapse(3) schedule(dynamic,64)
+            for (int i2 = NGHOSTS; i2 < NGHOSTS+Nxx2; i2++) {
+                for (int i1 = NGHOSTS; i1 < NGHOSTS+Nxx1; i1++) {
+                    for (int i0 = NGHOSTS; i0 < NGHOSTS+Nxx0; i0++) {
+                        // <INTERIOR>
+                    } // END LOOP: for (int i0 = NGHOSTS; i0 < NGHOSTS+Nxx0; i0++)
+                } // END LOOP: for (int i1 = NGHOSTS; i1 < NGHOSTS+Nxx1; i1++)
+            } // END LOOP: for (int i2 = NGHOSTS; i2 < NGHOSTS+Nxx2; i2++)
+        <BLANKLINE>
+
+        >>> simple_loop('AllPoints,OMP_collapse=2,tile_i1=8', '// <INTERIOR>')
+        Traceback (most recent call last):
+        ...
+        ValueError: OMP_collapse cannot be combined with tile_i1 or tile_i2 (the loops over tiles are collapsed).
     """
     if not options: return interior
 
@@ -167,7 +303,10 @@ def simple_loop(options, interior):
             Read_1Darrays = ["const REAL xx0 = xx[0][i0];",
                              "const REAL xx1 = xx[1][i1];",
                              "const REAL xx2 = xx[2][i2];", ]
-        else: raise ValueError('no SIMD support for Read_xxs (currently).')
+        else:
+            Read_1Darrays = ["const REAL_SIMD_ARRAY xx0 = ReadSIMD(&xx[0][i0]);",
+                             "const REAL NOSIMDxx1 = xx[1][i1]; const REAL_SIMD_ARRAY xx1 = ConstSIMD(NOSIMDxx1);",
+                             "const REAL NOSIMDxx2 = xx[2][i2]; const REAL_SIMD_ARRAY xx2 = ConstSIMD(NOSIMDxx2);", ]
     # 'Enable_rfm_precompute': enable pre-computation of reference metric
     if "Enable_rfm_precompute" in options:
         if "Read_xxs" in options:
@@ -181,17 +320,125 @@ def simple_loop(options, interior):
                              "#include \"rfm_files/rfm_struct__read1.h\"",
                              "#include \"rfm_files/rfm_struct__read2.h\""]
     # 'DisableOpenMP': disable loop parallelization using OpenMP
+    omp_clauses = True
     if "DisableOpenMP" in options:
         pragma = ""
     # 'OMP_custom_pragma': enable loop parallelization using OpenMP with custom pragma
     elif "OMP_custom_pragma" in options:
         pragma = re.search(r'OMP_custom_pragma=[\'\"](.+)[\'\"]', options).group(1)
+        omp_clauses = False
+    # 'OMP_in_parallel_region': only share the loop among the threads of an enclosing parallel
+    #   region (see omp_parallel_region()), such that several kernels may share a single region
+    elif "OMP_in_parallel_region" in options:
+        pragma = "#pragma omp for"
     else:
         pragma = "#pragma omp parallel for"
+    # 'OMP_collapse=N': parallelize over the N outermost loops (i2, or i2 & i1, or i2, i1 & i0)
+    ncollapse = 1
+    if "OMP_collapse=" in options:
+        ncollapse = int(re.search(r'OMP_collapse=(\d+)', options).group(1))
+        if ncollapse not in (1, 2, 3):
+            raise ValueError('OMP_collapse must be 1, 2, or 3.')
+    # 'OMP_schedule=KIND' (static, dynamic, guided, auto, or runtime), with optional 'OMP_chunk_size=N'
+    schedule = ""
+    if "OMP_schedule=" in options:
+        kind = re.search(r'OMP_schedule=(\w+)', options).group(1)
+        if kind not in ("static", "dynamic", "guided", "auto", "runtime"):
+            raise ValueError('unsupported OMP_schedule: ' + kind)
+        chunk_size = re.search(r'OMP_chunk_size=(\w+)', options)
+        schedule = " schedule(" + kind + ("," + chunk_size.group(1) if chunk_size else "") + ")"
+    elif "OMP_chunk_size=" in options:
+        raise ValueError('OMP_chunk_size requires OMP_schedule.')
+    if (ncollapse > 1 or schedule) and not omp_clauses:
+        raise ValueError('OMP_collapse and OMP_schedule cannot be combined with OMP_custom_pragma.')
     increment = ["1", "1", "SIMD_width"] if "EnableSIMD" in options else ["1","1","1"]
+    # 'unroll_i0=N': each iteration computes N consecutive points in i0 (see the outputC parameter FD_unroll_i0)
+    if "unroll_i0=" in options:
+        if "EnableSIMD" in options:
+            raise ValueError('unroll_i0 is not supported with EnableSIMD.')
+        increment[2] = re.search(r'unroll_i0=(\d+)', options).group(1)
+        # The extent of the i0 loop, e.g., Nxx0 for NGHOSTS <= i0 < NGHOSTS+Nxx0:
+        i0_extent = i2i1i0_maxs[2]
+        if i2i1i0_mins[2] != "0":
+            i0_extent = i0_extent[len(i2i1i0_mins[2] + "+"):] if i0_extent.startswith(i2i1i0_mins[2] + "+") \
+                else "(" + i0_extent + " - " + i2i1i0_mins[2] + ")"
+
+    # 'tile_i2=T2', 'tile_i1=T1': cache blocking (loop tiling) in i2 and/or i1, where each tile size
+    #   is either an integer or the name of a C variable (e.g., an int Cparameter) set at runtime
+    tile_size = ["", "", ""]
+    for i, dirn in enumerate(["2", "1"]):
+        tile = re.search(r'tile_i' + dirn + r'=(\w+)', options)
+        if tile:
+            tile_size[i] = tile.group(1)
 
-    return loop(["i2","i1","i0"], i2i1i0_mins, i2i1i0_maxs, increment, [pragma, Read_1Darrays[2], Read_1Darrays[1]], \
-        padding='    ', interior=Read_1Darrays[0] + ("\n" if Read_1Darrays[0] else "") + interior)
+    if tile_size == ["", "", ""]:
+        # Collapsed loops must be perfectly nested, so the 1D array reads in the
+        #   bodies of the outer collapsed loops move into the body of the innermost one.
+        if ncollapse > 1:
+            inner = 3 - ncollapse
+            Read_1Darrays[inner] = "\n".join([Read_1Darrays[i] for i in range(2, inner - 1, -1) if Read_1Darrays[i]])
+            for i in range(inner + 1, 3):
+                Read_1Darrays[i] = ""
+        if ncollapse == 3 and "StreamingStores" in options:
+            raise ValueError('OMP_collapse=3 cannot be combined with StreamingStores.')
+        if pragma:
+            pragma += (" collapse(" + str(ncollapse) + ")" if ncollapse > 1 else "") + schedule
+        interior = Read_1Darrays[0] + ("\n" if Read_1Darrays[0] else "") + interior
+        loop_str = loop(["i2","i1","i0"], i2i1i0_mins, i2i1i0_maxs, increment,
+                        [pragma, Read_1Darrays[2], Read_1Darrays[1].replace("\n", "\n" + 3*'    ')], \
+            padding='    ', interior=interior)
+    else:
+        if "OMP_collapse=" in options:
+            raise ValueError('OMP_collapse cannot be combined with tile_i1 or tile_i2 (the loops over tiles are collapsed).')
+        # Parallelize over tiles: the loops over tiles, and the i2 loop if untiled, are perfectly nested
+        #   (the i2 loop within a tile depends on i2B, so cannot be collapsed with the loops over tiles).
+        interior = Read_1Darrays[0] + ("\n" if Read_1Darrays[0] else "") + interior
+        loop_str = loop(["i2","i1","i0"], i2i1i0_mins, i2i1i0_maxs, increment, ["", Read_1Darrays[2], Read_1Darrays[1]], \
+            padding='    ', interior=interior, tile_size=tile_size)
+        ncollapse = len([size for size in tile_size if size]) + (1 if tile_size[0] == "" else 0)
+        if pragma and omp_clauses:
+            pragma += (" collapse(" + str(ncollapse) + ")" if ncollapse > 1 else "") + schedule
+        if pragma:
+            loop_str = '    ' + pragma + '\n' + loop_str
+    # 'StreamingStores': fence the non-temporal stores written in each row of points
+    if "StreamingStores" in options:
+        if "EnableSIMD" not in options or "InteriorPoints" not in options:
+            raise ValueError('StreamingStores requires EnableSIMD and InteriorPoints.')
+        i0_footer = re.search(r'\n( *)\} // END LOOP: for \(int i0 .*\n', loop_str)
+        loop_str = loop_str.replace(i0_footer.group(0), i0_footer.group(0) + i0_footer.group(1) + 'StreamFenceSIMD();\n')
+    # 'unroll_i0=N': there is no remainder loop, so stop if the extent of the i0 loop is not a multiple of N
+    if "unroll_i0=" in options:
+        loop_str = '    if(' + i0_extent + ' % ' + increment[2] + ' != 0) {\n' + \
+                   '        printf("ERROR: loop over i0 unrolled by ' + increment[2] + ' points, so ' + i0_extent + \
+                   ' = %d must be a multiple of ' + increment[2] + '.\\n", ' + i0_extent + ');\n' + \
+                   '        exit(1);\n    }\n' + loop_str
+    return loop_str
+
+def omp_parallel_region(body, clauses=""):
+    """ Enclose C code (e.g., several loops generated with the simple_loop() option
+        'OMP_in_parallel_region') in a single OpenMP parallel region, such that
+        the threads are created once for all loops, rather than once per loop.
+
+        :arg:    C code inside of the parallel region
+        :arg:    clauses of the parallel construct (e.g., 'proc_bind(close)')
+        :return: string of the parallel region
+
+        >>> print(omp_parallel_region(simple_loop('AllPoints,OMP_in_parallel_region,OMP_schedule=static', '// <INTERIOR>')))
+        #pragma omp parallel
+        {
+            #pragma omp for schedule(static)
+            for (int i2 = 0; i2 < Nxx_plus_2NGHOSTS2; i2++) {
+                for (int i1 = 0; i1 < Nxx_plus_2NGHOSTS1; i1++) {
+                    for (int i0 = 0; i0 < Nxx_plus_2NGHOSTS0; i0++) {
+                        // <INTERIOR>
+                    } // END LOOP: for (int i0 = 0; i0 < Nxx_plus_2NGHOSTS0; i0++)
+                } // END LOOP: for (int i1 = 0; i1 < Nxx_plus_2NGHOSTS1; i1++)
+            } // END LOOP: for (int i2 = 0; i2 < Nxx_plus_2NGHOSTS2; i2++)
+        } // END OMP PARALLEL REGION
+        <BLANKLINE>
+    """
+    if not body.endswith('\n'): body += '\n'
+    return '#pragma omp parallel' + (' ' + clauses if clauses else '') + '\n{\n' + body + '} // END OMP PARALLEL REGION\n'
 
 if __name__ == "__main__":
     import doctest
@@ -10,29 +10,63 @@
 #           list of symbols imported when
 #           "from outputC import *" is called.
 __all__ = ['lhrh', 'outCparams', 'nrpyAbs', 'superfast_uniq', 'check_if_string__error_if_not',
-           'outputC','parse_outCparams_string',
+           'CcodeWriter', 'outputC','parse_outCparams_string',
            'outC_function_prototype_dict', 'outC_function_dict', 'Cfunction', 'add_to_Cfunction_dict', 'outCfunction']
 
 import loop as lp                             # NRPy+: C code loop interface
 import NRPy_param_funcs as par                # NRPy+: parameter interface
 from SIMD import expr_convert_to_SIMD_intrins # NRPy+: SymPy expression => SIMD intrinsics interface
-from cse_helpers import cse_preprocess,cse_postprocess  # NRPy+: CSE preprocessing and postprocessing
+from cse_helpers import cse_preprocess,cse_postprocess,cse_parallel,cse_dag,cse_hoist_reciprocals,cse_lower_powers,cse_schedule,max_live_temporaries,symbol_occurrences  # NRPy+: CSE preprocessing, postprocessing, parallel and DAG-based CSE, division hoisting, power lowering, scheduling
+from cse_helpers import addition_chain,split_power # NRPy+: Integer & rational powers by multiplication, sqrt(), and cbrt()
+import outputC_cache as occ                   # NRPy+: Persistent on-disk cache for outputC() results
+import codegen_profiler as prof               # NRPy+: Code generation stage profiler
 import sympy as sp                            # SymPy: The Python computer algebra package upon which NRPy+ depends
 import re, sys, os                            # Standard Python: regular expressions, system, and multiplatform OS funcs
-from collections import namedtuple            # Standard Python: Enable namedtuple data type
+from collections import namedtuple, OrderedDict, Counter # Standard Python: Enable namedtuple, ordered dictionary, and counter data types
 
 lhrh = namedtuple('lhrh', 'lhs rhs')
-outCparams = namedtuple('outCparams', 'preindent includebraces declareoutputvars outCfileaccess outCverbose CSE_enable CSE_varprefix CSE_sorting CSE_preprocess SIMD_enable SIMD_find_more_subs SIMD_find_more_FMAsFMSs SIMD_debug enable_TYPE gridsuffix')
+outCparams = namedtuple('outCparams', 'preindent includebraces declareoutputvars outCfileaccess outCverbose CSE_enable CSE_varprefix CSE_sorting CSE_preprocess CSE_engine CSE_parallel_workers CSE_parallel_ordering CSE_hoist_reciprocals CSE_lower_powers CSE_schedule lower_powers SIMD_enable SIMD_find_more_subs SIMD_find_more_FMAsFMSs SIMD_debug SIMD_aligned_gfs SIMD_streaming_stores FD_unroll_i0 enable_TYPE gridsuffix')
 
 # Sometimes SymPy has problems evaluating complicated expressions involving absolute
 #    values, resulting in hangs. So instead of using sp.Abs(), if we instead use
 #    nrpyAbs, we can sidestep the internal SymPy evaluation and force the C
 #    codegen to output our desired fabs().
 nrpyAbs = sp.Function('nrpyAbs')
+
+def Ccode_power(b, e):
+    """ C code for b**e, given the C code for b and for an integer or a rational exponent e
+        (see split_power()), with the integer power of b computed in an addition chain (see
+        addition_chain()) and the roots by sqrt() and cbrt(). Repeated factors, e.g., (b)*(b)
+        in b**4 = ((b)*(b))*((b)*(b)), are computed once by the C compiler. Used with the outCparam
+        lower_powers="True" (see custom_functions_for_SymPy_ccode_lower_powers below).
+
+        >>> print(Ccode_power('x', '4'))
+        ((x)*(x)*((x)*(x)))
+        >>> print(Ccode_power('x', '-3.0/2.0'))
+        (1.0/((x)*sqrt(x)))
+        >>> print(Ccode_power('x + 1', '2.0/3.0'))
+        (cbrt(x + 1)*cbrt(x + 1))
+        >>> print(Ccode_power('x', '-5.0L/2.0L'))
+        (1.0/((x)*(x)*sqrt(x)))
+    """
+    # SymPy prints a rational exponent p/q as "p.0/q.0", or with a type suffix, e.g., "p.0L/q.0L"
+    n, roots, negative = split_power(sp.Rational(re.sub(r'(\d+)\.0*[FfLl]?', r'\1', e.replace(' ', ''))))
+    factors = []
+    if n > 0:
+        powers = {1: '(' + b + ')'}
+        for k, (i, j) in addition_chain([n]).items():
+            powers[k] = powers[i] + '*' + (powers[j] if j == 1 else '(' + powers[j] + ')')
+        factors.append(powers[n])
+    root = {sp.Rational(1, 2): 'sqrt(%s)', sp.Rational(1, 3): 'cbrt(%s)',
+            sp.Rational(1, 4): 'sqrt(sqrt(%s))', sp.Rational(1, 6): 'sqrt(cbrt(%s))'}
+    factors += [root[exponent] % b for exponent in roots]
+    power = '(' + '*'.join(factors) + ')'
+    return '(1.0/' + power + ')' if negative else power
+
 custom_functions_for_SymPy_ccode = {
     "nrpyAbs": "fabs",
-    'Pow': [(lambda b, e: e == 0.5, lambda b, e: 'sqrt(%s)'     % (b)),
-            (lambda b, e: e ==-0.5, lambda b, e: '(1.0/sqrt(%s))'     % (b)),
+    'Pow': [(lambda b, e: e == sp.S.Half or e == 0.5, lambda b, e: 'sqrt(%s)'     % (b)),
+            (lambda b, e: e ==-sp.S.Half or e ==-0.5, lambda b, e: '(1.0/sqrt(%s))'     % (b)),
             (lambda b, e: e == sp.S.One/3, lambda b, e: 'cbrt(%s)' % (b)),
             (lambda b, e: e ==-sp.S.One/3, lambda b, e: '(1.0/cbrt(%s))' % (b)),
             (lambda b, e: e == 2, lambda b, e: '((%s)*(%s))'                % (b,b)),
@@ -48,6 +82,18 @@ custom_functions_for_SymPy_ccode = {
 ##    (lambda b, e: e != 2, 'pow')]
 }
 
+# With the outCparam lower_powers="True": integer powers (in addition chains), and rational powers
+#   with denominator 2, 3, 4, or 6 (e.g., b**(3/2), b**(2/3)), by multiplication, sqrt(), and cbrt();
+#   above |e| = 16, pow() is shorter and nearly as fast. The results may differ from those with
+#   custom_functions_for_SymPy_ccode by a few units in the last place.
+custom_functions_for_SymPy_ccode_lower_powers = {
+    "nrpyAbs": "fabs",
+    'Pow': custom_functions_for_SymPy_ccode['Pow'][:4] +
+           [(lambda b, e: e ==-1, lambda b, e: '(1.0/(%s))'                       % (b)),
+            (lambda b, e: split_power(e) is not None and abs(e) <= 16, lambda b, e: Ccode_power(b, e)),
+            (lambda b, e: True, 'pow')]
+}
+
 # Parameter initialization is called once, within nrpy.py.
 par.initialize_param(par.glb_param("char", __name__, "PRECISION", "double")) # __name__ = "outputC", this module's name.
 # par.initialize_param(par.glb_param("bool", thismodule, "SIMD_enable", False))
@@ -68,9 +114,92 @@ def check_if_string__error_if_not(allegedstring,stringdesc):
         print("ERROR: "+str(stringdesc)+" =="+str(allegedstring)+" not a string!")
         sys.exit(1)
 
-def ccode_postproc(string):
-    PRECISION = par.parval_from_str("PRECISION")
-
+class StringBuffer:
+    """ In-memory string buffer, joined once by getvalue(). Unlike io.StringIO,
+        accepts str on both Python 2 and Python 3.
+
+        >>> buf = StringBuffer()
+        >>> buf.write("a = 1;\\n")
+        >>> buf.write("b = 2;")
+        >>> print(buf.getvalue())
+        a = 1;
+        b = 2;
+    """
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, string):
+        self.chunks.append(string)
+
+    def getvalue(self):
+        if len(self.chunks) > 1:
+            self.chunks = ["".join(self.chunks)]
+        return self.chunks[0] if self.chunks else ""
+
+class CcodeWriter:
+    """ Stream C code to a file handle or to an in-memory buffer.
+
+        Emitting C code through a CcodeWriter, rather than by repeated
+        string concatenation, keeps memory usage and runtime linear in
+        the size of the generated code, and allows C code to be written
+        to a file as it is generated.
+
+        :arg:    file handle or any object with a write() method
+                    (default: a new in-memory StringBuffer)
+        :arg:    indentation prepended to each line written
+
+        >>> writer = CcodeWriter()
+        >>> inner = writer.indented("  ")
+        >>> writer.write("{\\n")
+        >>> inner.write("const double a = 1.0;\\nconst double b = ")
+        >>> inner.write("2.0;\\n")
+        >>> writer.write("}\\n")
+        >>> print(writer.getvalue().rstrip("\\n"))
+        {
+          const double a = 1.0;
+          const double b = 2.0;
+        }
+    """
+    def __init__(self, stream=None, indent=""):
+        self.stream = StringBuffer() if stream is None else stream
+        self.indent = indent
+        self.at_line_start = True
+
+    def write(self, Ccode):
+        if not self.indent:
+            self.stream.write(Ccode)
+            return
+        for line in Ccode.splitlines(True):
+            if self.at_line_start:
+                self.stream.write(self.indent)
+            self.stream.write(line)
+            self.at_line_start = line.endswith("\n")
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def indented(self, indent):
+        """ Return a CcodeWriter streaming to the same destination, with additional indentation. """
+        return CcodeWriter(self.stream, self.indent + indent)
+
+    def getvalue(self):
+        """ Return the C code written so far (in-memory buffers only). """
+        return self.stream.getvalue()
+
+def is_Ccode_stream(dest):
+    """ Return True if dest is a CcodeWriter, file handle, or other object with a write() method """
+    return hasattr(dest, "write")
+
+# ccode_postproc() rewrites C math library function calls and SymPy's long-double
+#   rational literals in a single regular-expression pass over each string.
+#   The compiled regex depends only on PRECISION, so it is built once per PRECISION.
+cmath_functions = ['pow', 'sqrt', 'sin', 'cos', 'tan', 'sinh', 'cosh', 'tanh', 'exp', 'log', 'fabs']
+ccode_postproc_regex_dict = {}
+
+def ccode_postproc_regex(PRECISION):
+    if PRECISION in ccode_postproc_regex_dict:
+        return ccode_postproc_regex_dict[PRECISION]
     # In the C math library, e.g., pow(x,y) assumes x and y are doubles, and returns a double.
     #  If x and y are floats, then for consistency should use powf(x,y) instead.
     #  Similarly, in the case of x and y being long doubles, should use powl(x,y) for consistency.
@@ -86,18 +215,48 @@ def ccode_postproc(string):
         print("Error: "+__name__+"::PRECISION = \""+ PRECISION +"\" not supported")
         sys.exit(1)
     # ... then we append the above suffix to standard C math library functions:
-    for func in ['pow', 'sqrt', 'sin', 'cos', 'tan', 'sinh', 'cosh', 'tanh', 'exp', 'log', 'fabs']:
-        string2 = re.sub(func+r'\(', func + cmathsuffix+"(", string); string = string2
-
+    cmathfunc_pattern = r'(?P<func>' + '|'.join(cmath_functions) + r')\('
     # Finally, SymPy prefers to output Rationals as long-double fractions.
     #  E.g., Rational(1,3) is output as 1.0L/3.0L.
     #  The Intel compiler vectorizer complains miserably about this,
     #  and strictly speaking it is useless when we're in double precision.
     # So here we get rid of the "L" suffix on floating point numbers:
-    if PRECISION!="long double":
-        string2 = re.sub(r'([0-9.]+)L/([0-9.]+)L', '(\\1 / \\2)', string); string = string2
+    rational_pattern = r'(?P<num>[0-9.]+)L/(?P<den>[0-9.]+)L'
+
+    if PRECISION == "double":
+        regex = re.compile(rational_pattern)
+    elif PRECISION == "long double":
+        regex = re.compile(cmathfunc_pattern)
+    else:
+        # Function names consist only of lowercase letters and rational literals
+        #   only of digits, periods, "L", and "/", so matches of the two patterns
+        #   never overlap; further, no function name is a suffix of another. Thus a
+        #   single left-to-right pass gives exactly the same result as one re.sub()
+        #   per function followed by one re.sub() for the rationals.
+        regex = re.compile(cmathfunc_pattern + '|' + rational_pattern)
+
+    # (A replacement function is faster here than a replacement template string.)
+    def replace(match):
+        if match.lastgroup == "func":
+            return match.group("func") + cmathsuffix + "("
+        return "(" + match.group("num") + " / " + match.group("den") + ")"
+    ccode_postproc_regex_dict[PRECISION] = (regex, replace)
+    return regex, replace
 
-    return string
+def ccode_postproc(string):
+    """ Post-process C code output by sp.ccode(), according to the PRECISION parameter.
+
+    >>> import NRPy_param_funcs as par
+    >>> for PRECISION in ["double", "float", "long double"]:
+    ...     par.set_parval_from_str("PRECISION", PRECISION)
+    ...     print(ccode_postproc("x = asin(pow(a, 1.0L/3.0L)) + sinh(2.5L/7L) + fabs(b);"))
+    x = asin(pow(a, (1.0 / 3.0))) + sinh((2.5 / 7)) + fabs(b);
+    x = asinf(powf(a, (1.0 / 3.0))) + sinhf((2.5 / 7)) + fabsf(b);
+    x = asinl(powl(a, 1.0L/3.0L)) + sinhl(2.5L/7L) + fabsl(b);
+    >>> par.set_parval_from_str("PRECISION", "double")
+    """
+    regex, replace = ccode_postproc_regex(par.parval_from_str("PRECISION"))
+    return regex.sub(replace, string)
 
 def parse_outCparams_string(params):
     # Default values:
@@ -110,10 +269,25 @@ def parse_outCparams_string(params):
     CSE_sorting = "canonical"
     CSE_varprefix = "tmp"
     CSE_preprocess = "False"
+    CSE_engine = "sympy" # "sympy" (SymPy's cse()) or "DAG" (global value numbering over a hash-consed DAG; faster on large inputs)
+    CSE_parallel_workers = "1" # Number of processes for parallel CSE; "1" disables parallel CSE, "0" uses all CPUs
+    CSE_parallel_ordering = "deterministic" # "deterministic" or "fastest" (CSE temporary numbering may vary between runs)
+    CSE_hoist_reciprocals = "False" # Compute each repeated denominator's reciprocal once (divisions become multiplications; see cse_hoist_reciprocals() for the accuracy impact)
+    CSE_lower_powers = "False" # Compute the intermediate powers (e.g., b**2, sqrt(b)) shared by powers of the same base once (see cse_lower_powers())
+    CSE_schedule = "False" # Reorder CSE temporaries & outputs to shorten live ranges (reduces register pressure)
+    lower_powers = "False" # Compute integer powers in addition chains, and rational powers like b**(3/2) with sqrt() & cbrt() rather than pow()
+                           #   (scalar & SIMD; may change results by a few units in the last place; see Ccode_power())
     SIMD_enable = "False"
     SIMD_find_more_subs = "False"
-    SIMD_find_more_FMAsFMSs = "True" # Finding too many FMAs/FMSs can degrade performance; currently tuned to optimize BSSN
+    SIMD_find_more_FMAsFMSs = "True" # Finding too many FMAs/FMSs can degrade performance; currently tuned to optimize BSSN.
+                                     #   "CostModel" chooses the FMAs in each sum by estimated operation count and
+                                     #   latency instead (see SIMD.contract_FMAs_by_cost()), for any kernel.
     SIMD_debug = "False"
+    SIMD_aligned_gfs = "False" # FD_outputC(): read & write gridfunctions at i0 with aligned loads & stores (requires grid::GridFuncMemAlign > 0)
+    SIMD_streaming_stores = "False" # FD_outputC(): write output-only gridfunctions with non-temporal stores, bypassing the cache
+                                    #   (requires grid::GridFuncMemAlign > 0, and the "StreamingStores" loop option; see loop.py)
+    FD_unroll_i0 = "1" # FD_outputC(): compute this many consecutive points in i0, sharing the values read from memory
+                       #   (without SIMD; requires the "unroll_i0" loop option; see finite_difference_helpers.unroll_i0())
     enable_TYPE = "True"
     gridsuffix = ""
 
@@ -162,6 +336,29 @@ def parse_outCparams_string(params):
                 CSE_sorting = value[i]
             elif parname == "CSE_preprocess":
                 CSE_preprocess = value[i]
+            elif parname == "CSE_engine":
+                if value[i] not in ('sympy', 'DAG'):
+                    print("Error: CSE_engine must be set to \"sympy\" or \"DAG\", not \""+value[i]+"\".")
+                    sys.exit(1)
+                CSE_engine = value[i]
+            elif parname == "CSE_parallel_workers":
+                if not value[i].isdigit():
+                    print("Error: CSE_parallel_workers must be set to a nonnegative integer; "+value[i]+" is not.")
+                    sys.exit(1)
+                CSE_parallel_workers = value[i]
+            elif parname == "CSE_parallel_ordering":
+                if value[i] not in ('deterministic', 'fastest'):
+                    print("Error: CSE_parallel_ordering must be set to \"deterministic\" or \"fastest\", not \""+value[i]+"\".")
+                    sys.exit(1)
+                CSE_parallel_ordering = value[i]
+            elif parname == "CSE_hoist_reciprocals":
+                CSE_hoist_reciprocals = value[i]
+            elif parname == "CSE_lower_powers":
+                CSE_lower_powers = value[i]
+            elif parname == "CSE_schedule":
+                CSE_schedule = value[i]
+            elif parname == "lower_powers":
+                lower_powers = value[i]
             elif parname == "SIMD_enable":
                 SIMD_enable = value[i]
             elif parname == "SIMD_find_more_subs":
@@ -170,6 +367,12 @@ def parse_outCparams_string(params):
                 SIMD_find_more_FMAsFMSs = value[i]
             elif parname == "SIMD_debug":
                 SIMD_debug = value[i]
+            elif parname == "SIMD_aligned_gfs":
+                SIMD_aligned_gfs = value[i]
+            elif parname == "SIMD_streaming_stores":
+                SIMD_streaming_stores = value[i]
+            elif parname == "FD_unroll_i0":
+                FD_unroll_i0 = value[i]
             elif parname == "enable_TYPE":
                 enable_TYPE = value[i]
             elif parname == "GoldenKernelsEnable" and value[i] == "True":
@@ -198,7 +401,8 @@ def parse_outCparams_string(params):
 
     return outCparams(preindent,includebraces,declareoutputvars,outCfileaccess,outCverbose,
                       CSE_enable,CSE_varprefix,CSE_sorting,CSE_preprocess,
-                      SIMD_enable,SIMD_find_more_subs,SIMD_find_more_FMAsFMSs,SIMD_debug,
+                      CSE_engine,CSE_parallel_workers,CSE_parallel_ordering,CSE_hoist_reciprocals,CSE_lower_powers,CSE_schedule,lower_powers,
+                      SIMD_enable,SIMD_find_more_subs,SIMD_find_more_FMAsFMSs,SIMD_debug,SIMD_aligned_gfs,SIMD_streaming_stores,FD_unroll_i0,
                       enable_TYPE,gridsuffix)
 
 # Input: sympyexpr = a single SymPy expression *or* a list of SymPy expressions
@@ -216,19 +420,24 @@ def outputC(sympyexpr, output_varname_str, filename = "stdout", params = "", pre
     # Step 0: Initialize
     #  commentblock: comment block containing the input SymPy string,
     #                set only if outCverbose==True
-    #  outstring:    the output C code string
-    commentblock = ""
-    outstring = ""
+    #  outlines:     the output C code, as a list of lines (joined or
+    #                streamed only once all lines are generated)
+    commentblock = []
+    outlines = []
 
-    # Step 1: If SIMD_enable==True, then check if TYPE=="double". If not, error out.
+    # Step 1: If SIMD_enable==True, then check if TYPE=="double" or "float". If not, error out.
     #         Otherwise set TYPE="REAL_SIMD_ARRAY", which should be #define'd
     #         within the C code. For example for AVX-256, the C code should have
-    #         #define REAL_SIMD_ARRAY __m256d
+    #         #define REAL_SIMD_ARRAY __m256d (double) or __m256 (float), as in
+    #         SIMD/SIMD_intrinsics.h. SIMD constants are then set from scalars of
+    #         type SIMD_const_TYPE (the PRECISION), e.g.,
+    #         const float tmp_Integer_1 = 1.0; const REAL_SIMD_ARRAY _Integer_1 = ConstSIMD(tmp_Integer_1);
+    SIMD_const_TYPE = par.parval_from_str("PRECISION")
     if outCparams.SIMD_enable == "True":
-        if TYPE not in ('double', ''):
-            print("SIMD output currently only supports double precision or typeless. Sorry!")
+        if TYPE not in ('double', 'float', ''):
+            print("SIMD output currently only supports double precision, single precision, or typeless. Sorry!")
             sys.exit(1)
-        if TYPE == "double":
+        if TYPE in ('double', 'float'):
             TYPE = "REAL_SIMD_ARRAY"
 
     # Step 2a: Apply sanity checks when either sympyexpr or
@@ -258,27 +467,27 @@ def outputC(sympyexpr, output_varname_str, filename = "stdout", params = "", pre
     # Step 3: If outCparams.verbose = True, then output the original SymPy
     #         expression(s) in code comments prior to actual C code
     if outCparams.outCverbose == "True":
-        commentblock += preindent+"/*\n"+preindent+" *  Original SymPy expression"
+        commentblock.append(preindent+"/*\n"+preindent+" *  Original SymPy expression")
         if len(output_varname_str)>1:
-            commentblock += "s"
-        commentblock += ":\n"
+            commentblock.append("s")
+        commentblock.append(":\n")
         for i, varname in enumerate(output_varname_str):
             if i == 0:
                 if len(output_varname_str) != 1:
-                    commentblock += preindent+" *  \"["
+                    commentblock.append(preindent+" *  \"[")
                 else:
-                    commentblock += preindent+" *  \""
+                    commentblock.append(preindent+" *  \"")
             else:
-                commentblock += preindent+" *    "
-            commentblock += varname + " = " + str(sympyexpr[i])
+                commentblock.append(preindent+" *    ")
+            commentblock.append(varname + " = " + str(sympyexpr[i]))
             if i == len(output_varname_str)-1:
                 if len(output_varname_str) != 1:
-                    commentblock += "]\"\n"
+                    commentblock.append("]\"\n")
                 else:
-                    commentblock += "\"\n"
+                    commentblock.append("\"\n")
             else:
-                commentblock += ",\n"
-        commentblock += preindent+" */\n"
+                commentblock.append(",\n")
+        commentblock.append(preindent+" */\n")
 
     # Step 4: Add proper indentation of C code:
     if outCparams.includebraces == "True":
@@ -300,26 +509,42 @@ def outputC(sympyexpr, output_varname_str, filename = "stdout", params = "", pre
     #         though with support for float & long double types
     #         as well.
     SIMD_RATIONAL_decls = RATIONAL_decls = ""
-
-    if outCparams.CSE_enable == "False":
+    Ccode_user_functions = custom_functions_for_SymPy_ccode
+    if outCparams.lower_powers == "True":
+        Ccode_user_functions = custom_functions_for_SymPy_ccode_lower_powers
+
+    # Step 6.0: If the outputC cache is enabled, then look up the C code
+    #           generated by an identical previous call to outputC().
+    #           On a cache hit, all symbolic work in Step 6 is skipped.
+    cachekey = cached_entry = None
+    if occ.cache_enabled():
+        cachekey = occ.cache_key(sympyexpr, output_varname_str, outCparams, par.parval_from_str("PRECISION"))
+        cached_entry = occ.cache_lookup(cachekey)
+
+    if cached_entry is not None:
+        RATIONAL_decls, SIMD_RATIONAL_decls, outlines = cached_entry[0], cached_entry[1], [cached_entry[2]]
+    elif outCparams.CSE_enable == "False":
         # If CSE is disabled:
-        for i in range(len(sympyexpr)):
-            outstring += outtypestring + ccode_postproc(sp.ccode(sympyexpr[i], output_varname_str[i],
-                                                                 user_functions=custom_functions_for_SymPy_ccode))+"\n"
+        with prof.stage("ccode", sympyexpr):
+            for i in range(len(sympyexpr)):
+                outlines.append(outtypestring + ccode_postproc(sp.ccode(sympyexpr[i], output_varname_str[i],
+                                                                     user_functions=Ccode_user_functions))+"\n")
     # Step 6b: If CSE enabled, then perform CSE using SymPy and then
     #          resulting C code.
     else:
         # If CSE is enabled:
         SIMD_const_varnms = []
         SIMD_const_values = []
+        map_sym_to_rat = {}
 
         varprefix = '' if outCparams.CSE_varprefix == 'tmp' else outCparams.CSE_varprefix
         if outCparams.CSE_preprocess == "True" or outCparams.SIMD_enable == "True":
             # If CSE_preprocess == True, then perform partial factorization
             # If SIMD_enable == True, then declare _NegativeOne_ in preprocessing
             factor_negative = eval(outCparams.SIMD_enable) and eval(outCparams.SIMD_find_more_subs)
-            sympyexpr, map_sym_to_rat = cse_preprocess(sympyexpr, prefix=varprefix,
-                declare=eval(outCparams.SIMD_enable), negative=factor_negative, factor=eval(outCparams.CSE_preprocess))
+            with prof.stage("cse_preprocess", sympyexpr):
+                sympyexpr, map_sym_to_rat = cse_preprocess(sympyexpr, prefix=varprefix,
+                    declare=eval(outCparams.SIMD_enable), negative=factor_negative, factor=eval(outCparams.CSE_preprocess))
             for v in map_sym_to_rat:
                 p, q = float(map_sym_to_rat[v].p), float(map_sym_to_rat[v].q)
                 if outCparams.SIMD_enable == "False":
@@ -334,31 +559,94 @@ def outputC(sympyexpr, output_varname_str, filename = "stdout", params = "", pre
         sympy_minor_version = int(sympy_version.split(".")[1])
         if sympy_major_version < 1 or (sympy_major_version == 1 and sympy_minor_version < 3):
             print('Warning: SymPy version', sympy_version, 'does not support CSE postprocessing.')
-            CSE_results = sp.cse(sympyexpr, sp.numbered_symbols(outCparams.CSE_varprefix + '_'),
-                                 order=outCparams.CSE_sorting)
+            with prof.stage("sympy_cse", sympyexpr):
+                CSE_results = sp.cse(sympyexpr, sp.numbered_symbols(outCparams.CSE_varprefix + '_'),
+                                     order=outCparams.CSE_sorting)
         else:
-            CSE_results = cse_postprocess(sp.cse(sympyexpr, sp.numbered_symbols(outCparams.CSE_varprefix + '_'),
-                                                 order=outCparams.CSE_sorting))
-
-        for commonsubexpression in CSE_results[0]:
-            FULLTYPESTRING = "const " + TYPE + " "
-            if outCparams.enable_TYPE == "False":
-                FULLTYPESTRING = ""
-
-            if outCparams.SIMD_enable == "True":
-                outstring += indent + FULLTYPESTRING + str(commonsubexpression[0]) + " = " + \
-                             str(expr_convert_to_SIMD_intrins(commonsubexpression[1],map_sym_to_rat,varprefix,outCparams.SIMD_find_more_FMAsFMSs)) + ";\n"
-            else:
-                outstring += indent + FULLTYPESTRING + ccode_postproc(sp.ccode(commonsubexpression[1], commonsubexpression[0],
-                                                                user_functions=custom_functions_for_SymPy_ccode)) + "\n"
+            with prof.stage("sympy_cse", sympyexpr):
+                if outCparams.CSE_engine == "DAG":
+                    # Global value numbering over a hash-consed expression DAG (faster than SymPy CSE on large inputs)
+                    CSE_results = cse_dag(sympyexpr, sp.numbered_symbols(outCparams.CSE_varprefix + '_'),
+                                          order=outCparams.CSE_sorting)
+                elif outCparams.CSE_parallel_workers != "1" and len(sympyexpr) > 1:
+                    # Partition the expressions into clusters sharing many subexpressions,
+                    #   then perform CSE on each cluster in a separate process.
+                    CSE_results = cse_parallel(sympyexpr, sp.numbered_symbols(outCparams.CSE_varprefix + '_'),
+                                               order=outCparams.CSE_sorting,
+                                               workers=int(outCparams.CSE_parallel_workers),
+                                               ordering=outCparams.CSE_parallel_ordering)
+                else:
+                    CSE_results = sp.cse(sympyexpr, sp.numbered_symbols(outCparams.CSE_varprefix + '_'),
+                                         order=outCparams.CSE_sorting)
+            with prof.stage("cse_postprocess", [expr for _sym, expr in CSE_results[0]] + CSE_results[1]):
+                CSE_results = cse_postprocess(CSE_results)
+
+        if outCparams.CSE_hoist_reciprocals == "True":
+            # Compute the reciprocal of each repeated denominator once, replacing divisions
+            #   by multiplications. Results may change by ~1 ulp per rewritten division.
+            with prof.stage("cse_hoist_reciprocals", [expr for _sym, expr in CSE_results[0]] + CSE_results[1]):
+                CSE_results = cse_hoist_reciprocals(CSE_results[0], CSE_results[1], prefix=outCparams.CSE_varprefix,
+                                                    map_sym_to_rat=map_sym_to_rat)
+
+        if outCparams.CSE_lower_powers == "True":
+            # Compute the integer powers and roots shared by the powers of each base once
+            #   (e.g., b**2 in b**2, b**5, and b**(5/2)), rather than once per power.
+            with prof.stage("cse_lower_powers", [expr for _sym, expr in CSE_results[0]] + CSE_results[1]):
+                CSE_results = cse_lower_powers(CSE_results[0], CSE_results[1], prefix=outCparams.CSE_varprefix,
+                                               map_sym_to_rat=map_sym_to_rat)
+
+        # Statement order: k < len(CSE_results[0]) denotes CSE temporary k,
+        #   otherwise output k - len(CSE_results[0]). By default, all
+        #   temporaries are declared first, followed by the outputs.
+        num_temps = len(CSE_results[0])
+        CSE_order = range(num_temps + len(CSE_results[1]))
+        if outCparams.CSE_schedule == "True":
+            # Reorder temporaries and outputs to shorten live ranges. If an output
+            #   variable is also read by an expression, the outputs must stay at
+            #   the end, in their original order.
+            CSE_exprs = [expr for _sym, expr in CSE_results[0]] + CSE_results[1]
+            with prof.stage("cse_schedule", CSE_exprs):
+                read_names = set()
+                for expr in CSE_exprs:
+                    read_names.update(symbol_occurrences(expr))
+                CSE_order = cse_schedule(CSE_results[0], CSE_results[1],
+                                         fixed_outputs=not read_names.isdisjoint(output_varname_str))
+            outlines.append(indent + "// CSE scheduling: estimated max live temporaries " +
+                            str(max_live_temporaries(CSE_results[0], CSE_results[1])) + " -> " +
+                            str(max_live_temporaries(CSE_results[0], CSE_results[1], CSE_order)) + "\n")
+
+        FMA_stats, FMA_stats_line = {}, len(outlines)
+        with prof.stage("SIMD_intrinsics" if outCparams.SIMD_enable == "True" else "ccode",
+                        [expr for _sym, expr in CSE_results[0]] + CSE_results[1]):
+            for k in CSE_order:
+                if k >= num_temps:
+                    i, result = k - num_temps, CSE_results[1][k - num_temps]
+                    if outCparams.SIMD_enable == "True":
+                        outlines.append(outtypestring + output_varname_str[i] + " = " + \
+                                     str(expr_convert_to_SIMD_intrins(result,map_sym_to_rat,varprefix,outCparams.SIMD_find_more_FMAsFMSs,
+                                                                     FMA_stats=FMA_stats, lower_powers=outCparams.lower_powers)) + ";\n")
+                    else:
+                        outlines.append(outtypestring+ccode_postproc(sp.ccode(result,output_varname_str[i],
+                                                                           user_functions=Ccode_user_functions))+"\n")
+                    continue
+                commonsubexpression = CSE_results[0][k]
+                FULLTYPESTRING = "const " + TYPE + " "
+                if outCparams.enable_TYPE == "False":
+                    FULLTYPESTRING = ""
 
-        for i, result in enumerate(CSE_results[1]):
-            if outCparams.SIMD_enable == "True":
-                outstring += outtypestring + output_varname_str[i] + " = " + \
-                             str(expr_convert_to_SIMD_intrins(result,map_sym_to_rat,varprefix,outCparams.SIMD_find_more_FMAsFMSs)) + ";\n"
-            else:
-                outstring += outtypestring+ccode_postproc(sp.ccode(result,output_varname_str[i],
-                                                                   user_functions=custom_functions_for_SymPy_ccode))+"\n"
+                if outCparams.SIMD_enable == "True":
+                    outlines.append(indent + FULLTYPESTRING + str(commonsubexpression[0]) + " = " + \
+                                 str(expr_convert_to_SIMD_intrins(commonsubexpression[1],map_sym_to_rat,varprefix,outCparams.SIMD_find_more_FMAsFMSs,
+                                                                  FMA_stats=FMA_stats, lower_powers=outCparams.lower_powers)) + ";\n")
+                else:
+                    outlines.append(indent + FULLTYPESTRING + ccode_postproc(sp.ccode(commonsubexpression[1], commonsubexpression[0],
+                                                                    user_functions=Ccode_user_functions)) + "\n")
+        if FMA_stats.get("sums", 0) > 0:
+            outlines.insert(FMA_stats_line, indent + "// FMA cost model: fused " + str(FMA_stats["FMAs"]) + " of " +
+                            str(FMA_stats["products"]) + " products in " + str(FMA_stats["sums"]) + " sums into " +
+                            str(FMA_stats["chains"]) + " chains; estimated operations " + str(FMA_stats["ops_unfused"]) +
+                            " -> " + str(FMA_stats["ops"]) + ", summed critical paths " + str(FMA_stats["depth_unfused"]) +
+                            " -> " + str(FMA_stats["depth"]) + " cycles\n")
         # Complication: SIMD functions require numerical constants to be stored in SIMD arrays
         # Resolution: This function extends lists "SIMD_const_varnms" and "SIMD_const_values",
         #             which store the name of each constant SIMD array (e.g., _Integer_1) and
@@ -391,30 +679,46 @@ def outputC(sympyexpr, output_varname_str, filename = "stdout", params = "", pre
                 if outCparams.enable_TYPE == "False":
                     SIMD_RATIONAL_decls += indent + SIMD_const_varnms[i] + " = " + SIMD_const_values[i]+";"
                 else:
-                    SIMD_RATIONAL_decls += indent + "const double " + "tmp" + SIMD_const_varnms[i] + " = " + SIMD_const_values[i] + ";\n"
+                    SIMD_RATIONAL_decls += indent + "const " + SIMD_const_TYPE + " tmp" + SIMD_const_varnms[i] + " = " + SIMD_const_values[i] + ";\n"
                     SIMD_RATIONAL_decls += indent + "const REAL_SIMD_ARRAY " + SIMD_const_varnms[i] + " = ConstSIMD(" + "tmp" + SIMD_const_varnms[i] + ");\n"
                 SIMD_RATIONAL_decls += "\n"
 
-    # Step 7: Construct final output string
-    final_Ccode_output_str = commentblock
-    # Step 7a: Output C code in indented curly brackets if
-    #          outCparams.includebraces = True
-    if outCparams.includebraces == "True": final_Ccode_output_str += outCparams.preindent+"{\n"
-    final_Ccode_output_str += prestring + RATIONAL_decls + SIMD_RATIONAL_decls + outstring + poststring
-    if outCparams.includebraces == "True": final_Ccode_output_str += outCparams.preindent+"}\n"
+    # Step 6c: Store the newly generated C code in the outputC cache.
+    if cachekey is not None and cached_entry is None:
+        occ.cache_store(cachekey, [RATIONAL_decls, SIMD_RATIONAL_decls, "".join(outlines)])
+
+    # Step 7: Stream the final C code to its destination, writing each
+    #         piece exactly once (avoids quadratic string concatenation).
+    def write_final_Ccode(writer):
+        writer.writelines(commentblock)
+        # Step 7a: Output C code in indented curly brackets if
+        #          outCparams.includebraces = True
+        if outCparams.includebraces == "True": writer.write(outCparams.preindent+"{\n")
+        writer.write(prestring)
+        writer.write(RATIONAL_decls)
+        writer.write(SIMD_RATIONAL_decls)
+        writer.writelines(outlines)
+        writer.write(poststring)
+        if outCparams.includebraces == "True": writer.write(outCparams.preindent+"}\n")
 
     # Step 8: If filename == "stdout", then output
     #         C code to standard out (useful for copy-paste or interactive
-    #         mode). Otherwise output to file specified in variable name.
-    if filename == "stdout":
+    #         mode). If filename is a CcodeWriter or file handle, stream the
+    #         C code into it. Otherwise output to file specified in variable name.
+    if is_Ccode_stream(filename):
+        write_final_Ccode(filename if isinstance(filename, CcodeWriter) else CcodeWriter(filename))
+    elif filename == "stdout":
         # Output to standard out (stdout; "the screen")
-        print(final_Ccode_output_str)
+        write_final_Ccode(CcodeWriter(sys.stdout))
+        sys.stdout.write("\n")
     elif filename == "returnstring":
-        return final_Ccode_output_str
+        writer = CcodeWriter()
+        write_final_Ccode(writer)
+        return writer.getvalue()
     else:
         # Output to the file specified by the function input parameter string 'filename':
         with open(filename, outCparams.outCfileaccess) as file:
-            file.write(final_Ccode_output_str)
+            write_final_Ccode(CcodeWriter(file))
         successstr = ""
         if outCparams.outCfileaccess == "a":
             successstr = "Appended "
@@ -422,6 +726,114 @@ def outputC(sympyexpr, output_varname_str, filename = "stdout", params = "", pre
             successstr = "Wrote "
         print(successstr + "to file \"" + filename + "\"")
 
+# Declarations of the numerical constants outputC() and FD_outputC() generate, e.g.,
+#    const double FDPart1_Rational_1_12 = 1.0/12.0;
+#    const double tmp_Integer_2 = 2.0;
+#    const REAL_SIMD_ARRAY _Integer_2 = ConstSIMD(tmp_Integer_2);
+#    const double tmp_upwind_Integer_1 = 1.000000000000000000000000000000000;
+#    const REAL_SIMD_ARRAY upwind_Integer_1 = ConstSIMD(tmp_upwind_Integer_1);
+const_name_regex   = r'\w*_(?:Rational_\d+_\d+|Integer_\d+|NegativeOne_)'
+const_value_regex  = r'-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?'
+const_decl_regex   = re.compile(r'^\s*const\s+(?:double|float|REAL)\s+(' + const_name_regex + r')\s*=\s*('
+                                + const_value_regex + r'(?:\s*/\s*' + const_value_regex + r')?)\s*;\s*$')
+SIMD_const_decl_regex = re.compile(r'^\s*const\s+REAL_SIMD_ARRAY\s+(' + const_name_regex
+                                   + r')\s*=\s*ConstSIMD\(\s*(tmp_?\1)\s*\)\s*;\s*$')
+
+def hoist_constant_declarations(Ccode_list, indent="    "):
+    """ Remove the declarations of numerical constants (rationals, integers, and -1, as
+        declared by outputC(), scalar or SIMD) from a list of C code strings, e.g., the
+        preloop, loop body, and postloop of a C function. Constants with the same value
+        are merged into one, named after the first that appears, so that each can be
+        declared just once, in the function prologue.
+
+        :arg:    list of C code strings
+        :arg:    indentation of the returned declarations
+        :return: string of declarations, list of C code strings without them
+
+        >>> body = '''const double tmpFDPart1_Rational_1_2 = 1.0/2.0;
+        ... const REAL_SIMD_ARRAY FDPart1_Rational_1_2 = ConstSIMD(tmpFDPart1_Rational_1_2);
+        ... const REAL_SIMD_ARRAY a = MulSIMD(FDPart1_Rational_1_2, x);
+        ... const double tmp_Rational_1_2 = 0.5;
+        ... const REAL_SIMD_ARRAY _Rational_1_2 = ConstSIMD(tmp_Rational_1_2);
+        ... const REAL_SIMD_ARRAY b = MulSIMD(_Rational_1_2, y);
+        ... '''
+        >>> decls, (new_body,) = hoist_constant_declarations([body])
+        >>> print(decls.rstrip("\\n"))
+            const double tmpFDPart1_Rational_1_2 = 1.0/2.0;
+            const REAL_SIMD_ARRAY FDPart1_Rational_1_2 = ConstSIMD(tmpFDPart1_Rational_1_2);
+        >>> print(new_body.rstrip("\\n"))
+        const REAL_SIMD_ARRAY a = MulSIMD(FDPart1_Rational_1_2, x);
+        const REAL_SIMD_ARRAY b = MulSIMD(FDPart1_Rational_1_2, y);
+
+        Names declared more than once with different values are left where they are:
+        >>> decls, Ccode = hoist_constant_declarations(["const double _Integer_2 = 2.0;\\n",
+        ...                                             "const double _Integer_2 = 3.0;\\n"])
+        >>> decls == "" and Ccode == ["const double _Integer_2 = 2.0;\\n", "const double _Integer_2 = 3.0;\\n"]
+        True
+    """
+    def value_of(string):
+        numerator, _sep, denominator = string.partition("/")
+        return float(numerator) / float(denominator) if denominator else float(numerator)
+
+    # Step 1: Find every declaration, as (line number, number of lines, name, value, SIMD?)
+    decls_list = []
+    for Ccode in Ccode_list:
+        lines = Ccode.splitlines(True)
+        decls = []
+        i = 0
+        while i < len(lines):
+            match = const_decl_regex.match(lines[i])
+            if match is not None:
+                SIMD_match = SIMD_const_decl_regex.match(lines[i + 1]) if i + 1 < len(lines) else None
+                if SIMD_match is not None and SIMD_match.group(2) == match.group(1):
+                    decls.append((i, 2, SIMD_match.group(1), match.group(2), True))
+                    i += 2
+                    continue
+                decls.append((i, 1, match.group(1), match.group(2), False))
+            i += 1
+        decls_list.append((lines, decls))
+
+    # Step 2: Keep only names declared with a single (value, SIMD?) kind, then merge
+    #         names of the same kind, in the order they first appear. A name that
+    #         appears only in its declarations may be used inside a macro (e.g.,
+    #         upwind_Integer_1 in UPWIND_ALG()), so it cannot be renamed; it is
+    #         hoisted under its own name instead.
+    kinds = {}
+    num_decls = Counter()
+    for _lines, decls in decls_list:
+        for _i, _n, name, value, SIMD in decls:
+            kinds.setdefault(name, set()).add((value_of(value), SIMD))
+            num_decls[name] += 1
+    num_occurrences = Counter(re.findall(r'\w+', "".join(Ccode_list)))
+    canonical_name = {}
+    hoisted = OrderedDict()
+    for lines, decls in decls_list:
+        for i, n, name, value, SIMD in decls:
+            if len(kinds[name]) != 1 or name in canonical_name:
+                continue
+            kind = (value_of(value), SIMD)
+            if kind in hoisted and num_occurrences[name] == num_decls[name]:
+                kind = name
+            if kind not in hoisted:
+                hoisted[kind] = (name, "".join(indent + line.strip() + "\n" for line in lines[i:i + n]))
+            canonical_name[name] = hoisted[kind][0]
+    if not hoisted:
+        return "", list(Ccode_list)
+
+    # Step 3: Remove the hoisted declarations, and rename merged constants.
+    renamed = {name: canon for name, canon in canonical_name.items() if name != canon}
+    rename_regex = re.compile(r'\b(' + '|'.join(sorted(renamed, key=len, reverse=True)) + r')\b') if renamed else None
+    new_Ccode_list = []
+    for lines, decls in decls_list:
+        remove = set()
+        for i, n, name, _value, _SIMD in decls:
+            if name in canonical_name:
+                remove.update(range(i, i + n))
+        Ccode = "".join(line for i, line in enumerate(lines) if i not in remove)
+        if rename_regex is not None:
+            Ccode = rename_regex.sub(lambda match: renamed[match.group(1)], Ccode)
+        new_Ccode_list.append(Ccode)
+    return "".join(decl for _name, decl in hoisted.values()), new_Ccode_list
 
 outC_function_prototype_dict = {}
 outC_function_dict           = {}
@@ -441,31 +853,35 @@ def Cfunction(includes=None, prefunc="", desc="", type="void", name=None, params
         else:
             include_Cparams_str = "#include \"" + os.path.join(rel_path_to_Cparams, "set_Cparameters.h") + "\"\n"
 
-    complete_func = ""
+    # 'HoistConstants': declare the numerical constants of every outputC() call in the
+    #   preloop, loop body, and postloop just once, at the top of the function.
+    hoisted_decls = ""
+    if "HoistConstants" in opts:
+        hoisted_decls, (preloop, body, postloop) = hoist_constant_declarations([preloop, body, postloop])
+
+    # Collect the pieces of the C function in a list, and join them once at the end.
+    complete_func = []
     if includes is not None:
         if not isinstance(includes, list):
             print("Error in outCfunction(): includes must be set to a list of strings")
             print("e.g., includes=[\"stdio.h\",\"stdlib.h\"] ;  or None (default)")
             sys.exit(1)
         for inc in includes:
-            complete_func += "#include \"" + inc + "\"\n"
-        complete_func += "\n"
+            complete_func.append("#include \"" + inc + "\"\n")
+        complete_func.append("\n")
 
     if prefunc != "":
-        complete_func += prefunc + "\n"
+        complete_func.append(prefunc + "\n")
 
     def indent_Ccode(indent, Ccode):
-        Ccodesplit = Ccode.splitlines()
-        outstring = ""
-        for i in range(len(Ccodesplit)):
-            outstring += indent + Ccodesplit[i] + '\n'
-        return outstring
+        return "".join([indent + line + '\n' for line in Ccode.splitlines()])
 
     if desc != "":
-        complete_func += "/*\n" + indent_Ccode(" * ", desc) + " */\n"
-    complete_func += func_prototype + " {\n"+include_Cparams_str+preloop+"\n"+lp.simple_loop(loopopts, body)+postloop+"}\n"
+        complete_func.append("/*\n" + indent_Ccode(" * ", desc) + " */\n")
+    complete_func.extend([func_prototype + " {\n", include_Cparams_str, hoisted_decls, preloop, "\n",
+                          lp.simple_loop(loopopts, body), postloop, "}\n"])
 
-    return func_prototype+";", complete_func
+    return func_prototype+";", "".join(complete_func)
 
 def add_to_Cfunction_dict(includes=None, prefunc="", desc="", type="void", name=None, params=None,
                           preloop="", body=None, loopopts="", postloop="", opts="",
@@ -474,6 +890,8 @@ def add_to_Cfunction_dict(includes=None, prefunc="", desc="", type="void", name=
     outC_function_prototype_dict[name], outC_function_dict[name] = \
         Cfunction(includes, prefunc, desc, type, name, params, preloop, body, loopopts, postloop, opts,
                   rel_path_to_Cparams)
+    # Attribute all code generation stages profiled since the previous C function to this one.
+    prof.assign_to_Cfunction(name)
 
 def outCfunction(outfile="", includes=None, prefunc="", desc="",
                  type="void", name=None, params=None, preloop="", body=None, loopopts="", postloop="",
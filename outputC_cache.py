@@ -0,0 +1,249 @@
+""" Persistent (On-Disk) Cache for outputC()
+
+    The following module stores the C code generated by outputC() on disk,
+    keyed by a stable hash of everything that determines that C code:
+    the input SymPy expressions (their full expression trees), the output variable names,
+    the parsed outCparams, the PRECISION parameter, the SymPy version, and
+    the code generator itself (see generator_digest()).
+    A cache hit returns the finished C code without performing CSE or
+    any other symbolic work. The cache is bounded in size: once the
+    total size on disk exceeds the maximum, the least-recently-used
+    entries are evicted (file modification times record usage).
+
+    The cache is disabled by default; enable it with e.g.,
+    par.set_parval_from_str("outputC_cache::enable", True)
+"""
+
+import NRPy_param_funcs as par  # NRPy+: parameter interface
+import SIMD                     # NRPy+: SymPy expression => SIMD intrinsics interface (its cost model constants)
+import sympy as sp              # SymPy: The Python computer algebra package upon which NRPy+ depends
+import hashlib, json, os, sys   # Standard Python modules for hashing, serialization, and multiplatform OS-level functions
+
+thismodule = __name__
+par.initialize_param(par.glb_param("bool", thismodule, "enable", False))
+par.initialize_param(par.glb_param("char", thismodule, "cache_dir",
+                                   os.path.join(os.path.expanduser("~"), ".cache", "nrpy", "outputC")))
+par.initialize_param(par.glb_param("int",  thismodule, "max_size_MB", 1024))
+
+# Bump this whenever the format of a cache entry on disk changes. Changes
+#   to the C code generated need no bump, as the key includes generator_digest().
+CACHE_FORMAT_VERSION = 2
+
+# Modules whose source determines the C code output by outputC()
+generator_modules = ["outputC.py", "cse_helpers.py", "SIMD.py", "expr_tree.py", "finite_difference_helpers.py"]
+generator_source_digest = None
+
+cache_stats_dict = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+# Running estimate of the total cache size on disk, in bytes, so that
+#   the cache directory need only be scanned when eviction may be needed.
+cache_size_estimate = None
+
+def cache_enabled():
+    return par.parval_from_str(thismodule + "::enable")
+
+def generator_digest():
+    """ Compute a digest of the code generator: the source of generator_modules
+        (read once per process), and the SIMD cost model constants used with
+        SIMD_find_more_FMAsFMSs="CostModel", which may be changed at runtime.
+
+        :return: hexadecimal SHA-256 hash string
+
+        >>> digest = generator_digest()
+        >>> saved, SIMD.FMA_depth_weight = SIMD.FMA_depth_weight, 0.5
+        >>> len(digest), generator_digest() == digest
+        (64, False)
+        >>> SIMD.FMA_depth_weight = saved
+        >>> generator_digest() == digest
+        True
+    """
+    global generator_source_digest
+    if generator_source_digest is None:
+        hasher = hashlib.sha256()
+        for module in generator_modules:
+            with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), module), "rb") as file:
+                hasher.update(module.encode("utf-8") + b"\0" + file.read() + b"\0")
+        generator_source_digest = hasher.hexdigest()
+    constants = json.dumps([SIMD.SIMD_latency, SIMD.FMA_issue_width, SIMD.FMA_depth_weight], sort_keys=True)
+    return hashlib.sha256((generator_source_digest + constants).encode("utf-8")).hexdigest()
+
+def cache_key(sympyexpr_list, output_varname_list, outCparams, PRECISION):
+    """ Compute the cache key for a call to outputC()
+
+        :arg:    list of SymPy expressions
+        :arg:    list of output variable names
+        :arg:    parsed outCparams namedtuple
+        :arg:    PRECISION parameter
+        :return: hexadecimal SHA-256 hash string
+
+        >>> from sympy.abc import x, y
+        >>> k1 = cache_key([x**2 + y], ["out"], ("", "True"), "double")
+        >>> k2 = cache_key([x**2 + y], ["out"], ("", "True"), "float")
+        >>> len(k1), k1 == k2, k1 == cache_key([x**2 + y], ["out"], ("", "True"), "double")
+        (64, False, True)
+    """
+    hasher = hashlib.sha256()
+    for item in [str(CACHE_FORMAT_VERSION), generator_digest(), sp.__version__, PRECISION, repr(tuple(outCparams))]:
+        hasher.update(item.encode("utf-8") + b"\0")
+    memo = {}
+    for varname, expr in zip(output_varname_list, sympyexpr_list):
+        hasher.update(varname.encode("utf-8") + b"\0" + expr_fingerprint(expr, memo) + b"\0")
+    return hasher.hexdigest()
+
+def expr_fingerprint(expr, memo=None):
+    """ Compute a stable digest of a SymPy expression.
+
+        The digest is equivalent to hashing srepr(expr), but is much faster
+        on large expressions: sp.srepr() sorts the terms of every Add and
+        Mul for printing, whereas here we walk expr.args in SymPy's internal
+        (canonical) order, and each shared subexpression is digested once.
+
+        :arg:    SymPy expression
+        :arg:    memo dictionary, mapping id(subexpression) to digest
+        :return: SHA-256 digest (bytes)
+
+        >>> from sympy.abc import x, y
+        >>> expr_fingerprint(x + y) == expr_fingerprint(y + x)
+        True
+        >>> expr_fingerprint(x + y) == expr_fingerprint(x*y)
+        False
+    """
+    if memo is None:
+        memo = {}
+    # Iterative postorder traversal, so deeply nested expressions
+    #   cannot exceed Python's recursion limit.
+    stack = [(expr, False)]
+    while stack:
+        subexpr, children_done = stack.pop()
+        if id(subexpr) in memo:
+            continue
+        args = subexpr.args if isinstance(subexpr, sp.Basic) else ()
+        if not args:
+            atom = sp.srepr(subexpr) if isinstance(subexpr, sp.Basic) else repr(subexpr)
+            memo[id(subexpr)] = hashlib.sha256(atom.encode("utf-8")).digest()
+        elif children_done:
+            hasher = hashlib.sha256(type(subexpr).__name__.encode("utf-8"))
+            for arg in args:
+                hasher.update(memo[id(arg)])
+            memo[id(subexpr)] = hasher.digest()
+        else:
+            stack.append((subexpr, True))
+            for arg in args:
+                stack.append((arg, False))
+    return memo[id(expr)]
+
+def makedirs(path):
+    """ Create directory path (and its parents), unless it already exists,
+        e.g., because a concurrent process just created it. """
+    try:
+        os.makedirs(path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+
+def replace_file(src, dst):
+    """ Atomically rename src to dst, replacing dst if it exists (os.replace() is Python 3 only;
+        os.rename() replaces atomically on POSIX, but not on Windows). """
+    if hasattr(os, "replace"):
+        os.replace(src, dst)
+    else:
+        if os.name == "nt" and os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+def cache_path(key):
+    return os.path.join(par.parval_from_str(thismodule + "::cache_dir"), key[:2], key + ".json")
+
+def cache_lookup(key):
+    """ Return the cached entry (a list of strings) for key, or None on a cache miss. """
+    path = cache_path(key)
+    try:
+        with open(path, "r") as file:
+            entry = json.load(file)
+    except (IOError, OSError, ValueError):
+        cache_stats_dict["misses"] += 1
+        return None
+    # Update the modification time, which marks the entry as recently used
+    try: os.utime(path, None)
+    except OSError: pass
+    cache_stats_dict["hits"] += 1
+    # On Python 2, json.load() returns unicode strings; the generated C code is ASCII.
+    return [str(line) for line in entry]
+
+def cache_store(key, entry):
+    """ Store entry (a list of strings) under key, then evict entries if the cache is too large.
+
+        >>> import tempfile
+        >>> par.set_parval_from_str(thismodule + "::cache_dir", tempfile.mkdtemp())
+        >>> reset_cache_stats()
+        >>> cache_lookup("ab12") is None
+        True
+        >>> cache_store("ab12", ["const double x = 1.0;\\n"])
+        >>> cache_lookup("ab12")
+        ['const double x = 1.0;\\n']
+        >>> cache_clear()
+        >>> cache_lookup("ab12") is None
+        True
+        >>> sorted(cache_stats().items())
+        [('evictions', 0), ('hits', 0), ('misses', 1), ('stores', 0)]
+    """
+    path = cache_path(key)
+    try:
+        makedirs(os.path.dirname(path))
+        # Write to a temporary file first and then rename, so that concurrent
+        #   (e.g., multiprocessing) codegen never reads a partially-written entry.
+        tmppath = path + ".tmp" + str(os.getpid())
+        with open(tmppath, "w") as file:
+            json.dump(entry, file)
+        replace_file(tmppath, path)
+    except (IOError, OSError) as err:
+        print("outputC_cache warning: could not write cache entry " + path + ": " + str(err))
+        return
+    cache_stats_dict["stores"] += 1
+    global cache_size_estimate
+    max_size_bytes = par.parval_from_str(thismodule + "::max_size_MB") * 1024 * 1024
+    if cache_size_estimate is None or cache_size_estimate + os.path.getsize(path) > max_size_bytes:
+        cache_evict(max_size_bytes)
+    else:
+        cache_size_estimate += os.path.getsize(path)
+
+def cache_evict(max_size_bytes=None):
+    """ Evict least-recently-used entries until the cache fits within max_size_bytes. """
+    global cache_size_estimate
+    if max_size_bytes is None:
+        max_size_bytes = par.parval_from_str(thismodule + "::max_size_MB") * 1024 * 1024
+    entries = []
+    total_size = 0
+    for dirpath, _dirnames, filenames in os.walk(par.parval_from_str(thismodule + "::cache_dir")):
+        for filename in filenames:
+            if filename.endswith(".json"):
+                path = os.path.join(dirpath, filename)
+                try: stat = os.stat(path)
+                except OSError: continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+    if total_size > max_size_bytes:
+        for _mtime, size, path in sorted(entries):
+            try: os.remove(path)
+            except OSError: continue
+            cache_stats_dict["evictions"] += 1
+            total_size -= size
+            if total_size <= max_size_bytes:
+                break
+    cache_size_estimate = total_size
+
+def cache_clear():
+    """ Remove all cache entries from disk and reset the statistics. """
+    cache_evict(max_size_bytes=0)
+    reset_cache_stats()
+
+def cache_stats():
+    """ Return a copy of the hit/miss/store/eviction counters. """
+    return dict(cache_stats_dict)
+
+def reset_cache_stats():
+    for key in cache_stats_dict:
+        cache_stats_dict[key] = 0
+
+if __name__ == "__main__":
+    import doctest
+    sys.exit(doctest.testmod()[0])
@@ -0,0 +1,209 @@
+""" Accuracy Test: Transcendental Functions in SIMD/SIMD_intrinsics.h
+
+    Compiles a small C program against SIMD/SIMD_intrinsics.h for each
+    instruction set gcc can target on this machine (SSE2, AVX2+FMA, AVX512F,
+    or no SIMD), in double and single precision, and measures the maximum
+    error of ExpSIMD(), LogSIMD(), SinSIMD(), CosSIMD(), PowSIMD(), and
+    CbrtSIMD() in units in the last place (ULP), against libm evaluated in
+    higher precision (long double for double, double for float).
+
+    The tests are skipped if gcc is unavailable; instruction sets the CPU
+    does not support are skipped individually. Run with
+    python tests/test_SIMD_transcendentals.py (as UnitTesting/run_NRPy_UnitTests.sh does),
+    or python tests/test_SIMD_transcendentals.py table to print the ULP table.
+"""
+
+from cmdline_helper import check_executable_exists  # NRPy+: Multi-platform Python command-line interface
+import os, shutil, subprocess, sys, tempfile, unittest  # Standard Python modules for multiplatform OS-level functions and unit testing
+
+SIMD_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "SIMD")
+
+# Compile flags for each instruction set, and the /proc/cpuinfo flags it requires:
+ISAs = {"SSE2":    ("-msse2",           []),
+        "AVX2":    ("-mavx2 -mfma",     ["avx2", "fma"]),
+        "AVX512F": ("-mavx512f -mfma",  ["avx512f"]),
+        # Without SIMD, the header falls back to libm; hide x86-64's baseline SSE2 from it:
+        "noSIMD":  ("-U__SSE2__",       [])}
+
+# Maximum error, in ULP, for (double, float), as documented in SIMD/SIMD_intrinsics.h.
+#   PowSIMD(a,b) is additionally allowed 2|b log(a)| ULP (checked by the C program).
+max_ULP = {"exp": (1.2, 1.2), "log": (0.9, 0.9), "sin": (1.6, 1.6), "cos": (1.6, 1.6),
+           "pow": (0.9, 0.9), "cbrt": (0.8, 0.8)}
+
+accuracy_C = r"""
+#include <stdio.h>
+#include <stdlib.h>
+#include <math.h>
+#include "SIMD_intrinsics.h"
+#ifdef SIMD_FLOAT
+typedef double REF;  // Reference results are computed in double precision, with libm
+#define REF_(f) f
+#define MANTISSA_BITS 23
+#define MIN_EXPONENT -126
+#define EXP_MAX 88.0
+#define SUBNORMAL_MIN 1e-44
+#define SUBNORMAL_MAX 1e-38
+#else
+typedef long double REF;  // Reference results are computed in extended precision, with libm
+#define REF_(f) f ## l
+#define MANTISSA_BITS 52
+#define MIN_EXPONENT -1022
+#define EXP_MAX 709.0
+#define SUBNORMAL_MIN 1e-320
+#define SUBNORMAL_MAX 1e-308
+#endif
+#define N 1000000
+
+// Error of y in ULP of the correctly-rounded result, for a reference result ref:
+static double ULP_error(const REAL y, const REF ref) {
+  if(isnan(ref)) return isnan(y) ? 0 : INFINITY;
+  if(isinf((REAL)ref) || (REAL)ref == 0) return y == (REAL)ref ? 0 : INFINITY;  // Overflow or underflow in REAL
+  int e; frexp((double)ref, &e);
+  if(e - 1 < MIN_EXPONENT) e = MIN_EXPONENT + 1;
+  return (double)(fabsl((long double)y - (long double)ref) / ldexpl(1.0L, e - 1 - MANTISSA_BITS));
+}
+
+static double rand_in(const double lo, const double hi) { return lo + (hi - lo)*((double)rand() / RAND_MAX); }
+
+// Check f(x) at N random points x in [lo,hi] (on a logarithmic scale if log_scale):
+#define CHECK1(name, SIMDf, reff, lo, hi, log_scale)                    \
+  {                                                                     \
+    double max_err = 0;                                                 \
+    for(int i=0;i<N;i+=SIMD_width) {                                    \
+      REAL x[SIMD_width], y[SIMD_width];                                \
+      for(int j=0;j<SIMD_width;j++)                                     \
+        x[j] = log_scale ? (REAL)exp(rand_in(log(lo), log(hi))) : (REAL)rand_in(lo, hi); \
+      WriteSIMD(y, SIMDf(ReadSIMD(x)));                                 \
+      for(int j=0;j<SIMD_width;j++) {                                   \
+        const double err = ULP_error(y[j], REF_(reff)((REF)x[j]));      \
+        if(err > max_err) max_err = err;                                \
+      }                                                                 \
+    }                                                                   \
+    printf("%s %.3f\n", name, max_err);                                 \
+  }
+
+static double worst_special = 0;
+#define CHECK_SPECIAL1(SIMDf, reff, x0)                                 \
+  {                                                                     \
+    REAL x[SIMD_width], y[SIMD_width];                                  \
+    for(int j=0;j<SIMD_width;j++) x[j] = (x0);                          \
+    WriteSIMD(y, SIMDf(ReadSIMD(x)));                                   \
+    const double err = ULP_error(y[0], REF_(reff)((REF)x[0]));          \
+    if(err > worst_special) {                                           \
+      worst_special = err;                                              \
+      printf("# special case: " #SIMDf "(%g) = %g, error %g ULP\n", (double)x[0], (double)y[0], err); \
+    }                                                                   \
+  }
+
+int main() {
+  srand(1);
+  CHECK1("exp", ExpSIMD, exp, -80.0, 80.0, 0);
+  CHECK1("exp_full_range", ExpSIMD, exp, -EXP_MAX, EXP_MAX, 0);
+  CHECK1("log", LogSIMD, log, 1e-30, 1e30, 1);
+  CHECK1("log_near_1", LogSIMD, log, 0.5, 2.0, 0);
+  CHECK1("log_subnormal", LogSIMD, log, SUBNORMAL_MIN, SUBNORMAL_MAX, 1);
+  CHECK1("sin", SinSIMD, sin, -100.0, 100.0, 0);
+  CHECK1("cos", CosSIMD, cos, -100.0, 100.0, 0);
+  CHECK1("cbrt", CbrtSIMD, cbrt, -1e30, 1e30, 0);
+  CHECK1("cbrt_small", CbrtSIMD, cbrt, 1e-30, 1e30, 1);
+  {
+    // PowSIMD(a,b): error relative to 1 + 2|b log(a)| ULP, for a in [1e-3,1e3], b in [-3.5,3.5]:
+    double max_err = 0;
+    for(int i=0;i<N;i+=SIMD_width) {
+      REAL a[SIMD_width], b[SIMD_width], y[SIMD_width];
+      for(int j=0;j<SIMD_width;j++) { a[j] = (REAL)exp(rand_in(log(1e-3), log(1e3))); b[j] = (REAL)rand_in(-3.5, 3.5); }
+      WriteSIMD(y, PowSIMD(ReadSIMD(a), ReadSIMD(b)));
+      for(int j=0;j<SIMD_width;j++) {
+        const double err = ULP_error(y[j], REF_(pow)((REF)a[j], (REF)b[j])) / (1.0 + 2.0*fabs(b[j]*log(a[j])));
+        if(err > max_err) max_err = err;
+      }
+    }
+    printf("pow %.3f\n", max_err);
+  }
+  // Special values, which must be exact:
+  CHECK_SPECIAL1(ExpSIMD, exp, 0.0);
+  CHECK_SPECIAL1(ExpSIMD, exp, 1000.0);
+  CHECK_SPECIAL1(ExpSIMD, exp, -1000.0);
+  CHECK_SPECIAL1(ExpSIMD, exp, INFINITY);
+  CHECK_SPECIAL1(ExpSIMD, exp, -INFINITY);
+  CHECK_SPECIAL1(LogSIMD, log, 1.0);
+  CHECK_SPECIAL1(LogSIMD, log, 0.0);
+  CHECK_SPECIAL1(LogSIMD, log, -1.0);
+  CHECK_SPECIAL1(LogSIMD, log, INFINITY);
+  CHECK_SPECIAL1(LogSIMD, log, NAN);
+  CHECK_SPECIAL1(SinSIMD, sin, 0.0);
+  CHECK_SPECIAL1(CosSIMD, cos, 0.0);
+  CHECK_SPECIAL1(CbrtSIMD, cbrt, 0.0);
+  CHECK_SPECIAL1(CbrtSIMD, cbrt, -8.0);
+  CHECK_SPECIAL1(CbrtSIMD, cbrt, INFINITY);
+  CHECK_SPECIAL1(CbrtSIMD, cbrt, -INFINITY);
+  printf("special %.3f\n", worst_special);
+  return 0;
+}
+"""
+
+def CPU_supports(flags):
+    try:
+        with open("/proc/cpuinfo") as cpuinfo:
+            cpu_flags = set(next(line for line in cpuinfo if line.startswith("flags")).split(":")[1].split())
+    except (IOError, StopIteration):
+        return not flags
+    return all(flag in cpu_flags for flag in flags)
+
+def measure_ULP(ISA, precision, extra_flags=""):
+    """ Compile and run the accuracy program; return a dict of the maximum error, in ULP, of each function,
+        or None if this instruction set cannot be compiled for or run on this machine. """
+    compile_flags, cpu_flags = ISAs[ISA]
+    if not check_executable_exists("gcc", error_if_not_found=False) or not CPU_supports(cpu_flags):
+        return None
+    workdir = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(workdir, "accuracy.c"), "w") as file:
+            file.write(("#define SIMD_FLOAT\n" if precision == "float" else "")
+                       + "#define REAL " + precision + "\n" + accuracy_C)
+        exe = os.path.join(workdir, "accuracy")
+        subprocess.check_call("gcc -std=gnu99 -O2 " + compile_flags + " " + extra_flags + " -I" + SIMD_dir + " "
+                              + os.path.join(workdir, "accuracy.c") + " -o " + exe + " -lm", shell=True)
+        output = subprocess.check_output([exe]).decode()
+    finally:
+        shutil.rmtree(workdir)
+    return dict((line.split()[0], float(line.split()[1])) for line in output.splitlines() if not line.startswith("#"))
+
+class TestSIMDTranscendentals(unittest.TestCase):
+
+    def check_ISA(self, ISA):
+        tested = False
+        for precision_idx, precision in enumerate(("double", "float")):
+            errors = measure_ULP(ISA, precision)
+            if errors is None:
+                continue
+            tested = True
+            self.assertEqual(errors.pop("special"), 0, ISA + " " + precision + ": special values")
+            if ISA == "noSIMD":
+                continue  # Without SIMD, these are libm's own functions; only check that they are all #define'd.
+            for name, err in errors.items():
+                self.assertLessEqual(err, max_ULP[name.split("_")[0]][precision_idx],
+                                     "%s %s: %s has a maximum error of %.3f ULP" % (ISA, precision, name, err))
+        if not tested:
+            self.skipTest("gcc unavailable, or " + ISA + " unsupported by this CPU")
+
+    def test_SSE2(self):
+        self.check_ISA("SSE2")
+
+    def test_AVX2(self):
+        self.check_ISA("AVX2")
+
+    def test_AVX512F(self):
+        self.check_ISA("AVX512F")
+
+    def test_noSIMD(self):
+        self.check_ISA("noSIMD")
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["table"]:
+        for ISA in ISAs:
+            for precision in ("double", "float"):
+                print(ISA, precision, measure_ULP(ISA, precision))
+        sys.exit(0)
+    result = unittest.TextTestRunner().run(unittest.TestLoader().loadTestsFromTestCase(TestSIMDTranscendentals))
+    sys.exit(not result.wasSuccessful())